@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of getting and setting the degrees of freedom of an
+Optimizable graph.
+
+The graph consists of ``nnodes`` Optimizable objects with ``ndofs_per_node``
+DOFs each, all feeding a single OptimizableSum, similar to the graph of a
+stage-two objective with many coils or of a wireframe. For each graph size,
+the average time of a get and of a set of ``x`` on the final node is
+printed.
+"""
+
+import time
+
+import numpy as np
+
+from simsopt._core.optimizable import Optimizable, OptimizableSum
+
+print("Running 2_Intermediate/dof_scatter_gather_benchmark.py")
+print("======================================================")
+
+
+class Node(Optimizable):
+    def __init__(self, n):
+        super().__init__(x0=np.zeros(n))
+
+    def J(self):
+        return np.sum(self.local_full_x**2)
+
+
+ndofs_per_node = 100
+nrepeat = 20
+
+print(f"{'nodes':>8s} {'dofs':>10s} {'get x (s)':>12s} {'set x (s)':>12s}")
+for nnodes in [10, 100, 1000]:
+    nodes = [Node(ndofs_per_node) for _ in range(nnodes)]
+    # Fix some of the DOFs, so that only a subset of them are free
+    for node in nodes[::2]:
+        node.fix(0)
+    total = OptimizableSum(nodes)
+    x = np.random.standard_normal(total.dof_size)
+
+    t0 = time.perf_counter()
+    for _ in range(nrepeat):
+        total.x
+    t_get = (time.perf_counter() - t0) / nrepeat
+
+    t0 = time.perf_counter()
+    for _ in range(nrepeat):
+        total.x = x
+    t_set = (time.perf_counter() - t0) / nrepeat
+
+    assert np.array_equal(total.x, x)
+    print(f"{nnodes:>8d} {total.dof_size:>10d} {t_get:>12.3e} {t_set:>12.3e}")
+
+print("End of 2_Intermediate/dof_scatter_gather_benchmark.py")
+print("======================================================")
@@ -1,6 +1,7 @@
 from .derivative import *
 from .descriptor import *
 from .optimizable import *
+from .profiling import *
 from .util import *
 
-__all__ = (derivative.__all__ + descriptor.__all__ + optimizable.__all__ + util.__all__)
+__all__ = (derivative.__all__ + descriptor.__all__ + optimizable.__all__ + profiling.__all__ + util.__all__)
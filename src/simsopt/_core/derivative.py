@@ -1,5 +1,6 @@
 import numpy as np
 import numbers
+import functools
 import collections
 
 __all__ = ['Derivative']
@@ -106,20 +107,57 @@ class Derivative:
     returning the ``Derivative`` object, acting as a shorthand for
     ``obj.dJ(partials=True)(obj)``. This behavior is implemented with
     the decorator :obj:`derivative_dec`.
+
+    The values of the dictionary may also be two dimensional arrays of shape
+    ``(m, local_full_dof_size)``, i.e. the Jacobian of a vector valued output
+    with ``m`` entries, such as the residuals of a least squares problem.
+    Calling such a ``Derivative`` returns the ``(m, dof_size)`` Jacobian with
+    respect to the free DOFs, without creating a ``Derivative`` per row.
+
+    To sum many ``Derivative`` objects, e.g. the gradients of all the terms of
+    an objective, use :meth:`Derivative.sum`, which accumulates in place
+    instead of creating a temporary ``Derivative`` for every partial sum.
     """
 
     def __init__(self, data=OptimizableDefaultDict({})):
         self.data = OptimizableDefaultDict(data)
 
+    @staticmethod
+    def sum(derivatives):
+        """
+        Sum a sequence of ``Derivative`` objects. The result is the same as
+        that of the builtin ``sum``, but each array is copied only once and
+        the rest of the terms are accumulated in place.
+
+        Args:
+            derivatives: Iterable of ``Derivative`` objects.
+
+        Returns:
+            A new ``Derivative`` object. The input objects are not modified.
+        """
+        total = Derivative({})
+        for derivative in derivatives:
+            total += derivative
+        return total
+
+    def _batch_shape(self):
+        """
+        Shape of the leading (batch) dimensions of the stored arrays, which is
+        empty for the derivative of a scalar output.
+        """
+        for value in self.data.values():
+            return np.shape(value)[:-1]
+        return ()
+
     def __add__(self, other):
         x = self.data
         y = other.data
         z = copy_numpy_dict(x)
-        for k in y:
+        for k, yk in y.items():
             if k in z:
-                z[k] += y[k]
+                z[k] += yk
             else:
-                z[k] = y[k].copy()
+                z[k] = yk.copy()
         return Derivative(z)
 
     def __sub__(self, other):
@@ -182,10 +220,10 @@ class Derivative:
         """
         from .optimizable import Optimizable  # Import here to avoid circular import
         assert isinstance(optim, Optimizable)
-        derivs = []
+        batch_shape = self._batch_shape()
 
         if as_derivative:
-            keys = []
+            derivs = {}
 
             for k in optim.unique_dof_lineage:
                 for opt in k.dofs.dep_opts():
@@ -193,19 +231,25 @@ class Derivative:
                     # empty values e.g. if there are no local DOFs to opt, then self.data[opt]
                     # returns np.array([]).
                     if opt.local_full_dof_size > 0:
-                        derivs.append(self.data[opt])
-                        keys.append(opt)
+                        deriv = self.data.get(opt)
+                        if deriv is None:
+                            deriv = np.zeros(batch_shape + (opt.local_full_dof_size, ))
+                        derivs[opt] = deriv
 
-            return Derivative({k: d for k, d in zip(keys, derivs)})
+            return Derivative(derivs)
 
         else:
-            for k in optim.unique_dof_lineage:
-                if np.any(k.dofs_free_status):
-                    local_derivs = np.zeros(k.local_dof_size)
-                    for opt in k.dofs.dep_opts():
-                        local_derivs += self.data[opt][opt.local_dofs_free_status]
-                    derivs.append(local_derivs)
-            return np.concatenate(derivs)
+            # Accumulate directly into the vector of free DOFs, using the
+            # layout of the free DOFs precomputed by the Optimizable object
+            grad = np.zeros(batch_shape + (optim.dof_size, ))
+            for dofs, start, end, index in optim._dof_layout:
+                if start == end:
+                    continue
+                for opt in dofs.dep_opts():
+                    deriv = self.data.get(opt)
+                    if deriv is not None:
+                        grad[..., start:end] += deriv[..., index]
+            return grad
 
     # https://stackoverflow.com/questions/11624955/avoiding-python-sum-default-start-arg-behavior
     def __radd__(self, other):
@@ -223,12 +267,20 @@ def derivative_dec(func):
     equivalent to ``obj.dJ(partials=True)(obj)``. If
     ``partials=True``, the underlying :obj:`Derivative` object will be
     returned, so partial derivatives can be accessed and combined to
-    assemble gradients.
+    assemble gradients. If memoization is enabled for the Optimizable
+    object, the :obj:`Derivative` objects are memoized like its other
+    evaluations.
     """
 
     def _derivative_dec(self, *args, partials=False, **kwargs):
+        memoize = getattr(self, "_memoize", None)
+        if memoize is None:
+            derivative = func(self, *args, **kwargs)
+        else:
+            derivative = memoize("derivative_" + func.__name__,
+                                 functools.partial(func, self), *args, **kwargs)
         if partials:
-            return func(self, *args, **kwargs)
+            return derivative
         else:
-            return func(self, *args, **kwargs)(self)
+            return derivative(self)
     return _derivative_dec
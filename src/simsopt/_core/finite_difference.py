@@ -8,15 +8,21 @@ This module provides Jacobian evaluated with finite difference scheme
 
 from __future__ import annotations
 
+import json
 import logging
+import threading
 import traceback
+import weakref
 import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from time import time
 from datetime import datetime
 from typing import Callable, Union, IO
 from numbers import Real
 
 import numpy as np
+from scipy.optimize import least_squares, OptimizeResult
 try:
     # We import mpi4py here rather than mpi4py.MPI so MPI is not
     # initialized, since initializing MPI is disallowed on login nodes
@@ -27,12 +33,50 @@ except ImportError:
 
 from .types import RealArray
 from .dev import SimsoptRequires
+from .json import SIMSON, GSONEncoder, GSONDecoder
 from .optimizable import Optimizable
 from .util import finite_difference_steps
 
 logger = logging.getLogger(__name__)
 
-__all__ = ['FiniteDifference']
+__all__ = ['FiniteDifference', 'BroydenJacobian', 'least_squares_broyden']
+
+
+def _serialize_graph(opt: Optimizable) -> str:
+    """
+    Serialize the graph ending in ``opt`` to GSON, so that independent copies
+    of it can be created by the workers of a pool.
+    """
+    msg = (f"The graph of {opt.name} cannot be serialized to GSON, which is "
+           "needed to copy it for the workers. Use executor='fork', or "
+           "evaluate the finite differences serially instead.")
+    try:
+        serialized = json.dumps(SIMSON(opt), cls=GSONEncoder)
+        # Callables which cannot be imported, e.g. lambdas, are not decoded
+        copy = json.loads(serialized, cls=GSONDecoder)
+    except Exception as e:
+        raise ValueError(msg) from e
+    if not isinstance(copy, Optimizable):
+        raise ValueError(msg)
+    return serialized
+
+
+# Copy of the graph and name of the function evaluated by the workers of a
+# process pool. Set once per process by _init_process_worker.
+_worker_state = None
+
+
+def _init_process_worker(opt, fn_name):
+    global _worker_state
+    if isinstance(opt, str):
+        opt = json.loads(opt, cls=GSONDecoder)
+    _worker_state = (opt, fn_name)
+
+
+def _eval_process_worker(full_x):
+    opt, fn_name = _worker_state
+    opt.full_x = full_x
+    return np.asarray(getattr(opt, fn_name)())
 
 
 class FiniteDifference:
@@ -40,13 +84,49 @@ class FiniteDifference:
     Provides Jacobian evaluated with finite difference scheme.
     Supplies a method named jac to be used with optimizers. Use
     the initialization to customize the finite difference scheme
+
+    If ``workers`` is larger than 1, the function evaluations at the
+    perturbed points are distributed over a pool of threads or processes
+    from :mod:`concurrent.futures`, which provides parallel finite
+    differences without MPI, e.g. on a workstation or inside Jupyter. Each
+    worker evaluates the function on its own copy of the Optimizable graph.
+    Threads and processes started with ``spawn`` (``executor="process"``)
+    obtain their copies by serializing the graph to and from GSON, so the
+    graph has to be serializable to GSON. Threads only speed up the
+    evaluation if the function releases the GIL, e.g. in compiled code or
+    while waiting on an external code. Processes started with ``fork``
+    (``executor="fork"``) inherit the graph instead, which also works for
+    graphs that cannot be serialized, e.g. a
+    :obj:`~simsopt.objectives.LeastSquaresProblem`. However, forking a
+    process in which MPI, OpenMP or JAX have been initialized can deadlock,
+    so ``fork`` has to be requested explicitly.
+
+    The pool is created on the first call to :meth:`jac` and kept until
+    :meth:`close` is called, which is done automatically when the object is
+    used as a context manager, or when the object is garbage collected::
+
+        with FiniteDifference(prob.residuals, workers=4) as fd:
+            jac = fd.jac(x)
+
+    Args:
+        func: Method of an Optimizable object to be differentiated.
+        x0: Default point at which the Jacobian is evaluated.
+        abs_step: Absolute step size.
+        rel_step: Relative step size.
+        diff_method: ``"forward"`` or ``"centered"``.
+        workers: Number of parallel workers. If ``None`` or 1, the function
+            is evaluated serially on ``func.__self__``.
+        executor: ``"process"``, ``"fork"`` or ``"thread"``, the kind of
+            pool used if ``workers`` is larger than 1.
     """
 
     def __init__(self, func: Callable,
                  x0: RealArray = None,
                  abs_step: Real = 1.0e-7,
                  rel_step: Real = 0.0,
-                 diff_method: str = "forward") -> None:
+                 diff_method: str = "forward",
+                 workers: int = None,
+                 executor: str = "process") -> None:
 
         try:
             if not isinstance(func.__self__, Optimizable):
@@ -63,17 +143,118 @@ class FiniteDifference:
             raise ValueError(f"Finite difference method {diff_method} not implemented. "
                              "Supported methods are 'centered' and 'forward'.")
         self.diff_method = diff_method
+        if executor not in ['process', 'fork', 'thread']:
+            raise ValueError(f"Executor {executor} not implemented. Supported "
+                             "executors are 'process', 'fork' and 'thread'.")
+        self.executor = executor
+        self.workers = workers
 
         self.x0 = np.asarray(x0) if x0 is not None else x0
 
         self.jac_size = None
+        self._pool = None
+        self._pool_finalizer = None
+        self._thread_local = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the pool of workers, if any.
+        """
+        if self._pool is not None:
+            self._pool_finalizer()
+            self._pool = None
+            self._pool_finalizer = None
+            self._thread_local = None
+
+    def _get_pool(self):
+        if self._pool is not None:
+            return self._pool
+        fn_name = self.fn.__name__
+        if self.executor == "fork":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("fork"),
+                                             initializer=_init_process_worker,
+                                             initargs=(self.opt, fn_name))
+        elif self.executor == "thread":
+            serialized = _serialize_graph(self.opt)
+            # The initializer must not refer to self, which would otherwise
+            # be kept alive by the threads of the pool
+            thread_local = threading.local()
+
+            def init_thread():
+                opt = json.loads(serialized, cls=GSONDecoder)
+                thread_local.state = (opt, fn_name)
+
+            self._thread_local = thread_local
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            initializer=init_thread)
+        else:
+            serialized = _serialize_graph(self.opt)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_process_worker,
+                                             initargs=(serialized, fn_name))
+        # Shut down the workers if the object is garbage collected without
+        # calling close()
+        self._pool_finalizer = weakref.finalize(self, self._pool.shutdown)
+        return self._pool
+
+    def _eval_thread_worker(self, full_x):
+        opt, fn_name = self._thread_local.state
+        opt.full_x = full_x
+        return np.asarray(getattr(opt, fn_name)())
+
+    def _evaluate(self, xs: RealArray) -> list:
+        """
+        Evaluate the function at each row of ``xs``, which holds values of
+        the free DOFs, and return the list of results.
+        """
+        if self.workers is None or self.workers <= 1:
+            out = []
+            for x in xs:
+                self.opt.x = x
+                out.append(np.asarray(self.fn()))
+            return out
+
+        # The workers are sent the full DOF vectors, so that they also pick
+        # up changes of the fixed DOFs made since the pool was created.
+        full_x0 = self.opt.full_x
+        free = self.opt.dofs_free_status
+        full_xs = np.tile(full_x0, (len(xs), 1))
+        full_xs[:, free] = xs
+        pool = self._get_pool()
+        if self.executor == "thread":
+            return list(pool.map(self._eval_thread_worker, full_xs))
+        chunksize = max(1, len(xs) // (4 * self.workers))
+        return list(pool.map(_eval_process_worker, full_xs,
+                             chunksize=chunksize))
+
+    def jac(self, x: RealArray = None, f0: RealArray = None) -> RealArray:
+        """
+        Evaluate the Jacobian.
 
-    def jac(self, x: RealArray = None) -> RealArray:
+        Args:
+            x: Point at which the Jacobian is evaluated. If ``None``, ``x0``
+                or else the current DOFs of the Optimizable are used.
+            f0: Function value at ``x``, if already known. It is reused by
+                forward differences instead of evaluating the function again.
+        """
         if x is not None:
             self.x0 = np.asarray(x)
         x0 = self.x0 if self.x0 is not None else self.opt.x
         opt_x0 = self.opt.x
 
+        if f0 is not None:
+            f0 = np.asarray(f0)
+            if f0.ndim == 0:
+                f0 = f0.reshape(1)
+            self.jac_size = (len(f0), self.opt.dof_size)
         if self.jac_size is None:
             out = self.fn()
             if not isinstance(out, (np.ndarray, collections.abc.Sequence)):
@@ -83,39 +264,283 @@ class FiniteDifference:
         jac = np.zeros(self.jac_size)
         steps = finite_difference_steps(x0, abs_step=self.abs_step,
                                         rel_step=self.rel_step)
+        n = len(x0)
         if self.diff_method == "centered":
             # Centered differences:
-            for j in range(len(x0)):
-                x = np.copy(x0)
+            xs = np.tile(x0, (2 * n, 1))
+            xs[np.arange(0, 2 * n, 2), np.arange(n)] += steps
+            xs[np.arange(1, 2 * n, 2), np.arange(n)] -= steps
+            evals = self._evaluate(xs)
+            for j in range(n):
+                jac[:, j] = (evals[2 * j] - evals[2 * j + 1]) / (2 * steps[j])
 
-                x[j] = x0[j] + steps[j]
-                self.opt.x = x
-                fplus = np.asarray(self.fn())
+        elif self.diff_method == "forward":
+            # 1-sided differences
+            xs = np.tile(x0, (n + 1, 1))
+            xs[np.arange(1, n + 1), np.arange(n)] += steps
+            if f0 is not None:
+                evals = [f0] + self._evaluate(xs[1:])
+            else:
+                evals = self._evaluate(xs)
+            for j in range(n):
+                jac[:, j] = (evals[j + 1] - evals[0]) / steps[j]
 
-                x[j] = x0[j] - steps[j]
-                self.opt.x = x
-                fminus = np.asarray(self.fn())
+        # Set the opt.x to the original x. The workers evaluate the function
+        # on their own copies of the graph, so opt is usually unchanged and
+        # the caches of the graph are kept in that case.
+        if not np.array_equal(self.opt.x, opt_x0):
+            self.opt.x = opt_x0
 
-                jac[:, j] = (fplus - fminus) / (2 * steps[j])
+        return jac
 
-        elif self.diff_method == "forward":
-            # 1-sided differences
-            self.opt.x = x0
-            f0 = np.asarray(self.fn())
-            for j in range(len(x0)):
-                x = np.copy(x0)
-                x[j] = x0[j] + steps[j]
-                self.opt.x = x
-                fplus = np.asarray(self.fn())
 
-                jac[:, j] = (fplus - f0) / steps[j]
+class BroydenJacobian:
+    r"""
+    Wraps a finite difference Jacobian provider, i.e. a
+    :obj:`FiniteDifference` or :obj:`MPIFiniteDifference` object, and
+    replaces most of the full finite difference Jacobians by Broyden
+    rank-one updates computed from the points at which the function has
+    already been evaluated. This is useful when each function evaluation is
+    expensive, e.g. an equilibrium solve, since a full finite difference
+    Jacobian costs ``n + 1`` or ``2 n`` evaluations for ``n`` DOFs.
+
+    The function values computed by the optimizer have to be passed to
+    :meth:`record`. When :meth:`jac` is called at a point ``x``, the
+    previous Jacobian ``J`` is updated with every recorded point ``x_k``
+    according to
+
+    .. math::
+        J \leftarrow J + \frac{(f_k - f_0 - J \Delta x) \Delta x^T}{\Delta x^T \Delta x},
+        \quad \Delta x = x_k - x_0,
+
+    where ``x_0`` is the point of the previous Jacobian, finishing with
+    ``x`` itself. A full finite difference Jacobian is computed instead if
+    ``max_updates`` consecutive updates have been made, if the function
+    value at ``x`` has not been recorded, or if the decrease of the sum of
+    squares of the function in the last step is smaller than ``min_ratio``
+    times the decrease predicted by the linearization with the previous
+    Jacobian.
+
+    Since the optimizer only requests a Jacobian after successful steps, a
+    stale Jacobian can also stall it between two calls to :meth:`jac`. This
+    is flagged by :attr:`stalled` once ``max_rejected`` points recorded
+    since the last Broyden update do not improve on its base point. The
+    optimizer should then be restarted from :attr:`x` after calling
+    :meth:`reset`, as done by
+    :func:`~simsopt.solve.serial.least_squares_serial_solve`, which also
+    finishes the optimization with finite-difference Jacobians only if it
+    converged using Broyden updates.
+
+    Args:
+        fd: Finite difference Jacobian provider.
+        max_updates: Maximum number of consecutive Broyden updates between
+            two full finite difference Jacobians.
+        min_ratio: Minimum ratio of the actual to the predicted decrease of
+            the sum of squares of the function in a step, below which the
+            Jacobian is recomputed by finite differences.
+        max_rejected: Number of recorded points not improving on the base
+            point of a Broyden update after which :attr:`stalled` is set.
+    """
+
+    def __init__(self, fd, max_updates: int = 10, min_ratio: float = 0.25,
+                 max_rejected: int = 2):
+        if max_updates < 0:
+            raise ValueError("max_updates must be non-negative")
+        self.fd = fd
+        self.max_updates = max_updates
+        self.min_ratio = min_ratio
+        self.max_rejected = max_rejected
+        self.stalled = False
+
+        self.nfull = 0
+        self.nupdates = 0
+        self.nevals_saved = 0
+
+        self._points = []
+        self._x = None
+        self._f = None
+        self._jac = None
+        self._nconsecutive = 0
+        self._nrejected = 0
+
+    def record(self, x: RealArray, f: RealArray) -> None:
+        """
+        Record the value ``f`` of the function at ``x``. Only successful
+        evaluations should be recorded.
+        """
+        f = np.array(f, dtype=float).reshape(-1)
+        self._points.append((np.array(x, dtype=float), f))
+        if not self.last_full and np.sum(f * f) >= np.sum(self._f * self._f):
+            self._nrejected += 1
+            self.stalled = self._nrejected >= self.max_rejected
+
+    @property
+    def x(self) -> RealArray:
+        """
+        Point at which the last Jacobian was evaluated.
+        """
+        return self._x
 
-        # Set the opt.x to the original x
-        self.opt.x = opt_x0
+    @property
+    def f(self) -> RealArray:
+        """
+        Function value at :attr:`x`.
+        """
+        return self._f
 
+    @property
+    def last_full(self) -> bool:
+        """
+        Whether the last Jacobian was computed by finite differences rather
+        than by a Broyden update.
+        """
+        return self._nconsecutive == 0
+
+    def reset(self) -> None:
+        """
+        Force the next Jacobian to be computed by finite differences.
+        """
+        self._jac = None
+        self._nconsecutive = 0
+        self._nrejected = 0
+        self.stalled = False
+
+    def _lookup(self, x):
+        for xk, fk in reversed(self._points):
+            if np.array_equal(xk, x):
+                return fk
+        return None
+
+    def _full_jac_nevals(self, n):
+        if self.fd.diff_method == "centered":
+            return 2 * n
+        # The base point is reused by FiniteDifference
+        return n if isinstance(self.fd, FiniteDifference) else n + 1
+
+    def jac(self, x: RealArray = None, *args, **kwargs) -> RealArray:
+        x = np.array(x if x is not None else self.fd.opt.x, dtype=float)
+        f = self._lookup(x)
+
+        refresh = self._jac is None or f is None or self._f is None \
+            or self._nconsecutive >= self.max_updates
+        if not refresh:
+            f_lin = self._f + self._jac @ (x - self._x)
+            predicted = np.sum(self._f * self._f) - np.sum(f_lin * f_lin)
+            actual = np.sum(self._f * self._f) - np.sum(f * f)
+            refresh = predicted <= 0 or actual < self.min_ratio * predicted
+        if refresh:
+            if isinstance(self.fd, FiniteDifference):
+                jac = self.fd.jac(x, f0=f)
+            else:
+                jac = self.fd.jac(x)
+            self.nfull += 1
+            self._nconsecutive = 0
+        else:
+            jac = np.array(self._jac)
+            for xk, fk in [p for p in self._points
+                           if not np.array_equal(p[0], x)] + [(x, f)]:
+                dx = xk - self._x
+                dx2 = np.dot(dx, dx)
+                if dx2 == 0 or not np.all(np.isfinite(fk)):
+                    continue
+                jac += np.outer(fk - self._f - jac @ dx, dx) / dx2
+            self.nupdates += 1
+            self._nconsecutive += 1
+            saved = self._full_jac_nevals(len(x))
+            self.nevals_saved += saved
+            logger.info(f"Broyden update of the Jacobian saved {saved} "
+                        f"function evaluations, {self.nevals_saved} in total")
+
+        self._x = x
+        self._f = f
+        self._jac = jac
+        self._points = []
+        self._nrejected = 0
         return jac
 
 
+class _BroydenStall(Exception):
+    pass
+
+
+def least_squares_broyden(fun, x0, broyden, max_nfev=None, **kwargs):
+    """
+    Run scipy.optimize.least_squares with the Jacobian of ``broyden``, a
+    :obj:`BroydenJacobian`, which must be passed the function values
+    computed by ``fun``. If the optimization stalls while the last Jacobian
+    is a Broyden update, it is restarted from the last accepted point with
+    a finite-difference Jacobian. If it converges after using Broyden
+    updates, it is finished with finite-difference Jacobians only.
+
+    Args:
+        fun: The vector-valued function to minimize the sum of squares of.
+        x0: The initial point.
+        broyden: The :obj:`BroydenJacobian` providing the Jacobians.
+        max_nfev: Maximum number of evaluations of ``fun``, shared by all
+          the restarts. If ``None``, each run of least_squares uses its
+          default limit.
+        kwargs: Any other arguments passed to scipy.optimize.least_squares.
+
+    Returns:
+        The ``OptimizeResult`` of the last run of least_squares, with
+        ``nfev`` the total number of evaluations of ``fun``.
+    """
+    if max_nfev is not None and max_nfev < 1:
+        raise ValueError(f"max_nfev must be at least 1, got {max_nfev}")
+    # Function value at the restart point, which need not be recomputed
+    f0 = None
+    fx0 = None
+    nfev = 0
+
+    def fun_broyden(x):
+        nonlocal f0, nfev
+        if f0 is not None and np.array_equal(x, x0):
+            f = f0
+            broyden.record(x, f)
+        else:
+            f = fun(x)
+            nfev += 1
+        f0 = None
+        if broyden.stalled:
+            raise _BroydenStall()
+        return f
+
+    while True:
+        if max_nfev is not None:
+            remaining = max_nfev - nfev
+            if remaining <= 0:
+                logger.info("Maximum number of function evaluations reached "
+                            "before restarting least_squares")
+                return OptimizeResult(
+                    x=x0, fun=fx0, cost=0.5 * np.dot(fx0, fx0), nfev=nfev,
+                    status=0, success=False,
+                    message="The maximum number of function evaluations is exceeded.")
+            # The cached evaluation at the restart point is counted by
+            # least_squares but is free:
+            kwargs['max_nfev'] = remaining + (f0 is not None)
+        nupdates = broyden.nupdates
+        try:
+            result = least_squares(fun_broyden, x0, jac=broyden.jac, **kwargs)
+        except _BroydenStall:
+            logger.info("Broyden Jacobian stalled, restarting with a "
+                        "finite-difference Jacobian")
+            x0, f0 = broyden.x, broyden.f
+            fx0 = f0
+            broyden.reset()
+            continue
+        result.nfev = nfev
+        if broyden.nupdates == nupdates or result.status <= 0:
+            return result
+        # The convergence may be spurious, so the optimization is finished
+        # with finite-difference Jacobians only.
+        logger.info("Converged using Broyden Jacobians, restarting with "
+                    "finite-difference Jacobians")
+        broyden.reset()
+        broyden.max_updates = 0
+        x0, f0 = result.x, result.fun
+        fx0 = f0
+
+
 @SimsoptRequires(mpi4py is not None, "MPIFiniteDifference requires mpi4py")
 class MPIFiniteDifference:
     """
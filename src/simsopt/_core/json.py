@@ -8,7 +8,11 @@ A majority of the code is based on monty.json.
 Credits: Materials Virtual Job
 """
 
+import base64
+import contextlib
+import contextvars
 import datetime
+import hashlib
 import json
 import os
 import pathlib
@@ -48,6 +52,36 @@ except ImportError:
 
 __version__ = "3.0.0"
 
+# Options used when decoding arrays stored in a binary sidecar file. They are
+# held in a context variable because the decoder is re-instantiated
+# recursively by from_dict and can not carry state between instances.
+_binary_array_options = contextvars.ContextVar(
+    "_binary_array_options", default={"base_dir": None, "mmap": True})
+
+# Offsets of arrays in the binary sidecar are aligned to this many bytes
+_BINARY_ARRAY_ALIGNMENT = 64
+
+
+@contextlib.contextmanager
+def binary_array_context(base_dir=None, mmap=True):
+    """
+    Context manager setting how arrays stored in a binary sidecar file are
+    loaded by :class:`GSONDecoder`.
+
+    Args:
+        base_dir: Directory relative to which the sidecar file names recorded
+            in the JSON document are resolved. Defaults to the current
+            working directory.
+        mmap: If True, the arrays are returned as copy-on-write memory maps
+            of the sidecar file, so that data is only read from disk when
+            accessed. Otherwise the arrays are read into memory eagerly.
+    """
+    token = _binary_array_options.set({"base_dir": base_dir, "mmap": mmap})
+    try:
+        yield
+    finally:
+        _binary_array_options.reset(token)
+
 
 def _load_redirect(redirect_file):
     try:
@@ -346,8 +380,50 @@ class GSONEncoder(json.JSONEncoder):
     Usage::
         # Add it as a *cls* keyword when using json.dump
         json.dumps(object, cls=GSONEncoder)
+
+    Numpy arrays with at least ``array_threshold`` elements are stored as raw
+    binary buffers instead of nested lists, which is much faster to write and
+    to parse. By default the buffers are base64 encoded inside the JSON
+    document. If ``array_file``, a binary file object opened for writing, is
+    given, the buffers are instead appended to that file and only their
+    offsets are recorded in the JSON document. Identical arrays are written to
+    the sidecar file only once.
+    Usage::
+        json.dumps(object, cls=GSONEncoder, array_threshold=1000)
     """
 
+    def __init__(self, *args, array_threshold=None, array_file=None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.array_threshold = array_threshold
+        self.array_file = array_file
+        self._array_offsets = {}
+
+    def _encode_binary_array(self, o) -> dict:
+        o = np.ascontiguousarray(o)
+        d = {
+            "@module": "numpy",
+            "@class": "array",
+            "dtype": o.dtype.str,
+            "shape": list(o.shape),
+        }
+        if self.array_file is None:
+            d["encoding"] = "base64"
+            d["data"] = base64.b64encode(o.tobytes()).decode("ascii")
+            return d
+
+        key = (o.dtype.str, o.shape, hashlib.sha1(o.data).hexdigest())
+        if key not in self._array_offsets:
+            offset = self.array_file.tell()
+            padding = -offset % _BINARY_ARRAY_ALIGNMENT
+            self.array_file.write(b"\0" * padding)
+            self._array_offsets[key] = offset + padding
+            self.array_file.write(o.data)
+        d["encoding"] = "file"
+        d["file"] = os.path.basename(self.array_file.name)
+        d["offset"] = self._array_offsets[key]
+        return d
+
     def default(self, o) -> dict:  # pylint: disable=E0202
         """
         Overriding default method for JSON encoding. This method does two
@@ -370,6 +446,9 @@ class GSONEncoder(json.JSONEncoder):
             o = np.asarray(o)
 
         if isinstance(o, np.ndarray):
+            if self.array_threshold is not None and \
+                    o.size >= self.array_threshold and not o.dtype.hasobject:
+                return self._encode_binary_array(o)
             if str(o.dtype).startswith("complex"):
                 return {
                     "@module": "numpy",
@@ -526,6 +605,8 @@ class GSONDecoder(json.JSONDecoder):
                                 recon_objs[d["@name"]] = obj
                             return obj
                 elif np is not None and modname == "numpy" and classname == "array":
+                    if "encoding" in d:
+                        return _decode_binary_array(d)
                     if d["dtype"].startswith("complex"):
                         return np.array(
                             [np.array(r) + np.array(i) * 1j for r, i in
@@ -568,6 +649,30 @@ class GSONDecoder(json.JSONDecoder):
         return self.process_decoded(d)
 
 
+def _decode_binary_array(d):
+    """
+    Rebuild a numpy array stored as a raw buffer by
+    :meth:`GSONEncoder._encode_binary_array`.
+    """
+    dtype = np.dtype(d["dtype"])
+    shape = tuple(d["shape"])
+    if d["encoding"] == "base64":
+        buf = base64.b64decode(d["data"])
+        return np.frombuffer(buf, dtype=dtype).reshape(shape).copy()
+    if d["encoding"] == "file":
+        options = _binary_array_options.get()
+        fname = d["file"]
+        if options["base_dir"] is not None:
+            fname = os.path.join(options["base_dir"], fname)
+        if options["mmap"] and int(np.prod(shape)) > 0:
+            return np.memmap(fname, dtype=dtype, mode="c",
+                             offset=d["offset"], shape=shape)
+        count = int(np.prod(shape))
+        return np.fromfile(fname, dtype=dtype, count=count,
+                           offset=d["offset"]).reshape(shape)
+    raise GSONError(f"Unknown array encoding `{d['encoding']}`")
+
+
 class GSONError(Exception):
     """
     Exception class for serialization errors.
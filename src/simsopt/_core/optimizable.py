@@ -14,7 +14,6 @@ import hashlib
 from collections.abc import Callable as ABC_Callable, Hashable
 from numbers import Real, Integral
 from typing import Union, Tuple, Dict, Callable, Sequence, List
-from functools import lru_cache
 import logging
 import json
 from pathlib import Path
@@ -26,9 +25,10 @@ from monty.io import zopen
 from .dev import SimsoptRequires
 from .types import RealArray, StrArray, BoolArray, Key
 from .util import ImmutableId, OptimizableMeta, WeakKeyDefaultDict, \
-    DofLengthMismatchError
-from .derivative import derivative_dec
-from .json import GSONable, SIMSON, GSONDecoder, GSONEncoder
+    DofLengthMismatchError, EvaluationCache
+from .derivative import Derivative, derivative_dec
+from .json import GSONable, SIMSON, GSONDecoder, GSONEncoder, \
+    binary_array_context
 
 try:
     import networkx as nx
@@ -156,13 +156,26 @@ class DOFs(GSONable, Hashable):
         Sets the recompute flag in the dependent Optimizable objects.
         This function is called whenever the DOF values are changed.
         """
-        for opt_ref in self._dep_opts:
-            opt = opt_ref()
-            if opt is not None:
-                if opt.local_dof_setter is not None:
-                    # opt.local_dof_setter(opt, list(self._x))
-                    opt.local_dof_setter(opt, self._x)
-                opt.set_recompute_flag()
+        DOFs._flag_recompute_opts([self])
+
+    @staticmethod
+    def _flag_recompute_opts(dofs_list):
+        """
+        Calls the external DOF setters of the Optimizable objects depending
+        on any of the given DOFs objects, and then sets the recompute flag
+        in those objects and in their descendants in a single pass over the
+        graph.
+        """
+        opts = []
+        for dofs in dofs_list:
+            for opt_ref in dofs._dep_opts:
+                opt = opt_ref()
+                if opt is not None:
+                    if opt.local_dof_setter is not None:
+                        # opt.local_dof_setter(opt, list(dofs._x))
+                        opt.local_dof_setter(opt, dofs._x)
+                    opts.append(opt)
+        _set_recompute_flags(opts)
 
     def _update_opt_indices(self):
         """
@@ -343,11 +356,18 @@ class DOFs(GSONable, Hashable):
         .. warning::
                Even fixed DOFs are assinged
         """
+        self._set_full_x(x)
+        self._flag_recompute_opt()
+
+    def _set_full_x(self, x: RealArray) -> None:
+        """
+        Assign all the DOFs without flagging the dependent Optimizable objects
+        for recomputation.
+        """
         # To prevent broadcasting of a single DOF
         if len(self._x) != len(x):
             raise DofLengthMismatchError(len(x), len(self._x))
         self._x = np.asarray(x, dtype=np.double)
-        self._flag_recompute_opt()
 
     @property
     def reduced_len(self) -> Integral:
@@ -495,20 +515,49 @@ class DOFs(GSONable, Hashable):
         Returns:
             string identifiers of the DOFs
         """
-        @lru_cache()
-        def red_names(free):
-            rnames = []
-            for i, f in enumerate((free)):
-                if f:
-                    rnames.append(self._names[i])
-            return rnames
-        return red_names(tuple(self._free))
+        return [name for name, free in zip(self._names, self._free) if free]
 
     @property
     def full_names(self):
         return self._names
 
 
+def _set_recompute_flags(opts, parent=None):
+    """
+    Sets the recompute flag and rings the recompute bell of the given
+    Optimizable objects and of all their descendants. Every object is
+    visited only once, even if it can be reached along several paths of the
+    graph, and parents are visited before their children.
+
+    Args:
+        opts: Optimizable objects whose DOFs or inputs changed
+        parent: Optimizable object passed to the recompute bell of ``opts``
+    """
+    # Objects in reverse topological order and the parent through which
+    # each of them was reached. Kept in two lists rather than a list of
+    # tuples to avoid triggering the garbage collector on large graphs.
+    order = []
+    callers = []
+    visited = set()
+
+    def visit(opt, caller):
+        visited.add(id(opt))
+        for weakref_child in opt._children:
+            child = weakref_child()
+            if child is not None and id(child) not in visited:
+                visit(child, opt)
+        order.append(opt)
+        callers.append(caller)
+
+    for opt in opts:
+        if id(opt) not in visited:
+            visit(opt, parent)
+
+    for i in range(len(order) - 1, -1, -1):
+        order[i].new_x = True
+        order[i].recompute_bell(parent=callers[i])
+
+
 class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
     """
     Experimental callable ABC that provides lego-like optimizable objects
@@ -571,6 +620,7 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
            could be specified by using `opt_return_fns` argument
     """
     return_fn_map: Dict[str, Callable] = NotImplemented
+    _evaluation_cache: EvaluationCache = None
 
     def __init__(self,
                  x0: RealArray = None,
@@ -654,6 +704,9 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         def binder(fn, inst):
             def func(*args, **kwargs):
                 return fn(inst, *args, **kwargs)
+            # Record the bound object and method, mimicking bound methods
+            func.opt = inst
+            func.method = fn
             return func
 
         if len(depends_on):
@@ -737,11 +790,70 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         else:
             return_fns = return_fn_map.values()
 
-        result = []
-        for fn in return_fns:
-            result.append(fn(self, *args, **kwargs))
+        def evaluate_return_fns(*args, **kwargs):
+            result = []
+            for fn in return_fns:
+                result.append(fn(self, *args, **kwargs))
+
+            return result if len(result) > 1 else result[0]
+
+        name = "__call__" if not child else "__call__" + child.name
+        return self._memoize(name, evaluate_return_fns, *args, **kwargs)
+
+    def enable_memoization(self, maxsize: Integral = 16) -> None:
+        """
+        Memoize the evaluations of this Optimizable object in a bounded
+        least-recently-used cache keyed on the full DOF vector of the object
+        and its ancestors. Evaluations at a previously visited point then
+        return the cached values without recomputing the graph. This covers
+        calls of the object and the :obj:`Derivative` objects of functions
+        decorated with :obj:`derivative_dec`, such as ``dJ``.
+
+        Memoization assumes that the return values depend only on the DOFs.
+        It should not be used if the state of the graph is modified by other
+        means, e.g. by changing the resolution of a Vmec object, unless
+        :meth:`clear_memoization` is called afterwards. Evaluations with
+        additional arguments are never memoized. Cached values are shared
+        with the caller and must not be modified in place.
 
-        return result if len(result) > 1 else result[0]
+        Args:
+            maxsize: Maximum number of evaluations kept in the cache.
+        """
+        self._evaluation_cache = EvaluationCache(maxsize)
+
+    def disable_memoization(self) -> None:
+        """
+        Stop memoizing the evaluations of this Optimizable object and discard
+        the cached evaluations.
+        """
+        self._evaluation_cache = None
+
+    def clear_memoization(self) -> None:
+        """
+        Discard the cached evaluations, keeping memoization enabled.
+        """
+        if self._evaluation_cache is not None:
+            self._evaluation_cache.clear()
+
+    @property
+    def memoization_stats(self) -> Union[dict, None]:
+        """
+        Dictionary with the numbers of hits and misses, the size and the
+        maximum size of the memoization cache, or None if memoization is not
+        enabled.
+        """
+        if self._evaluation_cache is None:
+            return None
+        return self._evaluation_cache.stats()
+
+    def _memoize(self, name: str, fn: Callable, *args, **kwargs):
+        """
+        Evaluate ``fn(*args, **kwargs)``, reusing a previous evaluation at the
+        current DOFs if memoization is enabled.
+        """
+        if self._evaluation_cache is None or args or kwargs:
+            return fn(*args, **kwargs)
+        return self._evaluation_cache.memoize(name, self.full_x, fn)
 
     def get_return_fn_names(self) -> List[str]:
         """
@@ -947,6 +1059,16 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         self.dof_indices = dict(zip(self._unique_dof_opts,
                                     zip(dof_indices[:-1], dof_indices[1:])))
 
+        # Precompute the map between the global vector of free DOFs and the
+        # DOFs objects, used to get and set x without walking the graph.
+        # The free DOFs are addressed with a slice if all the DOFs are free
+        # and with an index array otherwise.
+        self._dof_layout = []
+        for opt, (start, end) in self.dof_indices.items():
+            free = opt._dofs.free_status
+            index = slice(None) if free.all() else np.flatnonzero(free)
+            self._dof_layout.append((opt._dofs, start, end, index))
+
         # Update the reduced dof length of children
         for weakref_child in self._children:
             child = weakref_child()
@@ -1041,15 +1163,21 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         Numeric values of the free DOFs associated with the current
         Optimizable object and those of its ancestors
         """
-        return np.concatenate([opt._dofs.free_x for
-                               opt in self._unique_dof_opts])
+        x = np.empty(self._free_dof_size)
+        for dofs, start, end, index in self._dof_layout:
+            if start < end:
+                x[start:end] = dofs._x[index]
+        return x
 
     @x.setter
     def x(self, x: RealArray) -> None:
-        if list(self.dof_indices.values())[-1][-1] != len(x):
+        if self._free_dof_size != len(x):
             raise ValueError
-        for opt, indices in self.dof_indices.items():
-            opt.local_x = x[indices[0]:indices[1]]
+        x = np.asarray(x, dtype=np.double)
+        for dofs, start, end, index in self._dof_layout:
+            if start < end:
+                dofs._x[index] = x[start:end]
+        DOFs._flag_recompute_opts([layout[0] for layout in self._dof_layout])
 
     @property
     def full_x(self) -> RealArray:
@@ -1066,7 +1194,8 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         Setter used to set all the global DOF values
         """
         for opt, indices in self._full_dof_indices.items():
-            opt.local_full_x = x[indices[0]:indices[1]]
+            opt._dofs._set_full_x(x[indices[0]:indices[1]])
+        DOFs._flag_recompute_opts([opt._dofs for opt in self._full_dof_indices])
 
     @property
     def local_x(self) -> RealArray:
@@ -1110,14 +1239,7 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         self._dofs.full_x = x
 
     def set_recompute_flag(self, parent=None):
-        self.new_x = True
-        self.recompute_bell(parent=parent)
-
-        # for child in self._children:
-        for weakref_child in self._children:
-            child = weakref_child()
-            if child is not None:
-                child.set_recompute_flag(parent=self)
+        _set_recompute_flags([self], parent=parent)
 
     def get(self, key: Key) -> Real:
         """
@@ -1608,10 +1730,11 @@ class Optimizable(ABC_Callable, Hashable, GSONable, metaclass=OptimizableMeta):
         if fnmatch(filename, "*.json*") or fnmatch(fname, "*.bson*"):
             with zopen(filename, "rt") as f:
                 contents = f.read()
-            return cls.from_str(contents, fmt="json")
+            with binary_array_context(Path(filename).parent):
+                return cls.from_str(contents, fmt="json")
 
 
-def load(filename, *args, **kwargs):
+def load(filename, *args, mmap=True, **kwargs):
     """
     Function to load simsopt object from a file.
     Only JSON format is supported at this time. Support for additional
@@ -1619,6 +1742,10 @@ def load(filename, *args, **kwargs):
     Args:
         filename:
             Name of file from which simsopt object has to be initialized
+        mmap:
+            If the file was saved with ``sidecar=True``, return the arrays
+            as copy-on-write memory maps of the sidecar file instead of
+            reading them into memory.
     Returns:
         Simsopt object
     """
@@ -1626,24 +1753,53 @@ def load(filename, *args, **kwargs):
     if (not fname == '.json'):
         raise ValueError(f"Invalid format: `{str(fname[1:])}`")
 
-    with zopen(filename, "rt") as fp:
+    with zopen(filename, "rt") as fp, \
+            binary_array_context(Path(filename).parent, mmap=mmap):
         if "cls" not in kwargs:
             kwargs["cls"] = GSONDecoder
         return json.load(fp, *args, **kwargs)
 
 
-def save(simsopt_objects, filename, *args, **kwargs):
+def save(simsopt_objects, filename, *args, array_threshold=None,
+         sidecar=False, **kwargs):
+    """
+    Function to save simsopt objects to a file.
+    Only JSON format is supported at this time.
+    Args:
+        simsopt_objects:
+            Simsopt object, or list/dict of simsopt objects, to be saved
+        filename:
+            Name of the JSON file
+        array_threshold:
+            If given, numpy arrays with at least this many elements are
+            stored as raw binary buffers instead of nested lists. By default
+            the buffers are base64 encoded inside the JSON file.
+        sidecar:
+            If True, the binary buffers are written to the file
+            ``filename + ".bin"`` next to the JSON file, with identical arrays
+            stored only once. :func:`load` then memory-maps the arrays.
+            Requires ``array_threshold``; ``array_threshold=0`` stores all
+            arrays in the sidecar file.
+    """
     fname = Path(filename).suffix.lower()
     if (not fname == '.json'):
         raise ValueError(f"Invalid format: `{str(fname[1:])}`")
+    if sidecar and array_threshold is None:
+        raise ValueError("sidecar=True requires an array_threshold")
 
     with zopen(filename, "wt") as fp:
         if "cls" not in kwargs:
             kwargs["cls"] = GSONEncoder
         if "indent" not in kwargs:
             kwargs["indent"] = 2
+        if array_threshold is not None:
+            kwargs["array_threshold"] = array_threshold
         simson = SIMSON(simsopt_objects)
-        return json.dump(simson, fp, *args, **kwargs)
+        if not sidecar:
+            return json.dump(simson, fp, *args, **kwargs)
+        with open(str(filename) + ".bin", "wb") as array_file:
+            kwargs["array_file"] = array_file
+            return json.dump(simson, fp, *args, **kwargs)
 
 
 def make_optimizable(func, *args, dof_indicators=None, **kwargs):
@@ -1824,5 +1980,4 @@ class OptimizableSum(Optimizable):
 
     @derivative_dec
     def dJ(self):
-        # Next line uses __add__ function for the Derivative class
-        return sum(opt.dJ(partials=True) for opt in self.opts)
+        return Derivative.sum(opt.dJ(partials=True) for opt in self.opts)
@@ -0,0 +1,278 @@
+# coding: utf-8
+# Copyright (c) HiddenSymmetries Development Team.
+# Distributed under the terms of the MIT License
+
+"""
+Provides the OptimizableProfiler class, which records the time spent in and
+the number of calls to the methods of every node of an Optimizable graph.
+"""
+
+import functools
+import inspect
+import json
+import time
+from collections import defaultdict
+
+__all__ = ['OptimizableProfiler']
+
+# Marks methods that were not set on the instance before patching
+_MISSING = object()
+
+
+class OptimizableProfiler:
+    """
+    Context manager that instruments every node of the graph ending in
+    ``opt``, i.e. ``opt`` and all its ancestors. While active, the methods
+    ``J``, ``dJ``, the return functions and ``recompute_bell`` of each node,
+    as well as the input functions of each node (``funcs_in``), are wrapped
+    to record the wall time and the number of calls. The calls to
+    ``recompute_bell`` count the recomputations triggered by DOF changes, and
+    the hits and misses of the memoization caches of the nodes (see
+    :meth:`Optimizable.enable_memoization`) are recorded as well.
+
+    For each wrapped call both the inclusive time and the self time
+    (excluding the time spent in other wrapped calls) are recorded. The
+    individual calls can be exported in the Chrome trace event format, which
+    can be visualized as a flame graph with ``chrome://tracing``, Perfetto or
+    speedscope.
+
+    Usage::
+
+        with OptimizableProfiler(JF) as prof:
+            JF.x = x
+            J = JF.J()
+            dJ = JF.dJ()
+        prof.print_stats()
+        prof.save_chrome_trace("trace.json")
+
+    Args:
+        opt: Final node of the Optimizable graph to be profiled.
+        methods: Names of the methods to be wrapped in addition to the return
+            functions of each node.
+        record_events: If True, every call is stored so that it can be
+            exported with :meth:`save_chrome_trace`. Set to False to keep
+            only the accumulated statistics during long runs.
+    """
+
+    def __init__(self, opt, methods=("J", "dJ", "recompute_bell"),
+                 record_events=True):
+        self.opt = opt
+        self.methods = tuple(methods)
+        self.record_events = record_events
+        self.events = []
+        self._stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self._classes = {}
+        self._stack = []
+        self._patches = []
+        self._memo_start = {}
+        self._memo_stop = {}
+        self._t0 = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def nodes(self):
+        """
+        List of the Optimizable objects instrumented by the profiler.
+        """
+        return self.opt.ancestors + [self.opt]
+
+    def start(self):
+        """
+        Wrap the methods of all the nodes of the graph and start recording.
+        """
+        if self._patches:
+            raise RuntimeError("The profiler is already running")
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        for node in self.nodes:
+            self._classes[node.name] = node.__class__.__name__
+            self._memo_start[node.name] = node.memoization_stats
+            names = list(self.methods)
+            return_fn_map = node.__class__.return_fn_map
+            if isinstance(return_fn_map, dict):
+                names += [fn.__name__ for fn in return_fn_map.values()
+                          if hasattr(fn, "__name__")]
+            for name in dict.fromkeys(names):
+                # Properties are skipped, accessing them would evaluate them
+                if isinstance(inspect.getattr_static(node, name, None),
+                              property):
+                    continue
+                fn = getattr(node, name, None)
+                if not callable(fn):
+                    continue
+                self._patch(node.__dict__, name, self._wrap(node, name, fn))
+
+            for i, fn in enumerate(node.funcs_in):
+                parent = getattr(fn, "__self__", getattr(fn, "opt", None))
+                method = getattr(fn, "__func__", getattr(fn, "method", fn))
+                if parent is None or not hasattr(parent, "name"):
+                    parent = node
+                name = getattr(method, "__name__", "funcs_in")
+                self._patch(node.funcs_in, i, self._wrap(parent, name, fn))
+
+    def stop(self):
+        """
+        Restore the original methods of all the nodes of the graph.
+        """
+        for container, key, original in reversed(self._patches):
+            if original is _MISSING:
+                del container[key]
+            else:
+                container[key] = original
+        self._patches = []
+        for node in self.nodes:
+            self._memo_stop[node.name] = node.memoization_stats
+
+    def _patch(self, container, key, value):
+        if isinstance(container, dict):
+            original = container.get(key, _MISSING)
+        else:
+            original = container[key]
+        self._patches.append((container, key, original))
+        container[key] = value
+
+    def _wrap(self, node, method, fn):
+        profiler = self
+        node_name = node.name
+        self._classes.setdefault(node_name, node.__class__.__name__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                child_time = profiler._stack.pop()
+                if profiler._stack:
+                    profiler._stack[-1] += duration
+                profiler._record(node_name, method, start, duration,
+                                 duration - child_time)
+
+        return wrapper
+
+    def _record(self, node_name, method, start, duration, self_time):
+        stats = self._stats[(node_name, method)]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] += self_time
+        if self.record_events:
+            self.events.append((node_name, method, start - self._t0,
+                                duration))
+
+    def cache_stats(self):
+        """
+        Return the numbers of memoization cache hits and misses of each node
+        recorded while the profiler was running. Nodes without memoization
+        are omitted.
+
+        Returns:
+            Dictionary mapping the node names to dictionaries with the keys
+            ``hits`` and ``misses``.
+        """
+        out = {}
+        for node in self.nodes:
+            start = self._memo_start.get(node.name)
+            stop = self._memo_stop.get(node.name) if not self._patches \
+                else node.memoization_stats
+            if start is None or stop is None:
+                continue
+            out[node.name] = {"hits": stop["hits"] - start["hits"],
+                              "misses": stop["misses"] - start["misses"]}
+        return out
+
+    def stats(self, by="node", comm=None):
+        """
+        Return the accumulated statistics of the wrapped calls.
+
+        Args:
+            by: ``"node"`` to accumulate the statistics for each Optimizable
+                object, or ``"class"`` to accumulate them over all the
+                objects of the same class.
+            comm: Optional MPI communicator. If given, the statistics of all
+                the ranks are summed and returned on every rank, with
+                ``max_time`` giving the largest time spent on a single rank.
+
+        Returns:
+            Dictionary mapping ``(name, method)`` tuples to dictionaries with
+            the keys ``calls``, ``time``, ``self_time`` and ``max_time``.
+        """
+        if by not in ("node", "class"):
+            raise ValueError(f"Unknown grouping {by}")
+        local = defaultdict(lambda: [0, 0.0, 0.0])
+        for (node_name, method), (calls, t, t_self) in self._stats.items():
+            name = node_name if by == "node" else self._classes[node_name]
+            entry = local[(name, method)]
+            entry[0] += calls
+            entry[1] += t
+            entry[2] += t_self
+        all_stats = [dict(local)] if comm is None else comm.allgather(dict(local))
+
+        out = {}
+        for rank_stats in all_stats:
+            for key, (calls, t, t_self) in rank_stats.items():
+                entry = out.setdefault(key, {"calls": 0, "time": 0.0,
+                                             "self_time": 0.0,
+                                             "max_time": 0.0})
+                entry["calls"] += calls
+                entry["time"] += t
+                entry["self_time"] += t_self
+                entry["max_time"] = max(entry["max_time"], t)
+        return out
+
+    def print_stats(self, by="class", comm=None, sort="self_time"):
+        """
+        Print a table of the accumulated statistics, sorted in descending
+        order of ``sort``. With an MPI communicator, the statistics are
+        aggregated over all the ranks and printed only on rank 0.
+        """
+        stats = self.stats(by=by, comm=comm)
+        if comm is not None and comm.rank != 0:
+            return
+        print(f"{'name':<40s} {'method':<24s} {'calls':>10s} "
+              f"{'time (s)':>12s} {'self (s)':>12s} {'max (s)':>12s}")
+        for (name, method), s in sorted(stats.items(),
+                                        key=lambda item: -item[1][sort]):
+            print(f"{name:<40s} {method:<24s} {s['calls']:>10d} "
+                  f"{s['time']:>12.4e} {s['self_time']:>12.4e} "
+                  f"{s['max_time']:>12.4e}")
+        for name, s in self.cache_stats().items():
+            print(f"{name}: {s['hits']} memoization hits, "
+                  f"{s['misses']} misses")
+
+    def chrome_trace(self, comm=None):
+        """
+        Return the recorded calls as a dictionary in the Chrome trace event
+        format. The MPI rank is used as the process id. With an MPI
+        communicator, the events of all the ranks are gathered.
+        """
+        rank = 0 if comm is None else comm.rank
+        events = [{"name": f"{node_name}.{method}",
+                   "cat": self._classes[node_name],
+                   "ph": "X", "ts": 1e6 * start, "dur": 1e6 * duration,
+                   "pid": rank, "tid": 0}
+                  for node_name, method, start, duration in self.events]
+        if comm is not None:
+            events = [e for rank_events in comm.allgather(events)
+                      for e in rank_events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, filename, comm=None):
+        """
+        Write the recorded calls to ``filename`` in the Chrome trace event
+        format. With an MPI communicator, the events of all the ranks are
+        written by rank 0.
+        """
+        trace = self.chrome_trace(comm=comm)
+        if comm is not None and comm.rank != 0:
+            return
+        with open(filename, "w") as f:
+            json.dump(trace, f)
+
@@ -8,6 +8,7 @@ subpackage.
 """
 
 import itertools
+from collections import OrderedDict
 from numbers import Integral, Real, Number
 from dataclasses import dataclass
 from abc import ABCMeta
@@ -226,6 +227,71 @@ class WeakKeyDefaultDict(WeakKeyDictionary):
             return self.__missing__(key)
 
 
+class EvaluationCache:
+    """
+    Bounded least-recently-used cache of function evaluations, keyed on a
+    name and the numeric values of a DOF vector. Used to memoize the
+    evaluations of Optimizable objects, so that revisiting a point in DOF
+    space does not trigger a recomputation of the whole graph. The numbers
+    of cache hits and misses are recorded.
+
+    Args:
+        maxsize: Maximum number of evaluations kept in the cache.
+    """
+
+    def __init__(self, maxsize: Integral = 16):
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def memoize(self, name: str, x: RealArray, fn, *args, **kwargs):
+        """
+        Return the cached value of ``fn`` at ``x`` if present, otherwise
+        evaluate ``fn(*args, **kwargs)`` and cache the result. Exceptions
+        raised by ``fn`` are not cached.
+
+        Args:
+            name: Identifier of the evaluated quantity.
+            x: DOF vector at which ``fn`` is evaluated.
+            fn: Function to evaluate on a cache miss.
+        """
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        key = (name, x.shape, x.tobytes())
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+        self.misses += 1
+        value = fn(*args, **kwargs)
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """
+        Remove all the cached evaluations and reset the statistics.
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Return the numbers of cache hits and misses, the current size and the
+        maximum size of the cache.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+
 def parallel_loop_bounds(comm, n):
     """
     Split up an array [0, 1, ..., n-1] across an mpi communicator.  Example: n
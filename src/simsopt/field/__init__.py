@@ -9,6 +9,7 @@ from .normal_field import *
 from .tracing import *
 from .wireframefield import *
 from .selffield import *
+from .spectral_bnormal import *
 from .magnetic_axis_helpers import *
 
 __all__ = (
@@ -23,5 +24,6 @@ __all__ = (
     + tracing.__all__
     + wireframefield.__all__
     + selffield.__all__
+    + spectral_bnormal.__all__
     + magnetic_axis_helpers.__all__
 )
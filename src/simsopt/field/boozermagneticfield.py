@@ -1,5 +1,5 @@
 import simsoptpp as sopp
-from scipy.interpolate import InterpolatedUnivariateSpline
+from scipy.interpolate import InterpolatedUnivariateSpline, BSpline, make_interp_spline
 import numpy as np
 import logging
 
@@ -299,6 +299,19 @@ class BoozerAnalytic(BoozerMagneticField):
         dKdzeta[:, 0] = -self.N*self.K1*r*np.cos(thetas-self.N*zetas)
 
 
+def _interpolating_spline(x, y, k):
+    """
+    Returns the :class:`~scipy.interpolate.BSpline` of degree ``k`` that
+    interpolates ``y`` at ``x``, using the same knots as
+    :class:`~scipy.interpolate.InterpolatedUnivariateSpline`. If ``y`` has
+    shape ``(nmodes, len(x))``, all rows are interpolated with a single
+    linear solve and the resulting spline is vector valued.
+    """
+    knots = InterpolatedUnivariateSpline(x, np.zeros_like(x), k=k).get_knots()
+    t = np.concatenate(([knots[0]]*k, knots, [knots[-1]]*k))
+    return make_interp_spline(x, np.asarray(y).T, k=k, t=t)
+
+
 class BoozerRadialInterpolant(BoozerMagneticField):
     r"""
     Given a :class:`Vmec` instance, performs a Boozer coordinate transformation using
@@ -308,6 +321,13 @@ class BoozerRadialInterpolant(BoozerMagneticField):
     and an inverse Fourier transform in the two angles.
     Throughout stellarator symmetry is assumed.
 
+    All Fourier harmonics of a quantity are interpolated by a single vector
+    valued spline, so construction and evaluation do not loop over the modes.
+    The interpolant can be stored with :meth:`save` and recreated with
+    :meth:`load`, which avoids running ``BOOZXFORM`` again. When running
+    with MPI, the splines are only constructed on the first rank and then
+    sent to all other ranks.
+
     Args:
         equil: instance of :class:`simsopt.mhd.vmec.Vmec` or :class:`simsopt.mhd.boozer.Boozer`.
             If it is an instance of :class:`simsopt.mhd.boozer.Boozer`, the
@@ -336,10 +356,14 @@ class BoozerRadialInterpolant(BoozerMagneticField):
             harmonics and its finite-difference derivative wrt ``s`` is performed
             instead (defaults to ``False``)
         ns_delete: (see ``rescale``) (defaults to 0)
+        shared_memory: If True and the :class:`Boozer` object has an MPI
+            partition, keep only one copy of the splines per node in an MPI
+            shared memory window instead of one copy per rank.
+            (defaults to ``False``)
     """
 
     def __init__(self, equil, order, mpol=32, ntor=32, N=None, enforce_vacuum=False, rescale=False,
-                 ns_delete=0, no_K=False):
+                 ns_delete=0, no_K=False, shared_memory=False):
 
         if isinstance(equil, Vmec):
             equil.run()
@@ -382,73 +406,148 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         BoozerMagneticField.__init__(self, self.booz.equil.wout.phi[-1]/(2*np.pi))
 
         if self.mpi is not None:
-            if self.mpi.proc0_groups:
+            # The splines are only built on one rank and then distributed.
+            tables = None
+            if self.mpi.proc0_world:
                 self.init_splines()
                 if (not self.no_K):
                     self.compute_K()
-            else:
-                self.psip_spline = None
-                self.G_spline = None
-                self.I_spline = None
-                self.dGds_spline = None
-                self.dIds_spline = None
-                self.iota_spline = None
-                self.diotads_spline = None
-                self.numns_splines = None
-                self.rmnc_splines = None
-                self.zmns_splines = None
-                self.dnumnsds_splines = None
-                self.drmncds_splines = None
-                self.dzmnsds_splines = None
-                self.bmnc_splines = None
-                self.dbmncds_splines = None
-                self.d_mn_factor_splines = None
-                self.mn_factor_splines = None
-                self.xm_b = None
-                self.xn_b = None
-                if not self.stellsym:
-                    self.numnc_splines = None
-                    self.rmns_splines = None
-                    self.zmnc_splines = None
-                    self.dnumncds_splines = None
-                    self.drmnsds_splines = None
-                    self.dzmncds_splines = None
-                    self.bmns_splines = None
-                    self.dbmnsds_splines = None
-
-            self.psip_spline = self.mpi.comm_world.bcast(self.psip_spline, root=0)
-            self.G_spline = self.mpi.comm_world.bcast(self.G_spline, root=0)
-            self.I_spline = self.mpi.comm_world.bcast(self.I_spline, root=0)
-            self.dGds_spline = self.mpi.comm_world.bcast(self.dGds_spline, root=0)
-            self.dIds_spline = self.mpi.comm_world.bcast(self.dIds_spline, root=0)
-            self.iota_spline = self.mpi.comm_world.bcast(self.iota_spline, root=0)
-            self.diotads_spline = self.mpi.comm_world.bcast(self.diotads_spline, root=0)
-            self.numns_splines = self.mpi.comm_world.bcast(self.numns_splines, root=0)
-            self.rmnc_splines = self.mpi.comm_world.bcast(self.rmnc_splines, root=0)
-            self.zmns_splines = self.mpi.comm_world.bcast(self.zmns_splines, root=0)
-            self.dnumnsds_splines = self.mpi.comm_world.bcast(self.dnumnsds_splines, root=0)
-            self.drmncds_splines = self.mpi.comm_world.bcast(self.drmncds_splines, root=0)
-            self.dzmnsds_splines = self.mpi.comm_world.bcast(self.dzmnsds_splines, root=0)
-            self.bmnc_splines = self.mpi.comm_world.bcast(self.bmnc_splines, root=0)
-            self.dbmncds_splines = self.mpi.comm_world.bcast(self.dbmncds_splines, root=0)
-            self.d_mn_factor_splines = self.mpi.comm_world.bcast(self.d_mn_factor_splines, root=0)
-            self.mn_factor_splines = self.mpi.comm_world.bcast(self.mn_factor_splines, root=0)
-            self.xm_b = self.mpi.comm_world.bcast(self.xm_b, root=0)
-            self.xn_b = self.mpi.comm_world.bcast(self.xn_b, root=0)
-            if not self.stellsym:
-                self.numnc_splines = self.mpi.comm_world.bcast(self.numnc_splines, root=0)
-                self.rmns_splines = self.mpi.comm_world.bcast(self.rmns_splines, root=0)
-                self.zmnc_splines = self.mpi.comm_world.bcast(self.zmnc_splines, root=0)
-                self.dnumncds_splines = self.mpi.comm_world.bcast(self.dnumncds_splines, root=0)
-                self.drmnsds_splines = self.mpi.comm_world.bcast(self.drmnsds_splines, root=0)
-                self.dzmncds_splines = self.mpi.comm_world.bcast(self.dzmncds_splines, root=0)
-                self.bmns_splines = self.mpi.comm_world.bcast(self.bmns_splines, root=0)
-                self.dbmnsds_splines = self.mpi.comm_world.bcast(self.dbmnsds_splines, root=0)
+                tables = self.get_tables()
+            self.set_tables(self._distribute_tables(tables, self.mpi.comm_world, shared_memory))
         else:
             self.init_splines()
             if (not self.no_K):
                 self.compute_K()
 
+    def _spline_names(self):
+        names = ['psip_spline', 'G_spline', 'I_spline', 'dGds_spline', 'dIds_spline',
+                 'iota_spline', 'diotads_spline', 'mn_factor_splines', 'd_mn_factor_splines',
+                 'numns_splines', 'rmnc_splines', 'zmns_splines', 'bmnc_splines',
+                 'dnumnsds_splines', 'drmncds_splines', 'dzmnsds_splines', 'dbmncds_splines']
+        if not self.stellsym:
+            names += ['numnc_splines', 'rmns_splines', 'zmnc_splines', 'bmns_splines',
+                      'dnumncds_splines', 'drmnsds_splines', 'dzmncds_splines', 'dbmnsds_splines']
+        if not self.no_K:
+            names += ['kmns_splines']
+            if not self.stellsym:
+                names += ['kmnc_splines']
+        return names
+
+    def get_tables(self):
+        """
+        Returns the data that defines the interpolant, i.e. the mode numbers,
+        some metadata, and the knots, coefficients and degree of each radial
+        spline, as a dictionary of numpy arrays.
+        """
+        tables = {
+            'psi0': np.asarray(self.psi0, dtype=float),
+            'order': np.asarray(self.order, dtype=int),
+            'stellsym': np.asarray(self.stellsym, dtype=int),
+            'no_K': np.asarray(self.no_K, dtype=int),
+            'enforce_vacuum': np.asarray(self.enforce_vacuum, dtype=int),
+            'rescale': np.asarray(self.rescale, dtype=int),
+            'ns_delete': np.asarray(self.ns_delete, dtype=int),
+            'xm_b': np.asarray(self.xm_b),
+            'xn_b': np.asarray(self.xn_b),
+            's_half_ext': np.asarray(self.s_half_ext),
+        }
+        if self.enforce_qs:
+            tables['N'] = np.asarray(self.N)
+        for name in self._spline_names():
+            spline = getattr(self, name)
+            tables[name + '_t'] = spline.t
+            tables[name + '_c'] = spline.c
+            tables[name + '_k'] = np.asarray(spline.k, dtype=int)
+        return tables
+
+    def set_tables(self, tables):
+        """
+        Sets up the interpolant from the dictionary returned by
+        :meth:`get_tables`. The arrays are used without copying them.
+        """
+        self.order = int(tables['order'])
+        self.stellsym = bool(tables['stellsym'])
+        self.no_K = bool(tables['no_K'])
+        self.enforce_vacuum = bool(tables['enforce_vacuum'])
+        self.rescale = bool(tables['rescale'])
+        self.ns_delete = int(tables['ns_delete'])
+        self.enforce_qs = 'N' in tables
+        if self.enforce_qs:
+            self.N = int(tables['N'])
+        self.xm_b = tables['xm_b']
+        self.xn_b = tables['xn_b']
+        self.s_half_ext = tables['s_half_ext']
+        for name in self._spline_names():
+            setattr(self, name, BSpline.construct_fast(tables[name + '_t'], tables[name + '_c'],
+                                                       int(tables[name + '_k'])))
+
+    def _distribute_tables(self, tables, comm, shared_memory):
+        # Sends the tables from rank 0 of comm to all other ranks. If
+        # shared_memory is True, only one copy of the tables is kept on each
+        # node, in an MPI shared memory window.
+        if not shared_memory:
+            return comm.bcast(tables, root=0)
+        layout = None
+        if comm.rank == 0:
+            layout = [(name, array.shape, array.dtype.str) for name, array in tables.items()]
+        layout = comm.bcast(layout, root=0)
+        # round up to multiples of 8 bytes to keep all arrays aligned
+        sizes = [8*((np.prod(shape, dtype=int)*np.dtype(dtype).itemsize + 7)//8) for _, shape, dtype in layout]
+        node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.rank)
+        self._window = MPI.Win.Allocate_shared(sum(sizes) if node_comm.rank == 0 else 0, 1, comm=node_comm)
+        buf, _ = self._window.Shared_query(0)
+        buf = np.ndarray(buffer=buf, dtype=np.uint8, shape=(sum(sizes),))
+        shared = {}
+        offset = 0
+        for (name, shape, dtype), size in zip(layout, sizes):
+            shared[name] = np.ndarray(buffer=buf, dtype=dtype, shape=shape, offset=offset)
+            offset += size
+        if comm.rank == 0:
+            for name, array in tables.items():
+                shared[name][...] = array
+        # copy from the node of rank 0 to all other nodes
+        leaders_comm = comm.Split(0 if node_comm.rank == 0 else MPI.UNDEFINED, key=comm.rank)
+        if leaders_comm != MPI.COMM_NULL:
+            leaders_comm.Bcast(buf, root=0)
+            leaders_comm.Free()
+        node_comm.Barrier()
+        node_comm.Free()
+        return shared
+
+    def save(self, filename):
+        """
+        Saves the interpolant, i.e. the radial splines of all Fourier
+        harmonics, to the ``.npz`` file ``filename``. It can be recreated with
+        :meth:`load` without running ``BOOZXFORM``.
+        """
+        np.savez(filename, **self.get_tables())
+
+    @classmethod
+    def load(cls, filename, mpi=None, shared_memory=False):
+        """
+        Loads an interpolant that was stored with :meth:`save`.
+
+        Args:
+            filename: Name of the ``.npz`` file.
+            mpi: An optional :obj:`~simsopt.util.mpi.MpiPartition`. If given,
+                the file is only read on rank 0 of ``mpi.comm_world`` and the
+                tables are then sent to all other ranks.
+            shared_memory: If True and ``mpi`` is given, keep only one copy of
+                the tables per node in an MPI shared memory window.
+        """
+        tables = None
+        if mpi is None or mpi.proc0_world:
+            with np.load(filename) as data:
+                tables = {name: data[name] for name in data.files}
+        field = cls.__new__(cls)
+        if mpi is not None:
+            tables = field._distribute_tables(tables, mpi.comm_world, shared_memory)
+        BoozerMagneticField.__init__(field, float(tables['psi0']))
+        field.booz = None
+        field.mpi = mpi
+        field.set_tables(tables)
+        return field
+
     def init_splines(self):
         self.xm_b = self.booz.bx.xm_b
         self.xn_b = self.booz.bx.xn_b
@@ -472,22 +571,12 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         I[1:-1] = self.booz.bx.Boozer_I
         if self.rescale:
             s_half_mn = self.booz.bx.s_in[self.ns_delete::]
-            bmnc = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-            rmnc = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-            zmns = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-            numns = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-
             bmnc = self.booz.bx.bmnc_b[:, self.ns_delete::]
             rmnc = self.booz.bx.rmnc_b[:, self.ns_delete::]
             zmns = self.booz.bx.zmns_b[:, self.ns_delete::]
             numns = self.booz.bx.numns_b[:, self.ns_delete::]
 
             if not self.stellsym:
-                bmns = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-                rmns = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-                zmnc = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-                numnc = np.zeros((len(self.xm_b), self.booz.bx.ns_in-self.ns_delete))
-
                 bmns = self.booz.bx.bmns_b[:, self.ns_delete::]
                 rmns = self.booz.bx.rmns_b[:, self.ns_delete::]
                 zmnc = self.booz.bx.zmnc_b[:, self.ns_delete::]
@@ -564,86 +653,77 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         dIds = (I[2:-1] - I[1:-2])/ds
         diotads = (iota[2:-1] - iota[1:-2])/ds
 
-        self.psip_spline = InterpolatedUnivariateSpline(s_full, psip, k=self.order)
+        self.psip_spline = _interpolating_spline(s_full, psip, self.order)
         if not self.enforce_vacuum:
-            self.G_spline = InterpolatedUnivariateSpline(self.s_half_ext, G, k=self.order)
-            self.I_spline = InterpolatedUnivariateSpline(self.s_half_ext, I, k=self.order)
-            self.dGds_spline = InterpolatedUnivariateSpline(s_full[1:-1], dGds, k=self.order)
-            self.dIds_spline = InterpolatedUnivariateSpline(s_full[1:-1], dIds, k=self.order)
+            self.G_spline = _interpolating_spline(self.s_half_ext, G, self.order)
+            self.I_spline = _interpolating_spline(self.s_half_ext, I, self.order)
+            self.dGds_spline = _interpolating_spline(s_full[1:-1], dGds, self.order)
+            self.dIds_spline = _interpolating_spline(s_full[1:-1], dIds, self.order)
         else:
-            self.G_spline = InterpolatedUnivariateSpline(self.s_half_ext, np.mean(G)*np.ones_like(self.s_half_ext), k=self.order)
-            self.I_spline = InterpolatedUnivariateSpline(self.s_half_ext, np.zeros_like(self.s_half_ext), k=self.order)
-            self.dGds_spline = InterpolatedUnivariateSpline(s_full[1:-1], np.zeros_like(s_full[1:-1]), k=self.order)
-            self.dIds_spline = InterpolatedUnivariateSpline(s_full[1:-1], np.zeros_like(s_full[1:-1]), k=self.order)
-        self.iota_spline = InterpolatedUnivariateSpline(self.s_half_ext, iota, k=self.order)
-        self.diotads_spline = InterpolatedUnivariateSpline(s_full[1:-1], diotads, k=self.order)
-
-        self.numns_splines = []
-        self.rmnc_splines = []
-        self.zmns_splines = []
-        self.dnumnsds_splines = []
-        self.drmncds_splines = []
-        self.dzmnsds_splines = []
-        self.bmnc_splines = []
-        self.dbmncds_splines = []
-        self.d_mn_factor_splines = []
-        self.mn_factor_splines = []
-        for im in range(len(self.xm_b)):
-            self.numns_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*numns[im, :], k=self.order))
-            self.rmnc_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*rmnc[im, :], k=self.order))
-            self.zmns_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*zmns[im, :], k=self.order))
-            self.mn_factor_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :], k=self.order))
-            self.d_mn_factor_splines.append(InterpolatedUnivariateSpline(s_half_mn, d_mn_factor[im, :], k=self.order))
-            if (self.enforce_qs and (self.xn_b[im] != self.N * self.xm_b[im])):
-                self.bmnc_splines.append(InterpolatedUnivariateSpline(s_half_mn, 0*bmnc[im, :], k=self.order))
-                self.dbmncds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], 0*dbmncds[im, :], k=self.order))
-            else:
-                self.bmnc_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*bmnc[im, :], k=self.order))
-                if self.rescale:
-                    self.dbmncds_splines.append(self.bmnc_splines[-1].derivative())
-                else:
-                    self.dbmncds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dbmncds[im, :], k=self.order))
+            self.G_spline = _interpolating_spline(self.s_half_ext, np.mean(G)*np.ones_like(self.s_half_ext), self.order)
+            self.I_spline = _interpolating_spline(self.s_half_ext, np.zeros_like(self.s_half_ext), self.order)
+            self.dGds_spline = _interpolating_spline(s_full[1:-1], np.zeros_like(s_full[1:-1]), self.order)
+            self.dIds_spline = _interpolating_spline(s_full[1:-1], np.zeros_like(s_full[1:-1]), self.order)
+        self.iota_spline = _interpolating_spline(self.s_half_ext, iota, self.order)
+        self.diotads_spline = _interpolating_spline(s_full[1:-1], diotads, self.order)
+
+        # All Fourier harmonics of a quantity are interpolated at once by a
+        # single vector valued spline
+        if self.enforce_qs:
+            non_qs = self.xn_b != self.N * self.xm_b
+        self.mn_factor_splines = _interpolating_spline(s_half_mn, mn_factor, self.order)
+        self.d_mn_factor_splines = _interpolating_spline(s_half_mn, d_mn_factor, self.order)
+        self.numns_splines = _interpolating_spline(s_half_mn, mn_factor*numns, self.order)
+        self.rmnc_splines = _interpolating_spline(s_half_mn, mn_factor*rmnc, self.order)
+        self.zmns_splines = _interpolating_spline(s_half_mn, mn_factor*zmns, self.order)
+        bmnc = mn_factor*bmnc
+        if self.enforce_qs:
+            bmnc[non_qs, :] = 0
+        self.bmnc_splines = _interpolating_spline(s_half_mn, bmnc, self.order)
+        if self.rescale:
+            self.dnumnsds_splines = self.numns_splines.derivative()
+            self.drmncds_splines = self.rmnc_splines.derivative()
+            self.dzmnsds_splines = self.zmns_splines.derivative()
+            self.dbmncds_splines = self.bmnc_splines.derivative()
+        else:
+            if self.enforce_qs:
+                dbmncds[non_qs, :] = 0
+            self.dnumnsds_splines = _interpolating_spline(s_full[1:-1], dnumnsds, self.order)
+            self.drmncds_splines = _interpolating_spline(s_full[1:-1], drmncds, self.order)
+            self.dzmnsds_splines = _interpolating_spline(s_full[1:-1], dzmnsds, self.order)
+            self.dbmncds_splines = _interpolating_spline(s_full[1:-1], dbmncds, self.order)
 
+        if not self.stellsym:
+            self.numnc_splines = _interpolating_spline(s_half_mn, mn_factor*numnc, self.order)
+            self.rmns_splines = _interpolating_spline(s_half_mn, mn_factor*rmns, self.order)
+            self.zmnc_splines = _interpolating_spline(s_half_mn, mn_factor*zmnc, self.order)
+            bmns = mn_factor*bmns
+            if self.enforce_qs:
+                bmns[non_qs, :] = 0
+            self.bmns_splines = _interpolating_spline(s_half_mn, bmns, self.order)
             if self.rescale:
-                self.dnumnsds_splines.append(self.numns_splines[-1].derivative())
-                self.drmncds_splines.append(self.rmnc_splines[-1].derivative())
-                self.dzmnsds_splines.append(self.zmns_splines[-1].derivative())
+                self.dnumncds_splines = self.numnc_splines.derivative()
+                self.drmnsds_splines = self.rmns_splines.derivative()
+                self.dzmncds_splines = self.zmnc_splines.derivative()
+                self.dbmnsds_splines = self.bmns_splines.derivative()
             else:
-                self.dnumnsds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dnumnsds[im, :], k=self.order))
-                self.drmncds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], drmncds[im, :], k=self.order))
-                self.dzmnsds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dzmnsds[im, :], k=self.order))
-
-        if not self.stellsym:
-            self.numnc_splines = []
-            self.rmns_splines = []
-            self.zmnc_splines = []
-            self.dnumncds_splines = []
-            self.drmnsds_splines = []
-            self.dzmncds_splines = []
-            self.bmns_splines = []
-            self.dbmnsds_splines = []
-            for im in range(len(self.xm_b)):
-                self.numnc_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*numnc[im, :], k=self.order))
-                self.rmns_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*rmns[im, :], k=self.order))
-                self.zmnc_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*zmnc[im, :], k=self.order))
-                if (self.enforce_qs and (self.xn_b[im] != self.N * self.xm_b[im])):
-                    self.bmns_splines.append(InterpolatedUnivariateSpline(s_half_mn, 0*bmns[im, :], k=self.order))
-                    self.dbmnsds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], 0*dbmnsds[im, :], k=self.order))
-                else:
-                    self.bmns_splines.append(InterpolatedUnivariateSpline(s_half_mn, mn_factor[im, :]*bmns[im, :], k=self.order))
-                    if self.rescale:
-                        self.dbmnsds_splines.append(self.bmns_splines[-1].derivative())
-                    else:
-                        self.dbmnsds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dbmnsds[im, :], k=self.order))
-
-                if self.rescale:
-                    self.dnumncds_splines.append(self.numnc_splines[-1].derivative())
-                    self.drmnsds_splines.append(self.rmns_splines[-1].derivative())
-                    self.dzmncds_splines.append(self.zmnc_splines[-1].derivative())
-                else:
-                    self.dnumncds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dnumncds[im, :], k=self.order))
-                    self.drmnsds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], drmnsds[im, :], k=self.order))
-                    self.dzmncds_splines.append(InterpolatedUnivariateSpline(s_full[1:-1], dzmncds[im, :], k=self.order))
+                if self.enforce_qs:
+                    dbmnsds[non_qs, :] = 0
+                self.dnumncds_splines = _interpolating_spline(s_full[1:-1], dnumncds, self.order)
+                self.drmnsds_splines = _interpolating_spline(s_full[1:-1], drmnsds, self.order)
+                self.dzmncds_splines = _interpolating_spline(s_full[1:-1], dzmncds, self.order)
+                self.dbmnsds_splines = _interpolating_spline(s_full[1:-1], dbmnsds, self.order)
+
+    def _harmonics(self, splines, s, weight=1.):
+        # Evaluates the Fourier harmonics at s and undoes the rescaling. Returns
+        # an array of shape (number of modes, len(s)).
+        return np.ascontiguousarray((weight*splines(s)/self.mn_factor_splines(s)).T)
+
+    def _harmonics_ds(self, splines, dsplines, s):
+        # Derivative of the Fourier harmonics with respect to s, see _harmonics.
+        mn_factor = self.mn_factor_splines(s)
+        d_mn_factor = self.d_mn_factor_splines(s)
+        return np.ascontiguousarray(((dsplines(s) - splines(s)*d_mn_factor/mn_factor)/mn_factor).T)
 
     def compute_K(self):
         ntheta = 2 * (2 * self.booz.bx.mboz + 1)
@@ -656,43 +736,26 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         thetas = thetas.flatten()
         zetas = zetas.flatten()
 
-        dzmnsds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        drmncds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        dnumnsds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        bmnc_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        rmnc_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        zmns_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        numns_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
+        s = self.s_half_ext
+        dnumnsds_half = self._harmonics_ds(self.numns_splines, self.dnumnsds_splines, s)
+        drmncds_half = self._harmonics_ds(self.rmnc_splines, self.drmncds_splines, s)
+        dzmnsds_half = self._harmonics_ds(self.zmns_splines, self.dzmnsds_splines, s)
+        bmnc_half = self._harmonics(self.bmnc_splines, s)
+        rmnc_half = self._harmonics(self.rmnc_splines, s)
+        zmns_half = self._harmonics(self.zmns_splines, s)
+        numns_half = self._harmonics(self.numns_splines, s)
         if not self.stellsym:
-            dzmncds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            drmnsds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            dnumncds_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            bmns_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            rmns_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            zmnc_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-            numnc_half = np.zeros((len(self.xm_b), len(self.s_half_ext)))
-        for im in range(len(self.xm_b)):
-            mn_factor = self.mn_factor_splines[im](self.s_half_ext)
-            d_mn_factor = self.d_mn_factor_splines[im](self.s_half_ext)
-            dnumnsds_half[im, :] = ((self.dnumnsds_splines[im](self.s_half_ext) - self.numns_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-            drmncds_half[im, :] = ((self.drmncds_splines[im](self.s_half_ext) - self.rmnc_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-            dzmnsds_half[im, :] = ((self.dzmnsds_splines[im](self.s_half_ext) - self.zmns_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-            bmnc_half[im, :] = self.bmnc_splines[im](self.s_half_ext)/mn_factor
-            rmnc_half[im, :] = self.rmnc_splines[im](self.s_half_ext)/mn_factor
-            zmns_half[im, :] = self.zmns_splines[im](self.s_half_ext)/mn_factor
-            numns_half[im, :] = self.numns_splines[im](self.s_half_ext)/mn_factor
-            if not self.stellsym:
-                dnumncds_half[im, :] = ((self.dnumncds_splines[im](self.s_half_ext) - self.numnc_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-                drmnsds_half[im, :] = ((self.drmnsds_splines[im](self.s_half_ext) - self.rmns_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-                dzmncds_half[im, :] = ((self.dzmncds_splines[im](self.s_half_ext) - self.zmnc_splines[im](self.s_half_ext)*d_mn_factor/mn_factor)/mn_factor)
-                bmns_half[im, :] = self.bmns_splines[im](self.s_half_ext)/mn_factor
-                rmns_half[im, :] = self.rmns_splines[im](self.s_half_ext)/mn_factor
-                zmnc_half[im, :] = self.zmnc_splines[im](self.s_half_ext)/mn_factor
-                numnc_half[im, :] = self.numnc_splines[im](self.s_half_ext)/mn_factor
-
-        G_half = self.G_spline(self.s_half_ext)
-        I_half = self.I_spline(self.s_half_ext)
-        iota_half = self.iota_spline(self.s_half_ext)
+            dnumncds_half = self._harmonics_ds(self.numnc_splines, self.dnumncds_splines, s)
+            drmnsds_half = self._harmonics_ds(self.rmns_splines, self.drmnsds_splines, s)
+            dzmncds_half = self._harmonics_ds(self.zmnc_splines, self.dzmncds_splines, s)
+            bmns_half = self._harmonics(self.bmns_splines, s)
+            rmns_half = self._harmonics(self.rmns_splines, s)
+            zmnc_half = self._harmonics(self.zmnc_splines, s)
+            numnc_half = self._harmonics(self.numnc_splines, s)
+
+        G_half = self.G_spline(s)
+        I_half = self.I_spline(s)
+        iota_half = self.iota_spline(s)
 
         if not self.stellsym:
             kmnc_kmns = sopp.compute_kmnc_kmns(rmnc_half, drmncds_half, zmns_half, dzmnsds_half,
@@ -709,18 +772,16 @@ class BoozerRadialInterpolant(BoozerMagneticField):
                                      self.xm_b, self.xn_b, thetas, zetas)
         kmns = kmns*dtheta*dzeta*self.booz.bx.nfp/self.psi0
 
-        self.kmns_splines = []
+        mn_factor = self.mn_factor_splines(s).T
+        kmns = mn_factor*kmns
+        if self.enforce_qs:
+            kmns[self.xn_b != self.N * self.xm_b, :] = 0
+        self.kmns_splines = _interpolating_spline(s, kmns, self.order)
         if not self.stellsym:
-            self.kmnc_splines = []
-        for im in range(len(self.xm_b)):
-            if (self.enforce_qs and (self.xn_b[im] != self.N * self.xm_b[im])):
-                self.kmns_splines.append(InterpolatedUnivariateSpline(self.s_half_ext, 0*kmns[im, :], k=self.order))
-                if not self.stellsym:
-                    self.kmnc_splines.append(InterpolatedUnivariateSpline(self.s_half_ext, 0*kmnc[im, :], k=self.order))
-            else:
-                self.kmns_splines.append(InterpolatedUnivariateSpline(self.s_half_ext, self.mn_factor_splines[im](self.s_half_ext)*kmns[im, :], k=self.order))
-                if not self.stellsym:
-                    self.kmnc_splines.append(InterpolatedUnivariateSpline(self.s_half_ext, self.mn_factor_splines[im](self.s_half_ext)*kmnc[im, :], k=self.order))
+            kmnc = mn_factor*kmnc
+            if self.enforce_qs:
+                kmnc[self.xn_b != self.N * self.xm_b, :] = 0
+            self.kmnc_splines = _interpolating_spline(s, kmnc, self.order)
 
     def _K_impl(self, K):
         points = self.get_points_ref()
@@ -730,14 +791,10 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         K[:, 0] = 0.
         if self.no_K:
             return
-        kmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            kmns[im, :] = self.kmns_splines[im](s)/self.mn_factor_splines[im](s)
+        kmns = self._harmonics(self.kmns_splines, s)
         sopp.inverse_fourier_transform_odd(K[:, 0], kmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            kmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                kmnc[im, :] = self.kmnc_splines[im](s)/self.mn_factor_splines[im](s)
+            kmnc = self._harmonics(self.kmnc_splines, s)
             sopp.inverse_fourier_transform_even(K[:, 0], kmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dKdtheta_impl(self, dKdtheta):
@@ -748,14 +805,10 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         dKdtheta[:, 0] = 0.
         if self.no_K:
             return
-        kmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            kmns[im, :] = self.kmns_splines[im](s) * self.xm_b[im]/self.mn_factor_splines[im](s)
+        kmns = self._harmonics(self.kmns_splines, s, self.xm_b)
         sopp.inverse_fourier_transform_even(dKdtheta[:, 0], kmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            kmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                kmnc[im, :] = -self.kmnc_splines[im](s) * self.xm_b[im]/self.mn_factor_splines[im](s)
+            kmnc = self._harmonics(self.kmnc_splines, s, -self.xm_b)
             sopp.inverse_fourier_transform_odd(dKdtheta[:, 0], kmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dKdzeta_impl(self, dKdzeta):
@@ -766,14 +819,10 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         dKdzeta[:, 0] = 0.
         if (self.no_K):
             return
-        kmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            kmns[im, :] = -self.kmns_splines[im](s) * self.xn_b[im]/self.mn_factor_splines[im](s)
+        kmns = self._harmonics(self.kmns_splines, s, -self.xn_b)
         sopp.inverse_fourier_transform_even(dKdzeta[:, 0], kmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            kmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                kmnc[im, :] = self.kmnc_splines[im](s) * self.xn_b[im]/self.mn_factor_splines[im](s)
+            kmnc = self._harmonics(self.kmnc_splines, s, self.xn_b)
             sopp.inverse_fourier_transform_odd(dKdzeta[:, 0], kmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _nu_impl(self, nu):
@@ -781,15 +830,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        numns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            numns[im, :] = self.numns_splines[im](s)/self.mn_factor_splines[im](s)
+        numns = self._harmonics(self.numns_splines, s)
         nu[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(nu[:, 0], numns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            numnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                numnc[im, :] = self.numnc_splines[im](s)/self.mn_factor_splines[im](s)
+            numnc = self._harmonics(self.numnc_splines, s)
             sopp.inverse_fourier_transform_even(nu[:, 0], numnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dnudtheta_impl(self, dnudtheta):
@@ -797,15 +842,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        numns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            numns[im, :] = self.numns_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+        numns = self._harmonics(self.numns_splines, s, self.xm_b)
         dnudtheta[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dnudtheta[:, 0], numns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            numnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                numnc[im, :] = -self.numnc_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+            numnc = self._harmonics(self.numnc_splines, s, -self.xm_b)
             sopp.inverse_fourier_transform_odd(dnudtheta[:, 0], numnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dnudzeta_impl(self, dnudzeta):
@@ -813,15 +854,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        numns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            numns[im, :] = -self.numns_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+        numns = self._harmonics(self.numns_splines, s, -self.xn_b)
         dnudzeta[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dnudzeta[:, 0], numns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            numnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                numnc[im, :] = self.numnc_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+            numnc = self._harmonics(self.numnc_splines, s, self.xn_b)
             sopp.inverse_fourier_transform_odd(dnudzeta[:, 0], numnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dnuds_impl(self, dnuds):
@@ -829,19 +866,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        numns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            d_mn_factor = self.d_mn_factor_splines[im](s)
-            mn_factor = self.mn_factor_splines[im](s)
-            numns[im, :] = ((self.dnumnsds_splines[im](s) - self.numns_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+        numns = self._harmonics_ds(self.numns_splines, self.dnumnsds_splines, s)
         dnuds[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dnuds[:, 0], numns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            numnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                d_mn_factor = self.d_mn_factor_splines[im](s)
-                mn_factor = self.mn_factor_splines[im](s)
-                numnc[im, :] = ((self.dnumncds_splines[im](s) - self.numnc_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+            numnc = self._harmonics_ds(self.numnc_splines, self.dnumncds_splines, s)
             sopp.inverse_fourier_transform_even(dnuds[:, 0], numnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dRdtheta_impl(self, dRdtheta):
@@ -849,15 +878,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        rmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            rmnc[im, :] = -self.rmnc_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+        rmnc = self._harmonics(self.rmnc_splines, s, -self.xm_b)
         dRdtheta[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dRdtheta[:, 0], rmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            rmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                rmns[im, :] = self.rmns_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+            rmns = self._harmonics(self.rmns_splines, s, self.xm_b)
             sopp.inverse_fourier_transform_even(dRdtheta[:, 0], rmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dRdzeta_impl(self, dRdzeta):
@@ -865,15 +890,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        rmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            rmnc[im, :] = self.rmnc_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+        rmnc = self._harmonics(self.rmnc_splines, s, self.xn_b)
         dRdzeta[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dRdzeta[:, 0], rmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            rmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                rmns[im, :] = -self.rmns_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+            rmns = self._harmonics(self.rmns_splines, s, -self.xn_b)
             sopp.inverse_fourier_transform_even(dRdzeta[:, 0], rmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dRds_impl(self, dRds):
@@ -881,19 +902,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        rmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            d_mn_factor = self.d_mn_factor_splines[im](s)
-            mn_factor = self.mn_factor_splines[im](s)
-            rmnc[im, :] = ((self.drmncds_splines[im](s) - self.rmnc_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+        rmnc = self._harmonics_ds(self.rmnc_splines, self.drmncds_splines, s)
         dRds[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dRds[:, 0], rmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            rmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                d_mn_factor = self.d_mn_factor_splines[im](s)
-                mn_factor = self.mn_factor_splines[im](s)
-                rmns[im, :] = ((self.drmnsds_splines[im](s) - self.rmns_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+            rmns = self._harmonics_ds(self.rmns_splines, self.drmnsds_splines, s)
             sopp.inverse_fourier_transform_odd(dRds[:, 0], rmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _R_impl(self, R):
@@ -901,15 +914,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        rmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            rmnc[im, :] = self.rmnc_splines[im](s)/self.mn_factor_splines[im](s)
+        rmnc = self._harmonics(self.rmnc_splines, s)
         R[:, 0] = 0.
         sopp.inverse_fourier_transform_even(R[:, 0], rmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            rmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                rmns[im, :] = self.rmns_splines[im](s)/self.mn_factor_splines[im](s)
+            rmns = self._harmonics(self.rmns_splines, s)
             sopp.inverse_fourier_transform_odd(R[:, 0], rmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dZdtheta_impl(self, dZdtheta):
@@ -917,15 +926,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        zmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            zmns[im, :] = self.zmns_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+        zmns = self._harmonics(self.zmns_splines, s, self.xm_b)
         dZdtheta[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dZdtheta[:, 0], zmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            zmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                zmnc[im, :] = -self.zmnc_splines[im](s)*self.xm_b[im]/self.mn_factor_splines[im](s)
+            zmnc = self._harmonics(self.zmnc_splines, s, -self.xm_b)
             sopp.inverse_fourier_transform_odd(dZdtheta[:, 0], zmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dZdzeta_impl(self, dZdzeta):
@@ -933,15 +938,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        zmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            zmns[im, :] = -self.zmns_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+        zmns = self._harmonics(self.zmns_splines, s, -self.xn_b)
         dZdzeta[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dZdzeta[:, 0], zmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            zmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                zmnc[im, :] = self.zmnc_splines[im](s)*self.xn_b[im]/self.mn_factor_splines[im](s)
+            zmnc = self._harmonics(self.zmnc_splines, s, self.xn_b)
             sopp.inverse_fourier_transform_odd(dZdzeta[:, 0], zmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dZds_impl(self, dZds):
@@ -949,19 +950,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        zmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            d_mn_factor = self.d_mn_factor_splines[im](s)
-            mn_factor = self.mn_factor_splines[im](s)
-            zmns[im, :] = ((self.dzmnsds_splines[im](s) - self.zmns_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+        zmns = self._harmonics_ds(self.zmns_splines, self.dzmnsds_splines, s)
         dZds[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dZds[:, 0], zmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            zmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                d_mn_factor = self.d_mn_factor_splines[im](s)
-                mn_factor = self.mn_factor_splines[im](s)
-                zmnc[im, :] = ((self.dzmncds_splines[im](s) - self.zmnc_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+            zmnc = self._harmonics_ds(self.zmnc_splines, self.dzmncds_splines, s)
             sopp.inverse_fourier_transform_even(dZds[:, 0], zmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _Z_impl(self, Z):
@@ -969,15 +962,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        zmns = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            zmns[im, :] = self.zmns_splines[im](s)/self.mn_factor_splines[im](s)
+        zmns = self._harmonics(self.zmns_splines, s)
         Z[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(Z[:, 0], zmns, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            zmnc = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                zmnc[im, :] = self.zmnc_splines[im](s)/self.mn_factor_splines[im](s)
+            zmnc = self._harmonics(self.zmnc_splines, s)
             sopp.inverse_fourier_transform_even(Z[:, 0], zmnc, self.xm_b, self.xn_b, thetas, zetas)
 
     def _psip_impl(self, psip):
@@ -1020,15 +1009,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        bmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            bmnc[im, :] = self.bmnc_splines[im](s)/self.mn_factor_splines[im](s)
+        bmnc = self._harmonics(self.bmnc_splines, s)
         modB[:, 0] = 0.
         sopp.inverse_fourier_transform_even(modB[:, 0], bmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            bmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                bmns[im, :] = self.bmns_splines[im](s)/self.mn_factor_splines[im](s)
+            bmns = self._harmonics(self.bmns_splines, s)
             sopp.inverse_fourier_transform_odd(modB[:, 0], bmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dmodBdtheta_impl(self, dmodBdtheta):
@@ -1036,15 +1021,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        bmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            bmnc[im, :] = -self.xm_b[im]*self.bmnc_splines[im](s)/self.mn_factor_splines[im](s)
+        bmnc = self._harmonics(self.bmnc_splines, s, -self.xm_b)
         dmodBdtheta[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dmodBdtheta[:, 0], bmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            bmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                bmns[im, :] = self.xm_b[im]*self.bmns_splines[im](s)/self.mn_factor_splines[im](s)
+            bmns = self._harmonics(self.bmns_splines, s, self.xm_b)
             sopp.inverse_fourier_transform_even(dmodBdtheta[:, 0], bmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dmodBdzeta_impl(self, dmodBdzeta):
@@ -1052,15 +1033,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        bmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            bmnc[im, :] = self.xn_b[im]*self.bmnc_splines[im](s)/self.mn_factor_splines[im](s)
+        bmnc = self._harmonics(self.bmnc_splines, s, self.xn_b)
         dmodBdzeta[:, 0] = 0.
         sopp.inverse_fourier_transform_odd(dmodBdzeta[:, 0], bmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            bmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                bmns[im, :] = -self.xn_b[im]*self.bmns_splines[im](s)/self.mn_factor_splines[im](s)
+            bmns = self._harmonics(self.bmns_splines, s, -self.xn_b)
             sopp.inverse_fourier_transform_even(dmodBdzeta[:, 0], bmns, self.xm_b, self.xn_b, thetas, zetas)
 
     def _dmodBds_impl(self, dmodBds):
@@ -1068,19 +1045,11 @@ class BoozerRadialInterpolant(BoozerMagneticField):
         s = points[:, 0]
         thetas = points[:, 1]
         zetas = points[:, 2]
-        bmnc = np.zeros((len(self.xm_b), len(s)))
-        for im in range(len(self.xm_b)):
-            mn_factor = self.mn_factor_splines[im](s)
-            d_mn_factor = self.d_mn_factor_splines[im](s)
-            bmnc[im, :] = ((self.dbmncds_splines[im](s) - self.bmnc_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+        bmnc = self._harmonics_ds(self.bmnc_splines, self.dbmncds_splines, s)
         dmodBds[:, 0] = 0.
         sopp.inverse_fourier_transform_even(dmodBds[:, 0], bmnc, self.xm_b, self.xn_b, thetas, zetas)
         if not self.stellsym:
-            bmns = np.zeros((len(self.xm_b), len(s)))
-            for im in range(len(self.xm_b)):
-                mn_factor = self.mn_factor_splines[im](s)
-                d_mn_factor = self.d_mn_factor_splines[im](s)
-                bmns[im, :] = ((self.dbmnsds_splines[im](s) - self.bmns_splines[im](s)*d_mn_factor/mn_factor)/mn_factor)
+            bmns = self._harmonics_ds(self.bmns_splines, self.dbmnsds_splines, s)
             sopp.inverse_fourier_transform_odd(dmodBds[:, 0], bmns, self.xm_b, self.xn_b, thetas, zetas)
 
 
@@ -2,6 +2,7 @@ import numpy as np
 
 import simsoptpp as sopp
 from .._core.optimizable import Optimizable
+from .._core.derivative import Derivative
 from .._core.json import GSONDecoder
 from .mgrid import MGrid
 
@@ -266,7 +267,7 @@ class MagneticFieldSum(MagneticField):
         ddA[:] = np.sum([bf.d2A_by_dXdX() for bf in self.Bfields], axis=0)
 
     def B_vjp(self, v):
-        return sum([bf.B_vjp(v) for bf in self.Bfields if np.any(bf.dofs_free_status)])
+        return Derivative.sum(bf.B_vjp(v) for bf in self.Bfields if np.any(bf.dofs_free_status))
 
     def as_dict(self, serial_objs_dict) -> dict:
         d = super().as_dict(serial_objs_dict=serial_objs_dict)
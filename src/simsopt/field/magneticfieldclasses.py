@@ -17,8 +17,8 @@ from .._core.json import GSONDecoder
 logger = logging.getLogger(__name__)
 
 __all__ = ['ToroidalField', 'PoloidalField', 'ScalarPotentialRZMagneticField',
-           'CircularCoil', 'Dommaschk', 'Reiman', 'InterpolatedField', 'DipoleField',
-           'MirrorModel']
+           'CircularCoil', 'Dommaschk', 'Reiman', 'InterpolatedField', 'InterpolatedFieldSuperposition',
+           'DipoleField', 'MirrorModel']
 
 
 class ToroidalField(MagneticField):
@@ -605,31 +605,187 @@ class DipoleField(MagneticField):
         R0: double.
             The value of the major radius of the stellarator needed only for simple toroidal
             coordinates.
+        sparse: bool (default False).
+            If True, the field is evaluated using only the dipoles with nonzero moments
+            in the half-period grid, and the contributions of the symmetry images are
+            computed on the fly by mapping the evaluation points back to the half-period
+            instead of looping over the full dipole manifold. This is much faster for the
+            sparse solutions returned by GPMO and relax-and-split.
+        theta: double (default 0).
+            Only used if sparse=True. Opening angle of the far-field approximation for
+            B and dB_by_dX: clusters of dipoles whose radius is smaller than theta times
+            their distance to the evaluation point are replaced by a single dipole with
+            the total moment of the cluster. The relative error is roughly proportional
+            to theta, and theta=0 evaluates all dipoles exactly.
+        cluster_size: double (default None).
+            Only used if theta > 0. Edge length of the cubic cells used to group the
+            dipoles into clusters. Defaults to a size that gives of order 64 dipoles
+            per cluster.
     """
 
-    def __init__(self, dipole_grid, dipole_vectors, stellsym=True, nfp=1, coordinate_flag='cartesian', m_maxima=None, R0=1):
+    def __init__(self, dipole_grid, dipole_vectors, stellsym=True, nfp=1, coordinate_flag='cartesian', m_maxima=None, R0=1,
+                 sparse=False, theta=0.0, cluster_size=None):
         super().__init__()
         if coordinate_flag == 'toroidal':
             warnings.warn('Note that if using simple toroidal coordinates, '
                           'the major radius must be specified through R0 argument.')
         self.R0 = R0
-        self._dipole_fields_from_symmetries(dipole_grid, dipole_vectors, stellsym, nfp, coordinate_flag, m_maxima, R0)
+        self.sparse = sparse
+        self.theta = theta
+        if sparse:
+            # Only the nonzero half-period dipoles are stored; the full dipole
+            # manifold is built on demand by _toVTK.
+            self._symmetry_args = (dipole_grid, dipole_vectors, stellsym, nfp, coordinate_flag, m_maxima, R0)
+            m_half = self._half_period_moments(dipole_grid, dipole_vectors, coordinate_flag, R0)
+            self._setup_sparse(dipole_grid, m_half, stellsym, nfp, cluster_size)
+        else:
+            self._dipole_fields_from_symmetries(dipole_grid, dipole_vectors, stellsym, nfp, coordinate_flag, m_maxima, R0)
 
     def _B_impl(self, B):
         points = self.get_points_cart_ref()
-        B[:] = sopp.dipole_field_B(points, self.dipole_grid, self.m_vec)
+        if self.sparse:
+            B[:] = self._sparse_eval(points, sopp.dipole_field_B, sopp.dipole_field_B_clustered)
+        else:
+            B[:] = sopp.dipole_field_B(points, self.dipole_grid, self.m_vec)
 
     def _dB_by_dX_impl(self, dB):
         points = self.get_points_cart_ref()
-        dB[:] = sopp.dipole_field_dB(points, self.dipole_grid, self.m_vec)
+        if self.sparse:
+            dB[:] = self._sparse_eval(points, sopp.dipole_field_dB, sopp.dipole_field_dB_clustered)
+        else:
+            dB[:] = sopp.dipole_field_dB(points, self.dipole_grid, self.m_vec)
 
     def _A_impl(self, A):
         points = self.get_points_cart_ref()
-        A[:] = sopp.dipole_field_A(points, self.dipole_grid, self.m_vec)
+        if self.sparse:
+            A[:] = self._sparse_eval(points, sopp.dipole_field_A)
+        else:
+            A[:] = sopp.dipole_field_A(points, self.dipole_grid, self.m_vec)
 
     def _dA_by_dX_impl(self, dA):
         points = self.get_points_cart_ref()
-        dA[:] = sopp.dipole_field_dA(points, self.dipole_grid, self.m_vec)
+        if self.sparse:
+            dA[:] = self._sparse_eval(points, sopp.dipole_field_dA)
+        else:
+            dA[:] = sopp.dipole_field_dA(points, self.dipole_grid, self.m_vec)
+
+    def _setup_sparse(self, dipole_grid, m_half, stellsym, nfp, cluster_size):
+        """
+        Extracts the nonzero dipoles of the half-period grid and the rotations
+        that map them onto their symmetry images, and optionally sorts the
+        dipoles into clusters for the far-field approximation.
+
+        The image of the dipole (p, m) under field-period rotation phi0 and
+        stellarator symmetry stell = +-1 is (Q p, stell * Q m), where
+        Q = R_z(phi0) diag(1, stell, stell) is a proper rotation. Hence the total
+        field is B(x) = sum_Q stell * Q B_half(Q^T x), and similarly for A and
+        the gradients, which transform as Q J Q^T.
+        """
+        nonzero = np.any(m_half != 0.0, axis=-1)
+        self._sparse_grid = np.ascontiguousarray(dipole_grid[nonzero])
+        self._sparse_m = np.ascontiguousarray(m_half[nonzero])
+
+        stell_list = [1, -1] if stellsym else [1]
+        rotations = []
+        signs = []
+        for stell in stell_list:
+            for fp in range(nfp):
+                phi0 = (2 * np.pi / nfp) * fp
+                c, s = np.cos(phi0), np.sin(phi0)
+                rotations.append([[c, -s * stell, 0.0],
+                                  [s, c * stell, 0.0],
+                                  [0.0, 0.0, stell]])
+                signs.append(stell)
+        self._sym_rotations = np.array(rotations)
+        self._sym_signs = np.array(signs, dtype=float)
+
+        if self.theta > 0 and self._sparse_grid.shape[0] > 0:
+            self._cluster_dipoles(cluster_size)
+
+    def _cluster_dipoles(self, cluster_size):
+        """
+        Sorts the nonzero dipoles into clusters given by a uniform grid of cubic
+        cells, and computes the center, radius and total moment of each cluster.
+        """
+        grid = self._sparse_grid
+        m = self._sparse_m
+        n = grid.shape[0]
+        lower = np.min(grid, axis=0)
+        extent = np.max(grid, axis=0) - lower
+        if cluster_size is None:
+            cluster_size = np.max(extent) * (64.0 / n) ** (1.0 / 3.0)
+        cluster_size = max(cluster_size, 1e-12)
+        cells = np.floor((grid - lower) / cluster_size).astype(np.int64)
+        keys = np.ravel_multi_index(cells.T, np.max(cells, axis=0) + 1)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        grid = np.ascontiguousarray(grid[order])
+        m = np.ascontiguousarray(m[order])
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, n))
+        centers = np.add.reduceat(grid, starts, axis=0) / counts[:, None]
+        dist2 = np.sum((grid - np.repeat(centers, counts, axis=0)) ** 2, axis=-1)
+
+        self._sparse_grid = grid
+        self._sparse_m = m
+        self._cluster_starts = np.append(starts, n).tolist()
+        self._cluster_centers = np.ascontiguousarray(centers)
+        self._cluster_moments = np.ascontiguousarray(np.add.reduceat(m, starts, axis=0))
+        self._cluster_radii = np.sqrt(np.maximum.reduceat(dist2, starts))
+
+    def _sparse_eval(self, points, kernel, clustered_kernel=None):
+        """
+        Evaluates a dipole field kernel using only the nonzero half-period dipoles,
+        summing over the symmetry images by transforming the evaluation points.
+        """
+        npoints = points.shape[0]
+        Q = self._sym_rotations
+        nsym = Q.shape[0]
+        tensor = kernel in (sopp.dipole_field_dB, sopp.dipole_field_dA)
+        if self._sparse_grid.shape[0] == 0:
+            return np.zeros((npoints, 3, 3) if tensor else (npoints, 3))
+        # points mapped back to the half period, Q^T x for every symmetry
+        sym_points = np.ascontiguousarray(np.einsum('sji,pj->spi', Q, points).reshape(nsym * npoints, 3))
+        if clustered_kernel is not None and self.theta > 0:
+            out = clustered_kernel(sym_points, self._sparse_grid, self._sparse_m, self._cluster_starts,
+                                   self._cluster_centers, self._cluster_moments, self._cluster_radii, self.theta)
+        else:
+            out = kernel(sym_points, self._sparse_grid, self._sparse_m)
+        if tensor:
+            out = np.asarray(out).reshape(nsym, npoints, 3, 3)
+            return np.einsum('s,sia,spab,sjb->pij', self._sym_signs, Q, out, Q)
+        out = np.asarray(out).reshape(nsym, npoints, 3)
+        return np.einsum('s,sij,spj->pi', self._sym_signs, Q, out)
+
+    @staticmethod
+    def _half_period_moments(dipole_grid, dipole_vectors, coordinate_flag='cartesian', R0=1):
+        """
+        Converts the dipole vectors of the half-period grid from the grid-aligned
+        coordinate system given by coordinate_flag to Cartesian components.
+        """
+        ox = dipole_grid[:, 0]
+        oy = dipole_grid[:, 1]
+        oz = dipole_grid[:, 2]
+        m = dipole_vectors.reshape(dipole_grid.shape[0], 3)
+        mmx = m[:, 0]
+        mmy = m[:, 1]
+        mmz = m[:, 2]
+        if coordinate_flag == 'cylindrical':
+            phi_dipole = np.arctan2(oy, ox)
+            mmx_temp = mmx * np.cos(phi_dipole) - mmy * np.sin(phi_dipole)
+            mmy_temp = mmx * np.sin(phi_dipole) + mmy * np.cos(phi_dipole)
+            mmx = mmx_temp
+            mmy = mmy_temp
+        if coordinate_flag == 'toroidal':
+            phi_dipole = np.arctan2(oy, ox)
+            theta_dipole = np.arctan2(oz, np.sqrt(ox ** 2 + oy ** 2) - R0)
+            mmx_temp = mmx * np.cos(phi_dipole) * np.cos(theta_dipole) - mmy * np.sin(phi_dipole) - mmz * np.cos(phi_dipole) * np.sin(theta_dipole)
+            mmy_temp = mmx * np.sin(phi_dipole) * np.cos(theta_dipole) + mmy * np.cos(phi_dipole) - mmz * np.sin(phi_dipole) * np.sin(theta_dipole)
+            mmz_temp = mmx * np.sin(theta_dipole) + mmz * np.cos(theta_dipole)
+            mmx = mmx_temp
+            mmy = mmy_temp
+            mmz = mmz_temp
+        return np.array([mmx, mmy, mmz]).T
 
     def _dipole_fields_from_symmetries(self, dipole_grid, dipole_vectors, stellsym=True, nfp=1, coordinate_flag='cartesian', m_maxima=None, R0=1):
         """
@@ -669,24 +825,10 @@ class DipoleField(MagneticField):
         n = ndipoles
 
         # get the components in Cartesian, converting if needed
+        m = self._half_period_moments(dipole_grid, m, coordinate_flag, R0)
         mmx = m[:, 0]
         mmy = m[:, 1]
         mmz = m[:, 2]
-        if coordinate_flag == 'cylindrical':
-            phi_dipole = np.arctan2(oy, ox)
-            mmx_temp = mmx * np.cos(phi_dipole) - mmy * np.sin(phi_dipole)
-            mmy_temp = mmx * np.sin(phi_dipole) + mmy * np.cos(phi_dipole)
-            mmx = mmx_temp
-            mmy = mmy_temp
-        if coordinate_flag == 'toroidal':
-            phi_dipole = np.arctan2(oy, ox)
-            theta_dipole = np.arctan2(oz, np.sqrt(ox ** 2 + oy ** 2) - R0)
-            mmx_temp = mmx * np.cos(phi_dipole) * np.cos(theta_dipole) - mmy * np.sin(phi_dipole) - mmz * np.cos(phi_dipole) * np.sin(theta_dipole)
-            mmy_temp = mmx * np.sin(phi_dipole) * np.cos(theta_dipole) + mmy * np.cos(phi_dipole) - mmz * np.sin(phi_dipole) * np.sin(theta_dipole)
-            mmz_temp = mmx * np.sin(theta_dipole) + mmz * np.cos(theta_dipole)
-            mmx = mmx_temp
-            mmy = mmy_temp
-            mmz = mmz_temp
 
         # Loop over stellarator and field-period symmetry contributions
         for stell in stell_list:
@@ -719,6 +861,9 @@ class DipoleField(MagneticField):
             vtkname (str): VTK filename, will be appended with .vts or .vtu.
         """
 
+        if self.sparse and not hasattr(self, 'm_vec'):
+            self._dipole_fields_from_symmetries(*self._symmetry_args)
+
         # get the coordinates
         ox = np.ascontiguousarray(self.dipole_grid[:, 0])
         oy = np.ascontiguousarray(self.dipole_grid[:, 1])
@@ -916,6 +1061,84 @@ class InterpolatedField(sopp.InterpolatedField, MagneticField):
         )
 
 
+class InterpolatedFieldSuperposition(sopp.InterpolatedFieldSuperposition, MagneticField):
+    r"""
+    Interpolant for the field of coils that are organised into groups carrying
+    a common current, e.g. the planar and non-planar coil types of a
+    stellarator. Since the field is linear in the currents, the field of
+    every group is interpolated on a regular grid in :math:`r,\phi,z` for
+    unit current, and the total field is formed as the weighted sum
+
+    .. math::
+        \mathbf B = \sum_g I_g \mathbf B_g
+
+    at evaluation time. Changing the currents via :meth:`set_currents` is
+    therefore essentially free, which makes this class well suited for scans
+    over current ratios. :math:`\nabla |\mathbf B|` is obtained from
+    interpolants of :math:`\nabla(\mathbf B_g\cdot\mathbf B_h)`, so the
+    field can be used with :func:`~simsopt.field.tracing.compute_fieldlines`
+    as well as :func:`~simsopt.field.tracing.trace_particles`.
+
+    The cost of building the interpolant grows linearly (for ``B``) and
+    quadratically (for ``GradAbsB``) with the number of groups, and the
+    ``GradAbsB`` tables are only built if they are needed.
+
+    Example::
+
+        fields = [BiotSavart([Coil(c.curve, ScaledCurrent(c.current, 1/I)) for c in group])
+                  for group, I in zip(coil_groups, group_currents)]
+        field = InterpolatedFieldSuperposition(fields, group_currents, 3, rrange, phirange, zrange,
+                                               nfp=nfp, stellsym=True)
+        field.set_currents(new_group_currents)
+    """
+
+    def __init__(self, fields, currents, degree, rrange, phirange, zrange, extrapolate=True, nfp=1, stellsym=False, skip=None):
+        r"""
+        Args:
+            fields: list of :mod:`simsopt.field.magneticfield.MagneticField`, the field of each group
+                    for unit current in that group.
+            currents: the current in each group.
+            degree: the degree of the piecewise polynomial interpolant.
+            rrange: a 3-tuple of the form ``(rmin, rmax, nr)``. This mean that the interval :math:`[rmin, rmax]` is
+                    split into ``nr`` many subintervals.
+            phirange: a 3-tuple of the form ``(phimin, phimax, nphi)``.
+            zrange: a 3-tuple of the form ``(zmin, zmax, nz)``.
+            extrapolate: whether to extrapolate the field when evaluate outside
+                         the integration domain or to throw an error.
+            nfp: Whether to exploit rotational symmetry, see :obj:`InterpolatedField`.
+                 The field of each group needs to have this symmetry.
+            stellsym: Whether to exploit stellarator symmetry, see :obj:`InterpolatedField`.
+                      The field of each group needs to have this symmetry.
+            skip: a function that takes in a point (in cylindrical (r,phi,z)
+                  coordinates) and returns whether to skip that location when
+                  building the interpolant or not, see :obj:`InterpolatedField`.
+        """
+        MagneticField.__init__(self)
+        if len(fields) != len(currents):
+            raise ValueError("The number of currents has to match the number of fields.")
+        if stellsym and zrange[0] != 0:
+            logger.warning(fr"Sure about zrange[0]={zrange[0]}? When exploiting stellarator symmetry, the interpolant is never evaluated for z<0.")
+        if nfp > 1 and abs(phirange[1] - 2*np.pi/nfp) > 1e-14:
+            logger.warning(fr"Sure about phirange[1]={phirange[1]}? When exploiting rotational symmetry, the interpolant is never evaluated for phi>2\pi/nfp.")
+
+        if skip is None:
+            def skip(xs, ys, zs):
+                return [False for _ in xs]
+
+        sopp.InterpolatedFieldSuperposition.__init__(self, fields, list(currents), degree, rrange, phirange, zrange,
+                                                     extrapolate, nfp, stellsym, skip)
+        self.__fields = fields
+
+    @property
+    def currents(self):
+        """The current in each group."""
+        return np.asarray(self.get_currents())
+
+    @currents.setter
+    def currents(self, currents):
+        self.set_currents(list(currents))
+
+
 class MirrorModel(MagneticField):
     r"""
     Model magnetic field employed in https://arxiv.org/abs/2305.06372 to study
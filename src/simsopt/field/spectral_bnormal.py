@@ -0,0 +1,207 @@
+"""
+This module provides an evaluator for the magnetic field on a surface that
+calls the (expensive) field only on a coarse tensor grid in the surface angles
+and Fourier interpolates the result to the quadrature points of the surface.
+"""
+
+import logging
+
+import numpy as np
+
+__all__ = ['SpectralBnormal', 'fourier_interpolation_matrix']
+
+logger = logging.getLogger(__name__)
+
+
+def fourier_interpolation_matrix(x, n):
+    r"""
+    Returns the ``(len(x), n)`` matrix that maps the values of a 1-periodic
+    function at the ``n`` equispaced points :math:`j/n`, :math:`j=0,\ldots,n-1`,
+    to the values of its trigonometric interpolant at the points ``x``.
+
+    For even ``n`` the Nyquist mode is represented by a cosine, so that the
+    interpolant is real.
+
+    Args:
+        x: Evaluation points, in units of the period.
+        n: Number of equispaced samples.
+    """
+    d = np.asarray(x)[:, None] - np.arange(n)[None, :]/n
+    res = np.ones(d.shape)
+    for k in range(1, (n+1)//2):
+        res += 2*np.cos(2*np.pi*k*d)
+    if n % 2 == 0:
+        res += np.cos(np.pi*n*d)
+    return res/n
+
+
+class SpectralBnormal:
+    r"""
+    Evaluates a magnetic field on the quadrature points of a surface by calling
+    the field on a coarse, equispaced grid in :math:`(\phi, \theta)` and
+    Fourier interpolating to the quadrature points.
+
+    The field of coils that are far from the surface is very smooth, so a
+    small number of field evaluations suffices to represent it to high
+    accuracy. The cylindrical components :math:`(B_R, B_\phi, B_Z)` are
+    interpolated, since they are periodic in :math:`\phi` with period
+    :math:`1/n_{fp}` when the surface and the field share the discrete
+    rotational symmetry. Pass ``nfp=1`` for fields that break this symmetry.
+
+    The coarse grid is chosen adaptively: starting from ``nphi x ntheta``
+    points per period, the resolution is doubled in each direction until the
+    amplitude of the two outermost Fourier shells of the coarse field, which
+    is used as an estimate of the truncation error, drops below ``tol``
+    times the RMS of :math:`|B|`. The estimate of the last evaluation is
+    available as :attr:`error_estimate`.
+
+    Since the interpolation is linear, vector-Jacobian products are obtained
+    by applying its transpose before calling the ``B_vjp`` of the field, so
+    objectives built on top of this class remain differentiable with respect
+    to the coil degrees of freedom.
+
+    Note that the points of ``field`` are set to the coarse grid by the
+    constructor and by :meth:`adapt`, and are set again by :meth:`B` and
+    :meth:`B_vjp` if they have been changed in the meantime. As for
+    :obj:`~simsopt.objectives.SquaredFlux`, the surface is assumed to be fixed.
+
+    Args:
+        surface: The :obj:`~simsopt.geo.surface.Surface` on whose quadrature
+          points the field is required.
+        field: The :obj:`~simsopt.field.magneticfield.MagneticField`, typically
+          a :obj:`~simsopt.field.biotsavart.BiotSavart` object.
+        tol: Relative tolerance for the estimated truncation error.
+        nphi: Initial number of coarse grid points per period in :math:`\phi`.
+        ntheta: Initial number of coarse grid points in :math:`\theta`.
+        max_nphi: Maximum number of coarse grid points per period in :math:`\phi`.
+        max_ntheta: Maximum number of coarse grid points in :math:`\theta`.
+        nfp: Number of periods in :math:`\phi` assumed for the field on the
+          surface. Defaults to ``surface.nfp``.
+    """
+
+    def __init__(self, surface, field, tol=1e-6, nphi=8, ntheta=8,
+                 max_nphi=128, max_ntheta=128, nfp=None):
+        if nphi < 4 or ntheta < 4:
+            raise ValueError("The coarse grid needs at least 4 points in each direction.")
+        self.surface = surface
+        self.field = field
+        self.tol = tol
+        self.max_nphi = max_nphi
+        self.max_ntheta = max_ntheta
+        self.nfp = surface.nfp if nfp is None else nfp
+
+        gamma = surface.gamma()
+        self.shape = gamma.shape
+        angle = np.arctan2(gamma[:, :, 1], gamma[:, :, 0])
+        self._cos = np.cos(angle)
+        self._sin = np.sin(angle)
+        self.adapt(nphi, ntheta)
+
+    def adapt(self, nphi=None, ntheta=None):
+        """
+        Choose the resolution of the coarse grid, starting from ``nphi x
+        ntheta`` points (by default the current resolution), and set the
+        points of the field accordingly.
+        """
+        nphi = self.nphi if nphi is None else nphi
+        ntheta = self.ntheta if ntheta is None else ntheta
+        while True:
+            self._set_coarse_grid(nphi, ntheta)
+            Bcyl = self._coarse_Bcyl()
+            err_phi, err_theta = self._tail_estimate(Bcyl)
+            scale = np.sqrt(np.mean(np.sum(Bcyl**2, axis=2)))
+            self.error_estimate = max(err_phi, err_theta)
+            refine_phi = err_phi > self.tol*scale and 2*nphi <= self.max_nphi
+            refine_theta = err_theta > self.tol*scale and 2*ntheta <= self.max_ntheta
+            if not (refine_phi or refine_theta):
+                break
+            nphi = 2*nphi if refine_phi else nphi
+            ntheta = 2*ntheta if refine_theta else ntheta
+        if self.error_estimate > self.tol*scale:
+            logger.warning(f"Estimated interpolation error {self.error_estimate:.3e} exceeds the tolerance "
+                           f"at the maximum resolution nphi={nphi}, ntheta={ntheta}.")
+
+    def _check_points(self):
+        # The field may be shared with other objectives that set its points.
+        points = self.field.get_points_cart_ref()
+        if points.shape != self._xyz.shape or not np.array_equal(points, self._xyz):
+            self.field.set_points(self._xyz)
+
+    def _set_coarse_grid(self, nphi, ntheta):
+        self.nphi = nphi
+        self.ntheta = ntheta
+        phis = np.arange(nphi)/(nphi*self.nfp)
+        thetas = np.arange(ntheta)/ntheta
+        phis2d, thetas2d = np.meshgrid(phis, thetas, indexing='ij')
+        xyz = np.zeros((nphi*ntheta, 3))
+        self.surface.gamma_lin(xyz, np.ascontiguousarray(phis2d.flatten()), np.ascontiguousarray(thetas2d.flatten()))
+        angle = np.arctan2(xyz[:, 1], xyz[:, 0]).reshape((nphi, ntheta))
+        self._cos_coarse = np.cos(angle)
+        self._sin_coarse = np.sin(angle)
+        self._interp_phi = fourier_interpolation_matrix(self.nfp*self.surface.quadpoints_phi, nphi)
+        self._interp_theta = fourier_interpolation_matrix(self.surface.quadpoints_theta, ntheta)
+        self._xyz = xyz
+        self.field.set_points(xyz)
+
+    def _coarse_Bcyl(self):
+        B = self.field.B().reshape((self.nphi, self.ntheta, 3))
+        c, s = self._cos_coarse, self._sin_coarse
+        return np.stack((c*B[:, :, 0] + s*B[:, :, 1], -s*B[:, :, 0] + c*B[:, :, 1], B[:, :, 2]), axis=2)
+
+    @staticmethod
+    def _tail_estimate(Bcyl):
+        nphi, ntheta = Bcyl.shape[:2]
+        coeffs = np.abs(np.fft.fft2(Bcyl, axes=(0, 1)))/(nphi*ntheta)
+        kphi = np.abs(np.fft.fftfreq(nphi)*nphi)
+        ktheta = np.abs(np.fft.fftfreq(ntheta)*ntheta)
+        err_phi = np.max(np.sum(coeffs[kphi >= kphi.max()-1, :, :], axis=(0, 1)))
+        err_theta = np.max(np.sum(coeffs[:, ktheta >= ktheta.max()-1, :], axis=(0, 1)))
+        return err_phi, err_theta
+
+    def B(self):
+        """
+        Returns the interpolated field as a ``(nphi, ntheta, 3)`` array on the
+        quadrature points of the surface. The error estimate is updated, and
+        a warning is logged if it exceeds the tolerance.
+        """
+        self._check_points()
+        Bcyl_coarse = self._coarse_Bcyl()
+        self.error_estimate = max(self._tail_estimate(Bcyl_coarse))
+        scale = np.sqrt(np.mean(np.sum(Bcyl_coarse**2, axis=2)))
+        if self.error_estimate > self.tol*scale:
+            logger.warning(f"Estimated interpolation error {self.error_estimate:.3e} exceeds the tolerance "
+                           f"at the resolution nphi={self.nphi}, ntheta={self.ntheta}. Call adapt() "
+                           "to refine the coarse grid.")
+        Bcyl = np.einsum('ij,jkd,lk->ild', self._interp_phi, Bcyl_coarse, self._interp_theta)
+        c, s = self._cos, self._sin
+        return np.stack((c*Bcyl[:, :, 0] - s*Bcyl[:, :, 1], s*Bcyl[:, :, 0] + c*Bcyl[:, :, 1], Bcyl[:, :, 2]), axis=2)
+
+    def B_vjp(self, v):
+        r"""
+        Returns the vector-Jacobian product of the interpolated field with
+        ``v`` (of shape ``(nphi, ntheta, 3)`` or ``(nphi*ntheta, 3)``), i.e.
+        the derivative of :math:`\sum v\cdot B` with respect to the
+        degrees of freedom of the field.
+        """
+        v = v.reshape(self.shape)
+        c, s = self._cos, self._sin
+        vcyl = np.stack((c*v[:, :, 0] + s*v[:, :, 1], -s*v[:, :, 0] + c*v[:, :, 1], v[:, :, 2]), axis=2)
+        vcyl = np.einsum('ij,ild,lk->jkd', self._interp_phi, vcyl, self._interp_theta)
+        c, s = self._cos_coarse, self._sin_coarse
+        vcoarse = np.stack((c*vcyl[:, :, 0] - s*vcyl[:, :, 1], s*vcyl[:, :, 0] + c*vcyl[:, :, 1], vcyl[:, :, 2]), axis=2)
+        self._check_points()
+        return self.field.B_vjp(vcoarse.reshape((-1, 3)))
+
+    def Bnormal(self):
+        r"""
+        Returns :math:`\mathbf{B}\cdot\mathbf{n}` on the quadrature points,
+        where :math:`\mathbf{n}` is the unit normal of the surface.
+        """
+        return np.sum(self.B()*self.surface.unitnormal(), axis=2)
+
+    def Bnormal_vjp(self, v):
+        """
+        Returns the vector-Jacobian product of :meth:`Bnormal` with the
+        ``(nphi, ntheta)`` array ``v``.
+        """
+        return self.B_vjp(v[:, :, None]*self.surface.unitnormal())
@@ -1,13 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from scipy.linalg import lu
+from scipy.linalg import lu, solve_triangular
 from scipy.optimize import minimize, least_squares
+from scipy.sparse.linalg import LinearOperator, gmres
 import simsoptpp as sopp
 
-from .surfaceobjectives import boozer_surface_residual, boozer_surface_dexactresidual_dcoils_dcurrents_vjp, boozer_surface_dlsqgrad_dcoils_vjp
+from .surfaceobjectives import boozer_surface_residual, boozer_surface_dexactresidual_dcoils_dcurrents_vjp, boozer_surface_dlsqgrad_dcoils_vjp, \
+    boozer_surface_residual_hessian_contract, BoozerResidualLinearization
 from .._core.optimizable import Optimizable
 from functools import partial
 
-__all__ = ['BoozerSurface']
+__all__ = ['BoozerSurface', 'BoozerSurfaceGroup']
+
+
+def _gmres(A, b, rtol, maxiter):
+    restart = min(b.size, 50)
+    maxiter = max(1, -(-maxiter // restart))
+    try:
+        x, _ = gmres(A, b, rtol=rtol, atol=0., restart=restart, maxiter=maxiter)
+    except TypeError:
+        # scipy < 1.12
+        x, _ = gmres(A, b, tol=rtol, atol=0., restart=restart, maxiter=maxiter)
+    return x
+
+
+class _MatrixFreeSystem(LinearOperator):
+    """
+    Square linear operator defined by its products with vectors, whose linear
+    systems are solved with GMRES. The columns of the operator are scaled by the
+    inverse of ``diagonal``, an approximation of its diagonal or of the norms of
+    its columns, which acts as a Jacobi preconditioner.
+    """
+
+    def __init__(self, matvec, rmatvec, diagonal, maxiter):
+        super().__init__(dtype=float, shape=(diagonal.size, diagonal.size))
+        self._mv = matvec
+        self._rmv = rmatvec
+        diagonal = np.abs(diagonal)
+        diagonal[diagonal == 0] = 1.
+        self.diagonal = diagonal
+        self.maxiter = maxiter
+
+    def _matvec(self, v):
+        return self._mv(np.ravel(v))
+
+    def _rmatvec(self, v):
+        return self._rmv(np.ravel(v))
+
+    def solve(self, b, rtol, shift=0., transpose=False):
+        """
+        Solve ``(A + shift * I) x = b``, or ``A^T x = b`` if ``transpose`` is True,
+        to a relative tolerance ``rtol``.
+        """
+        scale = 1. / (self.diagonal + shift)
+        if transpose:
+            op = LinearOperator(self.shape, matvec=lambda y: scale * self._rmv(y), dtype=float)
+            return _gmres(op, scale * b, rtol, self.maxiter)
+        op = LinearOperator(self.shape, matvec=lambda y: self._mv(scale * y) + shift * scale * y, dtype=float)
+        return scale * _gmres(op, b, rtol, self.maxiter)
 
 
 class BoozerSurface(Optimizable):
@@ -104,6 +155,10 @@ class BoozerSurface(Optimizable):
                 - `bfgs_maxiter` (int): maximum number of iterations for BFGS solver. Defaults to 1500.
                 - `limited_memory` (bool): True if L-BFGS solver is desired, False if the BFGS solver otherwise. Defaults to False.
                 - `weight_inv_modB` (float): for BoozerLS surfaces, weight the residual by modB so that it does not scale with coil currents.  Defaults to True.
+                - `linear_solver` (str): `'direct'` to solve the linear systems of Newton's method and of the adjoint equations with dense LU
+                  factorizations, or `'gmres'` to solve them matrix-free with GMRES. Defaults to `'direct'`.
+                - `krylov_tol` (float): relative tolerance of the adjoint and of the final Newton GMRES solves. Defaults to 1e-10.
+                - `krylov_maxiter` (int): maximum number of GMRES iterations per linear solve. Defaults to 1000.
         """
         super().__init__(depends_on=[biotsavart])
 
@@ -126,6 +181,13 @@ class BoozerSurface(Optimizable):
         if 'verbose' not in options:
             options['verbose'] = True
 
+        if 'linear_solver' not in options:
+            options['linear_solver'] = 'direct'
+        if 'krylov_tol' not in options:
+            options['krylov_tol'] = 1e-10
+        if 'krylov_maxiter' not in options:
+            options['krylov_maxiter'] = 1000
+
         # default solver options for the BoozerExact and BoozerLS solvers
         if self.boozer_type == 'exact':
             if 'newton_tol' not in options:
@@ -181,7 +243,8 @@ class BoozerSurface(Optimizable):
 
         # BoozerExact default solver
         if self.boozer_type == 'exact':
-            res = self.solve_residual_equation_exactly_newton(iota=iota, G=G, tol=self.options['newton_tol'], maxiter=self.options['newton_maxiter'], verbose=self.options['verbose'])
+            res = self.solve_residual_equation_exactly_newton(iota=iota, G=G, tol=self.options['newton_tol'], maxiter=self.options['newton_maxiter'], verbose=self.options['verbose'],
+                                                             linear_solver=self.options['linear_solver'], krylov_tol=self.options['krylov_tol'], krylov_maxiter=self.options['krylov_maxiter'])
             return res
 
         # BoozerLS default solver
@@ -200,9 +263,70 @@ class BoozerSurface(Optimizable):
             self.need_to_run_code = True
             res = self.minimize_boozer_penalty_constraints_newton(constraint_weight=self.constraint_weight, iota=iota, G=G,
                                                                   verbose=self.options['verbose'], tol=self.options['newton_tol'], maxiter=self.options['newton_maxiter'],
-                                                                  weight_inv_modB=self.options['weight_inv_modB'])
+                                                                  weight_inv_modB=self.options['weight_inv_modB'], linear_solver=self.options['linear_solver'],
+                                                                  krylov_tol=self.options['krylov_tol'], krylov_maxiter=self.options['krylov_maxiter'])
             return res
 
+    def predict_solution(self):
+        r"""
+        First-order prediction of the solution of the Boozer problem after the coils have changed, starting
+        from the last solution stored in :mod:`res`.
+
+        Denote by :math:`F(x, c) = 0` the nonlinear system solved by Newton's method, where :math:`x` contains
+        the surface dofs, :math:`\iota` and :math:`G`, and :math:`c` the coil dofs. Since :math:`F(x_0, c_0) = 0`
+        at the last solution :math:`x_0`, the linearization of :math:`F` around :math:`(x_0, c_0)` gives
+
+        .. math::
+            x \approx x_0 - (\partial F/\partial x)^{-1}(x_0, c_0) F(x_0, c),
+
+        i.e. the step along the sensitivity :math:`dx/dc`. It only requires one evaluation of :math:`F` at the new
+        coils, and reuses the factorization, or the matrix-free operator, of the Jacobian that is stored in
+        :mod:`res` for the adjoint solves.
+
+        This is only available after :mod:`run_code` converged with the BoozerLS or BoozerExact Newton solvers.
+        Otherwise, the current surface dofs and the stored values of :math:`\iota` and :math:`G` are returned.
+        The surface is left at its current dofs.
+
+        Returns:
+            tuple: The predicted surface dofs, :math:`\iota` and :math:`G`.
+        """
+        res = self.res
+        s = self.surface
+        sdofs = s.get_dofs()
+        iota, G = res['iota'], res['G']
+        has_solver = res.get('PLU') is not None or res.get('adjoint_solve') is not None
+        if res.get('type') not in ['ls', 'exact'] or not has_solver or not res['success']:
+            return sdofs, iota, G
+
+        if res['type'] == 'ls':
+            x = np.concatenate((sdofs, [iota] if G is None else [iota, G]))
+            _, rhs = self.boozer_penalty_constraints_vectorized(x, derivatives=1, constraint_weight=self.constraint_weight,
+                                                                optimize_G=G is not None, weight_inv_modB=res['weight_inv_modB'])
+        else:
+            x = np.concatenate((sdofs, [iota, G]))
+            r, = boozer_surface_residual(s, iota, G, self.biotsavart, derivatives=0)
+            constraints = [self.label.J()-self.targetlabel]
+            if not s.stellsym:
+                constraints.append(s.gamma()[0, 0, 2])
+            rhs = np.concatenate((r[res['mask']], constraints))
+
+        if res['PLU'] is not None:
+            P, L, U = res['PLU']
+            dx = solve_triangular(U, solve_triangular(L, P.T @ rhs, lower=True), lower=False)
+        elif res['type'] == 'ls':
+            # the Hessian of the BoozerLS objective is symmetric
+            dx = res['adjoint_solve'](rhs)
+        else:
+            dx = res['jacobian'].solve(rhs, rtol=self.options['krylov_tol'])
+
+        s.set_dofs(sdofs)
+        x = x - dx
+        if not np.all(np.isfinite(x)):
+            return sdofs, iota, G
+        if G is None:
+            return x[:-1], x[-1], None
+        return x[:-2], x[-2], x[-1]
+
     def boozer_penalty_constraints(self, x, derivatives=0, constraint_weight=1., scalarize=True, optimize_G=False, weight_inv_modB=True):
         r"""
         Define the residual
@@ -259,9 +383,15 @@ class BoozerSurface(Optimizable):
 
         s.set_dofs(sdofs)
 
-        boozer = boozer_surface_residual(s, iota, G, biotsavart, derivatives=derivatives, weight_inv_modB=weight_inv_modB)
-        # normalizing the residuals here
-        boozer = tuple([b/np.sqrt(num_res) for b in boozer])
+        if derivatives == 2:
+            # only the contraction of the Hessians of the residuals with the residuals is needed
+            r, J, rH = boozer_surface_residual_hessian_contract(s, iota, G, biotsavart, weight_inv_modB=weight_inv_modB)
+            # normalizing the residuals here
+            boozer = (r/np.sqrt(num_res), J/np.sqrt(num_res), rH/num_res)
+        else:
+            boozer = boozer_surface_residual(s, iota, G, biotsavart, derivatives=derivatives, weight_inv_modB=weight_inv_modB)
+            # normalizing the residuals here
+            boozer = tuple([b/np.sqrt(num_res) for b in boozer])
 
         r = boozer[0]
         l = self.label.J()
@@ -300,16 +430,12 @@ class BoozerSurface(Optimizable):
         if not scalarize:
             raise NotImplementedError('Can only return Hessian for scalarized version.')
 
-        H = boozer[2]
+        rH = boozer[2]
 
         d2l = np.zeros((x.shape[0], x.shape[0]))
         d2l[:nsurfdofs, :nsurfdofs] = self.label.d2J_by_dsurfacecoefficientsdsurfacecoefficients()
 
-        H = np.concatenate((
-            H,
-            np.sqrt(constraint_weight) * d2l[None, :, :],
-            np.zeros(d2l[None, :, :].shape)), axis=0)
-        d2val = J.T @ J + np.sum(r[:, None, None] * H, axis=0)
+        d2val = J.T @ J + rH + constraint_weight * rl * d2l
         return val, dval, d2val
 
     def boozer_penalty_constraints_vectorized(self, dofs, derivatives=0, constraint_weight=1., optimize_G=False, weight_inv_modB=True):
@@ -460,8 +586,10 @@ class BoozerSurface(Optimizable):
         s.set_dofs(sdofs)
         nsurfdofs = sdofs.size
 
-        boozer = boozer_surface_residual(s, iota, G, biotsavart, derivatives=derivatives+1)
-        r, J = boozer[0:2]
+        if derivatives == 0:
+            r, J = boozer_surface_residual(s, iota, G, biotsavart, derivatives=1)
+        else:
+            r, J, rH = boozer_surface_residual_hessian_contract(s, iota, G, biotsavart)
 
         dl = np.zeros((xl.shape[0]-2,))
 
@@ -479,13 +607,11 @@ class BoozerSurface(Optimizable):
         if derivatives == 0:
             return res
 
-        H = boozer[2]
-
         d2l = np.zeros((xl.shape[0]-2, xl.shape[0]-2))
         d2l[:nsurfdofs, :nsurfdofs] = self.label.d2J_by_dsurfacecoefficientsdsurfacecoefficients()
 
         dres = np.zeros((xl.shape[0], xl.shape[0]))
-        dres[:-2, :-2] = J.T @ J + np.sum(r[:, None, None] * H, axis=0) - lm[-2]*d2l
+        dres[:-2, :-2] = J.T @ J + rH - lm[-2]*d2l
         dres[:-2, -2] = -dl
         dres[:-2, -1] = -drz
 
@@ -493,6 +619,104 @@ class BoozerSurface(Optimizable):
         dres[-1, :-2] = drz
         return res, dres
 
+    def boozer_penalty_constraints_hessian_operator(self, x, constraint_weight=1., optimize_G=False, weight_inv_modB=True, krylov_maxiter=1000):
+        r"""
+        Return the Hessian of the objective of :mod:`boozer_penalty_constraints` as a
+        :obj:`scipy.sparse.linalg.LinearOperator` that computes Hessian-vector products
+        without forming the Hessian, using :obj:`~simsopt.geo.surfaceobjectives.BoozerResidualLinearization`.
+        Its ``solve(b, rtol, shift=0.)`` method solves :math:`(H + \text{shift}\, I) y = b`
+        with GMRES, preconditioned by the diagonal of the Gauss-Newton approximation of the Hessian.
+        Only the Hessian of the label is formed.
+
+        Args:
+            x (ndarray): The degrees of freedom of the Surface object, followed by the value of iota and G.
+                e.g. ``[surface.x, iota, G]`` or ``[surface.x, iota]`` if ``optimize_G=False``.
+            constraint_weight (float, Optional): The weight of the label constraint used when solving Boozer least squares.
+            optimize_G (bool, Optional): True if G is a variable in the optimization problem, False otherwise.
+            weight_inv_modB (bool, Optional): If True, weight the residual by modB so that it does not scale with coil currents. Defaults to True.
+            krylov_maxiter (int, Optional): The maximum number of GMRES iterations per solve. Defaults to 1000.
+        """
+        if optimize_G:
+            sdofs, iota, G = x[:-2], x[-2], x[-1]
+        else:
+            sdofs, iota, G = x[:-1], x[-1], None
+        nsurfdofs = sdofs.size
+        s = self.surface
+        s.set_dofs(sdofs)
+        num_res = 3 * s.quadpoints_phi.size * s.quadpoints_theta.size
+
+        lin = BoozerResidualLinearization(s, iota, G, self.biotsavart, weight_inv_modB=weight_inv_modB)
+        dl = np.zeros(x.shape)
+        drz = np.zeros(x.shape)
+        dl[:nsurfdofs] = self.label.dJ(partials=True)(s)
+        drz[:nsurfdofs] = s.dgamma_by_dcoeff()[0, 0, 2, :]
+        rl = self.label.J() - self.targetlabel
+        d2l = self.label.d2J_by_dsurfacecoefficientsdsurfacecoefficients()
+
+        def matvec(v):
+            out = (lin.vjp(lin.jvp(v), v.size) + lin.hvp(v)) / num_res
+            out += constraint_weight * (dl * (dl @ v) + drz * (drz @ v))
+            out[:nsurfdofs] += constraint_weight * rl * (d2l @ v[:nsurfdofs])
+            return out
+
+        diagonal = lin.gauss_newton_diagonal(x.size) / num_res + constraint_weight * (dl**2 + drz**2)
+        return _MatrixFreeSystem(matvec, matvec, diagonal, krylov_maxiter)
+
+    def boozer_exact_constraints_jacobian_operator(self, xl, optimize_G=True, krylov_maxiter=1000):
+        r"""
+        Return the residual of :mod:`boozer_exact_constraints` and its Jacobian as a
+        :obj:`scipy.sparse.linalg.LinearOperator` that computes Jacobian-vector products
+        without forming the Jacobian, see :mod:`boozer_penalty_constraints_hessian_operator`.
+        Its ``solve(b, rtol)`` method solves linear systems with the Jacobian with GMRES.
+
+        Args:
+            xl (ndarray): The degrees of freedom of the Surface object, followed by the value of iota and G
+                and the two Lagrange multipliers.
+            optimize_G (bool, Optional): True if G is a variable in the optimization problem, False otherwise.
+            krylov_maxiter (int, Optional): The maximum number of GMRES iterations per solve. Defaults to 1000.
+
+        Returns:
+            tuple: ``(res, dres)`` the residual and the Jacobian operator.
+        """
+        if optimize_G:
+            sdofs, iota, G = xl[:-4], xl[-4], xl[-3]
+        else:
+            sdofs, iota, G = xl[:-3], xl[-3], None
+        lm = xl[-2:]
+        nsurfdofs = sdofs.size
+        nx = xl.size - 2
+        s = self.surface
+        s.set_dofs(sdofs)
+
+        lin = BoozerResidualLinearization(s, iota, G, self.biotsavart)
+        dl = np.zeros((nx,))
+        drz = np.zeros((nx,))
+        dl[:nsurfdofs] = self.label.dJ(partials=True)(s)
+        drz[:nsurfdofs] = s.dgamma_by_dcoeff()[0, 0, 2, :]
+        d2l = self.label.d2J_by_dsurfacecoefficientsdsurfacecoefficients()
+
+        res = np.zeros(xl.shape)
+        res[:-2] = lin.vjp(lin.r, nx) - lm[-2] * dl - lm[-1] * drz
+        res[-2] = self.label.J() - self.targetlabel
+        res[-1] = s.gamma()[0, 0, 2]
+
+        def hessian(vx):
+            out = lin.vjp(lin.jvp(vx), nx) + lin.hvp(vx)
+            out[:nsurfdofs] -= lm[-2] * (d2l @ vx[:nsurfdofs])
+            return out
+
+        def matvec(v):
+            return np.concatenate((hessian(v[:-2]) - dl * v[-2] - drz * v[-1],
+                                   [dl @ v[:-2], drz @ v[:-2]]))
+
+        def rmatvec(v):
+            return np.concatenate((hessian(v[:-2]) + dl * v[-2] + drz * v[-1],
+                                   [-dl @ v[:-2], -drz @ v[:-2]]))
+
+        diagonal = np.concatenate((lin.gauss_newton_diagonal(nx), [np.linalg.norm(dl), np.linalg.norm(drz)]))
+        diagonal[:nsurfdofs] += np.abs(lm[-2] * np.diag(d2l))
+        return res, _MatrixFreeSystem(matvec, rmatvec, diagonal, krylov_maxiter)
+
     def minimize_boozer_penalty_constraints_LBFGS(self, tol=1e-3, maxiter=1000, constraint_weight=1., iota=0., G=None, vectorize=True, limited_memory=True, weight_inv_modB=True, verbose=False):
         r"""
         This function uses L-BFGS to find the surface that approximately solves
@@ -576,11 +800,18 @@ class BoozerSurface(Optimizable):
 
         return resdict
 
-    def minimize_boozer_penalty_constraints_newton(self, tol=1e-12, maxiter=10, constraint_weight=1., iota=0., G=None, stab=0., vectorize=True, weight_inv_modB=True, verbose=False):
+    def minimize_boozer_penalty_constraints_newton(self, tol=1e-12, maxiter=10, constraint_weight=1., iota=0., G=None, stab=0., vectorize=True, weight_inv_modB=True, verbose=False,
+                                                   linear_solver='direct', krylov_tol=1e-10, krylov_maxiter=1000):
         """
         This function does the same as :mod:`minimize_boozer_penalty_constraints_LBFGS`, but instead of LBFGS it uses
         Newton's method.
 
+        With ``linear_solver='gmres'``, the Hessian is not formed. Instead, the Newton steps are computed
+        with GMRES from Hessian-vector products, see :mod:`boozer_penalty_constraints_hessian_operator`, to a
+        relative accuracy that decreases with the norm of the gradient. This avoids the :math:`O(n^2)` memory and
+        :math:`O(n^3)` time of the dense solves for surfaces with many dofs. The adjoint equations of the
+        objectives depending on this surface are then solved with GMRES as well.
+
         Args:
             tol (float, Optional): The tolerance for the optimization. Defaults to 1e-12.
             maxiter (int, Optional): The maximum number of iterations for the optimization. Defaults to 10.
@@ -591,6 +822,9 @@ class BoozerSurface(Optimizable):
             vectorize (bool, Optional): If True, use the vectorized version of the residual function. Defaults to True.
             weight_inv_modB (bool, Optional): If True, weight the residual by modB so that it does not scale with coil currents. Defaults to True.
             verbose (bool, Optional): If True, print the optimization progress. Defaults to False.
+            linear_solver (str, Optional): ``'direct'`` for dense linear solves, or ``'gmres'`` for matrix-free solves. Defaults to ``'direct'``.
+            krylov_tol (float, Optional): The smallest relative tolerance of the GMRES solves, which is used for the adjoint solves. Defaults to 1e-10.
+            krylov_maxiter (int, Optional): The maximum number of GMRES iterations per linear solve. Defaults to 1000.
         
         Returns:
             dict: A dictionary containing the results of the optimization. The dictionary contains the following keys in addition
@@ -598,18 +832,22 @@ class BoozerSurface(Optimizable):
 
                 - 'residual': the value of the residual at the solution
                 - 'jacobian': the value of the Jacobian at the solution
-                - 'hessian': the value of the Hessian at the solution
+                - 'hessian': the value of the Hessian at the solution, as a linear operator if ``linear_solver='gmres'``
                 - 'iter': the number of iterations taken to converge
                 - 'success': True if the optimization converged, False otherwise
                 - 'G': the value of G on the surface
                 - 'iota': the value of iota on the surface
-                - 'PLU': the LU decomposition of the hessian
+                - 'PLU': the LU decomposition of the hessian, or None if ``linear_solver='gmres'``
+                - 'adjoint_solve': if ``linear_solver='gmres'``, a function solving linear systems with the hessian
                 - 'type': 'ls'.
                 - 'weight_inv_modB': the value of weight_inv_modB used in the optimization
         """
         if not self.need_to_run_code:
             return self.res
 
+        if linear_solver not in ['direct', 'gmres']:
+            raise ValueError(f"Unknown linear solver {linear_solver}")
+
         s = self.surface
         if G is None:
             x = np.concatenate((s.get_dofs(), [iota]))
@@ -618,28 +856,45 @@ class BoozerSurface(Optimizable):
         i = 0
 
         fun_name = self.boozer_penalty_constraints_vectorized if vectorize else self.boozer_penalty_constraints
-        val, dval, d2val = fun_name(x, derivatives=2, constraint_weight=constraint_weight, optimize_G=G is not None, weight_inv_modB=weight_inv_modB)
+
+        def evaluate(x):
+            if linear_solver == 'direct':
+                return fun_name(x, derivatives=2, constraint_weight=constraint_weight, optimize_G=G is not None, weight_inv_modB=weight_inv_modB)
+            val, dval = fun_name(x, derivatives=1, constraint_weight=constraint_weight, optimize_G=G is not None, weight_inv_modB=weight_inv_modB)
+            d2val = self.boozer_penalty_constraints_hessian_operator(x, constraint_weight=constraint_weight, optimize_G=G is not None,
+                                                                     weight_inv_modB=weight_inv_modB, krylov_maxiter=krylov_maxiter)
+            return val, dval, d2val
+
+        val, dval, d2val = evaluate(x)
 
         norm = np.linalg.norm(dval)
         while i < maxiter and norm > tol:
-            d2val += stab*np.identity(d2val.shape[0])
-            dx = np.linalg.solve(d2val, dval)
-            if norm < 1e-9:
-                dx += np.linalg.solve(d2val, dval - d2val@dx)
+            if linear_solver == 'gmres':
+                # inexact Newton: the linear solves get more accurate as the gradient decreases
+                dx = d2val.solve(dval, rtol=max(min(0.1, norm), krylov_tol), shift=stab)
+            else:
+                d2val += stab*np.identity(d2val.shape[0])
+                dx = np.linalg.solve(d2val, dval)
+                if norm < 1e-9:
+                    dx += np.linalg.solve(d2val, dval - d2val@dx)
             x = x - dx
-            val, dval, d2val = fun_name(x, derivatives=2, constraint_weight=constraint_weight, optimize_G=G is not None, weight_inv_modB=weight_inv_modB)
+            val, dval, d2val = evaluate(x)
             norm = np.linalg.norm(dval)
             i = i+1
 
         r = self.boozer_penalty_constraints(
             x, derivatives=0, constraint_weight=constraint_weight, scalarize=False, optimize_G=G is not None, weight_inv_modB=weight_inv_modB)
 
-        P, L, U = lu(d2val)
         res = {
             "residual": r, "jacobian": dval, "hessian": d2val, "iter": i, "success": norm <= tol, "G": None,
-            "PLU": (P, L, U), "vjp": partial(boozer_surface_dlsqgrad_dcoils_vjp, weight_inv_modB=weight_inv_modB),
+            "vjp": partial(boozer_surface_dlsqgrad_dcoils_vjp, weight_inv_modB=weight_inv_modB),
             "type": "ls", "weight_inv_modB": weight_inv_modB
         }
+        if linear_solver == 'gmres':
+            res['PLU'] = None
+            res['adjoint_solve'] = partial(d2val.solve, rtol=krylov_tol)
+        else:
+            res['PLU'] = lu(d2val)
         if G is None:
             s.set_dofs(x[:-1])
             iota = x[-1]
@@ -751,7 +1006,8 @@ class BoozerSurface(Optimizable):
         self.need_to_run_code = False
         return resdict
 
-    def minimize_boozer_exact_constraints_newton(self, tol=1e-12, maxiter=10, iota=0., G=None, lm=[0., 0.]):
+    def minimize_boozer_exact_constraints_newton(self, tol=1e-12, maxiter=10, iota=0., G=None, lm=[0., 0.],
+                                                 linear_solver='direct', krylov_tol=1e-10, krylov_maxiter=1000):
         r"""
         This function solves the constrained optimization problem
 
@@ -771,19 +1027,25 @@ class BoozerSurface(Optimizable):
         The final constraint is not necessary for stellarator symmetric surfaces as it is automatically
         satisfied by the stellarator symmetric surface parametrization.
 
+        With ``linear_solver='gmres'``, the Newton steps are computed matrix-free with GMRES, see
+        :mod:`boozer_exact_constraints_jacobian_operator`.
+
         Args:
             tol (float, Optional): The tolerance for the optimization. Defaults to 1e-12.
             maxiter (int, Optional): The maximum number of iterations for the optimization. Defaults to 10.
             iota (float, Optional): The initial guess for the value of the rotational transform on the surface. Defaults to 0.
             G (float, Optional): The initial guess for the value of G on the surface. Defaults to None.
             lm (list, Optional): The initial guesses for the Lagrange multipliers. Defaults to [0., 0.].
+            linear_solver (str, Optional): ``'direct'`` for dense linear solves, or ``'gmres'`` for matrix-free solves. Defaults to ``'direct'``.
+            krylov_tol (float, Optional): The smallest relative tolerance of the GMRES solves. Defaults to 1e-10.
+            krylov_maxiter (int, Optional): The maximum number of GMRES iterations per linear solve. Defaults to 1000.
 
         Returns:
             dict: A dictionary containing the results of the optimization. The dictionary contains the following keys in addition
             to others:
 
                 - 'residual': the value of the residual at the solution
-                - 'jacobian': the value of the jacobian at the solution
+                - 'jacobian': the value of the jacobian at the solution, as a linear operator if ``linear_solver='gmres'``
                 - 'iter': the number of iterations taken to converge
                 - 'success': True if the optimization converged, False otherwise
                 - 'G': the value of G on the surface
@@ -793,16 +1055,35 @@ class BoozerSurface(Optimizable):
         if not self.need_to_run_code:
             return self.res
 
+        if linear_solver not in ['direct', 'gmres']:
+            raise ValueError(f"Unknown linear solver {linear_solver}")
+
         s = self.surface
         if G is not None:
             xl = np.concatenate((s.get_dofs(), [iota, G], lm))
         else:
             xl = np.concatenate((s.get_dofs(), [iota], lm))
-        val, dval = self.boozer_exact_constraints(xl, derivatives=1, optimize_G=G is not None)
+
+        def evaluate(xl):
+            if linear_solver == 'direct':
+                return self.boozer_exact_constraints(xl, derivatives=1, optimize_G=G is not None)
+            return self.boozer_exact_constraints_jacobian_operator(xl, optimize_G=G is not None, krylov_maxiter=krylov_maxiter)
+
+        val, dval = evaluate(xl)
         norm = np.linalg.norm(val)
         i = 0
         while i < maxiter and norm > tol:
-            if s.stellsym:
+            if linear_solver == 'gmres':
+                rtol = max(min(0.1, norm), krylov_tol)
+                if s.stellsym:
+                    # drop the constraint z(0, 0) = 0 and its Lagrange multiplier
+                    A = _MatrixFreeSystem(lambda v: dval.matvec(np.append(v, 0.))[:-1],
+                                          lambda v: dval.rmatvec(np.append(v, 0.))[:-1],
+                                          dval.diagonal[:-1], krylov_maxiter)
+                    xl[:-1] = xl[:-1] - A.solve(val[:-1], rtol=rtol)
+                else:
+                    xl = xl - dval.solve(val, rtol=rtol)
+            elif s.stellsym:
                 A = dval[:-1, :-1]
                 b = val[:-1]
                 dx = np.linalg.solve(A, b)
@@ -814,7 +1095,7 @@ class BoozerSurface(Optimizable):
                 if norm < 1e-9:  # iterative refinement for higher accuracy. TODO: cache LU factorisation
                     dx += np.linalg.solve(dval, val-dval@dx)
                 xl = xl - dx
-            val, dval = self.boozer_exact_constraints(xl, derivatives=1, optimize_G=G is not None)
+            val, dval = evaluate(xl)
             norm = np.linalg.norm(val)
             i = i + 1
 
@@ -841,7 +1122,8 @@ class BoozerSurface(Optimizable):
         self.need_to_run_code = False
         return res
 
-    def solve_residual_equation_exactly_newton(self, tol=1e-10, maxiter=10, iota=0., G=None, verbose=False):
+    def solve_residual_equation_exactly_newton(self, tol=1e-10, maxiter=10, iota=0., G=None, verbose=False,
+                                               linear_solver='direct', krylov_tol=1e-10, krylov_maxiter=1000):
         """
         The function implements the BoozerExact approach by solving residual equation exactly using Newtons 
         method.  
@@ -910,25 +1192,34 @@ class BoozerSurface(Optimizable):
         which is the same as the number of surface dofs + 2 extra unknowns
         given by iota and G.
 
+        With ``linear_solver='gmres'``, the Jacobian is not formed and the Newton steps are computed
+        with GMRES from Jacobian-vector products, see
+        :obj:`~simsopt.geo.surfaceobjectives.BoozerResidualLinearization`. The adjoint equations of
+        the objectives depending on this surface are then solved with GMRES as well.
+
         Args:
             tol (float, Optional): The tolerance for the optimization. Defaults to 1e-10.
             maxiter (int, Optional): The maximum number of iterations for the optimization. Defaults to 10.
             iota (float, Optional): The initial guess for the value of the rotational transform on the surface. Defaults to 0.
             G (float, Optional): The initial guess for the value of G on the surface. Defaults to None.
             verbose (bool, Optional): If True, print the optimization progress. Defaults to False.
+            linear_solver (str, Optional): ``'direct'`` for dense linear solves, or ``'gmres'`` for matrix-free solves. Defaults to ``'direct'``.
+            krylov_tol (float, Optional): The smallest relative tolerance of the GMRES solves, which is used for the adjoint solves. Defaults to 1e-10.
+            krylov_maxiter (int, Optional): The maximum number of GMRES iterations per linear solve. Defaults to 1000.
         
         Returns:
             dict: A dictionary containing the results of the optimization. The dictionary contains the following keys in addition
             to others:
 
                 - 'residual': the value of the residual at the solution
-                - 'jacobian': the value of the jacobian at the solution
+                - 'jacobian': the value of the jacobian at the solution, as a linear operator if ``linear_solver='gmres'``
                 - 'iter': the number of iterations taken to converge
                 - 'success': True if the optimization converged, False otherwise
                 - 'G': the value of G on the surface
                 - 's': the surface object
                 - 'iota': the value of iota on the surface
-                - 'PLU': the LU decomposition of the jacobian
+                - 'PLU': the LU decomposition of the jacobian, or None if ``linear_solver='gmres'``
+                - 'adjoint_solve': if ``linear_solver='gmres'``, a function solving linear systems with the transposed jacobian
                 - 'mask': a mask for the residuals that are not used in the optimization
                 - 'type': 'exact'.
                 - 'vjp': the vector-Jacobian product for the optimization
@@ -936,6 +1227,9 @@ class BoozerSurface(Optimizable):
         if not self.need_to_run_code:
             return self.res
 
+        if linear_solver not in ['direct', 'gmres']:
+            raise ValueError(f"Unknown linear solver {linear_solver}")
+
         from simsopt.geo.surfacexyztensorfourier import SurfaceXYZTensorFourier
         s = self.surface
         if not isinstance(s, SurfaceXYZTensorFourier):
@@ -958,6 +1252,9 @@ class BoozerSurface(Optimizable):
         if G is None:
             G = 2. * np.pi * np.sum(np.abs([c.current.get_value() for c in self.biotsavart.coils])) * (4 * np.pi * 10**(-7) / (2 * np.pi))
         x = np.concatenate((s.get_dofs(), [iota, G]))
+        if linear_solver == 'gmres':
+            return self._solve_residual_equation_exactly_krylov(x, mask, tol, maxiter, krylov_tol, krylov_maxiter, verbose)
+
         i = 0
         r, J = boozer_surface_residual(s, iota, G, self.biotsavart, derivatives=1)
         norm = 1e6
@@ -1013,3 +1310,182 @@ class BoozerSurface(Optimizable):
         self.res = res
         self.need_to_run_code = False
         return res
+
+    def _solve_residual_equation_exactly_krylov(self, x, mask, tol, maxiter, krylov_tol, krylov_maxiter, verbose):
+        """
+        Matrix-free version of :mod:`solve_residual_equation_exactly_newton`, starting from
+        ``x = [surface dofs, iota, G]``, in which the Newton steps are computed with GMRES.
+        """
+        s = self.surface
+        label = self.label
+        nmask = np.count_nonzero(mask)
+
+        def linearize(x):
+            s.set_dofs(x[:-2])
+            lin = BoozerResidualLinearization(s, x[-2], x[-1], self.biotsavart, second_derivatives=False)
+            dl = np.concatenate((label.dJ(partials=True)(s), [0., 0.]))
+            constraints = [label.J()-self.targetlabel]
+            drows = [dl]
+            if not s.stellsym:
+                constraints.append(s.gamma()[0, 0, 2])
+                drows.append(np.concatenate((s.dgamma_by_dcoeff()[0, 0, 2, :], [0., 0.])))
+            drows = np.asarray(drows)
+            b = np.concatenate((lin.r[mask], constraints))
+
+            def matvec(v):
+                return np.concatenate((lin.jvp(v)[mask], drows @ v))
+
+            def rmatvec(u):
+                umask = np.zeros(mask.shape)
+                umask[mask] = u[:nmask]
+                return lin.vjp(umask) + drows.T @ u[nmask:]
+
+            diagonal = np.sqrt(lin.gauss_newton_diagonal(mask=mask) + np.sum(drows**2, axis=0))
+            return lin.r, b, _MatrixFreeSystem(matvec, rmatvec, diagonal, krylov_maxiter)
+
+        i = 0
+        r, b, J = linearize(x)
+        norm = np.linalg.norm(b)
+        while i < maxiter and norm > tol:
+            x = x - J.solve(b, rtol=max(min(0.1, norm), krylov_tol))
+            i += 1
+            r, b, J = linearize(x)
+            norm = np.linalg.norm(b)
+
+        iota, G = x[-2], x[-1]
+        res = {
+            "residual": r, "jacobian": J, "iter": i, "success": norm <= tol, "G": G, "s": s, "iota": iota, "PLU": None,
+            "adjoint_solve": partial(J.solve, rtol=krylov_tol, transpose=True),
+            "mask": mask, 'type': 'exact', "vjp": boozer_surface_dexactresidual_dcoils_dcurrents_vjp
+        }
+
+        if verbose:
+            print(f"NEWTON-KRYLOV solve - {res['success']}  iter={res['iter']}, iota={res['iota']:.16f}, ||residual||_inf = {np.linalg.norm(res['residual'], ord=np.inf):.3e}", flush=True)
+
+        self.res = res
+        self.need_to_run_code = False
+        return res
+
+
+class BoozerSurfaceGroup:
+    r"""
+    Solves the Boozer problems of several :obj:`BoozerSurface` objects, e.g. the nested surfaces of a
+    single stage coil optimization, concurrently and with warm starts.
+
+    Calling :mod:`run_code` solves all the surfaces whose coils changed since their last solve. Each surface
+    starts from the first-order prediction of :mod:`BoozerSurface.predict_solution` instead of its previous
+    solution, which reduces the number of iterations after small coil updates. If a solve started from the
+    prediction fails, it is restarted from the last converged solution of that surface.
+
+    The surfaces are solved by a pool of ``workers`` threads. Each surface must then have its own
+    :obj:`~simsopt.field.BiotSavart` object, since the evaluation points are set on it. With an MPI
+    communicator, every rank only solves its share of the surfaces, split in the same way as
+    :obj:`~simsopt.objectives.MPIObjective` splits the objectives, so that the objectives of the
+    local surfaces, e.g. :obj:`~simsopt.geo.NonQuasiSymmetricRatio` or :obj:`~simsopt.geo.Iotas`, can be
+    summed with :obj:`~simsopt.objectives.MPIObjective`. The objectives use the solutions computed by
+    :mod:`run_code` and do not solve the Boozer problems again.
+
+    Usage::
+
+        group = BoozerSurfaceGroup(boozer_surfaces, workers=4)
+        JF = sum(NonQuasiSymmetricRatio(bs, BiotSavart(coils)) for bs in boozer_surfaces)
+
+        def fun(dofs):
+            JF.x = dofs
+            group.run_code()
+            return JF.J(), JF.dJ()
+
+    Args:
+        boozer_surfaces (list): List of :obj:`BoozerSurface` objects.
+        workers (int, Optional): Number of threads solving the surfaces. Defaults to 1.
+        comm (MPI.Comm, Optional): MPI communicator over which the surfaces are split. Defaults to None.
+        warm_start (bool, Optional): If True, start the solves from the first-order predictions of the
+            solutions. Defaults to True.
+    """
+
+    def __init__(self, boozer_surfaces, workers=1, comm=None, warm_start=True):
+        from simsopt._core.util import parallel_loop_bounds
+        self.boozer_surfaces = list(boozer_surfaces)
+        self.workers = workers
+        self.comm = comm
+        self.warm_start = warm_start
+        startidx, endidx = parallel_loop_bounds(comm, len(self.boozer_surfaces))
+        self.local_boozer_surfaces = self.boozer_surfaces[startidx:endidx]
+        if workers > 1 and len({id(b.biotsavart) for b in self.local_boozer_surfaces}) < len(self.local_boozer_surfaces):
+            raise ValueError("The surfaces need separate BiotSavart objects to be solved by several threads")
+        # the last converged surface dofs, iota and G of each surface
+        self._converged = [None] * len(self.local_boozer_surfaces)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the pool of threads, if any.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _solve(self, idx, iota, G):
+        boozer_surface = self.local_boozer_surfaces[idx]
+        s = boozer_surface.surface
+        has_solution = hasattr(boozer_surface, 'res')
+        if has_solution:
+            converged = (s.get_dofs(), boozer_surface.res['iota'], boozer_surface.res['G'])
+            if self.warm_start:
+                sdofs, iota, G = boozer_surface.predict_solution()
+                s.set_dofs(sdofs)
+            else:
+                _, iota, G = converged
+        res = boozer_surface.run_code(iota, G=G)
+
+        if not res['success'] and has_solution and self.warm_start:
+            # restart from the previous solution
+            sdofs, iota, G = self._converged[idx] if self._converged[idx] is not None else converged
+            s.set_dofs(sdofs)
+            boozer_surface.need_to_run_code = True
+            res = boozer_surface.run_code(iota, G=G)
+        if res['success']:
+            self._converged[idx] = (s.get_dofs(), res['iota'], res['G'])
+        return res
+
+    def run_code(self, iotas=None, Gs=None):
+        """
+        Solve the Boozer problems of the local surfaces that need to be recomputed.
+
+        Args:
+            iotas (list, Optional): Guesses for the rotational transforms on all the surfaces. These are only
+                used for surfaces that have not been solved yet.
+            Gs (list, Optional): Guesses for G on all the surfaces, only used for surfaces that have not
+                been solved yet. A None entry means that G is not a degree of freedom of that surface.
+
+        Returns:
+            list: The result dictionaries of the local surfaces.
+        """
+        from simsopt._core.util import parallel_loop_bounds
+        startidx, _ = parallel_loop_bounds(self.comm, len(self.boozer_surfaces))
+        todo = []
+        for idx, boozer_surface in enumerate(self.local_boozer_surfaces):
+            if not boozer_surface.need_to_run_code:
+                continue
+            if not hasattr(boozer_surface, 'res') and iotas is None:
+                raise ValueError("Initial guesses for iota are needed for surfaces that have not been solved yet")
+            iota = None if iotas is None else iotas[startidx + idx]
+            G = None if Gs is None else Gs[startidx + idx]
+            todo.append((idx, iota, G))
+
+        if self.workers > 1 and len(todo) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            futures = [self._pool.submit(self._solve, *args) for args in todo]
+            for future in futures:
+                future.result()
+        else:
+            for args in todo:
+                self._solve(*args)
+        return [boozer_surface.res for boozer_surface in self.local_boozer_surfaces]
@@ -35,6 +35,24 @@ class GaussianSampler(GSONable):
 
     the sum is used to make the kernel periodic and in practice the infinite sum is truncated.
 
+    Two methods are available for drawing samples. For ``method="ldl"`` the
+    covariance matrix of the process and its derivatives at all points is
+    assembled and factorized densely, which costs :math:`O(n^3)` time and
+    :math:`O(n^2)` memory. For ``method="spectral"`` we use that the kernel is
+    stationary and periodic, so that the process can be written as a Fourier
+    series with independent coefficients
+
+    .. math::
+
+        X(t) = \sqrt{c_0} a_0 + \sum_{m=1}^{M} \sqrt{2 c_m} (a_m \cos(2\pi m t) + b_m \sin(2\pi m t)),
+        \quad c_m = \sigma^2 \sqrt{\pi} l \exp(-\pi^2 l^2 m^2),
+
+    where :math:`a_m, b_m` are independent standard normal variables and
+    :math:`M` is chosen such that the neglected :math:`c_m` are below machine
+    precision. The process and its derivatives are then evaluated with an
+    FFT in :math:`O(n \log n)`. The spectral method requires the points to be
+    uniformly spaced over one period, i.e. ``points[j] = points[0] + j/n``.
+
     Args:
         points: the quadrature points along which the perturbation should be computed.
         sigma: standard deviation of the underlying gaussian process
@@ -42,14 +60,25 @@ class GaussianSampler(GSONable):
         length_scale: length scale of the underlying gaussian process
                       (measure for the smoothness of the perturbation).
         n_derivs: number of derivatives of the gaussian process to sample.
+        method: either ``"ldl"`` (dense factorization of the covariance matrix)
+                or ``"spectral"`` (FFT based sampling on uniform points).
     """
 
     points: RealArray
     sigma: float
     length_scale: float
     n_derivs: int = 1
+    method: str = "ldl"
 
     def __post_init__(self):
+        if self.method == "spectral":
+            self._init_spectral()
+        elif self.method == "ldl":
+            self._init_ldl()
+        else:
+            raise ValueError(f"Unknown method {self.method}. Use 'ldl' or 'spectral'.")
+
+    def _init_ldl(self):
         xs = self.points
         n = len(xs)
         cov_mat = np.zeros((n*(self.n_derivs+1), n*(self.n_derivs+1)))
@@ -78,18 +107,65 @@ class GaussianSampler(GSONable):
         lu, d, _ = ldl(cov_mat)
         self.L = lu @ np.sqrt(np.maximum(d, 0))
 
+    def _init_spectral(self):
+        xs = np.asarray(self.points)
+        n = len(xs)
+        if not np.allclose(np.diff(xs), 1./n, rtol=0, atol=1e-12):
+            raise ValueError("The spectral method requires points that are uniformly spaced over one period.")
+        l = self.length_scale
+        # Fourier coefficients of the periodised kernel. Modes with c_m/c_0 below
+        # eps^2 do not contribute to the sample in double precision.
+        nmodes = int(np.ceil(np.sqrt(-np.log(np.finfo(float).eps**2))/(np.pi*l)))
+        ms = np.arange(nmodes+1)
+        c = (self.sigma**2) * np.sqrt(np.pi) * l * np.exp(-(np.pi*l*ms)**2)
+        # If the points are too coarse to resolve all modes, we evaluate the
+        # series on a refined grid and then restrict to the original points.
+        self._refine = max(1, int(np.ceil((2*nmodes+1)/n)))
+        self._nfine = n * self._refine
+        weights = np.sqrt(c/2) * self._nfine
+        weights[0] = np.sqrt(c[0]) * self._nfine
+        shift = np.exp(2j*np.pi*ms*xs[0])
+        self._spectral_weights = np.stack([weights * shift * (2j*np.pi*ms)**k for k in range(self.n_derivs+1)])
+        self.L = None
+
+    def _spectral_samples(self, z):
+        # z has shape (..., 2*nmodes+1, 3) and contains independent standard
+        # normal random variables for the cosine and sine coefficients.
+        nmodes = self._spectral_weights.shape[1] - 1
+        coeffs = np.zeros(z.shape[:-2] + (nmodes+1, 3), dtype=complex)
+        coeffs[..., 0, :] = z[..., 0, :]
+        coeffs[..., 1:, :] = z[..., 1:nmodes+1, :] - 1j * z[..., nmodes+1:, :]
+        coeffs = self._spectral_weights[:, :, None] * coeffs[..., None, :, :]
+        vals = np.fft.irfft(coeffs, n=self._nfine, axis=-2)
+        return vals[..., ::self._refine, :]
+
     def draw_sample(self, randomgen=None):
         """
         Returns a list of ``n_derivs+1`` arrays of size ``(len(points), 3)``, containing the
         perturbation and the derivatives.
         """
+        return self.draw_samples(1, randomgen=randomgen)[0]
+
+    def draw_samples(self, nsamples, randomgen=None):
+        """
+        Draws ``nsamples`` independent samples at once. Returns a list of length
+        ``nsamples``, where each entry has the same format as the output of
+        :meth:`draw_sample`. Drawing the samples in one batch produces the same
+        samples as ``nsamples`` consecutive calls to :meth:`draw_sample` with
+        the same random generator, but is considerably faster.
+        """
         n = len(self.points)
         n_derivs = self.n_derivs
         if randomgen is None:
             randomgen = np.random.Generator(np.random.PCG64DXSM())
-        z = randomgen.standard_normal(size=(n*(n_derivs+1), 3))
+        if self.method == "spectral":
+            nmodes = self._spectral_weights.shape[1] - 1
+            z = randomgen.standard_normal(size=(nsamples, 2*nmodes+1, 3))
+            curve_and_derivs = self._spectral_samples(z)
+            return [[curve_and_derivs[j, i] for i in range(n_derivs+1)] for j in range(nsamples)]
+        z = randomgen.standard_normal(size=(nsamples, n*(n_derivs+1), 3))
         curve_and_derivs = self.L@z
-        return [curve_and_derivs[(i*n):((i+1)*n), :] for i in range(n_derivs+1)]
+        return [[curve_and_derivs[j, (i*n):((i+1)*n), :] for i in range(n_derivs+1)] for j in range(nsamples)]
 
 
 class PerturbationSample(GSONable):
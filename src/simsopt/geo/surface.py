@@ -1,4 +1,6 @@
 import abc
+import logging
+from inspect import getfullargspec
 
 import numpy as np
 from scipy import interpolate
@@ -24,7 +26,10 @@ from .._core.dev import SimsoptRequires
 from .plotting import fix_matplotlib_3d
 from .._core.json import GSONable
 
-__all__ = ['Surface', 'signed_distance_from_surface', 'SurfaceClassifier', 'SurfaceScaled', 'best_nphi_over_ntheta']
+logger = logging.getLogger(__name__)
+
+__all__ = ['Surface', 'signed_distance_from_surface', 'SurfaceClassifier', 'SurfaceScaled', 'best_nphi_over_ntheta',
+           'surface_with_quadpoints', 'select_quadrature_resolution']
 
 
 class Surface(Optimizable):
@@ -673,45 +678,53 @@ class Surface(Optimizable):
 
     def dmean_cross_sectional_area_by_dcoeff(self):
         """
-        Return the derivative of the mean cross sectional area wrt surface coefficients
+        Return the derivative of the mean cross sectional area wrt surface coefficients.
+        The partial derivatives of the integrand wrt ``gamma``, ``gammadash1``
+        and ``gammadash2`` are contracted with the surface derivatives via
+        vector-Jacobian products, so the ``(nphi, ntheta, 3, ndofs)`` arrays
+        are never formed.
         """
 
         g = self.gamma()
         g1 = self.gammadash1()
         g2 = self.gammadash2()
 
-        dg_ds = self.dgamma_by_dcoeff()
-        dg1_ds = self.dgammadash1_by_dcoeff()
-        dg2_ds = self.dgammadash2_by_dcoeff()
-
-        x = g[:, :, 0, None]
-        y = g[:, :, 1, None]
+        x = g[:, :, 0]
+        y = g[:, :, 1]
+        r = np.sqrt(x**2+y**2)
 
-        dx_ds = dg_ds[:, :, 0, :]
-        dy_ds = dg_ds[:, :, 1, :]
+        xvarphi = g1[:, :, 0]
+        yvarphi = g1[:, :, 1]
+        zvarphi = g1[:, :, 2]
 
-        r = np.sqrt(x**2+y**2)
-        dr_ds = (x*dx_ds+y*dy_ds)/r
+        xtheta = g2[:, :, 0]
+        ytheta = g2[:, :, 1]
+        ztheta = g2[:, :, 2]
 
-        xvarphi = g1[:, :, 0, None]
-        yvarphi = g1[:, :, 1, None]
-        zvarphi = g1[:, :, 2, None]
+        P = x*yvarphi-y*xvarphi
+        Q = x*ytheta-y*xtheta
+        f = (ztheta*P-zvarphi*Q)/r
+        mean_area = np.mean(f)/(2.*np.pi)
 
-        xtheta = g2[:, :, 0, None]
-        ytheta = g2[:, :, 1, None]
-        ztheta = g2[:, :, 2, None]
+        v = np.zeros(g.shape)
+        v[:, :, 0] = (ztheta*yvarphi-zvarphi*ytheta)/r - f*x/r**2
+        v[:, :, 1] = (zvarphi*xtheta-ztheta*xvarphi)/r - f*y/r**2
 
-        dxvarphi_ds = dg1_ds[:, :, 0, :]
-        dyvarphi_ds = dg1_ds[:, :, 1, :]
-        dzvarphi_ds = dg1_ds[:, :, 2, :]
+        v1 = np.zeros(g1.shape)
+        v1[:, :, 0] = -ztheta*y/r
+        v1[:, :, 1] = ztheta*x/r
+        v1[:, :, 2] = -Q/r
 
-        dxtheta_ds = dg2_ds[:, :, 0, :]
-        dytheta_ds = dg2_ds[:, :, 1, :]
-        dztheta_ds = dg2_ds[:, :, 2, :]
+        v2 = np.zeros(g2.shape)
+        v2[:, :, 0] = zvarphi*y/r
+        v2[:, :, 1] = -zvarphi*x/r
+        v2[:, :, 2] = P/r
 
-        mean_area = np.mean((1/r) * (ztheta*(x*yvarphi-y*xvarphi)-zvarphi*(x*ytheta-y*xtheta)))/(2.*np.pi)
-        dmean_area_ds = np.mean((1/(r**2))*((xvarphi * y * ztheta - xtheta * y * zvarphi + x * (-yvarphi * ztheta + ytheta * zvarphi)) * dr_ds + r * (-zvarphi * (ytheta * dx_ds - y * dxtheta_ds - xtheta * dy_ds + x * dytheta_ds) + ztheta * (yvarphi * dx_ds - y * dxvarphi_ds - xvarphi * dy_ds + x * dyvarphi_ds) + (-xvarphi * y + x * yvarphi) * dztheta_ds + (xtheta * y - x * ytheta) * dzvarphi_ds)), axis=(0, 1))
-        return np.sign(mean_area) * dmean_area_ds/(2*np.pi)
+        scale = np.sign(mean_area)/(2*np.pi*x.size)
+        dmean_area_ds = self.dgamma_by_dcoeff_vjp(scale*v) \
+            + self.dgammadash1_by_dcoeff_vjp(scale*v1) \
+            + self.dgammadash2_by_dcoeff_vjp(scale*v2)
+        return dmean_area_ds
 
     def d2mean_cross_sectional_area_by_dcoeff_dcoeff(self):
         """
@@ -1063,3 +1076,124 @@ def best_nphi_over_ntheta(surf):
     gammadash2 = np.linalg.norm(surf.gammadash2(), axis=2)
     ratio = gammadash1 / gammadash2
     return np.sqrt(np.max(ratio) / np.max(1 / ratio))
+
+
+def surface_with_quadpoints(surface, quadpoints_phi, quadpoints_theta):
+    r"""
+    Return a surface of the same type as ``surface``, evaluated on different
+    quadrature points. The new surface shares the degrees of freedom of
+    ``surface``, so it follows the original surface during an optimization.
+
+    The remaining constructor arguments are read from the attributes of
+    ``surface`` with the same names.
+
+    Args:
+        surface: A surface object.
+        quadpoints_phi: The quadrature points in :math:`\phi` of the new surface.
+        quadpoints_theta: The quadrature points in :math:`\theta` of the new surface.
+    """
+    args = getfullargspec(surface.__class__.__init__).args[1:]
+    if 'dofs' not in args:
+        raise TypeError(f"{surface.__class__.__name__} can not be constructed from existing dofs.")
+    kwargs = {arg: getattr(surface, arg) for arg in args if hasattr(surface, arg)}
+    kwargs['quadpoints_phi'] = np.asarray(quadpoints_phi)
+    kwargs['quadpoints_theta'] = np.asarray(quadpoints_theta)
+    kwargs['dofs'] = surface.dofs
+    return surface.__class__(**kwargs)
+
+
+def select_quadrature_resolution(surface, integral, tol=1e-6, nphi=None, ntheta=None,
+                                 range=None, refine_phi=True, refine_theta=True,
+                                 growth=1.5, max_nphi=1024, max_ntheta=1024):
+    r"""
+    Select the cheapest quadrature grid on which a surface integral is
+    converged to a relative tolerance ``tol``.
+
+    Starting from ``nphi x ntheta`` points, the integral is evaluated with
+    the number of points in ``phi`` and in ``theta`` increased by the factor
+    ``growth``. Each direction in which the relative change of the integral
+    exceeds ``tol`` is refined, and this is repeated until neither
+    refinement changes the integral by more than ``tol``. Since the change
+    upon refinement estimates the quadrature error, the grid that is
+    returned is the coarsest one visited that meets the tolerance.
+
+    The integrand is given by a callable ``integral`` that takes a surface
+    (created with :func:`surface_with_quadpoints`, so it has the same
+    shape and degrees of freedom as ``surface``) and returns a float, e.g.::
+
+        def integral(surf):
+            bs.set_points(surf.gamma().reshape((-1, 3)))
+            Bn = np.sum(bs.B().reshape(surf.gamma().shape) * surf.unitnormal(), axis=2)
+            return np.mean(Bn**2 * np.linalg.norm(surf.normal(), axis=2))
+
+    Args:
+        surface: A surface object.
+        integral: Callable evaluating the integral on a given surface.
+        tol: Relative tolerance for the change of the integral.
+        nphi: Initial number of grid points in ``phi``. By default, this is
+          chosen from ``ntheta`` using :func:`best_nphi_over_ntheta`.
+        ntheta: Initial number of grid points in ``theta``. Defaults to
+          ``2*mpol+1``, but at least 8.
+        range: Toroidal extent of the grid, see :meth:`Surface.get_quadpoints`.
+          Defaults to the range deduced from the quadrature points of ``surface``.
+        refine_phi: Whether the resolution in ``phi`` may be increased. If
+          ``False``, the quadrature points in ``phi`` of ``surface`` are used.
+        refine_theta: Whether the resolution in ``theta`` may be increased. If
+          ``False``, the quadrature points in ``theta`` of ``surface`` are used.
+        growth: Factor by which the number of grid points is increased.
+        max_nphi: Maximum number of grid points in ``phi``.
+        max_ntheta: Maximum number of grid points in ``theta``.
+
+    Returns:
+        Tuple ``(nphi, ntheta)``.
+    """
+    if growth <= 1:
+        raise ValueError("growth needs to be larger than 1.")
+    if range is None:
+        range = surface.deduced_range
+    if not refine_theta:
+        ntheta = len(surface.quadpoints_theta)
+    elif ntheta is None:
+        ntheta = max(8, 2*getattr(surface, 'mpol', 0)+1)
+    if not refine_phi:
+        nphi = len(surface.quadpoints_phi)
+    elif nphi is None:
+        nphi_full = best_nphi_over_ntheta(surface) * ntheta
+        if range == Surface.RANGE_FIELD_PERIOD:
+            nphi_full /= surface.nfp
+        elif range == Surface.RANGE_HALF_PERIOD:
+            nphi_full /= 2*surface.nfp
+        nphi = max(4, int(np.ceil(nphi_full)))
+
+    values = {}
+
+    def evaluate(nphi, ntheta):
+        if (nphi, ntheta) not in values:
+            if refine_phi:
+                quadpoints_phi = Surface.get_phi_quadpoints(nphi=nphi, range=range, nfp=surface.nfp)
+            else:
+                quadpoints_phi = surface.quadpoints_phi
+            if refine_theta:
+                quadpoints_theta = Surface.get_theta_quadpoints(ntheta=ntheta)
+            else:
+                quadpoints_theta = surface.quadpoints_theta
+            values[(nphi, ntheta)] = integral(surface_with_quadpoints(surface, quadpoints_phi, quadpoints_theta))
+        return values[(nphi, ntheta)]
+
+    def grow(n):
+        return int(np.ceil(growth*n))
+
+    while True:
+        value = evaluate(nphi, ntheta)
+        scale = tol*max(abs(value), np.finfo(float).tiny)
+        more_phi = refine_phi and grow(nphi) <= max_nphi and abs(evaluate(grow(nphi), ntheta) - value) > scale
+        more_theta = refine_theta and grow(ntheta) <= max_ntheta and abs(evaluate(nphi, grow(ntheta)) - value) > scale
+        if not (more_phi or more_theta):
+            break
+        nphi = grow(nphi) if more_phi else nphi
+        ntheta = grow(ntheta) if more_theta else ntheta
+
+    if (refine_phi and grow(nphi) > max_nphi) or (refine_theta and grow(ntheta) > max_ntheta):
+        logger.warning(f"Reached the maximum resolution nphi={nphi}, ntheta={ntheta}; "
+                       "the integral may not be converged.")
+    return nphi, ntheta
@@ -4,7 +4,7 @@ import simsoptpp as sopp
 from .._core.optimizable import Optimizable
 from .._core.derivative import Derivative, derivative_dec
 from .._core.types import RealArray
-from .surface import Surface
+from .surface import Surface, select_quadrature_resolution, surface_with_quadpoints
 from .surfacexyztensorfourier import SurfaceXYZTensorFourier
 from ..objectives.utilities import forward_backward
 
@@ -234,18 +234,21 @@ class ToroidalFlux(Optimizable):
         """
         Calculate the partial derivatives with respect to the surface coefficients.
         """
-        ntheta = self.surface.gamma().shape[1]
+        gamma = self.surface.gamma()
+        ntheta = gamma.shape[1]
         dA_by_dX = self.biotsavart.dA_by_dX()
         A = self.biotsavart.A()
         dgammadash2 = self.surface.gammadash2()[self.idx, :]
-        dgammadash2_by_dc = self.surface.dgammadash2_by_dcoeff()[self.idx, :]
 
-        dx_dc = self.surface.dgamma_by_dcoeff()[self.idx]
-        dA_dc = np.sum(dA_by_dX[..., :, None] * dx_dc[..., None, :], axis=1)
-        term1 = np.sum(dA_dc * dgammadash2[..., None], axis=(0, 1))
-        term2 = np.sum(A[..., None] * dgammadash2_by_dc, axis=(0, 1))
+        # only the cross section at idx contributes, so the vectors that are
+        # contracted with the surface derivatives vanish everywhere else
+        v_gamma = np.zeros(gamma.shape)
+        v_gamma[self.idx] = np.einsum('kjl,kl->kj', dA_by_dX, dgammadash2)/ntheta
+        v_gammadash2 = np.zeros(gamma.shape)
+        v_gammadash2[self.idx] = A/ntheta
 
-        out = (term1+term2)/ntheta
+        out = self.surface.dgamma_by_dcoeff_vjp(v_gamma) \
+            + self.surface.dgammadash2_by_dcoeff_vjp(v_gammadash2)
         return out
 
     def d2J_by_dsurfacecoefficientsdsurfacecoefficients(self):
@@ -269,6 +272,38 @@ class ToroidalFlux(Optimizable):
         out = (1/ntheta) * np.sum(term1+term2+term3, axis=0)
         return out
 
+    def adapt_resolution(self, tol=1e-8, **kwargs):
+        """
+        Choose the number of quadrature points in ``theta`` such that the
+        toroidal flux is converged to a relative tolerance ``tol``, using
+        :func:`~simsopt.geo.surface.select_quadrature_resolution`. The
+        cross section at which the flux is computed is kept. As the geometry
+        changes during an optimization, this can be called again, e.g. from a
+        callback of the optimizer.
+
+        Args:
+            tol: Relative tolerance for the toroidal flux.
+            kwargs: Further arguments passed to
+              :func:`~simsopt.geo.surface.select_quadrature_resolution`.
+
+        Returns:
+            The selected number of quadrature points in ``theta``.
+        """
+        def integral(surf):
+            self.biotsavart.set_points(surf.gamma()[self.idx])
+            return np.sum(self.biotsavart.A() * surf.gammadash2()[self.idx])/len(surf.quadpoints_theta)
+
+        _, ntheta = select_quadrature_resolution(self.surface, integral, tol=tol, refine_phi=False, **kwargs)
+        surface = surface_with_quadpoints(self.surface, self.surface.quadpoints_phi,
+                                          Surface.get_theta_quadpoints(ntheta))
+        self.remove_parent(self.surface)
+        self.surface = surface
+        self.append_parent(surface)
+        if self.ntheta is not None:
+            self.ntheta = ntheta
+        self.invalidate_cache()
+        return ntheta
+
     def dJ_by_dcoils(self):
         """
         Calculate the partial derivatives with respect to the coil coefficients.
@@ -323,17 +358,16 @@ class PrincipalCurvature(Optimizable):
         k2 = curvature[:, :, 3]  # smaller
         normal = self.surface.normal()
         norm_normal = np.sqrt(normal[:, :, 0]**2 + normal[:, :, 1]**2 + normal[:, :, 2]**2)
-        dcurvature_dc = self.surface.dsurface_curvatures_by_dcoeff()
-        dk1_dc = dcurvature_dc[:, :, 2, :]
-        dk2_dc = dcurvature_dc[:, :, 3, :]
-        dnormal_dc = self.surface.dnormal_by_dcoeff()
-        dnorm_normal_dc = normal[:, :, 0, None]*dnormal_dc[:, :, 0, :]/norm_normal[:, :, None] + \
-            normal[:, :, 1, None]*dnormal_dc[:, :, 1, :]/norm_normal[:, :, None] + \
-            normal[:, :, 2, None]*dnormal_dc[:, :, 2, :]/norm_normal[:, :, None]
-        deriv = np.sum(dnorm_normal_dc * np.exp(-(k1[:, :, None] - self.kappamax1)/self.weight1), axis=(0, 1)) + \
-            np.sum(norm_normal[:, :, None] * np.exp(-(k1[:, :, None] - self.kappamax1)/self.weight1) * (- dk1_dc/self.weight1), axis=(0, 1)) + \
-            np.sum(dnorm_normal_dc * np.exp(-(-k2[:, :, None] - self.kappamax2)/self.weight2), axis=(0, 1)) + \
-            np.sum(norm_normal[:, :, None] * np.exp(-(-k2[:, :, None] - self.kappamax2)/self.weight2) * (dk2_dc/self.weight2), axis=(0, 1))
+        e1 = np.exp(-(k1 - self.kappamax1)/self.weight1)
+        e2 = np.exp(-(-k2 - self.kappamax2)/self.weight2)
+
+        dJ_dcurvature = np.zeros(curvature.shape)
+        dJ_dcurvature[:, :, 2] = -norm_normal * e1/self.weight1
+        dJ_dcurvature[:, :, 3] = norm_normal * e2/self.weight2
+        dJ_dnormal = (e1 + e2)[:, :, None] * normal/norm_normal[:, :, None]
+
+        deriv = self.surface.dsurface_curvatures_by_dcoeff_vjp(dJ_dcurvature) \
+            + self.surface.dnormal_by_dcoeff_vjp(dJ_dnormal)
         return Derivative({self.surface: deriv})
 
 
@@ -411,6 +445,13 @@ def boozer_surface_residual(surface, iota, G, biotsavart, derivatives=0, weight_
     nsurfdofs = dx_dc.shape[-1]
 
     dB_by_dX = biotsavart.dB_by_dX().reshape((nphi, ntheta, 3, 3))
+    if derivatives == 1:
+        # the fused kernel avoids the (nphi, ntheta, 3, nsurfdofs) temporaries below
+        _, J = sopp.boozer_residual_jacobian(G, iota, B, dB_by_dX, xphi, xtheta, dx_dc, dxphi_dc, dxtheta_dc, weight_inv_modB)
+        if not user_provided_G:
+            J = J[:, :-1]
+        return r, J
+
     dB_dc = np.einsum('ijkl,ijkm->ijlm', dB_by_dX, dx_dc)
 
     # dresidual_dc = G*dB_dc - 2*np.sum(B[..., None]*dB_dc, axis=2)[:, :, None, :] * tang[..., None] - B2[..., None, None] * (dxphi_dc + iota * dxtheta_dc)
@@ -443,9 +484,6 @@ def boozer_surface_residual(surface, iota, G, biotsavart, derivatives=0, weight_
     else:
         J = np.concatenate((drtil_dc_flattened, drtil_diota_flattened), axis=1)
 
-    if derivatives == 1:
-        return r, J
-
     d2B_by_dXdX = biotsavart.d2B_by_dXdX().reshape((nphi, ntheta, 3, 3, 3))
     d2B_dcdc = np.einsum('ijkpl,ijpn,ijkm->ijlmn', d2B_by_dXdX, dx_dc, dx_dc, optimize=True)
     dB2_dc = 2. * np.einsum('ijl,ijlm->ijm', B, dB_dc, optimize=True)
@@ -514,6 +552,265 @@ def boozer_surface_residual(surface, iota, G, biotsavart, derivatives=0, weight_
     return r, J, H
 
 
+def boozer_surface_residual_hessian_contract(surface, iota, G, biotsavart, u=None, weight_inv_modB=False):
+    r"""
+    For a given surface, this function computes the residual of :obj:`boozer_surface_residual`,
+    its Jacobian, and the contraction
+
+    .. math::
+        \sum_i u_i \nabla^2 r_i
+
+    of the Hessians of the residuals with respect to the surface dofs, iota and G with the
+    weights :math:`u_i`. The Hessians are not formed, so that the memory required scales with
+    the square of the number of surface dofs instead of the number of quadrature points times
+    the square of the number of surface dofs.
+
+    Args:
+        surface: The surface to use for the computation
+        iota: the surface rotational transform
+        G: a constant that is a function of the coil currents in vacuum field
+        biotsavart: the Biot-Savart magnetic field
+        u: the weights of the residuals. Defaults to the residuals themselves, i.e. the contraction
+            is the second order term of the Hessian of :math:`\frac{1}{2}\|\mathbf r\|^2`.
+        weight_inv_modB: whether to weight the residual by :math:`1/|\mathbf B|`
+
+    Returns:
+        the residual, its Jacobian and the contraction of the Hessians of the residuals with ``u``.
+    """
+    user_provided_G = G is not None
+    if not user_provided_G:
+        G = 2. * np.pi * np.sum([np.abs(c.current.get_value()) for c in biotsavart.coils]) * (4 * np.pi * 10**(-7) / (2 * np.pi))
+
+    x = surface.gamma()
+    xphi = surface.gammadash1()
+    xtheta = surface.gammadash2()
+    nphi = x.shape[0]
+    ntheta = x.shape[1]
+    dx_dc = surface.dgamma_by_dcoeff()
+    dxphi_dc = surface.dgammadash1_by_dcoeff()
+    dxtheta_dc = surface.dgammadash2_by_dcoeff()
+
+    biotsavart.set_points(x.reshape((-1, 3)))
+    biotsavart.compute(2)
+    B = biotsavart.B().reshape((nphi, ntheta, 3))
+    dB_by_dX = biotsavart.dB_by_dX().reshape((nphi, ntheta, 3, 3))
+    d2B_by_dXdX = biotsavart.d2B_by_dXdX().reshape((nphi, ntheta, 3, 3, 3))
+
+    r, J = sopp.boozer_residual_jacobian(G, iota, B, dB_by_dX, xphi, xtheta, dx_dc, dxphi_dc, dxtheta_dc, weight_inv_modB)
+    u = r if u is None else u
+    Hu = sopp.boozer_residual_hessian_contract(G, iota, B, dB_by_dX, d2B_by_dXdX, xphi, xtheta, dx_dc, dxphi_dc, dxtheta_dc,
+                                               np.ascontiguousarray(u).reshape((nphi, ntheta, 3)), weight_inv_modB)
+    if not user_provided_G:
+        J = J[:, :-1]
+        Hu = Hu[:-1, :-1]
+    return r, J, Hu
+
+
+class BoozerResidualLinearization:
+    r"""
+    Matrix-free linearization of the Boozer residual :math:`\mathbf r` computed by
+    :obj:`boozer_surface_residual` about the current surface, :math:`\iota` and :math:`G`.
+
+    Rather than forming the Jacobian :math:`J` and the Hessians :math:`\nabla^2 r_i` of the
+    residual with respect to :math:`x = [\text{surface dofs}, \iota, G]`, this class computes
+    the products :math:`J v`, :math:`J^T u` and :math:`\sum_i u_i \nabla^2 r_i v` from the
+    magnetic field and its spatial derivatives at the quadrature points. Each product costs
+    :math:`O(N n)` operations for :math:`N` quadrature points and :math:`n` surface dofs,
+    whereas forming the Hessian of the residual costs :math:`O(N n^2)`. The surface is
+    assumed to depend linearly on its dofs, which is the case for
+    :obj:`~simsopt.geo.SurfaceXYZFourier` and :obj:`~simsopt.geo.SurfaceXYZTensorFourier`.
+
+    The vectors :math:`v` passed to the methods below and the vectors returned by them have
+    size ``n+2`` if they include a derivative with respect to :math:`G`, or ``n+1`` otherwise.
+    The quantities needed are copied at construction, so the linearization remains valid
+    if the surface or the evaluation points of ``biotsavart`` change afterwards.
+
+    Args:
+        surface: The surface to use for the computation
+        iota: the surface rotational transform
+        G: a constant that is a function of the coil currents in vacuum field. If ``None``,
+           the value used by :obj:`boozer_surface_residual` is used.
+        biotsavart: the Biot-Savart magnetic field
+        weight_inv_modB: whether or not to weight the residual by :math:`1/\|\mathbf B\|`.
+        second_derivatives: whether the second derivatives of the field are needed, i.e.
+           whether :meth:`hvp` and :meth:`dlsqgrad_dcoils_vjp` will be called.
+    """
+
+    def __init__(self, surface, iota, G, biotsavart, weight_inv_modB=False, second_derivatives=True):
+        if G is None:
+            G = 2. * np.pi * np.sum([np.abs(c.current.get_value()) for c in biotsavart.coils]) * (4 * np.pi * 10**(-7) / (2 * np.pi))
+        self.iota = iota
+        self.G = G
+        self.weight_inv_modB = weight_inv_modB
+
+        self.xyz = surface.gamma().reshape((-1, 3)).copy()
+        self.xphi = surface.gammadash1().reshape((-1, 3)).copy()
+        self.xtheta = surface.gammadash2().reshape((-1, 3)).copy()
+        self.nsurfdofs = surface.dgamma_by_dcoeff().shape[-1]
+        self.dx_dc = surface.dgamma_by_dcoeff().reshape((-1, self.nsurfdofs))
+        self.dxphi_dc = surface.dgammadash1_by_dcoeff().reshape((-1, self.nsurfdofs))
+        self.dxtheta_dc = surface.dgammadash2_by_dcoeff().reshape((-1, self.nsurfdofs))
+
+        biotsavart.set_points(self.xyz)
+        self.B = biotsavart.B().copy()
+        self.dB = biotsavart.dB_by_dX().copy()
+        self.d2B = biotsavart.d2B_by_dXdX().copy() if second_derivatives else None
+
+        B = self.B
+        self.tang = self.xphi + iota * self.xtheta
+        self.B2 = np.sum(B**2, axis=1)
+        self.res = G * B - self.B2[:, None] * self.tang
+        if weight_inv_modB:
+            self.modB = np.sqrt(self.B2)
+            self.w = 1. / self.modB
+        else:
+            self.w = np.ones(self.B2.shape)
+        # derivative of the residual with respect to B, and minus the derivative
+        # with respect to the tangent xphi + iota * xtheta
+        self.dr_dB = self._gB_matrix()
+        self.c = self.w * self.B2
+        self.r = (self.w[:, None] * self.res).reshape((-1,))
+
+    def _gB_matrix(self):
+        B, w, tang = self.B, self.w, self.tang
+        dr_dB = self.G * w[:, None, None] * np.eye(3)[None, :, :] \
+            - 2 * w[:, None, None] * tang[:, :, None] * B[:, None, :]
+        if self.weight_inv_modB:
+            dr_dB -= self.res[:, :, None] * B[:, None, :] / self.modB[:, None, None]**3
+        return dr_dB
+
+    def _directions(self, v):
+        vs = v[:self.nsurfdofs]
+        viota = v[self.nsurfdofs]
+        vG = v[self.nsurfdofs+1] if v.size == self.nsurfdofs + 2 else 0.
+        dx = (self.dx_dc @ vs).reshape((-1, 3))
+        dxtheta = (self.dxtheta_dc @ vs).reshape((-1, 3))
+        dtang = (self.dxphi_dc @ vs).reshape((-1, 3)) + self.iota * dxtheta + viota * self.xtheta
+        dB = np.einsum('pkl,pk->pl', self.dB, dx)
+        return dx, dxtheta, dtang, dB, viota, vG
+
+    def _pullback(self, gx, gtang, dgiota, dgG, size):
+        # map derivatives with respect to x, the tangent, iota and G at the quadrature
+        # points to derivatives with respect to the dofs
+        out = np.zeros((size,))
+        gtang = gtang.reshape((-1,))
+        out[:self.nsurfdofs] = gx.reshape((-1,)) @ self.dx_dc + gtang @ self.dxphi_dc \
+            + self.iota * (gtang @ self.dxtheta_dc)
+        out[self.nsurfdofs] = dgiota
+        if size == self.nsurfdofs + 2:
+            out[-1] = dgG
+        return out
+
+    def jvp(self, v):
+        r"""
+        Return the Jacobian-vector product :math:`J v`.
+        """
+        dx, dxtheta, dtang, dB, viota, vG = self._directions(v)
+        dr = np.einsum('pab,pb->pa', self.dr_dB, dB) - self.c[:, None] * dtang + vG * self.w[:, None] * self.B
+        return dr.reshape((-1,))
+
+    def vjp(self, u, size=None):
+        r"""
+        Return the vector-Jacobian product :math:`J^T u`, of size ``size``, which
+        defaults to ``n+2``.
+        """
+        size = self.nsurfdofs + 2 if size is None else size
+        u = u.reshape((-1, 3))
+        gB = np.einsum('pab,pa->pb', self.dr_dB, u)
+        gx = np.einsum('pkl,pl->pk', self.dB, gB)
+        gtang = -self.c[:, None] * u
+        return self._pullback(gx, gtang, np.sum(gtang * self.xtheta),
+                              np.sum(self.w * np.sum(u * self.B, axis=1)), size)
+
+    def _dgB(self, u, dB, dtang, vG):
+        # directional derivative of gB = dr_dB^T u and of c for a fixed u
+        B, w, G, tang = self.B, self.w, self.G, self.tang
+        BdB = np.sum(B * dB, axis=1)
+        ut = np.sum(u * tang, axis=1)
+        udt = np.sum(u * dtang, axis=1)
+        dgB = w[:, None] * (vG * u - 2 * udt[:, None] * B - 2 * ut[:, None] * dB)
+        if self.weight_inv_modB:
+            modB = self.modB
+            dmodB = BdB / modB
+            dw = -dmodB / modB**2
+            ures = np.sum(u * self.res, axis=1)
+            dres = vG * B + G * dB - 2 * BdB[:, None] * tang - self.B2[:, None] * dtang
+            dures = np.sum(u * dres, axis=1)
+            dgB += dw[:, None] * (G * u - 2 * ut[:, None] * B) \
+                - (dures / modB**3)[:, None] * B \
+                - (ures / modB**3)[:, None] * dB \
+                + (3 * ures * dmodB / modB**4)[:, None] * B
+            dc = dmodB
+        else:
+            dw = np.zeros(w.shape)
+            dc = 2 * BdB
+        dgG = np.sum(dw * np.sum(u * B, axis=1) + w * np.sum(u * dB, axis=1))
+        return dgB, dc, dgG
+
+    def hvp(self, v, u=None):
+        r"""
+        Return :math:`\sum_i u_i \nabla^2 r_i v`, where :math:`u` defaults to the residual
+        :math:`\mathbf r`, so that :math:`J^T J v + ` ``hvp(v)`` is the product of the
+        Hessian of :math:`\frac{1}{2}\mathbf r^T \mathbf r` with :math:`v`.
+        """
+        u = (self.r if u is None else u).reshape((-1, 3))
+        dx, dxtheta, dtang, dB, viota, vG = self._directions(v)
+        gB = np.einsum('pab,pa->pb', self.dr_dB, u)
+        dgB, dc, dgG = self._dgB(u, dB, dtang, vG)
+        ddB = np.einsum('pjkl,pj->pkl', self.d2B, dx)
+        dgx = np.einsum('pkl,pl->pk', ddB, gB) + np.einsum('pkl,pl->pk', self.dB, dgB)
+        gtang = -self.c[:, None] * u
+        dgtang = -dc[:, None] * u
+        # the derivative of the tangent with respect to xtheta depends on iota
+        dgx_theta = viota * gtang
+        out = self._pullback(dgx, dgtang, np.sum(dgtang * self.xtheta) + np.sum(gtang * dxtheta), dgG, v.size)
+        out[:self.nsurfdofs] += dgx_theta.reshape((-1,)) @ self.dxtheta_dc
+        return out
+
+    def gauss_newton_diagonal(self, size=None, mask=None, chunk=256):
+        r"""
+        Return the diagonal of :math:`J^T J`, i.e. the squared norms of the columns of the
+        Jacobian, of size ``size``, which defaults to ``n+2``. If ``mask`` is given, only
+        the residuals for which ``mask`` is ``True`` are included. The Jacobian is formed in
+        chunks of ``chunk`` quadrature points at a time.
+        """
+        size = self.nsurfdofs + 2 if size is None else size
+        n = self.nsurfdofs
+        npoints = self.B.shape[0]
+        mask = np.ones((npoints, 3), dtype=bool) if mask is None else mask.reshape((npoints, 3))
+        dr_dx = np.einsum('pab,pkb->pak', self.dr_dB, self.dB)
+        dx_dc = self.dx_dc.reshape((npoints, 3, n))
+        dxphi_dc = self.dxphi_dc.reshape((npoints, 3, n))
+        dxtheta_dc = self.dxtheta_dc.reshape((npoints, 3, n))
+        out = np.zeros((size,))
+        for start in range(0, npoints, chunk):
+            sl = slice(start, start + chunk)
+            J = np.einsum('pak,pkn->pan', dr_dx[sl], dx_dc[sl]) \
+                - self.c[sl, None, None] * (dxphi_dc[sl] + self.iota * dxtheta_dc[sl])
+            out[:n] += np.sum(J**2 * mask[sl, :, None], axis=(0, 1))
+        out[n] = np.sum(mask * (self.c[:, None] * self.xtheta)**2)
+        if size == n + 2:
+            out[-1] = np.sum(mask * (self.w[:, None] * self.B)**2)
+        return out
+
+    def dlsqgrad_dcoils_vjp(self, lm, biotsavart):
+        r"""
+        Return the vector-Jacobian product of :math:`\lambda` with the derivative of the
+        gradient :math:`J^T\mathbf r` with respect to the coil dofs, see
+        :obj:`boozer_surface_dlsqgrad_dcoils_vjp`.
+        """
+        r = self.r.reshape((-1, 3))
+        dx, dxtheta, dtang, dB, viota, vG = self._directions(lm)
+        Jlm = self.jvp(lm).reshape((-1, 3))
+        gB = np.einsum('pab,pa->pb', self.dr_dB, r)
+        v1 = np.einsum('pab,pa->pb', self.dr_dB, Jlm)
+        v2 = self._dgB(r, dB, dtang, vG)[0]
+        v3 = dx[:, :, None] * gB[:, None, :]
+        biotsavart.set_points(self.xyz)
+        dres_dcoils = biotsavart.B_and_dB_vjp(v1 + v2, v3)
+        return dres_dcoils[0] + dres_dcoils[1]
+
+
 def parameter_derivatives(surface: Surface,
                           shape_gradient: RealArray
                           ) -> RealArray:
@@ -665,14 +962,10 @@ class MajorRadius(Optimizable):
         booz_surf = self.boozer_surface
         iota = booz_surf.res['iota']
         G = booz_surf.res['G']
-        P, L, U = booz_surf.res['PLU']
         dconstraint_dcoils_vjp = self.boozer_surface.res['vjp']
 
-        # tack on dJ_diota = dJ_dG = 0 to the end of dJ_ds
-        dJ_ds = np.zeros(L.shape[0])
-        dj_ds = surface.dmajor_radius_by_dcoeff()
-        dJ_ds[:dj_ds.size] = dj_ds
-        adj = forward_backward(P, L, U, dJ_ds)
+        # dJ_diota = dJ_dG = 0
+        adj = _boozer_adjoint_solve(booz_surf, surface.dmajor_radius_by_dcoeff())
 
         adj_times_dg_dcoil = dconstraint_dcoils_vjp(adj, booz_surf, iota, G)
         self._dJ = -1 * adj_times_dg_dcoil
@@ -775,17 +1068,13 @@ class NonQuasiSymmetricRatio(Optimizable):
         booz_surf = self.boozer_surface
         iota = booz_surf.res['iota']
         G = booz_surf.res['G']
-        P, L, U = booz_surf.res['PLU']
         dconstraint_dcoils_vjp = self.boozer_surface.res['vjp']
 
         dJ_by_dB = self.dJ_by_dB().reshape((-1, 3))
         dJ_by_dcoils = self.biotsavart.B_vjp(dJ_by_dB)
 
-        # tack on dJ_diota = dJ_dG = 0 to the end of dJ_ds
-        dJ_ds = np.zeros(L.shape[0])
-        dj_ds = self.dJ_by_dsurfacecoefficients()
-        dJ_ds[:dj_ds.size] = dj_ds
-        adj = forward_backward(P, L, U, dJ_ds)
+        # dJ_diota = dJ_dG = 0
+        adj = _boozer_adjoint_solve(booz_surf, self.dJ_by_dsurfacecoefficients())
 
         adj_times_dg_dcoil = dconstraint_dcoils_vjp(adj, booz_surf, iota, G)
         self._dJ = dJ_by_dcoils-adj_times_dg_dcoil
@@ -917,18 +1206,10 @@ class Iotas(Optimizable):
         booz_surf = self.boozer_surface
         iota = booz_surf.res['iota']
         G = booz_surf.res['G']
-        P, L, U = booz_surf.res['PLU']
         dconstraint_dcoils_vjp = self.boozer_surface.res['vjp']
 
-        dJ_ds = np.zeros(L.shape[0])
-        if G is not None:
-            # tack on dJ_diota = 1, and  dJ_dG = 0 to the end of dJ_ds
-            dJ_ds[-2] = 1.
-        else:
-            # tack on dJ_diota = 1 to the end of dJ_ds
-            dJ_ds[-1] = 1.
-
-        adj = forward_backward(P, L, U, dJ_ds)
+        # dJ_ds = 0, dJ_diota = 1, and dJ_dG = 0
+        adj = _boozer_adjoint_solve(booz_surf, np.zeros((0,)), dJ_diota=1.)
 
         adj_times_dg_dcoil = dconstraint_dcoils_vjp(adj, booz_surf, iota, G)
         self._dJ = -1.*adj_times_dg_dcoil
@@ -1010,7 +1291,6 @@ class BoozerResidual(Optimizable):
         self._J = 0.5*np.sum(rtil**2)
 
         booz_surf = self.boozer_surface
-        P, L, U = booz_surf.res['PLU']
         dconstraint_dcoils_vjp = booz_surf.res['vjp']
 
         dJ_by_dB = self.dJ_by_dB()
@@ -1023,7 +1303,7 @@ class BoozerResidual(Optimizable):
         Jtil = np.concatenate((J/np.sqrt(num_points), np.sqrt(self.constraint_weight) * dl[None, :]), axis=0)
         dJ_ds = Jtil.T@rtil
 
-        adj = forward_backward(P, L, U, dJ_ds)
+        adj = _boozer_adjoint_solve(booz_surf, dJ_ds)
 
         adj_times_dg_dcoil = dconstraint_dcoils_vjp(adj, booz_surf, iota, G)
         self._dJ = dJ_by_dcoils - adj_times_dg_dcoil
@@ -1038,14 +1318,27 @@ class BoozerResidual(Optimizable):
         nphi = self.surface.quadpoints_phi.size
         ntheta = self.surface.quadpoints_theta.size
         num_points = 3 * nphi * ntheta
-        r, r_dB = boozer_surface_residual_dB(surface, self.boozer_surface.res['iota'], self.boozer_surface.res['G'], self.biotsavart, derivatives=0, weight_inv_modB=res['weight_inv_modB'])
+        _, dJ_by_dB = boozer_surface_residual_dB_vjp(surface, res['iota'], res['G'], self.biotsavart, weight_inv_modB=res['weight_inv_modB'])
+        return dJ_by_dB / num_points
 
-        r /= np.sqrt(num_points)
-        r_dB /= np.sqrt(num_points)
 
-        dJ_by_dB = r[:, None]*r_dB
-        dJ_by_dB = np.sum(dJ_by_dB.reshape((-1, 3, 3)), axis=1)
-        return dJ_by_dB
+def _boozer_adjoint_solve(booz_surf, dJ_ds, dJ_diota=0.):
+    """
+    Solve the adjoint equation of the last solve of ``booz_surf`` for the
+    derivatives ``dJ_ds`` of an objective with respect to the surface dofs and
+    ``dJ_diota`` with respect to iota; the derivatives with respect to the
+    remaining unknowns are zero. The LU factorization ``booz_surf.res['PLU']``
+    is used if available, otherwise the matrix-free
+    ``booz_surf.res['adjoint_solve']``.
+    """
+    res = booz_surf.res
+    rhs = np.zeros(booz_surf.surface.get_dofs().size + (1 if res['G'] is None else 2))
+    rhs[:dJ_ds.size] = dJ_ds
+    rhs[-1 if res['G'] is None else -2] += dJ_diota
+    if res.get('PLU') is not None:
+        P, L, U = res['PLU']
+        return forward_backward(P, L, U, rhs)
+    return res['adjoint_solve'](rhs)
 
 
 def boozer_surface_dexactresidual_dcoils_dcurrents_vjp(lm, booz_surf, iota, G):
@@ -1071,15 +1364,11 @@ def boozer_surface_dexactresidual_dcoils_dcurrents_vjp(lm, booz_surf, iota, G):
     # G must be provided here
     assert G is not None
 
-    res, dres_dB = boozer_surface_residual_dB(surface, iota, G, biotsavart)
-    dres_dB = dres_dB.reshape((-1, 3, 3))
-
     lm_label = lm[-1]
     lmask = np.zeros(booz_surf.res["mask"].shape)
     lmask[booz_surf.res["mask"]] = lm[:-1]
-    lm_cons = lmask.reshape((-1, 3))
 
-    lm_times_dres_dB = np.sum(lm_cons[:, :, None] * dres_dB, axis=1).reshape((-1, 3))
+    _, lm_times_dres_dB = boozer_surface_residual_dB_vjp(surface, iota, G, biotsavart, lmask)
     lm_times_dres_dcoils = biotsavart.B_vjp(lm_times_dres_dB)
     lm_times_dlabel_dcoils = lm_label*booz_surf.label.dJ(partials=True)(biotsavart, as_derivative=True)
 
@@ -1095,6 +1384,10 @@ def boozer_surface_dlsqgrad_dcoils_vjp(lm, booz_surf, iota, G, weight_inv_modB=T
 
     G is known for exact boozer surfaces, so if G=None is passed, then that
     value is used instead.
+
+    The product is computed matrix-free using :obj:`BoozerResidualLinearization`,
+    i.e. without forming the derivatives of the residual with respect to the
+    surface dofs.
     """
 
     surface = booz_surf.surface
@@ -1102,19 +1395,10 @@ def boozer_surface_dlsqgrad_dcoils_vjp(lm, booz_surf, iota, G, weight_inv_modB=T
     nphi = surface.quadpoints_phi.size
     ntheta = surface.quadpoints_theta.size
     num_points = 3 * nphi * ntheta
-    # r, dr_dB, J, d2residual_dsurfacedB, d2residual_dsurfacedgradB
-    boozer = boozer_surface_residual_dB(surface, iota, G, biotsavart, derivatives=1, weight_inv_modB=weight_inv_modB)
-    r = boozer[0]/np.sqrt(num_points)
-    dr_dB = boozer[1].reshape((-1, 3, 3))/np.sqrt(num_points)
-    dr_ds = boozer[2]/np.sqrt(num_points)
-    d2r_dsdB = boozer[3]/np.sqrt(num_points)
-    d2r_dsdgradB = boozer[4]/np.sqrt(num_points)
-
-    v1 = np.sum(np.sum(lm[:, None]*dr_ds.T, axis=0).reshape((-1, 3, 1)) * dr_dB, axis=1)
-    v2 = np.sum(r.reshape((-1, 3, 1))*np.sum(lm[None, None, :]*d2r_dsdB, axis=-1).reshape((-1, 3, 3)), axis=1)
-    v3 = np.sum(r.reshape((-1, 3, 1, 1))*np.sum(lm[None, None, None, :]*d2r_dsdgradB, axis=-1).reshape((-1, 3, 3, 3)), axis=1)
-    dres_dcoils = biotsavart.B_and_dB_vjp(v1+v2, v3)
-    return dres_dcoils[0]+dres_dcoils[1]
+    lin = BoozerResidualLinearization(surface, iota, G, biotsavart, weight_inv_modB=weight_inv_modB,
+                                      second_derivatives=False)
+    # the residuals are normalized by sqrt(num_points)
+    return lin.dlsqgrad_dcoils_vjp(lm / num_points, biotsavart)
 
 
 def boozer_surface_residual_dB(surface, iota, G, biotsavart, derivatives=0, weight_inv_modB=False):
@@ -1250,3 +1534,48 @@ def boozer_surface_residual_dB(surface, iota, G, biotsavart, derivatives=0, weig
 
     if derivatives == 1:
         return rtil_flattened, drtil_dB_flattened, J, d2rtil_dsurfacedB, d2rtil_dsurfacedgradB
+
+
+def boozer_surface_residual_dB_vjp(surface, iota, G, biotsavart, u=None, weight_inv_modB=False):
+    r"""
+    For a given surface, this function computes the residual of :obj:`boozer_surface_residual`
+    and the vector-Jacobian product
+
+    .. math::
+        \sum_i u_i \frac{\partial r_i}{\partial \mathbf B}
+
+    with respect to the magnetic field at the quadrature points, without forming the
+    derivatives of the residual returned by :obj:`boozer_surface_residual_dB`.
+
+    Args:
+        surface: The surface to use for the computation
+        iota: the surface rotational transform
+        G: a constant that is a function of the coil currents in vacuum field. If ``None``,
+            the value corresponding to the coil currents is used.
+        biotsavart: the Biot-Savart magnetic field
+        u: the vector of size ``3*nphi*ntheta`` in the product. Defaults to the residual.
+        weight_inv_modB: whether to weight the residual by :math:`1/|\mathbf B|`
+
+    Returns:
+        the residual and the vector-Jacobian product, of shape ``(nphi*ntheta, 3)``.
+    """
+    if G is None:
+        G = 2. * np.pi * np.sum(np.abs([c.current.get_value() for c in biotsavart.coils])) * (4 * np.pi * 10**(-7) / (2 * np.pi))
+
+    x = surface.gamma()
+    xphi = surface.gammadash1()
+    xtheta = surface.gammadash2()
+    nphi = x.shape[0]
+    ntheta = x.shape[1]
+
+    biotsavart.set_points(x.reshape((-1, 3)))
+    B = biotsavart.B().reshape((nphi, ntheta, 3))
+    B2 = np.sum(B**2, axis=2)
+    residual = G*B - B2[..., None] * (xphi + iota * xtheta)
+    if weight_inv_modB:
+        residual *= 1./np.sqrt(B2)[..., None]
+    r = residual.reshape((-1,))
+
+    u = r if u is None else u
+    vjp = sopp.boozer_residual_dB_vjp(G, iota, B, xphi, xtheta, np.ascontiguousarray(u).reshape((nphi, ntheta, 3)), weight_inv_modB)
+    return r, vjp.reshape((-1, 3))
@@ -2,6 +2,7 @@
 Implementation of the ToroidalWireframe class and associated functions
 """
 import numpy as np
+import scipy.sparse
 import collections
 from simsopt.geo.surfacerzfourier import SurfaceRZFourier
 from .._core.dev import SimsoptRequires
@@ -323,7 +324,8 @@ class ToroidalWireframe(object):
 
         where ``x`` is the array of currents in each segment,
         ``matrix_row`` is a 1d array of coefficients for each segment, and
-        ``constant`` is the constant appearing on the right-hand side
+        ``constant`` is the constant appearing on the right-hand side.
+        The row is stored internally as a sparse matrix.
 
         Parameters
         ----------
@@ -331,7 +333,7 @@ class ToroidalWireframe(object):
                 Unique name for the constraint
             constraint_type: string
                 Type of constraint 
-            matrix_row: 1d double array
+            matrix_row: 1d double array or scipy.sparse matrix
                 Array of coefficients as described above
             constant: double
                 Constant on the right-hand side of the equation above
@@ -340,9 +342,15 @@ class ToroidalWireframe(object):
         if name in self.constraints.keys():
             raise ValueError('Constraint %s already exists' % (name))
 
-        if matrix_row.size != self.n_segments:
+        if scipy.sparse.issparse(matrix_row):
+            n_elements = np.prod(matrix_row.shape)
+        else:
+            matrix_row = np.asarray(matrix_row)
+            n_elements = matrix_row.size
+        if n_elements != self.n_segments:
             raise ValueError('matrix_row must have one element for every '
                              + 'segment in the wireframe')
+        matrix_row = scipy.sparse.csr_matrix(matrix_row.reshape((1, -1)))
 
         self.constraints[name] = \
             {'type': constraint_type,
@@ -354,6 +362,17 @@ class ToroidalWireframe(object):
             if ctype == 'segment' or ctype == 'implicit_segment':
                 self.implicits_updated = False
 
+    def _sparse_matrix_row(self, indices, values):
+        """
+        Returns a sparse 1-by-n_segments constraint row with the given values
+        in the columns of the given segment indices.
+        """
+        indices = np.atleast_1d(indices)
+        values = np.asarray(values, dtype=float) * np.ones(len(indices))
+        return scipy.sparse.csr_matrix(
+            (values, (np.zeros(len(indices), dtype=int), indices)),
+            shape=(1, self.n_segments))
+
     def remove_constraint(self, names):
         """
         Remove a constraint from the wireframe's set of constraints.
@@ -405,10 +424,10 @@ class ToroidalWireframe(object):
         seg_ind1b = seg_ind1a + 1
         seg_ind2b = self.n_segments - self.n_theta + 1
 
-        matrix_row = np.zeros((1, self.n_segments))
-        matrix_row[0, seg_ind0] = 1
-        matrix_row[0, seg_ind1a:seg_ind2a:self.n_theta] = 1
-        matrix_row[0, seg_ind1b:seg_ind2b:self.n_theta] = 1
+        pol_segs = np.concatenate(([seg_ind0],
+                                   np.arange(seg_ind1a, seg_ind2a, self.n_theta),
+                                   np.arange(seg_ind1b, seg_ind2b, self.n_theta)))
+        matrix_row = self._sparse_matrix_row(pol_segs, 1.0)
 
         self.add_constraint('poloidal_current', 'poloidal_current',
                             matrix_row, pol_current_sum)
@@ -456,8 +475,7 @@ class ToroidalWireframe(object):
                 in the positive "z" direction.
         """
 
-        matrix_row = np.zeros((1, self.n_segments))
-        matrix_row[0, :self.n_theta] = 1
+        matrix_row = self._sparse_matrix_row(np.arange(self.n_theta), 1.0)
 
         self.add_constraint('toroidal_current', 'toroidal_current',
                             matrix_row, current)
@@ -526,8 +544,7 @@ class ToroidalWireframe(object):
 
         for i in range(len(segments)):
 
-            matrix_row = np.zeros((1, self.n_segments))
-            matrix_row[0, segments[i]] = 1
+            matrix_row = self._sparse_matrix_row(segments[i], 1.0)
 
             self.add_constraint(name + '_%d' % (segments[i]), name,
                                 matrix_row, 0)
@@ -861,15 +878,15 @@ class ToroidalWireframe(object):
 
         name = 'continuity_node_%d' % (node_ind)
 
-        matrix_row = np.zeros((1, self.n_segments))
-        matrix_row[0, [ind_tor_in, ind_pol_in]] = -1
-        matrix_row[0, [ind_tor_out, ind_pol_out]] = 1
+        matrix_row = self._sparse_matrix_row(
+            [ind_tor_in, ind_pol_in, ind_tor_out, ind_pol_out],
+            [-1.0, -1.0, 1.0, 1.0])
 
         self.add_constraint(name, 'continuity', matrix_row, 0.0)
 
     def constraint_matrices(self, remove_redundancies=True,
                             remove_constrained_segments=False,
-                            assume_no_crossings=False):
+                            assume_no_crossings=False, sparse=False):
         """
         Return the matrices for the system of equations that define the linear
         equality constraints for the wireframe segment currents. The equations
@@ -914,11 +931,16 @@ class ToroidalWireframe(object):
                 single-track loops with no forks or crossings. In this case,
                 enough constraints will be removed to allow for one degree of
                 freedom per loop.
+            sparse: boolean (optional)
+                If true (default is false), the matrix C is returned as a
+                scipy.sparse CSR matrix rather than a dense array. Each 
+                constraint only involves a few segments, so this saves a large
+                amount of memory for wireframes with high resolution.
 
         Returns
         -------
-            constraints_C: 2d double array
-                The matrix B in the constraint equation
+            constraints_C: 2d double array or scipy.sparse CSR matrix
+                The matrix C in the constraint equation
             constraints_d: 1d double array (column vector)
                 The column vector on the right-hand side of the constraint 
                 equation
@@ -945,10 +967,9 @@ class ToroidalWireframe(object):
 
         # Construct the matrix and RHS from non-excluded constraints
 
-        constraints_C = np.ascontiguousarray(
-            np.concatenate([self.constraints[key]['matrix_row']
-                            for key in self.constraints
-                            if key not in excluded], axis=0))
+        constraints_C = scipy.sparse.vstack(
+            [self.constraints[key]['matrix_row'] for key in self.constraints
+             if key not in excluded], format='csr')
 
         constraints_d = np.ascontiguousarray(
             np.zeros((constraints_C.shape[0], 1)))
@@ -957,12 +978,12 @@ class ToroidalWireframe(object):
                             for key in self.constraints.keys() if key not in excluded]
 
         if remove_constrained_segments:
+            constraints_C = constraints_C[:, self.unconstrained_segments()]
 
-            return constraints_C[:, self.unconstrained_segments()], constraints_d
-
-        else:
+        if not sparse:
+            constraints_C = np.ascontiguousarray(constraints_C.toarray())
 
-            return constraints_C, constraints_d
+        return constraints_C, constraints_d
 
     def find_inactive_nodes(self, assume_no_crossings=False):
         """
@@ -978,9 +999,9 @@ class ToroidalWireframe(object):
         node_sum = np.zeros((self.n_nodes))
 
         # Tally how many unconstrained segments each node is connected to
-        for seg_ind in self.unconstrained_segments():
-            connected_nodes = np.sum(self.connected_segments == seg_ind, axis=1)
-            node_sum += connected_nodes
+        free = np.full(self.n_segments, False)
+        free[self.unconstrained_segments()] = True
+        node_sum += np.sum(free[self.connected_segments], axis=1)
 
         # If all four connected segments are constrained, the continuity
         # constraint is redundant
@@ -1167,7 +1188,7 @@ class ToroidalWireframe(object):
 
         # Set up the constraint matrices
         constraints_C_full, constraints_d_full = \
-            self.constraint_matrices(remove_redundancies=False)
+            self.constraint_matrices(remove_redundancies=False, sparse=True)
 
         # Evaluate the residuals of the constraint equations
         residuals = constraints_C_full @ x - constraints_d_full
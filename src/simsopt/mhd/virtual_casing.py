@@ -276,6 +276,9 @@ class VirtualCasing:
 
         if filename is not None:
             if filename == 'auto':
+                if vmec.output_file is None:
+                    raise RuntimeError("filename='auto' requires the wout file of the "
+                                       "Vmec object, which was not archived from scratch_dir.")
                 directory, basefile = os.path.split(vmec.output_file)
                 filename = os.path.join(directory, 'vcasing' + basefile[4:])
                 logger.debug(f'New filename: {filename}')
@@ -8,6 +8,10 @@ This module provides a class that handles the VMEC equilibrium code.
 
 import logging
 import os.path
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from datetime import datetime
 
@@ -237,6 +241,19 @@ class Vmec(Optimizable):
     iteration, you can set the ``files_to_delete`` attribute to ``[]``
     after that run of VMEC.
 
+    Since every run of VMEC writes a ``wout`` file that is read back, many
+    worker groups running VMEC concurrently can saturate a shared
+    filesystem. To avoid this, ``scratch_dir`` can be set to a node-local
+    directory, ideally a memory-backed one such as ``/dev/shm``. VMEC is
+    then run in a private subdirectory of ``scratch_dir``, the ``wout`` file
+    is read only by the leader of each worker group, whose ``wout``
+    attribute is broadcast to the other processes of the group, and all
+    the files written by VMEC are removed from ``scratch_dir`` right away.
+    The ``wout`` files are only copied to the working directory for the
+    worker groups selected by ``archive``, optionally in a background
+    thread so the optimization does not wait for the copy. The run
+    directory is removed when the ``Vmec`` object is garbage collected.
+
     Args:
         filename: Name of a VMEC ``input.<extension>`` file or ``wout_<extension>.nc``
           output file to use for loading the
@@ -248,6 +265,17 @@ class Vmec(Optimizable):
           except for the first and most recent ones from worker group 0. If
           ``True``, all ``wout`` files will be kept.
         verbose: Whether to print to stdout when running vmec.
+        scratch_dir: If not ``None``, directory in which VMEC is run and its
+          output files are read, see above.
+        archive: Which ``wout`` files are copied from ``scratch_dir`` to the
+          working directory: ``"none"``, ``"group0"`` for the ones of worker
+          group 0 or ``"all"``. Defaults to ``"all"`` if ``keep_all_files``
+          is ``True`` and to ``"group0"`` otherwise, in which case the
+          previous files are deleted as without ``scratch_dir``. Ignored if
+          ``scratch_dir`` is ``None``.
+        async_archive: Whether the ``wout`` files are copied to the working
+          directory in a background thread. Use :meth:`wait_for_archive`
+          to wait for the copies to complete.
 
     Attributes:
         iter: Number of times VMEC has run.
@@ -268,7 +296,10 @@ class Vmec(Optimizable):
                  verbose: bool = True,
                  ntheta=50,
                  nphi=50,
-                 range_surface='full torus'):
+                 range_surface='full torus',
+                 scratch_dir: Optional[str] = None,
+                 archive: Optional[str] = None,
+                 async_archive: bool = False):
 
         if filename is None:
             # Read default input file, which should be in the same
@@ -290,6 +321,19 @@ class Vmec(Optimizable):
         self.wout = Struct()
         self.verbose = verbose
 
+        if archive is None:
+            archive = "all" if keep_all_files else "group0"
+        if archive not in ["none", "group0", "all"]:
+            raise ValueError(f"Invalid archive option: {archive}")
+        self.scratch_dir = scratch_dir
+        self.archive = archive
+        self.async_archive = async_archive
+        self._scratch_run_dir = None
+        self._archive_executor = None
+        self._archive_futures = []
+        self._output_file = None
+        self._output_file_future = None
+
         # Get MPI communicator:
         if (mpi is None and MPI is not None):
             self.mpi = MpiPartition(ngroups=1)
@@ -677,14 +721,17 @@ class Vmec(Optimizable):
         input_file = os.path.join(
             os.getcwd(),
             os.path.basename(base_filename))
+        # Directory in which VMEC writes its output files:
+        run_dir = os.getcwd() if self.scratch_dir is None \
+            else self._get_scratch_run_dir()
         self.output_file = os.path.join(
-            os.getcwd(),
+            run_dir,
             os.path.basename(base_filename).replace('input.', 'wout_') + '.nc')
         mercier_file = os.path.join(
-            os.getcwd(),
+            run_dir,
             os.path.basename(base_filename).replace('input.', 'mercier.'))
         jxbout_file = os.path.join(
-            os.getcwd(),
+            run_dir,
             os.path.basename(base_filename).replace('input.', 'jxbout_') + '.nc')
 
         file_to_write = input_file if (self.mpi.proc0_world or self.keep_all_files) else None
@@ -702,7 +749,12 @@ class Vmec(Optimizable):
         self.ictrl[3] = 0  # ns_index
         self.ictrl[4] = 0  # iseq
         reset_file = ''
-        vmec.runvmec(self.ictrl, input_file, self.verbose, self.fcomm, reset_file)
+        cwd = os.getcwd()
+        os.chdir(run_dir)
+        try:
+            vmec.runvmec(self.ictrl, input_file, self.verbose, self.fcomm, reset_file)
+        finally:
+            os.chdir(cwd)
         ierr = self.ictrl[1]
 
         # Deallocate arrays, even if vmec did not converge:
@@ -722,6 +774,11 @@ class Vmec(Optimizable):
         if ierr != 11:
             raise ObjectiveFailure(f"VMEC did not converge. ierr={ierr}")
 
+        if self.scratch_dir is not None:
+            self._finish_scratch_run(input_file, mercier_file, jxbout_file)
+            self.need_to_run_code = False
+            return
+
         logger.info("VMEC run complete. Now loading output.")
         self.load_wout()
         # Make sure all procs have finished loading the wout file before we delete it:
@@ -770,12 +827,33 @@ class Vmec(Optimizable):
 
         self.need_to_run_code = False
 
+    @property
+    def output_file(self):
+        """
+        Name of the ``wout`` file of the most recent VMEC run. If this file
+        is being moved out of ``scratch_dir`` in a background thread, the
+        move is waited for first.
+        """
+        if self._output_file_future is not None:
+            future, self._output_file_future = self._output_file_future, None
+            future.result()
+        return self._output_file
+
+    @output_file.setter
+    def output_file(self, output_file):
+        self._output_file = output_file
+        self._output_file_future = None
+
     def load_wout(self):
         """
         Read in the most recent ``wout`` file created, and store all the
         data in a ``wout`` attribute of this Vmec object.
         """
         ierr = 0
+        if self.output_file is None:
+            raise RuntimeError("The wout file of the last VMEC run in scratch_dir "
+                               "was not archived, so it cannot be read. Set "
+                               "archive to keep the wout files.")
         logger.info(f"Attempting to read file {self.output_file}")
 
         with netcdf_file(self.output_file, mmap=False) as f:
@@ -793,11 +871,142 @@ class Vmec(Optimizable):
             self.wout.lasym = f.variables['lasym__logical__'][()]
             self.wout.volume = self.wout.volume_p
 
+        self._set_s_grids()
+
+        return ierr
+
+    def _set_s_grids(self):
         self.s_full_grid = np.linspace(0, 1, self.wout.ns)
         self.ds = self.s_full_grid[1] - self.s_full_grid[0]
         self.s_half_grid = self.s_full_grid[1:] - 0.5 * self.ds
 
-        return ierr
+    def _get_scratch_run_dir(self):
+        """
+        Return the private subdirectory of ``scratch_dir`` in which the
+        processes of this worker group run VMEC, creating it if needed.
+        """
+        if self._scratch_run_dir is None:
+            run_dir = None
+            if self.mpi.proc0_groups:
+                os.makedirs(self.scratch_dir, exist_ok=True)
+                run_dir = tempfile.mkdtemp(
+                    prefix=f"vmec_{self.mpi.group:03d}_", dir=self.scratch_dir)
+            run_dir = self.mpi.comm_groups.bcast(run_dir)
+            # The group may span several nodes with node-local scratch
+            # directories, in which case the directory only exists on the
+            # node of the group leader:
+            os.makedirs(run_dir, exist_ok=True)
+            self._scratch_run_dir = run_dir
+            if self.async_archive:
+                self._archive_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="vmec_archive")
+            weakref.finalize(self, self._remove_scratch_run_dir, run_dir,
+                             self._archive_executor)
+        return self._scratch_run_dir
+
+    @staticmethod
+    def _remove_scratch_run_dir(run_dir, archive_executor):
+        # The pending moves of wout files out of the directory finish first
+        if archive_executor is not None:
+            archive_executor.shutdown(wait=True)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _finish_scratch_run(self, input_file, mercier_file, jxbout_file):
+        """
+        Load the output of a VMEC run in ``scratch_dir`` on the group
+        leader, broadcast it to the group, and archive or delete the files.
+        Afterwards ``output_file`` is the archived ``wout`` file, or ``None``
+        if the file was not archived.
+        """
+        logger.info("VMEC run complete. Now loading output on the group leader.")
+        wout = None
+        output_file = None
+        archive_future = None
+        failure = None
+        if self.mpi.proc0_groups:
+            # Any exception on the leader is passed to the rest of the group,
+            # which would otherwise wait forever in the broadcast below.
+            try:
+                self.load_wout()
+                wout = self.wout
+            except Exception as e:
+                failure = e
+
+            try:
+                for filename in [mercier_file, jxbout_file,
+                                 os.path.join(self._scratch_run_dir, "fort.9")]:
+                    try:
+                        os.remove(filename)
+                    except FileNotFoundError:
+                        logger.debug(f'Tried to delete the file {filename} but it was not found')
+
+                archive = self.archive == "all" \
+                    or (self.archive == "group0" and self.mpi.group == 0)
+                if archive:
+                    output_file = os.path.join(os.getcwd(),
+                                               os.path.basename(self.output_file))
+                    archive_future = self._submit_archive_task(
+                        shutil.move, self.output_file, output_file)
+                else:
+                    try:
+                        os.remove(self.output_file)
+                    except FileNotFoundError:
+                        logger.debug(f'Tried to delete the file {self.output_file} but it was not found')
+
+                # Delete the previous archived files, if desired. This is done
+                # after the pending copies, which may include these files:
+                if self.files_to_delete:
+                    self._submit_archive_task(self._delete_files,
+                                              self.files_to_delete)
+                self.files_to_delete = []
+                if archive and (self.archive == "group0") and (self.iter > 0):
+                    self.files_to_delete += [input_file, output_file]
+            except Exception as e:
+                if failure is None:
+                    failure = e
+
+        wout, output_file, failure = self.mpi.comm_groups.bcast(
+            (wout, output_file, failure))
+        # The wout file in scratch_dir no longer exists. If it is still being
+        # moved, output_file waits for the move:
+        self.output_file = output_file
+        self._output_file_future = archive_future
+        if failure is not None:
+            raise failure
+        if not self.mpi.proc0_groups:
+            self.wout = wout
+            self._set_s_grids()
+        logger.info("Done loading VMEC output.")
+
+    @staticmethod
+    def _delete_files(filenames):
+        for filename in filenames:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                logger.debug(f"Tried to delete the file {filename} but it was not found")
+
+    def _submit_archive_task(self, fn, *args):
+        """
+        Call ``fn(*args)``, in the background if ``async_archive`` is
+        ``True``, in which case the future of the call is returned.
+        """
+        if not self.async_archive:
+            fn(*args)
+            return None
+        future = self._archive_executor.submit(fn, *args)
+        self._archive_futures.append(future)
+        return future
+
+    def wait_for_archive(self):
+        """
+        Wait until the ``wout`` files copied to the working directory in the
+        background, if ``async_archive`` is ``True``, have been written.
+        Exceptions raised while copying the files are raised here.
+        """
+        futures, self._archive_futures = self._archive_futures, []
+        for future in futures:
+            future.result()
 
     def update_mpi(self, new_mpi):
         """
@@ -128,56 +128,61 @@ class ConstrainedProblem(Optimizable):
             self.objective_cache = None
             self.constraint_cache = None
 
-        # get the constraint funcs
-        fn_nlc = self.funcs_in[1:]
         if not self.has_nlc:
             # No nonlinear constraints to evaluate
             raise RuntimeError
 
         if (self.constraint_cache is None):
-            outputs = []
-            for i, fn in enumerate(fn_nlc):
-
-                try:
-                    out = fn(*args, **kwargs)
-                except ObjectiveFailure:
-                    logger.warning(f"Function evaluation failed for {fn}")
-                    if self.fail is None or self.first_eval_con:
-                        raise
-
-                    break
-
-                # evaluate lhs as lhs - c(x) <= 0
-                if np.any(np.isfinite(self.lhs_nlc[i])):
-                    diff = np.array(self.lhs_nlc[i]) - out
-                    output = np.array([diff]) if not np.ndim(diff) else np.asarray(diff)
-                    outputs += [output]
-                    if self.first_eval_con:
-                        self.nvals += len(output)
-                        logger.debug(f"{i}: first eval {self.nvals}")
-
-                # evaluate rhs as c(x) - rhs <= 0
-                if np.any(np.isfinite(self.rhs_nlc[i])):
-                    diff = out - np.array(self.rhs_nlc[i])
-                    output = np.array([diff]) if not np.ndim(diff) else np.asarray(diff)
-                    outputs += [output]
-                    if self.first_eval_con:
-                        self.nvals += len(output)
-                        logger.debug(f"{i}: first eval {self.nvals}")
-
-            else:
+            # Failures are handled outside the memoized function, so that
+            # they are not cached and are retried when x is revisited
+            try:
+                self.constraint_cache = self._memoize(
+                    "nonlinear_constraints", self._evaluate_constraints,
+                    *args, **kwargs)
+            except ObjectiveFailure:
+                if self.fail is None or self.first_eval_con:
+                    raise
+                self.constraint_cache = np.full(self.nvals, self.fail)
+            self.new_x = False
+        return self.constraint_cache
+
+    def _evaluate_constraints(self, *args, **kwargs):
+        """
+        Evaluate the nonlinear constraint functions, ordered as in
+        :meth:`nonlinear_constraints`.
+        """
+        # get the constraint funcs
+        fn_nlc = self.funcs_in[1:]
+        outputs = []
+        for i, fn in enumerate(fn_nlc):
+
+            try:
+                out = fn(*args, **kwargs)
+            except ObjectiveFailure:
+                logger.warning(f"Function evaluation failed for {fn}")
+                raise
+
+            # evaluate lhs as lhs - c(x) <= 0
+            if np.any(np.isfinite(self.lhs_nlc[i])):
+                diff = np.array(self.lhs_nlc[i]) - out
+                output = np.array([diff]) if not np.ndim(diff) else np.asarray(diff)
+                outputs += [output]
                 if self.first_eval_con:
-                    self.first_eval_con = False
-                self.constraint_cache = np.concatenate(outputs)
-                self.new_x = False
-                return self.constraint_cache
+                    self.nvals += len(output)
+                    logger.debug(f"{i}: first eval {self.nvals}")
+
+            # evaluate rhs as c(x) - rhs <= 0
+            if np.any(np.isfinite(self.rhs_nlc[i])):
+                diff = out - np.array(self.rhs_nlc[i])
+                output = np.array([diff]) if not np.ndim(diff) else np.asarray(diff)
+                outputs += [output]
+                if self.first_eval_con:
+                    self.nvals += len(output)
+                    logger.debug(f"{i}: first eval {self.nvals}")
 
-            # Reached here after encountering break in for loop
-            self.constraint_cache = np.full(self.nvals, self.fail)
-            self.new_x = False
-            return self.constraint_cache
-        else:
-            return self.constraint_cache
+        if self.first_eval_con:
+            self.first_eval_con = False
+        return np.concatenate(outputs)
 
     def objective(self, x=None, *args, **kwargs):
         """
@@ -202,24 +207,30 @@ class ConstrainedProblem(Optimizable):
             self.constraint_cache = None
 
         if (self.objective_cache is None):
-            fn = self.funcs_in[0]
+            # Failures are handled outside the memoized function, so that
+            # they are not cached and are retried when x is revisited
             try:
-                out = fn(*args, **kwargs)
+                self.objective_cache = self._memoize(
+                    "objective", self._evaluate_objective, *args, **kwargs)
             except ObjectiveFailure:
-                logger.warning(f"Function evaluation failed for {fn}")
                 if self.fail is None or self.first_eval_obj:
                     raise
-                out = self.fail
-
-            self.objective_cache = out
-            self.new_x = False
-
+                self.objective_cache = self.fail
             if self.first_eval_obj:
                 self.first_eval_obj = False
+            self.new_x = False
+        return self.objective_cache
 
-            return self.objective_cache
-        else:
-            return self.objective_cache
+    def _evaluate_objective(self, *args, **kwargs):
+        """
+        Evaluate the objective function.
+        """
+        fn = self.funcs_in[0]
+        try:
+            return fn(*args, **kwargs)
+        except ObjectiveFailure:
+            logger.warning(f"Function evaluation failed for {fn}")
+            raise
 
     def all_funcs(self, x=None, *args, **kwargs):
         """
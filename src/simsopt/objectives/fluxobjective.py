@@ -46,17 +46,28 @@ class SquaredFlux(Optimizable):
           in ``phi`` and ``theta`` direction.
         definition: A string to select among the definitions above. The
           available options are ``"quadratic flux"``, ``"normalized"``, and ``"local"``.
+        spectral_tol: If given, the field is only evaluated on a coarse grid that is
+          chosen adaptively and Fourier interpolated to the quadrature points of the
+          surface, see :obj:`~simsopt.field.SpectralBnormal`. The value is the relative
+          tolerance for the estimated interpolation error. This assumes that the field
+          has the same discrete rotational symmetry as the surface.
     """
 
-    def __init__(self, surface, field, target=None, definition="quadratic flux"):
+    def __init__(self, surface, field, target=None, definition="quadratic flux", spectral_tol=None):
         self.surface = surface
         if target is not None:
             self.target = np.ascontiguousarray(target)
         else:
             self.target = np.zeros(self.surface.normal().shape[:2])
         self.field = field
-        xyz = self.surface.gamma()
-        self.field.set_points(xyz.reshape((-1, 3)))
+        self.spectral_tol = spectral_tol
+        if spectral_tol is None:
+            self.spectral = None
+            xyz = self.surface.gamma()
+            self.field.set_points(xyz.reshape((-1, 3)))
+        else:
+            from ..field.spectral_bnormal import SpectralBnormal
+            self.spectral = SpectralBnormal(surface, field, tol=spectral_tol)
         if definition not in ["quadratic flux", "normalized", "local"]:
             raise ValueError("Unrecognized option for 'definition'.")
         self.definition = definition
@@ -64,7 +75,7 @@ class SquaredFlux(Optimizable):
 
     def J(self):
         n = self.surface.normal()
-        Bcoil = self.field.B().reshape(n.shape)
+        Bcoil = self._B(n.shape)
         return sopp.integral_BdotN(Bcoil, self.target, n, self.definition)
 
     @derivative_dec
@@ -72,7 +83,7 @@ class SquaredFlux(Optimizable):
         n = self.surface.normal()
         absn = np.linalg.norm(n, axis=2)
         unitn = n * (1. / absn)[:, :, None]
-        Bcoil = self.field.B().reshape(n.shape)
+        Bcoil = self._B(n.shape)
         Bcoil_n = np.sum(Bcoil * unitn, axis=2)
         if self.target is not None:
             B_n = (Bcoil_n - self.target)
@@ -103,4 +114,49 @@ class SquaredFlux(Optimizable):
             raise ValueError("Should never get here")
 
         dJdB = dJdB.reshape((-1, 3))
+        if self.spectral is not None:
+            return self.spectral.B_vjp(dJdB)
         return self.field.B_vjp(dJdB)
+
+    def adapt_resolution(self, tol=1e-6, **kwargs):
+        """
+        Replace the surface by one with the cheapest quadrature grid on which
+        the objective is converged to a relative tolerance ``tol``, using
+        :func:`~simsopt.geo.surface.select_quadrature_resolution`. The new
+        surface shares the degrees of freedom of the old one. As the coils
+        change during an optimization, this can be called again, e.g. from a
+        callback of the optimizer. This is only possible if the target is zero.
+
+        Args:
+            tol: Relative tolerance for the objective.
+            kwargs: Further arguments passed to
+              :func:`~simsopt.geo.surface.select_quadrature_resolution`.
+
+        Returns:
+            Tuple ``(nphi, ntheta)`` with the selected resolution.
+        """
+        from ..geo.surface import Surface, select_quadrature_resolution, surface_with_quadpoints
+        if np.any(self.target != 0):
+            raise ValueError("The resolution can only be adapted for a zero target.")
+
+        def integral(surf):
+            n = surf.normal()
+            self.field.set_points(surf.gamma().reshape((-1, 3)))
+            return sopp.integral_BdotN(self.field.B().reshape(n.shape), np.zeros(n.shape[:2]), n, self.definition)
+
+        nphi, ntheta = select_quadrature_resolution(self.surface, integral, tol=tol, **kwargs)
+        quadpoints_phi, quadpoints_theta = Surface.get_quadpoints(
+            nphi=nphi, ntheta=ntheta, range=kwargs.get("range", self.surface.deduced_range), nfp=self.surface.nfp)
+        self.surface = surface_with_quadpoints(self.surface, quadpoints_phi, quadpoints_theta)
+        self.target = np.zeros((nphi, ntheta))
+        if self.spectral is None:
+            self.field.set_points(self.surface.gamma().reshape((-1, 3)))
+        else:
+            from ..field.spectral_bnormal import SpectralBnormal
+            self.spectral = SpectralBnormal(self.surface, self.field, tol=self.spectral_tol)
+        return nphi, ntheta
+
+    def _B(self, shape):
+        if self.spectral is not None:
+            return self.spectral.B()
+        return self.field.B().reshape(shape)
@@ -148,39 +148,43 @@ class LeastSquaresProblem(Optimizable):
             self.x = x
 
         if self.new_x:
-            outputs = []
-            new_weights = []
-            for i, fn in enumerate(self.funcs_in):
-                try:
-                    out = fn(*args, **kwargs)
-                except ObjectiveFailure:
-                    logger.warning(f"Function evaluation failed for {fn}")
-                    if self.fail is None or self.first_eval:
-                        raise
-
-                    break
-
-                output = np.array([out]) if not np.ndim(out) else np.asarray(out)
-                output = output - self.goals[i]
-                if self.first_eval:
-                    self.nvals += len(output)
-                    logger.debug(f"{i}: first eval {self.nvals}")
-                new_weights += [self.inp_weights[i]] * len(output)
-                outputs += [output]
-            else:
-                if self.first_eval:
-                    self.first_eval = False
-                self.weights = np.asarray(new_weights)
-                self.cache = np.concatenate(outputs)
-                self.new_x = False
-                return self.cache
-
-            # Reached here after encountering break in for loop
-            self.cache = np.full(self.nvals, self.fail)
+            # Failures are handled outside the memoized function, so that
+            # they are not cached and are retried when x is revisited
+            try:
+                self.cache, self.weights = self._memoize(
+                    "unweighted_residuals", self._evaluate_funcs_in,
+                    *args, **kwargs)
+            except ObjectiveFailure:
+                if self.fail is None or self.first_eval:
+                    raise
+                self.cache = np.full(self.nvals, self.fail)
             self.new_x = False
-            return self.cache
-        else:
-            return self.cache
+        return self.cache
+
+    def _evaluate_funcs_in(self, *args, **kwargs):
+        """
+        Evaluate the input functions and return the unweighted residuals
+        together with the weight of each residual.
+        """
+        outputs = []
+        new_weights = []
+        for i, fn in enumerate(self.funcs_in):
+            try:
+                out = fn(*args, **kwargs)
+            except ObjectiveFailure:
+                logger.warning(f"Function evaluation failed for {fn}")
+                raise
+
+            output = np.array([out]) if not np.ndim(out) else np.asarray(out)
+            output = output - self.goals[i]
+            if self.first_eval:
+                self.nvals += len(output)
+                logger.debug(f"{i}: first eval {self.nvals}")
+            new_weights += [self.inp_weights[i]] * len(output)
+            outputs += [output]
+        if self.first_eval:
+            self.first_eval = False
+        return np.concatenate(outputs), np.asarray(new_weights)
 
     def residuals(self, x=None, *args, **kwargs):
         """
@@ -36,16 +36,29 @@ def forward_backward(P, L, U, rhs, iterative_refinement=False):
 def sum_across_comm(derivative, comm):
     r"""
     Compute the sum of :mod:`simsopt._core.derivative.Derivative` objects from
-    several MPI ranks. This implementation is fairly basic and requires that
-    the derivative dictionaries contain the same keys on all ranks.
+    several MPI ranks. This implementation requires that the derivative
+    dictionaries contain the same keys, with arrays of the same sizes, on all
+    ranks. The arrays of all keys are packed into one contiguous buffer, which
+    is summed with a single buffer-based ``Allreduce``, and then unpacked.
+
+    Args:
+        derivative: the local :mod:`simsopt._core.derivative.Derivative`.
+        comm: the MPI communicator.
     """
+    # Sort the keys by name, so that the buffer layout does not depend on
+    # the order in which the dictionary was assembled on each rank.
+    keys = sorted(derivative.data.keys(), key=lambda k: k.name)
+    arrays = [np.atleast_1d(np.asarray(derivative.data[k], dtype=np.float64)) for k in keys]
+    sizes = [a.size for a in arrays]
+    sendbuf = np.concatenate([a.ravel() for a in arrays]) if len(arrays) > 0 else np.zeros(0)
+    recvbuf = np.empty_like(sendbuf)
+    comm.Allreduce(sendbuf, recvbuf)
+
     newdict = {}
-    for k in derivative.data.keys():
-        data = derivative.data[k]
-        alldata = sum(comm.allgather(data))
-        if isinstance(alldata, float):
-            alldata = np.asarray([alldata])
-        newdict[k] = alldata
+    offset = 0
+    for k, a, size in zip(keys, arrays, sizes):
+        newdict[k] = recvbuf[offset:offset + size].reshape(a.shape)
+        offset += size
     return Derivative(newdict)
 
 
@@ -128,16 +141,16 @@ class MPIObjective(Optimizable):
         self.n = len(self.objectives) if comm is None else np.sum(self.comm.allgather(len(self.objectives)))
 
     def J(self):
-        local_vals = [J.J() for J in self.objectives]
-        global_vals = local_vals if self.comm is None else [i for o in self.comm.allgather(local_vals) for i in o]
-        res = np.sum(global_vals)
-        return res/self.n
+        res = np.asarray([np.sum([J.J() for J in self.objectives])], dtype=np.float64)
+        if self.comm is not None:
+            self.comm.Allreduce(res.copy(), res)
+        return res[0]/self.n
 
     @derivative_dec
     def dJ(self):
         if len(self.objectives) == 0:
             raise NotImplementedError("`MPIObjective.dJ` currently requires that there is at least one objective per process.")
-        local_derivs = sum([J.dJ(partials=True) for J in self.objectives])
+        local_derivs = Derivative.sum(J.dJ(partials=True) for J in self.objectives)
         all_derivs = local_derivs if self.comm is None else sum_across_comm(local_derivs, self.comm)
         all_derivs *= 1./self.n
         return all_derivs
@@ -25,7 +25,8 @@ except ImportError:
 from .._core.optimizable import Optimizable
 from .._core.util import Struct
 from ..util.mpi import MpiPartition
-from .._core.finite_difference import MPIFiniteDifference
+from .._core.finite_difference import MPIFiniteDifference, BroydenJacobian, \
+    least_squares_broyden
 from ..objectives.least_squares import LeastSquaresProblem
 from ..objectives.constrained import ConstrainedProblem
 
@@ -36,6 +37,7 @@ CALCULATE_F = 1
 CALCULATE_JAC = 2
 CALCULATE_FD_JAC = 3
 CALCULATE_NLC = 4
+CALCULATE_STEPS = 5
 
 __all__ = ['least_squares_mpi_solve', 'constrained_mpi_solve']
 
@@ -74,6 +76,108 @@ def _mpi_workers_task(mpi: MpiPartition,
         traceback.print_exc()  # Print traceback
 
 
+def _speculative_least_squares(fun_batch, jac, x0, f0, nsteps: int,
+                               ftol: float = 1e-8, xtol: float = 1e-8,
+                               gtol: float = 1e-8, max_nfev: int = None):
+    """
+    Levenberg-Marquardt minimization of the sum of squares of a vector
+    function, in which ``nsteps`` candidate steps with different damping
+    parameters, i.e. different trust-region radii, are evaluated together
+    after each Jacobian evaluation, and the one with the lowest sum of
+    squares is accepted. If ``fun_batch`` evaluates the candidates
+    concurrently, a single round of evaluations replaces the sequence of
+    trial steps that a trust-region method would otherwise take one after
+    the other.
+
+    Args:
+        fun_batch: Function taking a list of points and returning the list
+            of function values at these points.
+        jac: Function returning the Jacobian at a point.
+        x0: Initial point.
+        f0: Function value at ``x0``.
+        nsteps: Number of candidate steps evaluated after each Jacobian.
+        ftol: Tolerance for the relative decrease of the sum of squares.
+        xtol: Tolerance for the relative change of the point.
+        gtol: Tolerance for the infinity norm of the gradient.
+        max_nfev: Maximum number of function evaluations, not counting the
+            ones of the Jacobians.
+
+    Returns:
+        Struct with the attributes ``x``, ``fun``, ``cost``, ``nfev``,
+        ``njev``, ``status`` and ``message``, the status codes being those of
+        ``scipy.optimize.least_squares``.
+    """
+    messages = {0: "The maximum number of function evaluations is exceeded.",
+                1: "`gtol` termination condition is satisfied.",
+                2: "`ftol` termination condition is satisfied.",
+                3: "`xtol` termination condition is satisfied."}
+    # Ratio between the damping parameters of consecutive candidates
+    factor = 4.0
+    exponents = np.arange(nsteps) - (nsteps - 1) / 2
+
+    x = np.array(x0, dtype=float)
+    f = np.asarray(f0, dtype=float)
+    cost = np.dot(f, f)
+    damping = 1.0e-3
+    nfev = 1
+    njev = 0
+    status = None
+    while status is None:
+        J = jac(x)
+        njev += 1
+        g = J.T @ f
+        if np.linalg.norm(g, ord=np.inf) < gtol:
+            status = 1
+            break
+        JTJ = J.T @ J
+        scale = np.diag(JTJ).copy()
+        scale[scale <= 0] = 1.0
+        while True:
+            dampings = damping * factor ** exponents
+            dxs = [np.linalg.solve(JTJ + d * np.diag(scale), -g)
+                   for d in dampings]
+            fs = fun_batch([x + dx for dx in dxs])
+            nfev += nsteps
+            costs = [np.dot(fk, fk) for fk in fs]
+            k = int(np.argmin(costs))
+            logger.info(f"Candidate steps with damping {dampings} give "
+                        f"objective {costs}, initial {cost}")
+            if costs[k] < cost:
+                x_old = x
+                x = x + dxs[k]
+                f = np.asarray(fs[k], dtype=float)
+                cost_old = cost
+                cost = costs[k]
+                damping = dampings[k] / factor
+                if cost_old - cost < ftol * cost_old:
+                    status = 2
+                elif np.linalg.norm(x - x_old) < xtol * (xtol + np.linalg.norm(x)):
+                    status = 3
+                break
+            # All the candidates were rejected, so try shorter steps
+            damping = dampings[-1] * factor ** ((nsteps + 1) / 2)
+            if max(np.linalg.norm(dx) for dx in dxs) \
+                    < xtol * (xtol + np.linalg.norm(x)):
+                status = 3
+                break
+            if max_nfev is not None and nfev >= max_nfev:
+                break
+        if status is None and max_nfev is not None and nfev >= max_nfev:
+            status = 0
+
+    result = Struct()
+    result.x = x
+    result.fun = f
+    result.cost = 0.5 * cost
+    result.nfev = nfev
+    result.njev = njev
+    result.status = status
+    result.message = messages[status]
+    logger.info(f"{result.message} Function evaluations {nfev}, Jacobian "
+                f"evaluations {njev}, final objective {cost}.")
+    return result
+
+
 def least_squares_mpi_solve(prob: LeastSquaresProblem,
                             mpi: MpiPartition,
                             grad: bool = False,
@@ -81,6 +185,8 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
                             rel_step: float = 0.0,
                             diff_method: str = "forward",
                             save_residuals: bool = False,
+                            broyden_updates: int = 0,
+                            speculative_steps: int = 0,
                             **kwargs):
     """
     Solve a nonlinear-least-squares minimization problem using
@@ -105,6 +211,22 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
              be used. Else, error is raised.
         save_residuals: Whether to save the residuals at each iteration.
              This may be useful for debugging, although the file can become large.
+        broyden_updates: If positive, the finite-difference Jacobian is only
+             recomputed after this many consecutive Broyden rank-one updates,
+             or when the optimization stalls, which saves function
+             evaluations when they are expensive. The updates are computed by
+             proc0_world alone while the other processes wait in their
+             loops. See
+             :obj:`~simsopt._core.finite_difference.BroydenJacobian`.
+        speculative_steps: If positive and ``grad=True``, a
+             Levenberg-Marquardt method is used instead of
+             scipy.optimize.least_squares, in which after each Jacobian this
+             many candidate steps with different damping parameters (i.e.
+             trust-region radii) are evaluated concurrently by the worker
+             groups, and the best one is accepted. Choosing a multiple of
+             the number of groups keeps all the groups busy. In this mode
+             only the ``ftol``, ``xtol``, ``gtol`` and ``max_nfev`` entries
+             of ``kwargs`` are used.
         kwargs: Any arguments to pass to
                 `scipy.optimize.least_squares <https://docs.scipy.org/doc/scipy/reference/generated/scipy.optimize.least_squares.html>`_.
                 For instance, you can supply ``max_nfev=100`` to set
@@ -124,6 +246,7 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
     datalog_started = False
     nevals = 0
     start_time = time()
+    broyden = None
 
     def _f_proc0(x):
         """
@@ -142,13 +265,22 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
             logger.debug(f"unweighted residuals in _f_proc0:\n {unweighted_residuals}")
             residuals = prob.residuals()
             logger.debug(f"residuals in _f_proc0:\n {residuals}")
+            if broyden is not None:
+                broyden.record(x, residuals)
         except:
             unweighted_residuals = np.full(prob.parent_return_fns_no, 1.0e12)
             residuals = np.full(prob.parent_return_fns_no, 1.0e12)
             logger.info("Exception caught during function evaluation.")
 
         objective_val = prob.objective()
+        _log_evaluation(x, unweighted_residuals, residuals, objective_val)
+        logger.debug(f"residuals are {residuals}")
+        return residuals
 
+    def _log_evaluation(x, unweighted_residuals, residuals, objective_val):
+        """
+        Write a function evaluation to the objective and residuals files.
+        """
         nonlocal datalog_started, objective_file, residuals_file, nevals
 
         # Since the number of terms is not known until the first
@@ -197,12 +329,92 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
             residuals_file.flush()
 
         nevals += 1
-        logger.debug(f"residuals are {residuals}")
-        return residuals
+
+    def _evaluate_steps(xs=None):
+        """
+        Evaluate the residuals at the points ``xs``, which are distributed
+        over the worker groups. This function is called by all the group
+        leaders, and returns the list of residuals on proc0_world.
+        """
+        xs = mpi.comm_leaders.bcast(xs, root=0)
+        results = {}
+        for j, xj in enumerate(xs):
+            # Handle only this group's share of the work:
+            if np.mod(j, mpi.ngroups) != mpi.rank_leaders:
+                continue
+            mpi.mobilize_workers(CALCULATE_F)
+            mpi.comm_groups.bcast(xj, root=0)
+            try:
+                unweighted_residuals = prob.unweighted_residuals(xj)
+                residuals = prob.residuals()
+            except:
+                unweighted_residuals = np.full(prob.parent_return_fns_no, 1.0e12)
+                residuals = np.full(prob.parent_return_fns_no, 1.0e12)
+                logger.info("Exception caught during function evaluation.")
+            results[j] = (unweighted_residuals, residuals)
+
+        results = mpi.comm_leaders.gather(results, root=0)
+        if not mpi.proc0_world:
+            return None
+        results = {j: r for group_results in results
+                   for j, r in group_results.items()}
+        out = []
+        for j, xj in enumerate(xs):
+            unweighted_residuals, residuals = results[j]
+            _log_evaluation(xj, unweighted_residuals, residuals,
+                            np.dot(residuals, residuals))
+            out.append(residuals)
+        return out
+
+    if grad and speculative_steps > 0:
+        # The group leaders either evaluate candidate steps or their share
+        # of the finite difference Jacobian, depending on the signal sent by
+        # proc0_world.
+        fd = MPIFiniteDifference(prob.residuals, mpi, abs_step=abs_step,
+                                 rel_step=rel_step, diff_method=diff_method)
+
+        def leaders_action(mpi, data):
+            if data == CALCULATE_STEPS:
+                _evaluate_steps()
+            else:
+                fd.mpi_leaders_task()
+
+        def workers_action(mpi, data): return fd.mpi_workers_task()
+        fd.init_log()
+        mpi.apart(leaders_action, workers_action)
+
+        if mpi.proc0_world:
+            # proc0_world does this block, running the optimization.
+            x0 = np.copy(prob.x)
+            logger.info(f"Using {speculative_steps} speculative steps per "
+                        "iteration")
+
+            def fun_batch(xs):
+                mpi.mobilize_leaders(CALCULATE_STEPS)
+                return _evaluate_steps(xs)
+
+            options = {key: kwargs[key] for key in kwargs
+                       if key in ("ftol", "xtol", "gtol", "max_nfev")}
+            if len(options) < len(kwargs):
+                logger.warning(f"Arguments {set(kwargs) - set(options)} are "
+                               "ignored with speculative_steps")
+            try:
+                result = _speculative_least_squares(
+                    fun_batch, fd.jac, x0, _f_proc0(x0), speculative_steps,
+                    **options)
+            except:
+                print("Failure on proc0_world")
+                result = Struct()
+                result.x = x0
+
+        # Stop loops for workers and group leaders:
+        mpi.together()
+        if mpi.proc0_world and fd.new_log_file:
+            fd.log_file.close()
 
     # For MPI finite difference gradient, get the worker and leader action from
     # MPIFiniteDifference
-    if grad:
+    elif grad:
         with MPIFiniteDifference(prob.residuals, mpi, abs_step=abs_step,
                                  rel_step=rel_step, diff_method=diff_method) as fd:
             if mpi.proc0_world:
@@ -211,12 +423,22 @@ def least_squares_mpi_solve(prob: LeastSquaresProblem,
                 logger.info("Using finite difference method implemented in "
                             "SIMSOPT for evaluating gradient")
                 try:
-                    result = least_squares(_f_proc0, x0, jac=fd.jac, verbose=2,
-                                           **kwargs)
+                    if broyden_updates > 0:
+                        broyden = BroydenJacobian(fd, max_updates=broyden_updates)
+                        result = least_squares_broyden(_f_proc0, x0, broyden,
+                                                       verbose=2, **kwargs)
+                    else:
+                        result = least_squares(_f_proc0, x0, jac=fd.jac,
+                                               verbose=2, **kwargs)
                 except:
                     print("Failure on proc0_world")
                     result = Struct()
                     result.x = x0
+                if broyden is not None:
+                    logger.info(f"{broyden.nfull} finite-difference Jacobians "
+                                f"and {broyden.nupdates} Broyden updates, which "
+                                f"saved {broyden.nevals_saved} function "
+                                "evaluations")
 
     else:
         def leaders_action(mpi, data): return None
@@ -1,3 +1,5 @@
+import logging
+import os
 import warnings
 
 
@@ -7,7 +9,9 @@ import simsoptpp as sopp
 from .._core.types import RealArray
 
 
-__all__ = ['relax_and_split', 'GPMO']
+__all__ = ['relax_and_split', 'relax_and_split_continuation', 'GPMO']
+
+logger = logging.getLogger(__name__)
 
 
 def prox_l0(m: RealArray,
@@ -84,6 +88,151 @@ def projection_L2_balls(x, mmax):
     return np.divide(x_shaped, np.array([denom, denom, denom]).T).reshape(3 * N)
 
 
+def _print_convex_history(A_obj, b_obj, x, m_proxy, m_maxima, m_history,
+                          objective_history, R2_history, print_iter, k,
+                          nu, reg_l0, reg_l1, reg_l2):
+    """
+    Record and print the loss terms of the convex sub-problem, in the same
+    format as the C++ MwPGP algorithm.
+    """
+    m_history[:, :, print_iter] = x
+    R2 = 0.5 * np.sum((A_obj @ np.ravel(x) - b_obj) ** 2)
+    N2 = 0.5 * np.sum((x - m_proxy) ** 2) / nu
+    L2 = reg_l2 * np.sum(x ** 2)
+    L1 = reg_l1 * np.sum(np.abs(x))
+    L0 = reg_l0 * np.count_nonzero(np.abs(m_proxy) < 1e-20)
+    cost = R2 + N2 + L2
+    objective_history[print_iter] = cost
+    R2_history[print_iter] = R2
+    print(f"{k} ... {R2:.2e} ... {N2:.2e} ... {L2:.2e} ... {L1:.2e} ... {L0:.2e} ... {cost:.2e} ")
+
+
+def FISTA_algorithm(A_obj, b_obj, ATb, m_proxy, m0, m_maxima, alpha,
+                    nu=1e100, epsilon=1e-4, reg_l0=0.0, reg_l1=0.0,
+                    reg_l2=0.0, max_iter=500, min_fb=1e-20, verbose=False):
+    r"""
+    Accelerated projected gradient (FISTA) solver for the convex part of the
+    permanent magnet optimization problem,
+
+    .. math::
+
+        \min_m \frac{1}{2}\|Am - b\|^2 + \text{reg_l2}\|m\|^2 + \frac{1}{2\nu}\|m - w\|^2
+        \quad \text{s.t.} \quad \|m_i\|_2 \leq m^{max}_i,
+
+    where :math:`w` is the relax-and-split proxy variable. Nesterov momentum
+    is reset with the gradient-based adaptive restart of O'Donoghue and
+    Candes, which recovers linear convergence for this strongly convex
+    problem. The arguments and return values are the same as for
+    ``sopp.MwPGP_algorithm``, so the two can be used interchangeably.
+
+    Args:
+        A_obj: The inductance matrix, shape (ngrid, ndipoles * 3) or
+            (ngrid, ndipoles, 3).
+        b_obj: The target normal field, shape (ngrid,).
+        ATb: A^T b, shape (ndipoles, 3).
+        m_proxy: The relax-and-split proxy variable, shape (ndipoles, 3).
+        m0: The initial guess, shape (ndipoles, 3).
+        m_maxima: The maximal dipole strengths, shape (ndipoles,).
+        alpha: The step size, which should be below 1 / L, where L is the
+            largest eigenvalue of the Hessian of the objective.
+        nu: The strength of the relax-and-split term.
+        epsilon: The algorithm stops when the L1 norm of the change in m
+            falls below epsilon.
+        reg_l0: L0 regularization, only used for printing.
+        reg_l1: L1 regularization, only used for printing.
+        reg_l2: L2 regularization.
+        max_iter: Maximum number of iterations.
+        min_fb: The algorithm stops when the recorded :math:`\|Am - b\|^2/2`
+            falls below min_fb.
+        verbose: If True, print and record the loss terms every max_iter // 5
+            iterations, or every iteration if max_iter is below 5.
+
+    Returns:
+        Tuple of (objective_history, R2_history, m_history, m).
+    """
+    N = ATb.shape[0]
+    A_obj = A_obj.reshape(A_obj.shape[0], -1)
+    ATb_rs = np.ravel(ATb + m_proxy / nu)
+    l2_fac = 2 * (reg_l2 + 1.0 / (2.0 * nu))
+
+    def grad(v):
+        return A_obj.T @ (A_obj @ v) + l2_fac * v - ATb_rs
+
+    m_history = np.zeros((N, 3, 21))
+    objective_history = np.zeros(21)
+    R2_history = np.zeros(21)
+    print_iter = 0
+    if verbose:
+        print("Iteration ... |Am - b|^2 ... |m-w|^2/v ...   a|m|^2 ...  b|m-1|^2 ...   c|m|_1 ...   d|m|_0 ... Total Error:")
+
+    x = np.ravel(m0).copy()
+    y = x.copy()
+    t = 1.0
+    for k in range(max_iter):
+        x_prev = x
+        x = projection_L2_balls(y - alpha * grad(y), m_maxima)
+        if np.dot(y - x, x - x_prev) > 0:
+            # momentum points uphill, so restart the acceleration
+            t = 1.0
+            y = x
+        else:
+            t_next = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t ** 2))
+            y = x + ((t - 1.0) / t_next) * (x - x_prev)
+            t = t_next
+
+        if verbose and ((k % max(1, max_iter // 5)) == 0 or k == max_iter - 1):
+            _print_convex_history(A_obj, b_obj, x.reshape(N, 3), m_proxy, m_maxima,
+                                  m_history, objective_history, R2_history,
+                                  print_iter, k, nu, reg_l0, reg_l1, reg_l2)
+            if R2_history[print_iter] < min_fb:
+                break
+            print_iter += 1
+
+        if np.sum(np.abs(x - x_prev)) < epsilon:
+            if verbose:
+                print(f"FISTA algorithm ended early, at iteration {k}")
+            break
+    return objective_history, R2_history, m_history, x.reshape(N, 3)
+
+
+class _AndersonAcceleration:
+    """
+    Type-II Anderson acceleration of a fixed-point iteration x -> F(x), with
+    a window of the last ``depth`` iterates. If the fixed-point residual
+    grows, the history is discarded and a plain fixed-point step is taken.
+    """
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.dx = []
+        self.df = []
+        self.x_prev = None
+        self.f_prev = None
+
+    def update(self, x, Fx):
+        """
+        Given the current iterate x and F(x), return the next iterate.
+        """
+        f = Fx - x
+        if self.f_prev is not None:
+            if np.linalg.norm(f) > np.linalg.norm(self.f_prev):
+                self.dx = []
+                self.df = []
+            else:
+                self.dx.append(x - self.x_prev)
+                self.df.append(f - self.f_prev)
+                self.dx = self.dx[-self.depth:]
+                self.df = self.df[-self.depth:]
+        self.x_prev = x
+        self.f_prev = f
+        if len(self.df) == 0:
+            return Fx
+        dX = np.array(self.dx).T
+        dF = np.array(self.df).T
+        gamma = np.linalg.lstsq(dF, f, rcond=None)[0]
+        return Fx - (dX + dF) @ gamma
+
+
 def setup_initial_condition(pm_opt, m0=None):
     """
     If an initial guess for the dipole moments is specified,
@@ -165,6 +314,13 @@ def relax_and_split(pm_opt, m0=None, **kwargs):
                 called, and the number of times a prox is computed.
             verbose:
                 Prints out all the loss term errors separately.
+            convex_solver:
+                Solver for the convex sub-problems, either 'MwPGP' (default)
+                or 'FISTA' (see :func:`FISTA_algorithm`).
+            anderson_depth:
+                If > 0, apply Anderson acceleration with this window size
+                to the outer relax-and-split iteration for the proxy
+                variable. Defaults to 0, i.e. no acceleration.
 
     Returns:
         A tuple of optimization loss, solution at each step, and sparse solution.
@@ -193,10 +349,19 @@ def relax_and_split(pm_opt, m0=None, **kwargs):
     m_history = []
     m_proxy_history = []
 
-    # get optimal alpha value for the MwPGP algorithm
-    alpha_max = 2.0 / pm_opt.ATA_scale
+    # get optimal alpha value for the convex solver. MwPGP allows step sizes
+    # up to 2 / L, while FISTA needs step sizes below 1 / L.
+    convex_solver = kwargs.pop('convex_solver', 'MwPGP')
+    if convex_solver == 'MwPGP':
+        alpha_max = 2.0 / pm_opt.ATA_scale
+        convex_step = sopp.MwPGP_algorithm
+    elif convex_solver == 'FISTA':
+        alpha_max = 1.0 / pm_opt.ATA_scale
+        convex_step = FISTA_algorithm
+    else:
+        raise ValueError(f'Unknown convex_solver {convex_solver}. Use MwPGP or FISTA.')
     alpha_max = alpha_max * (1 - 1e-5)
-    convex_step = sopp.MwPGP_algorithm
+    anderson_depth = kwargs.pop('anderson_depth', 0)
 
     # set the nonconvex step in the algorithm
     reg_rs = 0.0
@@ -231,13 +396,18 @@ def relax_and_split(pm_opt, m0=None, **kwargs):
     if reg_rs > 0.0:
         # Relax-and-split algorithm
         m = pm_opt.m0
+        # w is the proxy variable passed to the convex step. It equals m_proxy
+        # unless Anderson acceleration extrapolates it from previous iterates.
+        w = m_proxy
+        if anderson_depth > 0:
+            anderson = _AndersonAcceleration(anderson_depth)
         for i in range(max_iter_RS):
             # update m with the CONVEX part of the algorithm
             algorithm_history, _, _, m = convex_step(
                 A_obj=pm_opt.A_obj,
                 b_obj=pm_opt.b_obj,
                 ATb=ATb,
-                m_proxy=np.ascontiguousarray(m_proxy.reshape(pm_opt.ndipoles, 3)),
+                m_proxy=np.ascontiguousarray(w.reshape(pm_opt.ndipoles, 3)),
                 m0=np.ascontiguousarray(m.reshape(pm_opt.ndipoles, 3)),  # note updated m is new guess
                 m_maxima=mmax,
                 **kwargs
@@ -253,6 +423,10 @@ def relax_and_split(pm_opt, m0=None, **kwargs):
             if np.linalg.norm(m - m_proxy) < epsilon_RS:
                 print('Relax-and-split finished early, at iteration ', i)
                 break
+            if anderson_depth > 0:
+                w = anderson.update(w, m_proxy)
+            else:
+                w = m_proxy
     else:
         m0 = np.ascontiguousarray(m0.reshape(pm_opt.ndipoles, 3))
         # no nonconvex terms being used, so just need one round of the
@@ -275,6 +449,37 @@ def relax_and_split(pm_opt, m0=None, **kwargs):
     return errors, m_history, m_proxy_history
 
 
+def relax_and_split_continuation(pm_opt, reg_l0_schedule, m0=None, **kwargs):
+    """
+    Runs :func:`relax_and_split` for a sequence of increasing L0
+    regularization values, warm-starting every stage from the solution of
+    the previous one. Gradually increasing the threshold typically needs far
+    fewer iterations in total than starting the final stage from scratch.
+
+    Args:
+        pm_opt: The grid of permanent magnets to optimize.
+        reg_l0_schedule: List of (already rescaled) L0 regularization values.
+        m0: Initial guess for the first stage. Defaults to pm_opt.m0.
+        kwargs: Keyword arguments passed on to :func:`relax_and_split`.
+
+    Returns:
+        Tuple of (errors, m_history, m_proxy_history), each a list with the
+        corresponding output of :func:`relax_and_split` for every stage.
+    """
+    errors = []
+    m_history = []
+    m_proxy_history = []
+    for reg_l0 in reg_l0_schedule:
+        stage_kwargs = dict(kwargs, reg_l0=reg_l0)
+        stage_errors, stage_m_history, stage_m_proxy_history = relax_and_split(
+            pm_opt, m0=m0, **stage_kwargs)
+        errors.append(stage_errors)
+        m_history.append(stage_m_history)
+        m_proxy_history.append(stage_m_proxy_history)
+        m0 = pm_opt.m
+    return errors, m_history, m_proxy_history
+
+
 def GPMO(pm_opt, algorithm='baseline', **kwargs):
     r"""
     GPMO is a greedy algorithm for the permanent magnet optimization problem.
@@ -348,6 +553,22 @@ def GPMO(pm_opt, algorithm='baseline', **kwargs):
             verbose: bool.
                 If True, print out the algorithm progress every 'nhistory'
                 iterations. Also needed to record the algorithm history.
+            checkpoint_file: str.
+                Path of a ``.npz`` file in which the solution and the history
+                arrays are saved every 'checkpoint_every' iterations. If the
+                file already exists, the run is resumed from the saved state,
+                and a ValueError is raised if it was written for a different
+                grid, K, nhistory or max_nMagnets. The file is kept after the
+                run is complete, so a later call returns the saved result
+                without computing anything; delete it to start a new run.
+                Only a keyword argument for 'ArbVec_backtracking', which is
+                the only variant that can be initialized from a partial
+                solution.
+            checkpoint_every: integer.
+                Number of iterations between checkpoints. Defaults to K, i.e.
+                a single checkpoint at the end of the run. Should be a
+                multiple of 'backtracking' so that the backtracking schedule
+                is not changed by the checkpoints.
 
     Returns:
         Tuple of (errors, Bn_errors, m_history)
@@ -383,6 +604,12 @@ def GPMO(pm_opt, algorithm='baseline', **kwargs):
     # Set the L2 regularization if it is included in the kwargs
     reg_l2 = kwargs.pop("reg_l2", 0.0)
 
+    checkpoint_file = kwargs.pop("checkpoint_file", None)
+    checkpoint_every = kwargs.pop("checkpoint_every", None)
+    if checkpoint_file is not None and algorithm != 'ArbVec_backtracking':
+        raise ValueError('Checkpointing is only supported for the '
+                         'ArbVec_backtracking algorithm.')
+
     # check that algorithm can generate K binary dipoles if no backtracking done
     if "K" in kwargs:
         if (algorithm not in ['backtracking', 'ArbVec_backtracking']) and kwargs["K"] > pm_opt.ndipoles:
@@ -444,14 +671,25 @@ def GPMO(pm_opt, algorithm='baseline', **kwargs):
             kwargs.pop("m_init")
         else:
             kwargs["x_init"] = contig(np.zeros((nGridPoints, 3)))
-        algorithm_history, Bn_history, m_history, num_nonzeros, m = sopp.GPMO_ArbVec_backtracking(
-            A_obj=contig(A_obj.T),
-            b_obj=contig(pm_opt.b_obj),
-            mmax=np.sqrt(reg_l2)*mmax_vec,
-            normal_norms=Nnorms,
-            pol_vectors=contig(pm_opt.pol_vectors),
-            **kwargs
-        )
+        if checkpoint_file is None:
+            algorithm_history, Bn_history, m_history, num_nonzeros, m, _ = sopp.GPMO_ArbVec_backtracking(
+                A_obj=contig(A_obj.T),
+                b_obj=contig(pm_opt.b_obj),
+                mmax=np.sqrt(reg_l2)*mmax_vec,
+                normal_norms=Nnorms,
+                pol_vectors=contig(pm_opt.pol_vectors),
+                **kwargs
+            )
+        else:
+            algorithm_history, Bn_history, m_history, num_nonzeros, m = _GPMO_ArbVec_backtracking_checkpointed(
+                checkpoint_file, checkpoint_every,
+                A_obj=contig(A_obj.T),
+                b_obj=contig(pm_opt.b_obj),
+                mmax=np.sqrt(reg_l2)*mmax_vec,
+                normal_norms=Nnorms,
+                pol_vectors=contig(pm_opt.pol_vectors),
+                **kwargs
+            )
     elif algorithm == 'multi':  # GPMOm
         algorithm_history, Bn_history, m_history, m = sopp.GPMO_multi(
             A_obj=contig(A_obj.T),
@@ -478,3 +716,70 @@ def GPMO(pm_opt, algorithm='baseline', **kwargs):
     pm_opt.m = np.ravel(m)
     pm_opt.m_proxy = pm_opt.m
     return errors, Bn_errors, m_history
+
+
+def _GPMO_ArbVec_backtracking_checkpointed(checkpoint_file, checkpoint_every, **kwargs):
+    """
+    Runs the ArbVec_backtracking variant of GPMO in chunks of
+    ``checkpoint_every`` iterations, restarting each chunk from the solution
+    of the previous one and saving the solution and the history arrays to
+    ``checkpoint_file`` after every chunk. If ``checkpoint_file`` exists, the
+    run is resumed from the saved state, after checking that it was written
+    for the same problem. The returned arrays have the same format as those
+    of ``sopp.GPMO_ArbVec_backtracking``, except that they only contain the
+    recorded entries.
+    """
+    K = kwargs.pop("K", 1000)
+    nhistory = kwargs.pop("nhistory", 100)
+    max_nMagnets = kwargs["max_nMagnets"]
+    if checkpoint_every is None:
+        checkpoint_every = K
+    N = kwargs["x_init"].shape[0]
+    # Parameters that a checkpoint must match to be resumed
+    params = dict(K=K, nhistory=nhistory, max_nMagnets=max_nMagnets,
+                  ndipoles=N, ngrid=kwargs["b_obj"].shape[0])
+
+    if os.path.exists(checkpoint_file):
+        with np.load(checkpoint_file) as data:
+            for key, value in params.items():
+                if key not in data or int(data[key]) != value:
+                    saved = int(data[key]) if key in data else None
+                    raise ValueError(f'The checkpoint {checkpoint_file} was written for {key}={saved}, '
+                                     f'but this run has {key}={value}. Delete the file to start a new run.')
+            k_done = int(data["k_done"])
+            x = data["x"]
+            histories = [data["objective_history"], data["Bn_history"],
+                         data["m_history"], data["num_nonzeros"]]
+        logger.info(f'Resuming GPMO from {checkpoint_file} at iteration {k_done}')
+    else:
+        k_done = 0
+        x = kwargs["x_init"]
+        histories = None
+
+    while k_done < K:
+        K_chunk = min(checkpoint_every, K - k_done)
+        nhistory_chunk = min(K_chunk, max(1, (nhistory * K_chunk) // K))
+        kwargs["x_init"] = np.ascontiguousarray(x)
+        objective_history, Bn_history, m_history, num_nonzeros, x, nrecorded = sopp.GPMO_ArbVec_backtracking(
+            K=K_chunk, nhistory=nhistory_chunk, **kwargs
+        )
+        chunk = [objective_history[:nrecorded], Bn_history[:nrecorded],
+                 m_history[:, :, :nrecorded], num_nonzeros[:nrecorded]]
+        if histories is None:
+            histories = chunk
+        else:
+            # The first entry of every chunk records the initial solution,
+            # which is the last entry of the previous chunk
+            histories = [np.concatenate((h, c[..., 1:]), axis=-1)
+                         for h, c in zip(histories, chunk)]
+        k_done += K_chunk
+        # Stop early if the C++ code terminated because a magnet limit was
+        # reached, recording the run as complete in the checkpoint
+        num_nonzero = np.count_nonzero(np.any(x != 0, axis=-1))
+        if num_nonzero >= min(N, max_nMagnets):
+            k_done = K
+        np.savez(checkpoint_file, k_done=k_done, x=x,
+                 objective_history=histories[0], Bn_history=histories[1],
+                 m_history=histories[2], num_nonzeros=histories[3], **params)
+
+    return (*histories, x)
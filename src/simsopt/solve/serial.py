@@ -20,7 +20,8 @@ from scipy.optimize import NonlinearConstraint, LinearConstraint
 from ..objectives.least_squares import LeastSquaresProblem
 from ..objectives.constrained import ConstrainedProblem
 from .._core.optimizable import Optimizable
-from .._core.finite_difference import FiniteDifference
+from .._core.finite_difference import FiniteDifference, BroydenJacobian, \
+    least_squares_broyden
 
 
 logger = logging.getLogger(__name__)
@@ -34,6 +35,9 @@ def least_squares_serial_solve(prob: LeastSquaresProblem,
                                rel_step: float = 0.0,
                                diff_method: str = "forward",
                                save_residuals: bool = False,
+                               workers: int = None,
+                               executor: str = "process",
+                               broyden_updates: int = 0,
                                **kwargs):
     """
     Solve a nonlinear-least-squares minimization problem using
@@ -55,6 +59,19 @@ def least_squares_serial_solve(prob: LeastSquaresProblem,
              be used. Else, error is raised.
         save_residuals: Whether to save the residuals at each iteration.
              This can be useful for debugging, although the file can become large.
+        workers: Number of threads or processes used to evaluate the
+             finite-difference Jacobian in parallel, without MPI. If
+             unspecified, the Jacobian is evaluated serially. See
+             :obj:`~simsopt._core.finite_difference.FiniteDifference`.
+        executor: Kind of pool used if ``workers`` is larger than 1,
+             ``"process"``, ``"fork"`` or ``"thread"``. Since a
+             :obj:`~simsopt.objectives.LeastSquaresProblem` cannot be
+             serialized to GSON, only ``"fork"`` currently works here.
+        broyden_updates: If positive, the finite-difference Jacobian is only
+             recomputed after this many consecutive Broyden rank-one updates,
+             or when the optimization stalls, which saves function
+             evaluations when they are expensive. See
+             :obj:`~simsopt._core.finite_difference.BroydenJacobian`.
         kwargs: Any arguments to pass to
                 `scipy.optimize.least_squares <https://docs.scipy.org/doc/scipy/reference/generated/scipy.optimize.least_squares.html>`_.
                 For instance, you can supply ``max_nfev=100`` to set
@@ -71,15 +88,25 @@ def least_squares_serial_solve(prob: LeastSquaresProblem,
     nevals = 0
     start_time = time()
     datalogging_started = False
+    # Last successful evaluation, reused by the finite-difference Jacobian
+    last_x = None
+    last_residuals = None
+    broyden = None
 
     def objective(x):
         nonlocal datalogging_started, objective_file, residuals_file, nevals
+        nonlocal last_x, last_residuals
         #success = True
         try:
             residuals = prob.residuals(x)
+            last_x = np.copy(x)
+            last_residuals = np.copy(residuals)
+            if broyden is not None:
+                broyden.record(x, residuals)
         except:
             logger.info("Exception caught during function evaluation")
             residuals = np.full(prob.parent_return_fns_no, 1.0e12)
+            last_x = None
             #success = False
 
         objective_val = prob.objective()
@@ -150,10 +177,27 @@ def least_squares_serial_solve(prob: LeastSquaresProblem,
     print('prob is ', prob)
     x0 = np.copy(prob.x)
     if grad:
-        fd = FiniteDifference(prob.residuals, abs_step=abs_step,
-                              rel_step=rel_step, diff_method=diff_method)
         logger.info("Using derivatives")
-        result = least_squares(objective, x0, verbose=2, jac=fd.jac, **kwargs)
+        with FiniteDifference(prob.residuals, abs_step=abs_step,
+                              rel_step=rel_step, diff_method=diff_method,
+                              workers=workers, executor=executor) as fd:
+
+            def jac(x):
+                if last_x is not None and np.array_equal(x, last_x):
+                    return fd.jac(x, f0=last_residuals)
+                return fd.jac(x)
+
+            if broyden_updates > 0:
+                broyden = BroydenJacobian(fd, max_updates=broyden_updates)
+                result = least_squares_broyden(objective, x0, broyden,
+                                               verbose=2, **kwargs)
+            else:
+                result = least_squares(objective, x0, verbose=2, jac=jac,
+                                       **kwargs)
+        if broyden is not None:
+            logger.info(f"{broyden.nfull} finite-difference Jacobians and "
+                        f"{broyden.nupdates} Broyden updates, which saved "
+                        f"{broyden.nevals_saved} function evaluations")
     else:
         logger.info("Using derivative-free method")
         result = least_squares(objective, x0, verbose=2, **kwargs)
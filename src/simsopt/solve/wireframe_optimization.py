@@ -4,6 +4,8 @@ Contains functions for optimizing currents within wireframe structures.
 
 import numpy as np
 import scipy
+import scipy.sparse
+import scipy.sparse.linalg
 import time
 import simsoptpp as sopp
 from simsopt.geo import Surface, ToroidalWireframe
@@ -114,6 +116,14 @@ def optimize_wireframe(wframe, algorithm, params,
         If true, will assume that the wireframe is constrained such that
         its free segments form single-track loops with no forks or 
         crossings.  Default is False. 
+    *   ``solver``: (*string (optional)*) -
+        Method for solving the constrained least-squares problem; see
+        ``regularized_constrained_least_squares``. Options are ``'qr'``
+        (default; dense QR factorization), ``'lsqr'`` and ``'cg'`` (sparse
+        constraint handling with a Krylov solver).
+    *   ``tol``: (*double (optional)*) -
+        Convergence tolerance for the ``'lsqr'`` and ``'cg'`` solvers.
+        Default is 1e-10.
 
     Parameters for GSCO optimizations:
 
@@ -169,6 +179,10 @@ def optimize_wireframe(wframe, algorithm, params,
 
     *   ``f_R``: (*double*) -
         Value of the sub-objective function f_R
+    *   ``timings``: (*dictionary*) -
+        Wall-clock times in seconds for the constraint assembly 
+        (``'assembly'``), factorization (``'factorization'``) and solve 
+        (``'solve'``) steps
 
     For GSCO optimizations only:
 
@@ -260,11 +274,16 @@ def optimize_wireframe(wframe, algorithm, params,
 
         assume_no_crossings = False if 'assume_no_crossings' not in params \
             else params['assume_no_crossings']
+        solver = 'qr' if 'solver' not in params else params['solver']
+        tol = 1e-10 if 'tol' not in params else params['tol']
 
+        timings = dict()
         x, f_B, f_R, f = \
-            rcls_wireframe(wframe, A, b, reg_W, assume_no_crossings, verbose)
+            rcls_wireframe(wframe, A, b, reg_W, assume_no_crossings, verbose,
+                           solver=solver, tol=tol, timings=timings)
 
         results['f_R'] = f_R  # f_B and f will be recorded later
+        results['timings'] = timings
 
     elif algorithm.lower() == 'gsco':
 
@@ -453,7 +472,8 @@ def bnorm_obj_matrices(wframe, surf_plas, ext_field=None,
     return A, b
 
 
-def rcls_wireframe(wframe, Amat, bvec, reg_W, assume_no_crossings, verbose):
+def rcls_wireframe(wframe, Amat, bvec, reg_W, assume_no_crossings, verbose,
+                   solver='qr', tol=1e-10, timings=None):
     """
     Performs a Regularized Constrained Least Squares optimization for the 
     segments in a wireframe.
@@ -481,6 +501,15 @@ def rcls_wireframe(wframe, Amat, bvec, reg_W, assume_no_crossings, verbose):
         verbose: boolean (optional)
             If true, will print progress to screen with durations of certain
             steps
+        solver: string (optional)
+            Solution method passed to 
+            ``regularized_constrained_least_squares``. Default is ``'qr'``.
+        tol: double (optional)
+            Convergence tolerance for the iterative solvers
+        timings: dictionary (optional)
+            If supplied, will be populated with the wall-clock times in 
+            seconds for constraint assembly (``'assembly'``), factorization 
+            (``'factorization'``) and solve (``'solve'``)
 
     Returns
     -------
@@ -492,12 +521,20 @@ def rcls_wireframe(wframe, Amat, bvec, reg_W, assume_no_crossings, verbose):
             (f = f_B + f_R)
     """
 
+    if timings is None:
+        timings = dict()
+
     # Obtain the constraint matrices
     if verbose:
         print('    Obtaining constraint matrices')
+    t0 = time.time()
     C, d = wframe.constraint_matrices(assume_no_crossings=assume_no_crossings,
-                                      remove_constrained_segments=True)
+                                      remove_constrained_segments=True,
+                                      sparse=True)
     free_segs = wframe.unconstrained_segments()
+    timings['assembly'] = time.time() - t0
+    if verbose:
+        print('        Assembly took %.2f seconds' % (timings['assembly']))
 
     if np.shape(C)[0] >= len(free_segs):
         raise ValueError('Least-squares problem has as many or more '
@@ -524,9 +561,14 @@ def rcls_wireframe(wframe, Amat, bvec, reg_W, assume_no_crossings, verbose):
     if verbose:
         print('    Solving the regularized constrained least-squares problem')
     t0 = time.time()
-    xfree = regularized_constrained_least_squares(Afree, bvec, Wfree, C, d)
+    xfree = regularized_constrained_least_squares(Afree, bvec, Wfree, C, d,
+                                                  solver=solver, tol=tol,
+                                                  timings=timings)
     t1 = time.time()
     if verbose:
+        print('        Factorization took %.2f seconds'
+              % (timings['factorization']))
+        print('        Solve took %.2f seconds' % (timings['solve']))
         print('        Solver took %.2f seconds' % (t1 - t0))
 
     # Construct the solution column vector
@@ -720,7 +762,8 @@ def get_gsco_iteration(iteration, res, wframe):
     return x_iter
 
 
-def regularized_constrained_least_squares(A, b, W, C, d):
+def regularized_constrained_least_squares(A, b, W, C, d, solver='qr',
+                                          tol=1e-10, timings=None):
     """
     Solves a linear least squares problem with Tikhonov regularization
     subject to linear equality constraints on the variables.
@@ -737,6 +780,16 @@ def regularized_constrained_least_squares(A, b, W, C, d):
     regularization matrix (normally diagonal), and C and d contain the 
     coefficients and constants of the constraint equations, respectively.
 
+    With the default solver ``'qr'``, the constraints are eliminated using a
+    dense QR factorization of C^T and the reduced normal equations are solved
+    directly. The solvers ``'lsqr'`` and ``'cg'`` instead keep C sparse: the 
+    solution is written as x = x0 + P z, where x0 is the minimum-norm solution
+    of C * x = d and P = I - C^T (C C^T)^-1 C projects onto the null space of
+    C, applied using a sparse LU factorization of C C^T. The reduced problem 
+    for z is then solved with LSQR on the stacked system [A; W] P, or with 
+    conjugate gradients on the projected normal equations. Empty and 
+    duplicated constraint rows are removed beforehand, as they are redundant.
+
     Parameters
     ----------
         A: array with dimensions m*n
@@ -745,12 +798,22 @@ def regularized_constrained_least_squares(A, b, W, C, d):
             Target vector
         W: scalar, array with dimension n, or array with dimension n*n
             Regularization matrix
-        C: array with dimension p*n
+        C: array or scipy.sparse matrix with dimension p*n
             Coefficients of the solution vector elements in each of the p
-            constraint equations. Must be full rank.
+            constraint equations. Must be full rank (up to empty or
+            duplicated rows for the sparse solvers).
         d: array with dimension p
             Constants appearing on the right-hand side of the constraint
             equations, i.e. B*x = d.
+        solver: string (optional)
+            One of ``'qr'`` (default), ``'lsqr'`` or ``'cg'``, see above
+        tol: double (optional)
+            Relative convergence tolerance for the ``'lsqr'`` and ``'cg'``
+            solvers. Default is 1e-10.
+        timings: dictionary (optional)
+            If supplied, the wall-clock times in seconds of the factorization
+            and solve steps will be stored under the keys ``'factorization'``
+            and ``'solve'``
 
     Returns
     -------
@@ -758,10 +821,19 @@ def regularized_constrained_least_squares(A, b, W, C, d):
             Solution to the least-squares problem
     """
 
+    if solver not in ['qr', 'lsqr', 'cg']:
+        raise ValueError('Unrecognized solver %s' % (solver))
+    if timings is None:
+        timings = dict()
+
     # Recast inputs as Numpy arrays
     Amat = np.array(A)
     bvec = np.array(b).reshape((-1, 1))
-    Ctra = np.array(C).T  # Transpose will be used for the calculations
+    if scipy.sparse.issparse(C):
+        Csp = scipy.sparse.csr_matrix(C)
+    else:
+        Csp = scipy.sparse.csr_matrix(np.array(C))
+    Ctra = Csp.T  # Transpose will be used for the calculations
     dvec = np.array(d).reshape((-1, 1))
 
     # Check the inputs
@@ -775,14 +847,15 @@ def regularized_constrained_least_squares(A, b, W, C, d):
         raise ValueError('Number of elements in d must match rows in C')
 
     if np.isscalar(W):
-        Wmat = W*np.eye(n)
+        Wmat = W*np.eye(n) if solver == 'qr' else W
     else:
         Wmat = np.squeeze(W)
         if len(Wmat.shape) == 1:
             if Wmat.shape[0] != n:
                 raise ValueError('Number of elements in vector-form W '
                                  'must match columns in A')
-            Wmat = np.diag(Wmat)
+            if solver == 'qr':
+                Wmat = np.diag(Wmat)
         elif len(Wmat.shape) == 2:
             if Wmat.shape[0] != n or Wmat.shape[1] != n:
                 raise ValueError('Number of rows and columns in matrix-form W '
@@ -790,8 +863,15 @@ def regularized_constrained_least_squares(A, b, W, C, d):
         else:
             raise ValueError('W must be a scalar, 1d array, or 2d array')
 
+    if solver != 'qr':
+        return _sparse_constrained_least_squares(Amat, bvec, Wmat, Csp, dvec,
+                                                 solver, tol, timings)
+
     # Compute the QR factorization of the transpose of the constraint matrix
-    Qfull, Rtall = _qr_factorization_wrapper(Ctra)
+    t0 = time.time()
+    Qfull, Rtall = _qr_factorization_wrapper(Ctra.toarray())
+    timings['factorization'] = time.time() - t0
+    t0 = time.time()
     Q1mat = Qfull[:, :p]  # Orthonormal vectors in the constrained subspace
     Q2mat = Qfull[:, p:]  # Orthonormal vectors in the free subspace
     Rmat = Rtall[:p, :]
@@ -818,7 +898,139 @@ def regularized_constrained_least_squares(A, b, W, C, d):
     vvec = scipy.linalg.lstsq(LHS, RHS)[0]
 
     # Transform from "Q" basis back to the basis of individual segment currents
-    return Qfull @ np.concatenate((uvec, vvec), axis=0)
+    x = Qfull @ np.concatenate((uvec, vvec), axis=0)
+    timings['solve'] = time.time() - t0
+    return x
+
+
+def _remove_redundant_constraints(C, d):
+    """
+    Removes constraint equations that are trivially redundant, i.e. rows of
+    the sparse matrix C that are empty or exact duplicates of an earlier row.
+    Raises a ValueError if an empty row has a nonzero right-hand side, or if
+    duplicated rows are inconsistent.
+
+    Parameters
+    ----------
+        C: scipy.sparse CSR matrix with dimension p*n
+            Constraint matrix
+        d: array with dimension p*1
+            Constants on the right-hand side of the constraint equations
+
+    Returns
+    -------
+        C, d: the constraint matrix and right-hand side with redundant rows
+            removed
+    """
+
+    C = C.copy()
+    C.eliminate_zeros()
+    C.sort_indices()
+    keep = []
+    seen = dict()
+    for i in range(C.shape[0]):
+        start, end = C.indptr[i], C.indptr[i+1]
+        if start == end:
+            if d[i, 0] != 0:
+                raise ValueError('Constraint %d has no coefficients but a '
+                                 'nonzero constant' % (i))
+            continue
+        key = (C.indices[start:end].tobytes(), C.data[start:end].tobytes())
+        if key in seen:
+            if d[i, 0] != d[seen[key], 0]:
+                raise ValueError('Constraints %d and %d are inconsistent'
+                                 % (seen[key], i))
+            continue
+        seen[key] = i
+        keep.append(i)
+
+    return C[keep, :], d[keep, :]
+
+
+def _sparse_constrained_least_squares(A, b, W, C, d, solver, tol, timings):
+    """
+    Null-space solution of the regularized constrained least-squares problem
+    with a sparse constraint matrix, using a Krylov method for the reduced
+    problem. See ``regularized_constrained_least_squares`` for details; inputs
+    are assumed to have been checked there.
+    """
+
+    m, n = A.shape
+    bvec = b.reshape((-1))
+
+    # Factorize C C^T, which is sparse and (after removing redundant rows)
+    # nonsingular if C has full row rank
+    t0 = time.time()
+    C, d = _remove_redundant_constraints(C, d)
+    Ctra = C.T.tocsr()
+    if C.shape[0] > 0:
+        lu = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(C @ Ctra))
+        x0 = Ctra @ lu.solve(d.reshape((-1)))
+    else:
+        lu = None
+        x0 = np.zeros(n)
+    timings['factorization'] = time.time() - t0
+
+    def project(v):
+        if lu is None:
+            return v
+        return v - Ctra @ lu.solve(C @ v)
+
+    if np.ndim(W) < 2:
+        def Wdot(v):
+            return W * v
+
+        WTdot = Wdot
+    else:
+        def Wdot(v):
+            return W @ v
+
+        def WTdot(v):
+            return W.T @ v
+
+    t0 = time.time()
+    if solver == 'lsqr':
+        # Minimize |[A; W] (x0 + P z) - [b; 0]|
+        def matvec(z):
+            Pz = project(z)
+            return np.concatenate((A @ Pz, Wdot(Pz)))
+
+        def rmatvec(y):
+            return project(A.T @ y[:m] + WTdot(y[m:]))
+
+        op = scipy.sparse.linalg.LinearOperator((m + n, n), matvec=matvec,
+                                                rmatvec=rmatvec)
+        rhs = np.concatenate((bvec - A @ x0, -Wdot(x0)))
+        z = scipy.sparse.linalg.lsqr(op, rhs, atol=tol, btol=tol,
+                                     iter_lim=10*n)[0]
+    else:
+        # Solve P (A^T A + W^T W) z = P (A^T b - (A^T A + W^T W) x0)
+        def hess(v):
+            return A.T @ (A @ v) + WTdot(Wdot(v))
+
+        # Projected conjugate gradient iteration; all iterates remain in the
+        # null space of C since the residuals are projected
+        r = project(A.T @ bvec - hess(x0))
+        z = np.zeros(n)
+        q = r.copy()
+        rr = r @ r
+        rr_stop = tol**2 * rr
+        for _ in range(10*n):
+            if rr <= rr_stop:
+                break
+            Hq = project(hess(q))
+            alpha = rr / (q @ Hq)
+            z += alpha * q
+            r -= alpha * Hq
+            rr_new = r @ r
+            q = r + (rr_new / rr) * q
+            rr = rr_new
+        else:
+            raise RuntimeError('Conjugate gradient solver did not converge')
+
+    x = x0 + project(z)
+    timings['solve'] = time.time() - t0
+    return x.reshape((-1, 1))
 
 
 def _qr_factorization_wrapper(M):
@@ -2,6 +2,7 @@
 #include "simdhelpers.h"
 #include "vec3dsimd.h"
 #include "xtensor/xarray.hpp"
+#include <vector>
 
 #if __cplusplus >= 201703L
 #define MYIF(c) if constexpr(c)
@@ -556,3 +557,165 @@ template<class T, int deriv> void boozer_residual_impl(double G, double iota, T&
 }
 
 #endif
+
+// The kernels below evaluate the quantities of the Boozer residual
+//
+//   rtil = w * (G*B - |B|^2 * (xphi + iota*xtheta)),   w = 1/|B| if weight_inv_modB else 1,
+//
+// that boozer_surface_residual and boozer_surface_residual_dB compute in python, without forming
+// the derivatives of B with respect to the surface dofs at all quadrature points at once. Only
+// O(ndofs) scratch memory per quadrature point is used in addition to the outputs.
+
+// Residual r (3*nphi*ntheta) and its Jacobian J (3*nphi*ntheta, ndofs+2) with respect to the
+// surface dofs, iota and G.
+template<class T> void boozer_residual_jacobian_impl(double G, double iota, T& B, T& dB_dx, T& xphi, T& xtheta, T& dx_ds, T& dxphi_ds, T& dxtheta_ds, T& r, T& J, size_t ndofs, bool weight_inv_modB){
+    int nphi = xphi.shape(0);
+    int ntheta = xtheta.shape(1);
+
+    for(int i=0; i<nphi; i++){
+        for(int j=0; j<ntheta; j++){
+            int row = 3*(i*ntheta + j);
+            double B2ij = B(i,j,0)*B(i,j,0) + B(i,j,1)*B(i,j,1) + B(i,j,2)*B(i,j,2);
+            double rB2ij = 1/B2ij;
+            double wij = weight_inv_modB ? sqrt(rB2ij) : 1.;
+
+            double tang_ij[3], res_ij[3];
+            for(int k = 0; k < 3; k++){
+                tang_ij[k] = xphi(i,j,k) + iota*xtheta(i,j,k);
+                res_ij[k] = G*B(i,j,k) - B2ij*tang_ij[k];
+                r(row+k) = wij*res_ij[k];
+            }
+
+            for(int m = 0; m < ndofs; m++){
+                double dB_ijm[3];
+                for(int k = 0; k < 3; k++)
+                    dB_ijm[k] = dB_dx(i,j,0,k)*dx_ds(i,j,0,m) + dB_dx(i,j,1,k)*dx_ds(i,j,1,m) + dB_dx(i,j,2,k)*dx_ds(i,j,2,m);
+                double dB2_ijm = 2*(B(i,j,0)*dB_ijm[0] + B(i,j,1)*dB_ijm[1] + B(i,j,2)*dB_ijm[2]);
+                double dw_ijm = weight_inv_modB ? -0.5*dB2_ijm*wij*rB2ij : 0.;
+                for(int k = 0; k < 3; k++){
+                    double dtang_ijkm = dxphi_ds(i,j,k,m) + iota*dxtheta_ds(i,j,k,m);
+                    double dres_ijkm = G*dB_ijm[k] - dB2_ijm*tang_ij[k] - B2ij*dtang_ijkm;
+                    J(row+k, m) = wij*dres_ijkm + dw_ijm*res_ij[k];
+                }
+            }
+            for(int k = 0; k < 3; k++){
+                J(row+k, ndofs) = -wij*B2ij*xtheta(i,j,k);
+                J(row+k, ndofs+1) = wij*B(i,j,k);
+            }
+        }
+    }
+}
+
+// Contraction sum_ijk u(i,j,k) * d^2 rtil(i,j,k) of the Hessians of the residual with respect to
+// the surface dofs, iota and G with the weights u, which is a (ndofs+2, ndofs+2) matrix.
+template<class T> void boozer_residual_hessian_contract_impl(double G, double iota, T& B, T& dB_dx, T& d2B_dx2, T& xphi, T& xtheta, T& dx_ds, T& dxphi_ds, T& dxtheta_ds, T& u, T& Hu, size_t ndofs, bool weight_inv_modB){
+    int nphi = xphi.shape(0);
+    int ntheta = xtheta.shape(1);
+
+    std::vector<double> dB_ij(3*ndofs), dtang_ij(3*ndofs), dres_ij(3*ndofs);
+    std::vector<double> dB2_ij(ndofs), dmodB_ij(ndofs), dw_ij(ndofs);
+    // d2B_dx2 contracted with dx_ds over its first spatial index: T_ij[(k*3+l)*ndofs+m] = sum_a d2B_k/dx_a dx_l * dx_a/ds_m
+    std::vector<double> T_ij(9*ndofs);
+
+    for(int i=0; i<nphi; i++){
+        for(int j=0; j<ntheta; j++){
+            double B2ij = B(i,j,0)*B(i,j,0) + B(i,j,1)*B(i,j,1) + B(i,j,2)*B(i,j,2);
+            double rB2ij = 1/B2ij;
+            double wij = weight_inv_modB ? sqrt(rB2ij) : 1.;
+            double modB_ij = sqrt(B2ij);
+            double powrmodBijthree = wij*wij*wij;
+
+            double tang_ij[3], res_ij[3], u_ij[3];
+            for(int k = 0; k < 3; k++){
+                tang_ij[k] = xphi(i,j,k) + iota*xtheta(i,j,k);
+                res_ij[k] = G*B(i,j,k) - B2ij*tang_ij[k];
+                u_ij[k] = u(i,j,k);
+            }
+            // the contraction of u with the residual and its derivatives with respect to the weight
+            double ures_ij = u_ij[0]*res_ij[0] + u_ij[1]*res_ij[1] + u_ij[2]*res_ij[2];
+            double utang_ij = u_ij[0]*tang_ij[0] + u_ij[1]*tang_ij[1] + u_ij[2]*tang_ij[2];
+            double uxtheta_ij = u_ij[0]*xtheta(i,j,0) + u_ij[1]*xtheta(i,j,1) + u_ij[2]*xtheta(i,j,2);
+            double uB_ij = u_ij[0]*B(i,j,0) + u_ij[1]*B(i,j,1) + u_ij[2]*B(i,j,2);
+
+            for(int m = 0; m < ndofs; m++){
+                double dB2_ijm = 0.;
+                for(int k = 0; k < 3; k++){
+                    double dB_ijkm = dB_dx(i,j,0,k)*dx_ds(i,j,0,m) + dB_dx(i,j,1,k)*dx_ds(i,j,1,m) + dB_dx(i,j,2,k)*dx_ds(i,j,2,m);
+                    dB_ij[k*ndofs+m] = dB_ijkm;
+                    dB2_ijm += 2*B(i,j,k)*dB_ijkm;
+                    dtang_ij[k*ndofs+m] = dxphi_ds(i,j,k,m) + iota*dxtheta_ds(i,j,k,m);
+                    for(int l = 0; l < 3; l++)
+                        T_ij[(k*3+l)*ndofs+m] = d2B_dx2(i,j,0,l,k)*dx_ds(i,j,0,m) + d2B_dx2(i,j,1,l,k)*dx_ds(i,j,1,m) + d2B_dx2(i,j,2,l,k)*dx_ds(i,j,2,m);
+                }
+                dB2_ij[m] = dB2_ijm;
+                dmodB_ij[m] = 0.5*dB2_ijm*wij;
+                dw_ij[m] = weight_inv_modB ? -dmodB_ij[m]*rB2ij : 0.;
+                for(int k = 0; k < 3; k++)
+                    dres_ij[k*ndofs+m] = G*dB_ij[k*ndofs+m] - dB2_ijm*tang_ij[k] - B2ij*dtang_ij[k*ndofs+m];
+            }
+
+            for(int m = 0; m < ndofs; m++){
+                double udres_ijm = 0., udtang_ijm = 0., udB_ijm = 0., udxtheta_ijm = 0.;
+                for(int k = 0; k < 3; k++){
+                    udres_ijm += u_ij[k]*dres_ij[k*ndofs+m];
+                    udtang_ijm += u_ij[k]*dtang_ij[k*ndofs+m];
+                    udB_ijm += u_ij[k]*dB_ij[k*ndofs+m];
+                    udxtheta_ijm += u_ij[k]*dxtheta_ds(i,j,k,m);
+                }
+                for(int n = m; n < ndofs; n++){
+                    double d2B_ij[3];
+                    for(int k = 0; k < 3; k++)
+                        d2B_ij[k] = T_ij[(k*3+0)*ndofs+m]*dx_ds(i,j,0,n) + T_ij[(k*3+1)*ndofs+m]*dx_ds(i,j,1,n) + T_ij[(k*3+2)*ndofs+m]*dx_ds(i,j,2,n);
+                    double d2B2_ijmn = 2*(dB_ij[m]*dB_ij[n] + dB_ij[ndofs+m]*dB_ij[ndofs+n] + dB_ij[2*ndofs+m]*dB_ij[2*ndofs+n]
+                                          + B(i,j,0)*d2B_ij[0] + B(i,j,1)*d2B_ij[1] + B(i,j,2)*d2B_ij[2]);
+                    double ud2B_ijmn = u_ij[0]*d2B_ij[0] + u_ij[1]*d2B_ij[1] + u_ij[2]*d2B_ij[2];
+                    double udtang_ijn = u_ij[0]*dtang_ij[n] + u_ij[1]*dtang_ij[ndofs+n] + u_ij[2]*dtang_ij[2*ndofs+n];
+                    double udres_ijn = u_ij[0]*dres_ij[n] + u_ij[1]*dres_ij[ndofs+n] + u_ij[2]*dres_ij[2*ndofs+n];
+
+                    // sum_k u_k d2res_k/dmdn
+                    double ud2res_ijmn = G*ud2B_ijmn - udtang_ijn*dB2_ij[m] - udtang_ijm*dB2_ij[n] - utang_ij*d2B2_ijmn;
+                    double d2modB_ijmn = (2*B2ij*d2B2_ijmn - dB2_ij[m]*dB2_ij[n])*powrmodBijthree/4.;
+                    double d2wij_mn = weight_inv_modB ? (2.*dmodB_ij[m]*dmodB_ij[n] - modB_ij*d2modB_ijmn)*powrmodBijthree : 0.;
+                    Hu(m, n) += udres_ijm*dw_ij[n] + udres_ijn*dw_ij[m] + ud2res_ijmn*wij + ures_ij*d2wij_mn;
+                }
+                // mixed derivatives with respect to the surface dofs and iota, and to the surface dofs and G
+                double ud2res_ijmiota = -(dB2_ij[m]*uxtheta_ij + B2ij*udxtheta_ijm);
+                double udres_ijiota = -B2ij*uxtheta_ij;
+                Hu(m, ndofs) += ud2res_ijmiota*wij + udres_ijiota*dw_ij[m];
+                Hu(m, ndofs+1) += udB_ijm*wij + uB_ij*dw_ij[m];
+            }
+        }
+    }
+
+    // symmetrize the Hessian
+    for(int m = 0; m < ndofs+2; m++){
+        for(int n = m+1; n < ndofs+2; n++){
+            Hu(n, m) = Hu(m, n);
+        }
+    }
+}
+
+// Vector-Jacobian product sum_k u(i,j,k) * d rtil(i,j,k)/dB(i,j,l) of the residual with respect to
+// the magnetic field at the quadrature points, of shape (nphi, ntheta, 3).
+template<class T> void boozer_residual_dB_vjp_impl(double G, double iota, T& B, T& xphi, T& xtheta, T& u, T& out, bool weight_inv_modB){
+    int nphi = xphi.shape(0);
+    int ntheta = xtheta.shape(1);
+
+    for(int i=0; i<nphi; i++){
+        for(int j=0; j<ntheta; j++){
+            double B2ij = B(i,j,0)*B(i,j,0) + B(i,j,1)*B(i,j,1) + B(i,j,2)*B(i,j,2);
+            double wij = weight_inv_modB ? 1/sqrt(B2ij) : 1.;
+            double utang_ij = 0., ures_ij = 0.;
+            for(int k = 0; k < 3; k++){
+                double tang_ijk = xphi(i,j,k) + iota*xtheta(i,j,k);
+                utang_ij += u(i,j,k)*tang_ijk;
+                ures_ij += u(i,j,k)*(G*B(i,j,k) - B2ij*tang_ijk);
+            }
+            // dw/dB = -B/|B|^3
+            double dw_coeff = weight_inv_modB ? -ures_ij*wij*wij*wij : 0.;
+            for(int l = 0; l < 3; l++){
+                out(i,j,l) = wij*(G*u(i,j,l) - 2*B(i,j,l)*utang_ij) + dw_coeff*B(i,j,l);
+            }
+        }
+    }
+}
@@ -30,3 +30,28 @@ std::tuple<double, Array, Array> boozer_residual_ds2(double G, double iota, Arra
     return tup;
 }
 
+
+std::tuple<Array, Array> boozer_residual_jacobian(double G, double iota, Array& B, Array& dB_dx, Array& xphi, Array& xtheta, Array& dx_ds, Array& dxphi_ds, Array& dxtheta_ds, bool weight_inv_modB){
+    size_t ndofs = dx_ds.shape(3);
+    size_t num_res = 3 * xphi.shape(0) * xphi.shape(1);
+
+    Array r = xt::zeros<double>({num_res});
+    Array J = xt::zeros<double>({num_res, ndofs+2});
+    boozer_residual_jacobian_impl<Array>(G, iota, B, dB_dx, xphi, xtheta, dx_ds, dxphi_ds, dxtheta_ds, r, J, ndofs, weight_inv_modB);
+    auto tup = std::make_tuple(r, J);
+    return tup;
+}
+
+Array boozer_residual_hessian_contract(double G, double iota, Array& B, Array& dB_dx, Array& d2B_dx2, Array& xphi, Array& xtheta, Array& dx_ds, Array& dxphi_ds, Array& dxtheta_ds, Array& u, bool weight_inv_modB){
+    size_t ndofs = dx_ds.shape(3);
+
+    Array Hu = xt::zeros<double>({ndofs+2, ndofs+2});
+    boozer_residual_hessian_contract_impl<Array>(G, iota, B, dB_dx, d2B_dx2, xphi, xtheta, dx_ds, dxphi_ds, dxtheta_ds, u, Hu, ndofs, weight_inv_modB);
+    return Hu;
+}
+
+Array boozer_residual_dB_vjp(double G, double iota, Array& B, Array& xphi, Array& xtheta, Array& u, bool weight_inv_modB){
+    Array out = xt::zeros<double>({xphi.shape(0), xphi.shape(1), static_cast<size_t>(3)});
+    boozer_residual_dB_vjp_impl<Array>(G, iota, B, xphi, xtheta, u, out, weight_inv_modB);
+    return out;
+}
@@ -853,4 +853,119 @@ Array define_a_uniform_cartesian_grid_between_two_toroidal_surfaces(Array& norma
         }
     }
     return final_grid;
-}
\ No newline at end of file
+}
+// Field of a single dipole m at displacement r = x - x_dipole, added to B:
+// B += 3(m * r)r / |r|^5 - m / |r|^3
+static inline void dipole_B_add(const double* r, const double* m, double* B) {
+    double rmag_2 = r[0] * r[0] + r[1] * r[1] + r[2] * r[2];
+    double rmag_inv = 1.0 / std::sqrt(rmag_2);
+    double rmag_inv_3 = rmag_inv * rmag_inv * rmag_inv;
+    double rmag_inv_5 = rmag_inv_3 * rmag_inv * rmag_inv;
+    double rdotm = r[0] * m[0] + r[1] * m[1] + r[2] * m[2];
+    for (int d = 0; d < 3; ++d)
+        B[d] += 3.0 * rdotm * r[d] * rmag_inv_5 - m[d] * rmag_inv_3;
+}
+
+// Gradient of the field of a single dipole, added to dB (see dipole_field_dB):
+// dB_j/dr_k += 3(m_k * r_j + m_j * r_k + (m_l * r_l) * delta_{jk}) / |r|^5 - 15 (m_l * r_l) * (r_j * r_k) / |r|^7
+static inline void dipole_dB_add(const double* r, const double* m, double* dB) {
+    double rmag_2 = r[0] * r[0] + r[1] * r[1] + r[2] * r[2];
+    double rmag_inv_2 = 1.0 / rmag_2;
+    double rmag_inv_5 = rmag_inv_2 * rmag_inv_2 * std::sqrt(rmag_inv_2);
+    double rdotm = r[0] * m[0] + r[1] * m[1] + r[2] * m[2];
+    for (int j = 0; j < 3; ++j) {
+        for (int k = 0; k < 3; ++k) {
+            double diag = (j == k) ? rdotm : 0.0;
+            dB[3 * j + k] += 3.0 * rmag_inv_5 * ((m[j] * r[k] + m[k] * r[j] + diag) - 5.0 * rdotm * r[j] * r[k] * rmag_inv_2);
+        }
+    }
+}
+
+// Far-field accelerated versions of dipole_field_B and dipole_field_dB.
+// The dipoles must be sorted by cluster, such that cluster c contains the
+// dipoles cluster_starts[c] <= j < cluster_starts[c + 1]. If a cluster is far
+// away from the evaluation point, in the sense that
+// cluster_radii[c] < theta * |x - cluster_centers[c]|, all its dipoles are
+// replaced by a single dipole with the total moment cluster_moments[c] placed
+// at the cluster center (Barnes-Hut opening criterion). Otherwise the dipoles
+// of the cluster are summed directly, so theta = 0 reproduces the direct sum.
+Array dipole_field_B_clustered(Array& points, Array& m_points, Array& m, std::vector<int>& cluster_starts, Array& cluster_centers, Array& cluster_moments, Array& cluster_radii, double theta)
+{
+    if(points.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("points needs to be in row-major storage order");
+    if(m_points.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("m_points needs to be in row-major storage order");
+    if(m.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("m needs to be in row-major storage order");
+
+    int num_points = points.shape(0);
+    int num_clusters = cluster_centers.shape(0);
+    Array B = xt::zeros<double>({points.shape(0), points.shape(1)});
+    double* m_points_ptr = &(m_points(0, 0));
+    double* m_ptr = &(m(0, 0));
+    double fak = 1e-7;  // mu0 divided by 4 * pi factor
+
+    #pragma omp parallel for schedule(static)
+    for (int i = 0; i < num_points; ++i) {
+        double B_i[3] = {0.0, 0.0, 0.0};
+        double r[3];
+        for (int c = 0; c < num_clusters; ++c) {
+            for (int d = 0; d < 3; ++d)
+                r[d] = points(i, d) - cluster_centers(c, d);
+            double rmag = std::sqrt(r[0] * r[0] + r[1] * r[1] + r[2] * r[2]);
+            if (cluster_radii(c) < theta * rmag) {
+                dipole_B_add(r, &(cluster_moments(c, 0)), B_i);
+            } else {
+                for (int j = cluster_starts[c]; j < cluster_starts[c + 1]; ++j) {
+                    for (int d = 0; d < 3; ++d)
+                        r[d] = points(i, d) - m_points_ptr[3 * j + d];
+                    dipole_B_add(r, &(m_ptr[3 * j]), B_i);
+                }
+            }
+        }
+        for (int d = 0; d < 3; ++d)
+            B(i, d) = fak * B_i[d];
+    }
+    return B;
+}
+
+Array dipole_field_dB_clustered(Array& points, Array& m_points, Array& m, std::vector<int>& cluster_starts, Array& cluster_centers, Array& cluster_moments, Array& cluster_radii, double theta)
+{
+    if(points.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("points needs to be in row-major storage order");
+    if(m_points.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("m_points needs to be in row-major storage order");
+    if(m.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("m needs to be in row-major storage order");
+
+    int num_points = points.shape(0);
+    int num_clusters = cluster_centers.shape(0);
+    Array dB = xt::zeros<double>({points.shape(0), points.shape(1), points.shape(1)});
+    double* m_points_ptr = &(m_points(0, 0));
+    double* m_ptr = &(m(0, 0));
+    double fak = 1e-7;  // mu0 divided by 4 * pi factor
+
+    #pragma omp parallel for schedule(static)
+    for (int i = 0; i < num_points; ++i) {
+        double dB_i[9] = {0.0};
+        double r[3];
+        for (int c = 0; c < num_clusters; ++c) {
+            for (int d = 0; d < 3; ++d)
+                r[d] = points(i, d) - cluster_centers(c, d);
+            double rmag = std::sqrt(r[0] * r[0] + r[1] * r[1] + r[2] * r[2]);
+            if (cluster_radii(c) < theta * rmag) {
+                dipole_dB_add(r, &(cluster_moments(c, 0)), dB_i);
+            } else {
+                for (int j = cluster_starts[c]; j < cluster_starts[c + 1]; ++j) {
+                    for (int d = 0; d < 3; ++d)
+                        r[d] = points(i, d) - m_points_ptr[3 * j + d];
+                    dipole_dB_add(r, &(m_ptr[3 * j]), dB_i);
+                }
+            }
+        }
+        for (int j = 0; j < 3; ++j)
+            for (int k = 0; k < 3; ++k)
+                dB(i, j, k) = fak * dB_i[3 * j + k];
+    }
+    return dB;
+}
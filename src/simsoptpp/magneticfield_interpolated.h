@@ -209,3 +209,292 @@ class InterpolatedField : public MagneticField<T> {
             return interp_GradAbsB->estimate_error(this->fbatch_GradAbsB, samples);
         }
 };
+
+/*
+ * Interpolant for the field of a coil set whose coils are organised into
+ * groups that carry a common current. Since B is linear in the currents, the
+ * field of every group is interpolated for unit current, and the total field
+ * is formed as the weighted sum at evaluation time. Changing the currents
+ * therefore does not require rebuilding the interpolant.
+ *
+ * |B| is not linear in the currents, but |B|^2 = sum_{g,h} I_g I_h B_g.B_h is
+ * a quadratic form, so for GradAbsB we interpolate the gradients of the
+ * scalars B_g.B_h for g <= h. These transform like grad |B| under the
+ * symmetries, as long as each group field is symmetric on its own.
+ */
+template<template<class, std::size_t, xt::layout_type> class T>
+class InterpolatedFieldSuperposition : public MagneticField<T> {
+    public:
+        using typename MagneticField<T>::Tensor2;
+        using typename MagneticField<T>::Tensor3;
+    private:
+
+        CachedTensor<T, 2> points_cyl_sym;
+        std::function<Vec(Vec, Vec, Vec)> fbatch_B;
+        std::function<Vec(Vec, Vec, Vec)> fbatch_GradBB;
+        std::function<std::vector<bool>(Vec, Vec, Vec)> skip;
+        shared_ptr<RegularGridInterpolant3D<Tensor2>> interp_B, interp_GradBB;
+        bool status_B = false;
+        bool status_GradBB = false;
+        const bool extrapolate;
+        const bool stellsym = false;
+        const int nfp = 1;
+        vector<bool> symmetries = vector<bool>(1, false);
+        vector<double> currents;
+
+        void build_B() {
+            int ngroups = fields.size();
+            if(!interp_B)
+                interp_B = std::make_shared<RegularGridInterpolant3D<Tensor2>>(rule, r_range, phi_range, z_range, 3*ngroups, extrapolate, skip);
+            if(!status_B) {
+                vector<Tensor2> old_points;
+                for(auto& field : fields)
+                    old_points.push_back(field->get_points_cart());
+                interp_B->interpolate_batch(fbatch_B);
+                for (int g = 0; g < ngroups; ++g)
+                    fields[g]->set_points_cart(old_points[g]);
+                status_B = true;
+            }
+        }
+
+        void build_GradBB() {
+            int ngroups = fields.size();
+            int npairs = (ngroups*(ngroups+1))/2;
+            if(!interp_GradBB)
+                interp_GradBB = std::make_shared<RegularGridInterpolant3D<Tensor2>>(rule, r_range, phi_range, z_range, 3*npairs, extrapolate, skip);
+            if(!status_GradBB) {
+                vector<Tensor2> old_points;
+                for(auto& field : fields)
+                    old_points.push_back(field->get_points_cart());
+                interp_GradBB->interpolate_batch(fbatch_GradBB);
+                for (int g = 0; g < ngroups; ++g)
+                    fields[g]->set_points_cart(old_points[g]);
+                status_GradBB = true;
+            }
+        }
+
+        // evaluates the interpolant at the current points, exploiting the symmetries if requested
+        void evaluate(shared_ptr<RegularGridInterpolant3D<Tensor2>> interp, Tensor2& res) {
+            if(nfp > 1 || stellsym){
+                Tensor2& rphiz = this->get_points_cyl_ref();
+                Tensor2& rphiz_sym = points_cyl_sym.get_or_create({npoints, 3});
+                exploit_symmetries_points(rphiz, rphiz_sym);
+                interp->evaluate_batch(rphiz_sym, res);
+            } else {
+                interp->evaluate_batch(this->get_points_cyl_ref(), res);
+            }
+        }
+
+    protected:
+        void _B_cyl_impl(Tensor2& B_cyl) override {
+            build_B();
+            int ngroups = fields.size();
+            Tensor2 B_groups = xt::zeros<double>({npoints, 3*ngroups});
+            evaluate(interp_B, B_groups);
+            for (int i = 0; i < npoints; ++i) {
+                for (int d = 0; d < 3; ++d) {
+                    double val = 0.;
+                    for (int g = 0; g < ngroups; ++g)
+                        val += currents[g] * B_groups(i, 3*g+d);
+                    B_cyl(i, d) = val;
+                }
+            }
+            if(stellsym)
+                apply_symmetries_to_B_cyl(B_cyl);
+        }
+
+        void _GradAbsB_cyl_impl(Tensor2& GradAbsB_cyl) override {
+            Tensor2& B_cyl = this->B_cyl_ref();
+            build_GradBB();
+            int ngroups = fields.size();
+            int npairs = (ngroups*(ngroups+1))/2;
+            Tensor2 GradBB = xt::zeros<double>({npoints, 3*npairs});
+            evaluate(interp_GradBB, GradBB);
+            for (int i = 0; i < npoints; ++i) {
+                double GradB2[3] = {0., 0., 0.};
+                int p = 0;
+                for (int g = 0; g < ngroups; ++g) {
+                    for (int h = g; h < ngroups; ++h) {
+                        double weight = (g == h ? 1. : 2.) * currents[g] * currents[h];
+                        for (int d = 0; d < 3; ++d)
+                            GradB2[d] += weight * GradBB(i, 3*p+d);
+                        p++;
+                    }
+                }
+                double AbsB = std::sqrt(B_cyl(i, 0)*B_cyl(i, 0) + B_cyl(i, 1)*B_cyl(i, 1) + B_cyl(i, 2)*B_cyl(i, 2));
+                for (int d = 0; d < 3; ++d)
+                    GradAbsB_cyl(i, d) = GradB2[d]/(2*AbsB);
+            }
+            if(stellsym)
+                apply_symmetries_to_GradAbsB_cyl(GradAbsB_cyl);
+        }
+
+        void _B_impl(Tensor2& B) override {
+            Tensor2& B_cyl = this->B_cyl_ref();
+            Tensor2& rphiz = this->get_points_cyl_ref();
+            int npoints = B.shape(0);
+            for (int i = 0; i < npoints; ++i) {
+                double phi = rphiz(i, 1);
+                B(i, 0) = std::cos(phi)*B_cyl(i, 0) - std::sin(phi)*B_cyl(i, 1);
+                B(i, 1) = std::sin(phi)*B_cyl(i, 0) + std::cos(phi)*B_cyl(i, 1);
+                B(i, 2) = B_cyl(i, 2);
+            }
+        }
+
+        void _GradAbsB_impl(Tensor2& GradAbsB) override {
+            Tensor2& GradAbsB_cyl = this->GradAbsB_cyl_ref();
+            Tensor2& rphiz = this->get_points_cyl_ref();
+            int npoints = GradAbsB.shape(0);
+            for (int i = 0; i < npoints; ++i) {
+                double phi = rphiz(i, 1);
+                GradAbsB(i, 0) = std::cos(phi)*GradAbsB_cyl(i, 0) - std::sin(phi)*GradAbsB_cyl(i, 1);
+                GradAbsB(i, 1) = std::sin(phi)*GradAbsB_cyl(i, 0) + std::cos(phi)*GradAbsB_cyl(i, 1);
+                GradAbsB(i, 2) = GradAbsB_cyl(i, 2);
+            }
+        }
+
+        void exploit_symmetries_points(Tensor2& rphiz, Tensor2& rphiz_sym){
+            int npoints = rphiz.shape(0);
+            if(symmetries.size() != npoints)
+                symmetries = vector<bool>(npoints, false);
+            double period = (2*M_PI)/nfp;
+            double* dataptr = &(rphiz(0, 0));
+            double* datasymptr = &(rphiz_sym(0, 0));
+            for (int i = 0; i < npoints; ++i) {
+                double r = dataptr[3*i+0];
+                double phi = dataptr[3*i+1];
+                double z = dataptr[3*i+2];
+                if(z < 0 && stellsym) {
+                    z = -z;
+                    phi = 2*M_PI-phi;
+                    symmetries[i] = true;
+                }else{
+                    symmetries[i] = false;
+                }
+                int phi_mult = int(phi/period);
+                phi = phi - phi_mult * period;
+                datasymptr[3*i+0] = r;
+                datasymptr[3*i+1] = phi;
+                datasymptr[3*i+2] = z;
+            }
+        }
+
+        void apply_symmetries_to_B_cyl(Tensor2& field){
+            int npoints = field.shape(0);
+            for (int i = 0; i < npoints; ++i) {
+                if(symmetries[i])
+                    field(i, 0) = -field(i, 0);
+            }
+        }
+
+        void apply_symmetries_to_GradAbsB_cyl(Tensor2& field){
+            int npoints = field.shape(0);
+            for (int i = 0; i < npoints; ++i) {
+                if(symmetries[i]){
+                    field(i, 1) = -field(i, 1);
+                    field(i, 2) = -field(i, 2);
+                }
+            }
+        }
+
+
+    public:
+        const vector<shared_ptr<MagneticField<T>>> fields;
+        const RangeTriplet r_range, phi_range, z_range;
+        using MagneticField<T>::npoints;
+        const InterpolationRule rule;
+
+        InterpolatedFieldSuperposition(
+                vector<shared_ptr<MagneticField<T>>> fields, vector<double> currents, InterpolationRule rule,
+                RangeTriplet r_range, RangeTriplet phi_range, RangeTriplet z_range,
+                bool extrapolate, int nfp, bool stellsym, std::function<std::vector<bool>(Vec, Vec, Vec)> skip) :
+            fields(fields), rule(rule), r_range(r_range), phi_range(phi_range), z_range(z_range), extrapolate(extrapolate), nfp(nfp), stellsym(stellsym),
+            skip(skip)
+        {
+            if(fields.size() == 0)
+                throw std::invalid_argument("At least one field is required.");
+            set_currents(currents);
+
+            fbatch_B = [this](Vec r, Vec phi, Vec z) {
+                int npoints = r.size();
+                int ngroups = this->fields.size();
+                Tensor2 points = xt::zeros<double>({npoints, 3});
+                for(int i=0; i<npoints; i++) {
+                    points(i, 0) = r[i];
+                    points(i, 1) = phi[i];
+                    points(i, 2) = z[i];
+                }
+                auto res = Vec(3*ngroups*npoints, 0.);
+                for (int g = 0; g < ngroups; ++g) {
+                    this->fields[g]->set_points_cyl(points);
+                    Tensor2& B_cyl = this->fields[g]->B_cyl_ref();
+                    for (int i = 0; i < npoints; ++i)
+                        for (int d = 0; d < 3; ++d)
+                            res[3*ngroups*i + 3*g + d] = B_cyl(i, d);
+                }
+                return res;
+            };
+
+            fbatch_GradBB = [this](Vec r, Vec phi, Vec z) {
+                int npoints = r.size();
+                int ngroups = this->fields.size();
+                int npairs = (ngroups*(ngroups+1))/2;
+                Tensor2 points = xt::zeros<double>({npoints, 3});
+                for(int i=0; i<npoints; i++) {
+                    points(i, 0) = r[i];
+                    points(i, 1) = phi[i];
+                    points(i, 2) = z[i];
+                }
+                vector<Tensor2> B;
+                vector<Tensor3> dB;
+                for (int g = 0; g < ngroups; ++g) {
+                    this->fields[g]->set_points_cyl(points);
+                    B.push_back(this->fields[g]->B());
+                    dB.push_back(this->fields[g]->dB_by_dX());
+                }
+                auto res = Vec(3*npairs*npoints, 0.);
+                for (int i = 0; i < npoints; ++i) {
+                    double c = std::cos(phi[i]);
+                    double s = std::sin(phi[i]);
+                    int p = 0;
+                    for (int g = 0; g < ngroups; ++g) {
+                        for (int h = g; h < ngroups; ++h) {
+                            // gradient of B_g . B_h in cartesian coordinates
+                            double grad[3];
+                            for (int j = 0; j < 3; ++j) {
+                                grad[j] = 0.;
+                                for (int l = 0; l < 3; ++l)
+                                    grad[j] += dB[g](i, j, l) * B[h](i, l) + B[g](i, l) * dB[h](i, j, l);
+                            }
+                            res[3*npairs*i + 3*p + 0] = c*grad[0] + s*grad[1];
+                            res[3*npairs*i + 3*p + 1] = -s*grad[0] + c*grad[1];
+                            res[3*npairs*i + 3*p + 2] = grad[2];
+                            p++;
+                        }
+                    }
+                }
+                return res;
+            };
+        }
+
+        InterpolatedFieldSuperposition(
+                vector<shared_ptr<MagneticField<T>>> fields, vector<double> currents, int degree,
+                RangeTriplet r_range, RangeTriplet phi_range, RangeTriplet z_range,
+                bool extrapolate, int nfp, bool stellsym, std::function<std::vector<bool>(Vec, Vec, Vec)> skip) : InterpolatedFieldSuperposition(fields, currents, UniformInterpolationRule(degree), r_range, phi_range, z_range, extrapolate, nfp, stellsym, skip) {}
+
+        void set_currents(vector<double> new_currents) {
+            if(new_currents.size() != fields.size())
+                throw std::invalid_argument("The number of currents has to match the number of fields.");
+            currents = new_currents;
+            this->invalidate_cache();
+        }
+
+        vector<double> get_currents() {
+            return currents;
+        }
+
+        std::pair<double, double> estimate_error_B(int samples) {
+            build_B();
+            return interp_B->estimate_error(this->fbatch_B, samples);
+        }
+};
@@ -7,6 +7,8 @@
 #include <functional>
 #include <vector>
 #include <math.h>
+#include <numeric>
+#include <queue>
 
 // Project a 3-vector onto the L2 ball with radius m_maxima
 std::tuple<double, double, double> projection_L2_balls(double x1, double x2, double x3, double m_maxima) {
@@ -350,31 +352,152 @@ void print_GPMO(int k, int ngrid, int& print_iter, Array& x, double* Aij_mj_ptr,
     return;
 }
 
-// compute which dipoles are directly adjacent to every dipole
-Array connectivity_matrix(Array& dipole_grid_xyz, int Nadjacent)
+// Build a k-d tree over the points xyz (shape (n, 3), row-major). The tree is
+// stored implicitly in the index array idx: the node covering idx[lo:hi] is
+// split at mid = (lo + hi) / 2 along dimension split_dim[mid], with all points
+// in idx[lo:mid] having a coordinate <= split_val[mid] and all points in
+// idx[mid:hi] having a coordinate >= split_val[mid].
+void kdtree_build(const vector<double>& xyz, vector<int>& idx, vector<int>& split_dim, vector<double>& split_val, int lo, int hi)
+{
+    if (hi - lo <= KDTREE_LEAF_SIZE) return;
+    // split along the dimension with the largest extent
+    double lower[3] = {1e300, 1e300, 1e300};
+    double upper[3] = {-1e300, -1e300, -1e300};
+    for (int i = lo; i < hi; ++i) {
+        for (int d = 0; d < 3; ++d) {
+            lower[d] = std::min(lower[d], xyz[3 * idx[i] + d]);
+            upper[d] = std::max(upper[d], xyz[3 * idx[i] + d]);
+        }
+    }
+    int dim = 0;
+    for (int d = 1; d < 3; ++d) {
+        if (upper[d] - lower[d] > upper[dim] - lower[dim]) dim = d;
+    }
+    int mid = (lo + hi) / 2;
+    std::nth_element(idx.begin() + lo, idx.begin() + mid, idx.begin() + hi,
+        [&xyz, dim](int a, int b) { return xyz[3 * a + dim] < xyz[3 * b + dim]; });
+    split_dim[mid] = dim;
+    split_val[mid] = xyz[3 * idx[mid] + dim];
+    kdtree_build(xyz, idx, split_dim, split_val, lo, mid);
+    kdtree_build(xyz, idx, split_dim, split_val, mid, hi);
+}
+
+// Collect the k nearest neighbours of point q in the subtree idx[lo:hi]. The
+// heap is a max-heap of (squared distance, index) pairs, so that ties in the
+// distance are broken in favour of the lower index.
+void kdtree_knn(const vector<double>& xyz, const vector<int>& idx, const vector<int>& split_dim, const vector<double>& split_val, int lo, int hi, const double* q, int k, std::priority_queue<std::pair<double, int>>& heap)
+{
+    if (hi - lo <= KDTREE_LEAF_SIZE) {
+        for (int i = lo; i < hi; ++i) {
+            int p = idx[i];
+            double dx = xyz[3 * p] - q[0];
+            double dy = xyz[3 * p + 1] - q[1];
+            double dz = xyz[3 * p + 2] - q[2];
+            std::pair<double, int> cand(dx * dx + dy * dy + dz * dz, p);
+            if ((int) heap.size() < k) heap.push(cand);
+            else if (cand < heap.top()) {
+                heap.pop();
+                heap.push(cand);
+            }
+        }
+        return;
+    }
+    int mid = (lo + hi) / 2;
+    int dim = split_dim[mid];
+    double diff = q[dim] - split_val[mid];
+    if (diff < 0) {
+        kdtree_knn(xyz, idx, split_dim, split_val, lo, mid, q, k, heap);
+        if ((int) heap.size() < k || diff * diff <= heap.top().first)
+            kdtree_knn(xyz, idx, split_dim, split_val, mid, hi, q, k, heap);
+    }
+    else {
+        kdtree_knn(xyz, idx, split_dim, split_val, mid, hi, q, k, heap);
+        if ((int) heap.size() < k || diff * diff <= heap.top().first)
+            kdtree_knn(xyz, idx, split_dim, split_val, lo, mid, q, k, heap);
+    }
+}
+
+// compute which dipoles are directly adjacent to every dipole. Row j contains
+// the indices of the Nneighbors dipoles closest to dipole j (including j
+// itself), sorted by distance. The neighbours are found with a k-d tree, so
+// the cost is O(Ndipole * Nneighbors * log(Ndipole)) rather than O(Ndipole^2).
+// If there are fewer than Nneighbors dipoles, the remaining columns repeat
+// the farthest dipole.
+Array connectivity_matrix(Array& dipole_grid_xyz, int Nneighbors)
 {
     int Ndipole = dipole_grid_xyz.shape(0);
-    Array connectivity_inds = xt::zeros<int>({Ndipole, 2000});
-    
-    // Compute distances between dipole j and all other dipoles
-    // By default computes distance between dipole j and itself
+    int Nfound = std::min(Nneighbors, Ndipole);
+    Array connectivity_inds = xt::zeros<int>({Ndipole, Nneighbors});
+
+    vector<double> xyz(3 * Ndipole);
+    for (int j = 0; j < Ndipole; ++j) {
+        for (int d = 0; d < 3; ++d) {
+            xyz[3 * j + d] = dipole_grid_xyz(j, d);
+        }
+    }
+    vector<int> idx(Ndipole);
+    vector<int> split_dim(Ndipole, 0);
+    vector<double> split_val(Ndipole, 0.0);
+    std::iota(idx.begin(), idx.end(), 0);
+    kdtree_build(xyz, idx, split_dim, split_val, 0, Ndipole);
+
 #pragma omp parallel for schedule(static)
     for (int j = 0; j < Ndipole; ++j) {
-	vector<double> dist_ij(Ndipole, 1e10);
-        for (int i = 0; i < Ndipole; ++i) {
-	     dist_ij[i] = sqrt((dipole_grid_xyz(i, 0) - dipole_grid_xyz(j, 0)) * (dipole_grid_xyz(i, 0) - dipole_grid_xyz(j, 0)) + (dipole_grid_xyz(i, 1) - dipole_grid_xyz(j, 1)) * (dipole_grid_xyz(i, 1) - dipole_grid_xyz(j, 1)) + (dipole_grid_xyz(i, 2) - dipole_grid_xyz(j, 2)) * (dipole_grid_xyz(i, 2) - dipole_grid_xyz(j, 2)));
-	}
-        for (int k = 0; k < 2000; ++k) {
-	    auto result = std::min_element(dist_ij.begin(), dist_ij.end());
-            int dist_ind = std::distance(dist_ij.begin(), result);
-	    connectivity_inds(j, k) = dist_ind;
-	    //printf("%d %d %d %f %d\n", j, k, Nadjacent, dist_ij[dist_ind], dist_ind);
-            dist_ij[dist_ind] = 1e10; // eliminate the min to get the next min
-	}
+        std::priority_queue<std::pair<double, int>> heap;
+        kdtree_knn(xyz, idx, split_dim, split_val, 0, Ndipole, &(xyz[3 * j]), Nfound, heap);
+        // the heap pops the farthest neighbour first
+        for (int k = Nfound - 1; k >= 0; --k) {
+            connectivity_inds(j, k) = heap.top().second;
+            heap.pop();
+        }
+        for (int k = Nfound; k < Nneighbors; ++k) {
+            connectivity_inds(j, k) = connectivity_inds(j, Nfound - 1);
+        }
     }
     return connectivity_inds;
 }
 
+// Compute the correlations ATr_j = a_j . r between every row a_j of A_obj
+// (shape (3N, ngrid)) and the residual r, as well as the squared norms
+// |a_j|^2. Since |r + s a_j|^2 = |r|^2 + 2 s ATr_j + |a_j|^2, these are all
+// that is needed to score every candidate dipole in the GPMO algorithms.
+void GPMO_initialize_correlations(Array& A_obj, double* Aij_mj_ptr, vector<double>& ATr, vector<double>& A_norms2)
+{
+    int ngrid = A_obj.shape(1);
+    int N3 = A_obj.shape(0);
+    double* Aij_ptr = &(A_obj(0, 0));
+#pragma omp parallel for schedule(static)
+    for (int j = 0; j < N3; ++j) {
+        double dot = 0.0;
+        double norm2 = 0.0;
+        int nj = ngrid * j;
+        for (int i = 0; i < ngrid; ++i) {
+            dot += Aij_ptr[i + nj] * Aij_mj_ptr[i];
+            norm2 += Aij_ptr[i + nj] * Aij_ptr[i + nj];
+        }
+        ATr[j] = dot;
+        A_norms2[j] = norm2;
+    }
+}
+
+// Rank-one update of the correlations after the residual changed by
+// fac * v, i.e. ATr += fac * A v.
+void GPMO_update_correlations(Array& A_obj, const double* v, double fac, vector<double>& ATr)
+{
+    int ngrid = A_obj.shape(1);
+    int N3 = A_obj.shape(0);
+    double* Aij_ptr = &(A_obj(0, 0));
+#pragma omp parallel for schedule(static)
+    for (int j = 0; j < N3; ++j) {
+        double dot = 0.0;
+        int nj = ngrid * j;
+        for (int i = 0; i < ngrid; ++i) {
+            dot += Aij_ptr[i + nj] * v[i];
+        }
+        ATr[j] += fac * dot;
+    }
+}
+
 // GPMO algorithm with backtracking to fix wyrms -- close cancellations between
 // two nearby, oppositely oriented magnets. 
 std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, int K, bool verbose, int nhistory, int backtracking, Array& dipole_grid_xyz, int single_direction, int Nadjacent, int max_nMagnets)
@@ -422,6 +545,14 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Ar
     // get indices for dipoles that are adjacent to dipole j
     Array Connect = connectivity_matrix(dipole_grid_xyz, Nadjacent);
 
+    // correlations of the residual with every column of A, updated
+    // incrementally as dipoles are placed and removed
+    vector<double> ATr(N3);
+    vector<double> A_norms2(N3);
+    GPMO_initialize_correlations(A_obj, Aij_mj_ptr, ATr, A_norms2);
+    // contribution to Aij * mj of a wyrm pair that is removed
+    vector<double> v(ngrid);
+
     // if using a single direction, increase j by 3 each iteration
     int j_update = 1;
     if (single_direction >= 0) j_update = 3;
@@ -436,17 +567,10 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Ar
 
 	    // Check all the allowed dipole positions
 	    if (Gamma_ptr[j]) {
-		double R2 = 0.0;
-		double R2minus = 0.0;
-		int nj = ngrid * j;
-
-		// Compute contribution of jth dipole component, either with +- orientation
-		for(int i = 0; i < ngrid; ++i) {
-		    R2 += (Aij_mj_ptr[i] + Aij_ptr[i + nj]) * (Aij_mj_ptr[i] + Aij_ptr[i + nj]); 
-		    R2minus += (Aij_mj_ptr[i] - Aij_ptr[i + nj]) * (Aij_mj_ptr[i] - Aij_ptr[i + nj]); 
-		}
-		R2s_ptr[j] = R2 + (mmax_ptr[j] * mmax_ptr[j]);
-		R2s_ptr[j + N3] = R2minus + (mmax_ptr[j] * mmax_ptr[j]);
+		// Contribution of jth dipole component, either with +- orientation,
+		// up to the constant |Am - b|^2
+		R2s_ptr[j] = A_norms2[j] + 2.0 * ATr[j] + (mmax_ptr[j] * mmax_ptr[j]);
+		R2s_ptr[j + N3] = A_norms2[j] - 2.0 * ATr[j] + (mmax_ptr[j] * mmax_ptr[j]);
 	    }
 	}
 
@@ -476,6 +600,7 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Ar
 	for(int i = 0; i < ngrid; ++i) {
             Aij_mj_ptr[i] += sign_fac[k] * Aij_ptr[i + skj_inds];
 	}
+	GPMO_update_correlations(A_obj, Aij_ptr + skj_inds, sign_fac[k], ATr);
         for (int j = 0; j < 3; ++j) {
             Gamma_complement(skj[k], j) = false;
 	    R2s[3 * skj[k] + j] = 1e50;
@@ -510,8 +635,11 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Ar
 	                 int skj_ind2 = (3 * cj + skjj_ind[cj]) * ngrid;
 #pragma omp parallel for schedule(static)
 			 for(int i = 0; i < ngrid; ++i) {
-		             Aij_mj_ptr[i] -= sk_sign_fac[jk] * Aij_ptr[i + skj_ind1] + sk_sign_fac[cj] * Aij_ptr[i + skj_ind2];
+		             v[i] = sk_sign_fac[jk] * Aij_ptr[i + skj_ind1] + sk_sign_fac[cj] * Aij_ptr[i + skj_ind2];
+		             Aij_mj_ptr[i] -= v[i];
 			 }
+			 // one pass over A_obj for both dipoles of the pair
+			 GPMO_update_correlations(A_obj, &(v[0]), -1.0, ATr);
 	                 mmax_sum -= mmax_ptr[jk] * mmax_ptr[jk];
 	                 mmax_sum -= mmax_ptr[cj] * mmax_ptr[cj];
 			 // set sign_fac = 0 so that these magnets do not keep getting dewyrmed
@@ -618,8 +746,9 @@ std::tuple<Array, Array, Array, Array> GPMO_multi(Array& A_obj, Array& b_obj, Ar
     double mmax_sum = 0.0;
     double* mmax_ptr = &(mmax(0));
     
-    // get indices for dipoles that are adjacent to dipole j
-    Array Connect = connectivity_matrix(dipole_grid_xyz, Nadjacent);
+    // get indices for dipoles that are adjacent to dipole j, plus extra
+    // neighbours to fall back on when the closest ones are already filled
+    Array Connect = connectivity_matrix(dipole_grid_xyz, 2000);
     
     // if using a single direction, increase j by 3 each iteration
     int j_update = 1;
@@ -726,7 +855,10 @@ std::tuple<Array, Array, Array, Array> GPMO_multi(Array& A_obj, Array& b_obj, Ar
 //
 // The A matrix should be rescaled by m_maxima since we are assuming all ones 
 // in m.
-std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
+//
+// Besides the history arrays and the solution, the number of recorded entries
+// of the history arrays is returned.
+std::tuple<Array, Array, Array, Array, Array, int> GPMO_ArbVec_backtracking(
     Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, 
     Array& pol_vectors, int K, bool verbose, int nhistory, int backtracking, 
     Array& dipole_grid_xyz, int Nadjacent, double thresh_angle, 
@@ -791,6 +923,28 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
     print_GPMO(0, ngrid, print_iter, x, Aij_mj_ptr, objective_history, 
         Bn_history, m_history, mmax_sum, normal_norms_ptr);
 
+    // Correlations of the residual with every column of A, updated
+    // incrementally as dipoles are placed and removed, and the 3x3 Gram
+    // blocks of the columns belonging to each dipole. Together these give
+    // the objective for every polarization vector without touching A.
+    vector<double> ATr(N3);
+    vector<double> A_norms2(N3);
+    GPMO_initialize_correlations(A_obj, Aij_mj_ptr, ATr, A_norms2);
+    vector<double> A_gram(9 * N);
+#pragma omp parallel for schedule(static)
+    for (int j = 0; j < N; ++j) {
+        for (int l = 0; l < 3; ++l) {
+            for (int ll = 0; ll < 3; ++ll) {
+                double dot = 0.0;
+                for (int i = 0; i < ngrid; ++i) {
+                    dot += Aij_ptr[i + ngrid * (3*j + l)] * Aij_ptr[i + ngrid * (3*j + ll)];
+                }
+                A_gram[9*j + 3*l + ll] = dot;
+            }
+        }
+    }
+    vector<double> v(ngrid);
+
     // Main loop over the optimization iterations
     for (int k = 0; k < K; ++k) {
 
@@ -803,23 +957,21 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
                 for (int m = 0; m < nPolVecs; m++) {
 
                     int mj = j*nPolVecs + m;
-		    double R2 = 0.0;
-                    double R2minus = 0.0;
+                    const double* pol_vec_jm = pol_vec_ptr + 3*(nPolVecs*j+m);
 
-                    // Contribution to the normal field from the mth 
-                    // allowable polarization vector
-                    for(int i = 0; i < ngrid; ++i) {
-                        double bnorm = 0.0;
-                        for (int l = 0; l < 3; ++l) {
-                            int nj3 = ngrid * (3*j + l);
-                            double pol_vec_l = pol_vec_ptr[l+3*(nPolVecs*j+m)];
-                            bnorm += pol_vec_l * Aij_ptr[i+nj3];
+                    // Correlation of the residual with the normal field from
+                    // the mth allowable polarization vector, and the squared
+                    // norm of that normal field
+                    double rb = 0.0;
+                    double bb = 0.0;
+                    for (int l = 0; l < 3; ++l) {
+                        rb += pol_vec_jm[l] * ATr[3*j + l];
+                        for (int ll = 0; ll < 3; ++ll) {
+                            bb += pol_vec_jm[l] * pol_vec_jm[ll] * A_gram[9*j + 3*l + ll];
                         }
-                        R2 += (Aij_mj_ptr[i] + bnorm) * (Aij_mj_ptr[i] + bnorm);
-                        R2minus += (Aij_mj_ptr[i] - bnorm) * (Aij_mj_ptr[i] - bnorm);
                     }
-		    R2s_ptr[mj] = R2 + (mmax_ptr[j] * mmax_ptr[j]);
-                    R2s_ptr[mj + NNp] = R2minus + (mmax_ptr[j] * mmax_ptr[j]);
+		    R2s_ptr[mj] = bb + 2.0 * rb + (mmax_ptr[j] * mmax_ptr[j]);
+                    R2s_ptr[mj + NNp] = bb - 2.0 * rb + (mmax_ptr[j] * mmax_ptr[j]);
 		}
 	    }
 	}
@@ -841,6 +993,7 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
 
 	// Add binary magnet and get rid of the magnet (all three components)
         // from the complement of Gamma 
+        std::fill(v.begin(), v.end(), 0.0);
         for (int l = 0; l < 3; ++l) {
             int pol_ind = l + 3 * (nPolVecs * skj[k] + skjj[k]);
 	    int skj_inds = (3 * skj[k] + l) * ngrid;
@@ -848,8 +1001,10 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
 #pragma omp parallel for schedule(static)
 	    for(int i = 0; i < ngrid; ++i) {
                 Aij_mj_ptr[i] += sign_fac[k] * pol_vec_ptr[pol_ind] * Aij_ptr[i + skj_inds];
+                v[i] += pol_vec_ptr[pol_ind] * Aij_ptr[i + skj_inds];
             }
 	}
+        GPMO_update_correlations(A_obj, &(v[0]), sign_fac[k], ATr);
         Gamma_complement(skj[k]) = false;
         for (int m = 0; m < nPolVecs; ++m) {
 	    R2s[skj[k]*nPolVecs + m] = 1e50;
@@ -902,18 +1057,21 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
                     // Subtract the pair's contribution to Aij * mj
                     #pragma omp parallel for schedule(static)
                     for (int i = 0; i < ngrid; ++i) {
+                        v[i] = 0.0;
                         for (int l = 0; l < 3; ++l) {
                             int A_ind_k = ngrid * (3*j      + l);
                             int A_ind_c = ngrid * (3*cj_min + l);
                             int pol_ind_k = l + 3*(j*nPolVecs      + m);
                             int pol_ind_c = l + 3*(cj_min*nPolVecs + cm_min);
-                            Aij_mj_ptr[i] -= 
+                            v[i] += 
                                 x_sign[j] * pol_vec_ptr[pol_ind_k] 
                                           * Aij_ptr[i + A_ind_k]
                               + x_sign[cj_min] * pol_vec_ptr[pol_ind_c]
                                                * Aij_ptr[i + A_ind_c];
                         }
+                        Aij_mj_ptr[i] -= v[i];
                     }
+                    GPMO_update_correlations(A_obj, &(v[0]), -1.0, ATr);
 
                     // Reset the solution vectors
                     for (int l = 0; l < 3; ++l) {
@@ -982,8 +1140,9 @@ std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
 
     }
 
+    // print_iter is the number of recorded history entries
     return std::make_tuple(objective_history, Bn_history, m_history, 
-                           num_nonzeros, x);
+                           num_nonzeros, x, print_iter);
 }
 
 /*  
@@ -1272,6 +1431,12 @@ std::tuple<Array, Array, Array, Array> GPMO_baseline(Array& A_obj, Array& b_obj,
     double* normal_norms_ptr = &(normal_norms(0));
     double* mmax_ptr = &(mmax(0));
 
+    // correlations of the residual with every column of A, updated
+    // incrementally as dipoles are placed
+    vector<double> ATr(N3);
+    vector<double> A_norms2(N3);
+    GPMO_initialize_correlations(A_obj, Aij_mj_ptr, ATr, A_norms2);
+
     // if using a single direction, increase j by 3 each iteration
     int j_update = 1;
     if (single_direction >= 0) j_update = 3;
@@ -1283,17 +1448,10 @@ std::tuple<Array, Array, Array, Array> GPMO_baseline(Array& A_obj, Array& b_obj,
 
 	    // Check all the allowed dipole positions
 	    if (Gamma_ptr[j]) {
-		double R2 = 0.0;
-		double R2minus = 0.0;
-		int nj = ngrid * j;
-
-		// Compute contribution of jth dipole component, either with +- orientation
-		for(int i = 0; i < ngrid; ++i) {
-		    R2 += (Aij_mj_ptr[i] + Aij_ptr[i + nj]) * (Aij_mj_ptr[i] + Aij_ptr[i + nj]);
-		    R2minus += (Aij_mj_ptr[i] - Aij_ptr[i + nj]) * (Aij_mj_ptr[i] - Aij_ptr[i + nj]); 
-		}
-		R2s_ptr[j] = R2 + (mmax_ptr[j] * mmax_ptr[j]);
-		R2s_ptr[j + N3] = R2minus + (mmax_ptr[j] * mmax_ptr[j]);
+		// Contribution of jth dipole component, either with +- orientation,
+		// up to the constant |Am - b|^2
+		R2s_ptr[j] = A_norms2[j] + 2.0 * ATr[j] + (mmax_ptr[j] * mmax_ptr[j]);
+		R2s_ptr[j + N3] = A_norms2[j] - 2.0 * ATr[j] + (mmax_ptr[j] * mmax_ptr[j]);
 	    }
 	}
 
@@ -1317,6 +1475,7 @@ std::tuple<Array, Array, Array, Array> GPMO_baseline(Array& A_obj, Array& b_obj,
 	for(int i = 0; i < ngrid; ++i) {
             Aij_mj_ptr[i] += sign_fac[k] * Aij_ptr[i + skj_inds];
 	}
+	GPMO_update_correlations(A_obj, Aij_ptr + skj_inds, sign_fac[k], ATr);
         for (int j = 0; j < 3; ++j) {
             Gamma_complement(skj[k], j) = false;
 	    R2s[3 * skj[k] + j] = 1e50;
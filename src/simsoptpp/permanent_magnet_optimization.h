@@ -3,6 +3,7 @@
 #include <cmath>  // pow function
 #include <tuple>  // c++ tuples
 #include <algorithm>  // std::min_element function
+#include <queue>  // std::priority_queue for the k-d tree
 #include "xtensor-python/pyarray.hpp"     // Numpy bindings
 typedef xt::pyarray<double> Array;
 using std::vector;
@@ -23,7 +24,7 @@ std::tuple<Array, Array, Array, Array> MwPGP_algorithm(Array& A_obj, Array& b_ob
 std::tuple<Array, Array, Array, Array, Array> GPMO_backtracking(Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, int K, bool verbose, int nhistory, int backtracking, Array& dipole_grid_xyz, int single_direction, int Nadjacent, int max_nMagnets);
 std::tuple<Array, Array, Array, Array> GPMO_multi(Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, int K, bool verbose, int nhistory, Array& dipole_grid_xyz, int single_direction, int Nadjacent);
 std::tuple<Array, Array, Array, Array> GPMO_ArbVec(Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, Array& pol_vectors, int K, bool verbose, int nhistory);
-std::tuple<Array, Array, Array, Array, Array> GPMO_ArbVec_backtracking(
+std::tuple<Array, Array, Array, Array, Array, int> GPMO_ArbVec_backtracking(
     Array& A_obj, Array& b_obj, Array& mmax, Array& normal_norms, 
     Array& pol_vectors, int K, bool verbose, int nhistory, int backtracking, 
     Array& dipole_grid_xyz, int Nadjacent, double thresh_angle, 
@@ -32,7 +33,14 @@ std::tuple<Array, Array, Array, Array> GPMO_baseline(Array& A_obj, Array& b_obj,
 
 // helper functions for GPMO algorithm
 void print_GPMO(int k, int ngrid, int& print_iter, Array& x, double* Aij_mj_ptr, Array& objective_history, Array& Bn_history, Array& m_history, double mmax_sum, double* normal_norms_ptr); 
-Array connectivity_matrix(Array& dipole_grid_xyz, int Nadjacent);
+Array connectivity_matrix(Array& dipole_grid_xyz, int Nneighbors);
+void GPMO_initialize_correlations(Array& A_obj, double* Aij_mj_ptr, vector<double>& ATr, vector<double>& A_norms2);
+void GPMO_update_correlations(Array& A_obj, const double* v, double fac, vector<double>& ATr);
+
+// k-d tree helpers for nearest neighbour searches on the dipole grid
+const int KDTREE_LEAF_SIZE = 16;
+void kdtree_build(const vector<double>& xyz, vector<int>& idx, vector<int>& split_dim, vector<double>& split_val, int lo, int hi);
+void kdtree_knn(const vector<double>& xyz, const vector<int>& idx, const vector<int>& split_dim, const vector<double>& split_val, int lo, int hi, const double* q, int k, std::priority_queue<std::pair<double, int>>& heap);
 void initialize_GPMO_ArbVec(Array& x_init, Array& pol_vectors, 
          Array& x, vector<int>& x_vec, vector<int>& x_sign, 
          Array& A_obj, Array& Aij_mj_sum, vector<double>& R2s, 
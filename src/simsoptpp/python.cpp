@@ -65,6 +65,8 @@ PYBIND11_MODULE(simsoptpp, m) {
     m.def("dipole_field_A" , &dipole_field_A);
     m.def("dipole_field_dB", &dipole_field_dB);
     m.def("dipole_field_dA" , &dipole_field_dA);
+    m.def("dipole_field_B_clustered", &dipole_field_B_clustered, py::arg("points"), py::arg("m_points"), py::arg("m"), py::arg("cluster_starts"), py::arg("cluster_centers"), py::arg("cluster_moments"), py::arg("cluster_radii"), py::arg("theta"));
+    m.def("dipole_field_dB_clustered", &dipole_field_dB_clustered, py::arg("points"), py::arg("m_points"), py::arg("m"), py::arg("cluster_starts"), py::arg("cluster_centers"), py::arg("cluster_moments"), py::arg("cluster_radii"), py::arg("theta"));
     m.def("dipole_field_Bn" , &dipole_field_Bn, py::arg("points"), py::arg("m_points"), py::arg("unitnormal"), py::arg("nfp"), py::arg("stellsym"), py::arg("b"), py::arg("coordinate_flag") = "cartesian", py::arg("R0") = 0.0);
     m.def("define_a_uniform_cartesian_grid_between_two_toroidal_surfaces" , &define_a_uniform_cartesian_grid_between_two_toroidal_surfaces);
 
@@ -136,6 +138,9 @@ PYBIND11_MODULE(simsoptpp, m) {
     m.def("boozer_residual", &boozer_residual);
     m.def("boozer_residual_ds", &boozer_residual_ds);
     m.def("boozer_residual_ds2", &boozer_residual_ds2);
+    m.def("boozer_residual_jacobian", &boozer_residual_jacobian);
+    m.def("boozer_residual_hessian_contract", &boozer_residual_hessian_contract);
+    m.def("boozer_residual_dB_vjp", &boozer_residual_dB_vjp);
 
     m.def("matmult", [](PyArray& A, PyArray&B) {
             // Product of an lxm matrix with an mxn matrix, results in an l x n matrix
@@ -21,6 +21,7 @@ typedef MagneticField<xt::pytensor> PyMagneticField;
 typedef BiotSavart<xt::pytensor, PyArray> PyBiotSavart;
 typedef WireframeField<xt::pytensor, PyArray, PyIntArray> PyWireframeField;
 typedef InterpolatedField<xt::pytensor> PyInterpolatedField;
+typedef InterpolatedFieldSuperposition<xt::pytensor> PyInterpolatedFieldSuperposition;
 
 
 
@@ -78,7 +79,7 @@ void init_magneticfields(py::module_ &m){
         .def(py::init<InterpolationRule, RangeTriplet, RangeTriplet, RangeTriplet, int, bool>())
         .def("interpolate_batch", &RegularGridInterpolant3D<PyTensor>::interpolate_batch, "Interpolate a function by evaluating the function on all interpolation nodes simultanuously.")
         .def("evaluate", &RegularGridInterpolant3D<PyTensor>::evaluate, "Evaluate the interpolant at a point.")
-        .def("evaluate_batch", &RegularGridInterpolant3D<PyTensor>::evaluate_batch, "Evaluate the interpolant at multiple points (faster than `evaluate` as it uses prefetching).");
+        .def("evaluate_batch", &RegularGridInterpolant3D<PyTensor>::evaluate_batch, "Evaluate the interpolant at multiple points (faster than `evaluate` as large batches are sorted by cell and vectorized over the points).");
 
 
     py::class_<CurrentBase<PyArray>, shared_ptr<CurrentBase<PyArray>>, PyCurrentBaseTrampoline>(m, "CurrentBase")
@@ -119,6 +120,17 @@ void init_magneticfields(py::module_ &m){
         .def_readonly("z_range", &PyInterpolatedField::z_range)
         .def_readonly("rule", &PyInterpolatedField::rule);
     //register_common_field_methods<PyInterpolatedField>(ifield);
+
+    py::class_<PyInterpolatedFieldSuperposition, shared_ptr<PyInterpolatedFieldSuperposition>, PyMagneticField>(m, "InterpolatedFieldSuperposition")
+        .def(py::init<vector<shared_ptr<PyMagneticField>>, vector<double>, InterpolationRule, RangeTriplet, RangeTriplet, RangeTriplet, bool, int, bool, std::function<std::vector<bool>(Vec, Vec, Vec)>>())
+        .def(py::init<vector<shared_ptr<PyMagneticField>>, vector<double>, int, RangeTriplet, RangeTriplet, RangeTriplet, bool, int, bool, std::function<std::vector<bool>(Vec, Vec, Vec)>>())
+        .def("set_currents", &PyInterpolatedFieldSuperposition::set_currents)
+        .def("get_currents", &PyInterpolatedFieldSuperposition::get_currents)
+        .def("estimate_error_B", &PyInterpolatedFieldSuperposition::estimate_error_B)
+        .def_readonly("r_range", &PyInterpolatedFieldSuperposition::r_range)
+        .def_readonly("phi_range", &PyInterpolatedFieldSuperposition::phi_range)
+        .def_readonly("z_range", &PyInterpolatedFieldSuperposition::z_range)
+        .def_readonly("rule", &PyInterpolatedFieldSuperposition::rule);
  
     auto wf = py::class_<PyWireframeField, PyMagneticFieldTrampoline<PyWireframeField>, shared_ptr<PyWireframeField>, PyMagneticField>(m, "WireframeField")
         .def(py::init<vector<PyArray>, PyIntArray&, vector<double>, PyArray&>())
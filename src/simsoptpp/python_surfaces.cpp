@@ -114,9 +114,11 @@ template <typename T, typename S> void register_common_surface_methods(S &s) {
      .def("gamma_lin", &T::gamma_lin)
      .def("dgamma_by_dcoeff", &T::dgamma_by_dcoeff)
      .def("dgamma_by_dcoeff_vjp", &T::dgamma_by_dcoeff_vjp)
+     .def("dgamma_by_dcoeff_jvp", &T::dgamma_by_dcoeff_jvp)
      .def("gammadash1", &T::gammadash1)
      .def("dgammadash1_by_dcoeff", &T::dgammadash1_by_dcoeff)
      .def("dgammadash1_by_dcoeff_vjp", &T::dgammadash1_by_dcoeff_vjp)
+     .def("dgammadash1_by_dcoeff_jvp", &T::dgammadash1_by_dcoeff_jvp)
      .def("gammadash2", &T::gammadash2)
      .def("dgammadash2_by_dcoeff", &T::dgammadash2_by_dcoeff)
      .def("gammadash1dash1", &T::gammadash1dash1, "Returns a `(n_phi, n_theta, 3)` array containing partial^2_{phi,phi} Gamma(phi_i, theta_j) for i in {1, ..., n_phi}, j in{1, ..., n_theta}")
@@ -125,16 +127,22 @@ template <typename T, typename S> void register_common_surface_methods(S &s) {
      .def("dgammadash1dash1_by_dcoeff", &T::dgammadash1dash1_by_dcoeff, "Returns a `(n_phi, n_theta, 3)` array containing derivatives of `gammadash1dash1` wrt surface coefficients.")
      .def("dgammadash1dash2_by_dcoeff", &T::dgammadash1dash2_by_dcoeff, "Returns a `(n_phi, n_theta, 3)` array containing derivatives of `gammadash1dash2` wrt surface coefficients.")
      .def("dgammadash2dash2_by_dcoeff", &T::dgammadash2dash2_by_dcoeff, "Returns a `(n_phi, n_theta, 3)` array containing derivatives of `gammadash2dash2` wrt surface coefficients.")
+     .def("dgammadash1dash1_by_dcoeff_vjp", &T::dgammadash1dash1_by_dcoeff_vjp, "Returns the contraction of a `(n_phi, n_theta, 3)` array with `dgammadash1dash1_by_dcoeff`.")
+     .def("dgammadash1dash2_by_dcoeff_vjp", &T::dgammadash1dash2_by_dcoeff_vjp, "Returns the contraction of a `(n_phi, n_theta, 3)` array with `dgammadash1dash2_by_dcoeff`.")
+     .def("dgammadash2dash2_by_dcoeff_vjp", &T::dgammadash2dash2_by_dcoeff_vjp, "Returns the contraction of a `(n_phi, n_theta, 3)` array with `dgammadash2dash2_by_dcoeff`.")
      .def("surface_curvatures", &T::surface_curvatures, "Returns a `(n_phi, n_theta, 4)` array containing [G(phi_i, theta_j),K(phi_i, theta_j),kappa_1(phi_i, theta_j),kappa_2(phi_i, theta_j)] for i in {1, ..., n_phi}, j in {1, ..., n_theta} where H is the mean curvature, K is the Gaussian curvature, and kappa_{1,2} are the principal curvatures with kappa_1>kappa_2.")
      .def("dsurface_curvatures_by_dcoeff", &T::dsurface_curvatures_by_dcoeff, "Returns a `(n_phi, n_theta, 4, ndofs)` array containing the derivatives of `surface_curvatures` wrt the surface coefficients.")
+     .def("dsurface_curvatures_by_dcoeff_vjp", &T::dsurface_curvatures_by_dcoeff_vjp, "Returns the contraction of a `(n_phi, n_theta, 4)` array with `dsurface_curvatures_by_dcoeff`, without forming the latter.")
      .def("first_fund_form", &T::first_fund_form, "Returns a `(n_phi, n_theta, 3)` array containing [partial_{phi} Gamma(phi_i, theta_j) cdot partial_{phi} Gamma(phi_i, theta_j), partial_{phi} Gamma(phi_i, theta_j) cdot partial_{theta} Gamma(phi_i, theta_j), partial_{theta} Gamma(phi_i, theta_j) cdot partial_{theta} Gamma(phi_i, theta_j)] for i in {1, ..., n_phi}, j in {1, ..., n_theta}.")
      .def("dfirst_fund_form_by_dcoeff", &T::dfirst_fund_form_by_dcoeff, "Returns a `(n_phi, n_theta, 3, ndofs)` array containing the derivatives of `first_fund_form` wrt the surface coefficients.")
      .def("second_fund_form", &T::second_fund_form, "Returns a `(n_phi, n_theta, 3)` array containing [n(phi_i, theta_j) cdot partial^2_{phi,phi} Gamma(phi_i, theta_j), n(phi_i, theta_j) cdot partial^2_{phi,theta} Gamma(phi_i, theta_j), n(phi_i, theta_j) cdot partial^2_{theta,theta} Gamma(phi_i, theta_j)] for i in {1, ..., n_phi}, j in {1, ..., n_theta} where n is the unit normal.")
      .def("dsecond_fund_form_by_dcoeff", &T::dsecond_fund_form_by_dcoeff, "Returns a `(n_phi, n_theta, 3, ndofs)` array containing the derivatives of `second_fund_form` wrt the surface coefficients.")
      .def("dgammadash2_by_dcoeff_vjp", &T::dgammadash2_by_dcoeff_vjp)
+     .def("dgammadash2_by_dcoeff_jvp", &T::dgammadash2_by_dcoeff_jvp)
      .def("normal", &T::normal)
      .def("dnormal_by_dcoeff", &T::dnormal_by_dcoeff)
      .def("dnormal_by_dcoeff_vjp", &T::dnormal_by_dcoeff_vjp)
+     .def("dnormal_by_dcoeff_jvp", &T::dnormal_by_dcoeff_jvp)
      .def("d2normal_by_dcoeffdcoeff", &T::d2normal_by_dcoeffdcoeff)
      .def("unitnormal", &T::unitnormal)
      .def("dunitnormal_by_dcoeff", &T::dunitnormal_by_dcoeff)
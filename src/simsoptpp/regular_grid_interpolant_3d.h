@@ -1,11 +1,11 @@
 #pragma once
 #include "simdhelpers.h"
-#include <unordered_map>
 #include <algorithm>
 #include <fmt/core.h>
 #include <fmt/ranges.h>
 #include <functional>
 #include <iostream>
+#include <numeric>
 #include <random>
 #include <stdexcept>
 #include <stdint.h>
@@ -103,8 +103,10 @@ class RegularGridInterpolant3D {
         Vec xdoftensor_reduced, ydoftensor_reduced, zdoftensor_reduced;
 
         Vec vals; // contains the values of the function to be interpolated at the dofs, of size dofs_to_keep * value_size
-        std::unordered_map<int, AlignedPaddedVec> all_local_vals_map; // maps each cell to an array of size (degree+1)**3 * padded_value_size
+        // for each cell that is not skipped, an array of size (degree+1)**3 * padded_value_size, stored contiguously
+        AlignedPaddedVec all_local_vals;
         std::vector<bool> skip_cell; // whether to skip each cell or not
+        std::vector<int32_t> cell_to_local; // position of each cell in all_local_vals, or -1 if the cell is skipped
         // since we are skipping some dofs, we need mappings into the list of
         // reduced dofs, e.g. if we skip dofs 3, then reduced to full would
         // look like [0, 1, 2, 4, 5, ...]
@@ -120,6 +122,8 @@ class RegularGridInterpolant3D {
         static const int simdcount = 1; // vector width is set to 1 for non-xsimd code
         #endif
         int padded_value_size; // smallest multiple of simdcount that is larger than value_size
+        // batches with fewer points than this are evaluated point by point, larger batches are sorted by cell first
+        static const int cell_sort_threshold = 32;
 
         inline int idx_dof(int i, int j, int k){
             int degree = rule.degree;
@@ -140,8 +144,11 @@ class RegularGridInterpolant3D {
         }
 
         int locate_unsafe(double x, double y, double z);
+        const double* local_vals(int xidx, int yidx, int zidx);
+        const double* locate(double x, double y, double z, double* xyzlocal);
         void evaluate_inplace(double x, double y, double z, double* res);
-        void evaluate_local(double x, double y, double z, int cell_idx, double* res);
+        void evaluate_local(double x, double y, double z, const double* vals_local, double* res);
+        void evaluate_cell_batch(const double* vals_local, int first, int last, const double* xl, const double* yl, const double* zl, const int* order, double* res);
 
     public:
 
@@ -204,6 +211,12 @@ class RegularGridInterpolant3D {
                 }
             }
             cells_to_keep = nx*ny*nz - cells_to_skip;
+            cell_to_local = std::vector<int32_t>(nx*ny*nz, -1);
+            int32_t local_idx = 0;
+            for (int i = 0; i < nx*ny*nz; ++i) {
+                if(!skip_cell[i])
+                    cell_to_local[i] = local_idx++;
+            }
 
             // now build the interpolation points in 1d.
             xdof = Vec(nx*degree+1, 0.);
@@ -303,7 +316,7 @@ class RegularGridInterpolant3D {
         void interpolate_batch(std::function<Vec(Vec, Vec, Vec)> &f); // build the interpolant
 
         Vec evaluate(double x, double y, double z); // evaluate the interpolant at one location
-        void evaluate_batch(Array& xyz, Array& fxyz); // evluate the interpolant at multiple locations
+        void evaluate_batch(Array& xyz, Array& fxyz); // evluate the interpolant at multiple locations, grouped by cell
 
         std::pair<double, double> estimate_error(std::function<Vec(Vec, Vec, Vec)> &f, int samples);
 };
@@ -28,8 +28,7 @@ void RegularGridInterpolant3D<Array>::interpolate_batch(std::function<Vec(Vec, V
         }
     }
     int degree = rule.degree;
-    all_local_vals_map = std::unordered_map<int, AlignedPaddedVec>();
-    all_local_vals_map.reserve(cells_to_keep);
+    all_local_vals = AlignedPaddedVec(size_t(cells_to_keep)*local_vals_size, 0.);
 
     for (int xidx = 0; xidx < nx; ++xidx) {
         for (int yidx = 0; yidx < ny; ++yidx) {
@@ -37,7 +36,7 @@ void RegularGridInterpolant3D<Array>::interpolate_batch(std::function<Vec(Vec, V
                 int meshidx = idx_cell(xidx, yidx, zidx);
                 if(skip_cell[meshidx])
                     continue;
-                AlignedPaddedVec local_vals(local_vals_size, 0.);
+                double* local_vals = all_local_vals.data() + size_t(cell_to_local[meshidx])*local_vals_size;
                 for (int i = 0; i < degree+1; ++i) {
                     for (int j = 0; j < degree+1; ++j) {
                         for (int k = 0; k < degree+1; ++k) {
@@ -49,7 +48,6 @@ void RegularGridInterpolant3D<Array>::interpolate_batch(std::function<Vec(Vec, V
                         }
                     }
                 }
-                all_local_vals_map.insert({meshidx, local_vals});
             }
         }
     }
@@ -60,9 +58,93 @@ void RegularGridInterpolant3D<Array>::evaluate_batch(Array& xyz, Array& fxyz){
     if(fxyz.layout() != xt::layout_type::row_major)
           throw std::runtime_error("fxyz needs to be in row-major storage order");
     int npoints = xyz.shape(0);
+    double* res = fxyz.data();
+    if(npoints < cell_sort_threshold) {
+        for (int i = 0; i < npoints; ++i) {
+            evaluate_inplace(xyz(i, 0), xyz(i, 1), xyz(i, 2), res + value_size*i);
+        }
+        return;
+    }
+    // locate all points first and then sort them by cell, so that all points
+    // in a cell are evaluated together on the same local values. since the
+    // local values are stored in the order of the cells, this also makes the
+    // memory accesses across cells mostly sequential.
+    std::vector<const double*> cells(npoints);
+    Vec xyzlocal(3*npoints, 0.);
     for (int i = 0; i < npoints; ++i) {
-        evaluate_inplace(xyz(i, 0), xyz(i, 1), xyz(i, 2), fxyz.data() + value_size*i);
+        cells[i] = locate(xyz(i, 0), xyz(i, 1), xyz(i, 2), &xyzlocal[3*i]);
+    }
+    std::vector<int> order(npoints);
+    std::iota(order.begin(), order.end(), 0);
+    std::sort(order.begin(), order.end(), [&cells](int a, int b) { return std::less<const double*>()(cells[a], cells[b]); });
+    // the local coordinates in sorted order, padded so that full simd vectors can be loaded at the end
+    AlignedPaddedVec xl(npoints + simdcount, 0.), yl(npoints + simdcount, 0.), zl(npoints + simdcount, 0.);
+    for (int p = 0; p < npoints; ++p) {
+        xl[p] = xyzlocal[3*order[p] + 0];
+        yl[p] = xyzlocal[3*order[p] + 1];
+        zl[p] = xyzlocal[3*order[p] + 2];
+    }
+    int first = 0;
+    while(first < npoints) {
+        const double* vals_local = cells[order[first]];
+        int last = first + 1;
+        while(last < npoints && cells[order[last]] == vals_local)
+            last++;
+        // points outside of the domain or in skipped cells are left untouched
+        if(vals_local != nullptr)
+            evaluate_cell_batch(vals_local, first, last, xl.data(), yl.data(), zl.data(), order.data(), res);
+        first = last;
+    }
+}
+
+template<class Array>
+void RegularGridInterpolant3D<Array>::evaluate_cell_batch(const double* vals_local, int first, int last, const double* xl, const double* yl, const double* zl, const int* order, double* res){
+    // evaluate the interpolant at the points order[first], ..., order[last-1]
+    // that all lie in the same cell. xl, yl, zl contain the local coordinates
+    // of the points in sorted order.
+    #if defined(USE_XSIMD)
+    // vectorize over the points instead of over the value dimension, so that
+    // no simd lanes are wasted on padding and the basis functions are
+    // evaluated for simdcount points at once.
+    int degree = rule.degree;
+    auto pxs = std::vector<simd_t, xs::aligned_allocator<simd_t, XSIMD_DEFAULT_ALIGNMENT>>(degree+1);
+    auto pys = std::vector<simd_t, xs::aligned_allocator<simd_t, XSIMD_DEFAULT_ALIGNMENT>>(degree+1);
+    auto pzs = std::vector<simd_t, xs::aligned_allocator<simd_t, XSIMD_DEFAULT_ALIGNMENT>>(degree+1);
+    for (int p = first; p < last; p += simdcount) {
+        simd_t x = xsimd::load_unaligned(xl + p);
+        simd_t y = xsimd::load_unaligned(yl + p);
+        simd_t z = xsimd::load_unaligned(zl + p);
+        for (int k = 0; k < degree+1; ++k) {
+            pxs[k] = this->rule.basis_fun(k, x);
+            pys[k] = this->rule.basis_fun(k, y);
+            pzs[k] = this->rule.basis_fun(k, z);
+        }
+        int nlanes = std::min(simdcount, last-p);
+        for (int l = 0; l < value_size; ++l) {
+            simd_t sumi(0.);
+            const double* val_ptr = vals_local + l;
+            for (int i = 0; i < degree+1; ++i) {
+                simd_t sumj(0.);
+                for (int j = 0; j < degree+1; ++j) {
+                    simd_t sumk(0.);
+                    for (int k = 0; k < degree+1; ++k) {
+                        sumk = xsimd::fma(simd_t(*val_ptr), pzs[k], sumk);
+                        val_ptr += padded_value_size;
+                    }
+                    sumj = xsimd::fma(sumk, pys[j], sumj);
+                }
+                sumi = xsimd::fma(sumj, pxs[i], sumi);
+            }
+            for (int lane = 0; lane < nlanes; ++lane) {
+                res[value_size*order[p+lane] + l] = sumi[lane];
+            }
+        }
     }
+    #else
+    for (int p = first; p < last; ++p) {
+        evaluate_local(xl[p], yl[p], zl[p], vals_local, res + value_size*order[p]);
+    }
+    #endif
 }
 
 template<class Array>
@@ -82,7 +164,19 @@ int RegularGridInterpolant3D<Array>::locate_unsafe(double x, double y, double z)
 }
 
 template<class Array>
-void RegularGridInterpolant3D<Array>::evaluate_inplace(double x, double y, double z, double* res){
+const double* RegularGridInterpolant3D<Array>::local_vals(int xidx, int yidx, int zidx){
+    // returns a pointer to the local values of the cell, or nullptr if the
+    // cell is outside of the grid, skipped, or not interpolated yet
+    if(xidx < 0 || xidx >= nx || yidx < 0 || yidx >= ny || zidx < 0 || zidx >= nz || all_local_vals.empty())
+        return nullptr;
+    int32_t local_idx = cell_to_local[idx_cell(xidx, yidx, zidx)];
+    if(local_idx < 0)
+        return nullptr;
+    return all_local_vals.data() + size_t(local_idx)*local_vals_size;
+}
+
+template<class Array>
+const double* RegularGridInterpolant3D<Array>::locate(double x, double y, double z, double* xyzlocal){
 
     // to avoid funny business when the data is just a tiny bit out of bounds
     // due to machine precision, we perform this check and shift
@@ -104,25 +198,32 @@ void RegularGridInterpolant3D<Array>::evaluate_inplace(double x, double y, doubl
         if(zidx < 0 || zidx >= nz)
             throw std::runtime_error(fmt::format("zidxs={} not within [0, {}]", zidx, nz-1));
     }
-    double xlocal = (x-xmesh[xidx])/hx;
-    double ylocal = (y-ymesh[yidx])/hy;
-    double zlocal = (z-zmesh[zidx])/hz;
-    return evaluate_local(xlocal, ylocal, zlocal, idx_cell(xidx, yidx, zidx), res);
+    const double* vals_local = local_vals(xidx, yidx, zidx);
+    if(vals_local == nullptr) {
+        if(out_of_bounds_ok)
+            return nullptr;
+        else
+            throw std::runtime_error(fmt::format("cell_idx={} is skipped or has not been interpolated", idx_cell(xidx, yidx, zidx)));
+    }
+    xyzlocal[0] = (x-xmesh[xidx])/hx;
+    xyzlocal[1] = (y-ymesh[yidx])/hy;
+    xyzlocal[2] = (z-zmesh[zidx])/hz;
+    return vals_local;
+}
+
+template<class Array>
+void RegularGridInterpolant3D<Array>::evaluate_inplace(double x, double y, double z, double* res){
+    double xyzlocal[3];
+    const double* vals_local = locate(x, y, z, xyzlocal);
+    if(vals_local == nullptr)
+        return;
+    evaluate_local(xyzlocal[0], xyzlocal[1], xyzlocal[2], vals_local, res);
 }
 
 template<class Array>
-void RegularGridInterpolant3D<Array>::evaluate_local(double x, double y, double z, int cell_idx, double* res)
+void RegularGridInterpolant3D<Array>::evaluate_local(double x, double y, double z, const double* vals_local, double* res)
 {
     int degree = rule.degree;
-    auto got = all_local_vals_map.find(cell_idx);
-    if (got == all_local_vals_map.end()) {
-        if(out_of_bounds_ok)
-            return;
-        else
-            throw std::runtime_error(fmt::format("cell_idx={} not in all_local_vals_map", cell_idx));
-    }
-
-    double* vals_local = got->second.data();
     #if defined(USE_XSIMD)
     if(xsimd::simd_type<double>::size >= 3){
         simd_t xyz;
@@ -150,7 +251,7 @@ void RegularGridInterpolant3D<Array>::evaluate_local(double x, double y, double
     for(int l=0; l<padded_value_size; l += simdcount) {
         simd_t sumi(0.);
         int offset_local = l;
-        double* val_ptr = &(vals_local[offset_local]);
+        const double* val_ptr = &(vals_local[offset_local]);
         for (int i = 0; i < degree+1; ++i) {
             simd_t sumj(0.); 
             for (int j = 0; j < degree+1; ++j) {
@@ -179,7 +280,7 @@ void RegularGridInterpolant3D<Array>::evaluate_local(double x, double y, double
     for(int l=0; l<padded_value_size; l += simdcount) {
         double sumi(0.);
         int offset_local = l;
-        double* val_ptr = &(vals_local[offset_local]);
+        const double* val_ptr = &(vals_local[offset_local]);
         for (int i = 0; i < degree+1; ++i) {
             double sumj(0.);
             for (int j = 0; j < degree+1; ++j) {
@@ -39,6 +39,23 @@ Array surface_vjp_contraction(const Array& mat, const Array& v){
     return res;
 }
 
+template<class Array>
+Array surface_jvp_contraction(const Array& mat, const Array& w){
+    if(mat.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("mat needs to be in row-major storage order");
+    if(w.layout() != xt::layout_type::row_major)
+          throw std::runtime_error("w needs to be in row-major storage order");
+    int numquadpoints_phi = mat.shape(0);
+    int numquadpoints_theta = mat.shape(1);
+    int numdofs = mat.shape(3);
+    Array res = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+    Eigen::Map<Eigen::Matrix<double,Eigen::Dynamic,Eigen::Dynamic,Eigen::RowMajor>> eigen_mat(const_cast<double*>(mat.data()), numquadpoints_phi*numquadpoints_theta*3, numdofs);
+    Eigen::Map<Eigen::Matrix<double,Eigen::Dynamic,Eigen::Dynamic,Eigen::RowMajor>> eigen_w(const_cast<double*>(w.data()), numdofs, 1);
+    Eigen::Map<Eigen::Matrix<double,Eigen::Dynamic,Eigen::Dynamic,Eigen::RowMajor>> eigen_res(const_cast<double*>(res.data()), numquadpoints_phi*numquadpoints_theta*3, 1);
+    eigen_res = eigen_mat*eigen_w;
+    return res;
+}
+
 template<class Array>
 void Surface<Array>::least_squares_fit(Array& target_values) {
     if(target_values.shape(0) != numquadpoints_phi)
@@ -353,6 +370,69 @@ void Surface<Array>::dsurface_curvatures_by_dcoeff_impl(Array& data) {
 };
 
 
+template<class Array>
+Array Surface<Array>::dsurface_curvatures_by_dcoeff_vjp(Array& v) {
+  // reverse mode version of dsurface_curvatures_by_dcoeff_impl: the
+  // sensitivities are propagated back to the fundamental forms, then to the
+  // derivatives of gamma and the unit normal, so that no array of size
+  // (nphi, ntheta, ..., ndofs) is formed.
+  auto drd1 = this->gammadash1();
+  auto drd2 = this->gammadash2();
+  auto d2rd1d1 = this->gammadash1dash1();
+  auto d2rd1d2 = this->gammadash1dash2();
+  auto d2rd2d2 = this->gammadash2dash2();
+  auto n = this->normal();
+  auto unitnormal = this->unitnormal();
+  auto first = this->first_fund_form();
+  auto second = this->second_fund_form();
+
+  Array v_drd1 = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  Array v_drd2 = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  Array v_d2rd1d1 = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  Array v_d2rd1d2 = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  Array v_d2rd2d2 = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  Array v_n = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+  for (int i = 0; i < numquadpoints_phi; ++i) {
+      for (int j = 0; j < numquadpoints_theta; ++j) {
+          double E = first(i,j,0), F = first(i,j,1), G = first(i,j,2);
+          double L = second(i,j,0), M = second(i,j,1), N = second(i,j,2);
+          double denom = E*G - F*F;
+          double H = (L*G - 2*F*M + N*E)/(2*denom);
+          double K = (L*N - M*M)/denom;
+          double term2 = std::sqrt(H*H - K);
+
+          // kappa_{1,2} = H +- sqrt(H^2 - K)
+          double v_H = v(i,j,0) + v(i,j,2) + v(i,j,3) + (v(i,j,2) - v(i,j,3))*H/term2;
+          double v_K = v(i,j,1) - 0.5*(v(i,j,2) - v(i,j,3))/term2;
+          double v_denom = -(v_H*H + v_K*K)/denom;
+          double v_E = v_H*N/(2*denom) + v_denom*G;
+          double v_F = -v_H*M/denom - 2*v_denom*F;
+          double v_G = v_H*L/(2*denom) + v_denom*E;
+          double v_L = v_H*G/(2*denom) + v_K*N/denom;
+          double v_M = -v_H*F/denom - 2*v_K*M/denom;
+          double v_N = v_H*E/(2*denom) + v_K*L/denom;
+
+          double normn = std::sqrt(n(i,j,0)*n(i,j,0) + n(i,j,1)*n(i,j,1) + n(i,j,2)*n(i,j,2));
+          double v_unitnormal[3];
+          for (int d = 0; d < 3; ++d) {
+              v_drd1(i,j,d) = 2*v_E*drd1(i,j,d) + v_F*drd2(i,j,d);
+              v_drd2(i,j,d) = v_F*drd1(i,j,d) + 2*v_G*drd2(i,j,d);
+              v_d2rd1d1(i,j,d) = v_L*unitnormal(i,j,d);
+              v_d2rd1d2(i,j,d) = v_M*unitnormal(i,j,d);
+              v_d2rd2d2(i,j,d) = v_N*unitnormal(i,j,d);
+              v_unitnormal[d] = v_L*d2rd1d1(i,j,d) + v_M*d2rd1d2(i,j,d) + v_N*d2rd2d2(i,j,d);
+          }
+          // unitnormal = n/|n|
+          double udotv = unitnormal(i,j,0)*v_unitnormal[0] + unitnormal(i,j,1)*v_unitnormal[1] + unitnormal(i,j,2)*v_unitnormal[2];
+          for (int d = 0; d < 3; ++d)
+              v_n(i,j,d) = (v_unitnormal[d] - unitnormal(i,j,d)*udotv)/normn;
+      }
+  }
+  return dgammadash1_by_dcoeff_vjp(v_drd1) + dgammadash2_by_dcoeff_vjp(v_drd2)
+      + dgammadash1dash1_by_dcoeff_vjp(v_d2rd1d1) + dgammadash1dash2_by_dcoeff_vjp(v_d2rd1d2)
+      + dgammadash2dash2_by_dcoeff_vjp(v_d2rd2d2) + dnormal_by_dcoeff_vjp(v_n);
+};
+
 template<class Array>
 void Surface<Array>::surface_curvatures_impl(Array& data) {
   auto drd1 = this->gammadash1();
@@ -360,9 +440,6 @@ void Surface<Array>::surface_curvatures_impl(Array& data) {
   auto d2rd1d1 = this->gammadash1dash1();
   auto d2rd1d2 = this->gammadash1dash2();
   auto d2rd2d2 = this->gammadash2dash2();
-  auto dg1_dc = this->dgammadash1_by_dcoeff();
-  auto dg2_dc = this->dgammadash2_by_dcoeff();
-  int ndofs = num_dofs();
 
   auto first = this->first_fund_form();
   auto second = this->second_fund_form();
@@ -561,6 +638,23 @@ Array Surface<Array>::dnormal_by_dcoeff_vjp(Array& v) {
     return dgammadash1_by_dcoeff_vjp(res_dgammadash1) + dgammadash2_by_dcoeff_vjp(res_dgammadash2);
 }
 
+template<class Array>
+Array Surface<Array>::dnormal_by_dcoeff_jvp(Array& w) {
+    auto dg1 = this->gammadash1();
+    auto dg2 = this->gammadash2();
+    Array dg1_w = dgammadash1_by_dcoeff_jvp(w);
+    Array dg2_w = dgammadash2_by_dcoeff_jvp(w);
+    Array res = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+    for (int i = 0; i < numquadpoints_phi; ++i) {
+        for (int j = 0; j < numquadpoints_theta; ++j) {
+            res(i, j, 0) = dg1_w(i, j, 1)*dg2(i, j, 2) - dg1_w(i, j, 2)*dg2(i, j, 1) + dg1(i, j, 1)*dg2_w(i, j, 2) - dg1(i, j, 2)*dg2_w(i, j, 1);
+            res(i, j, 1) = dg1_w(i, j, 2)*dg2(i, j, 0) - dg1_w(i, j, 0)*dg2(i, j, 2) + dg1(i, j, 2)*dg2_w(i, j, 0) - dg1(i, j, 0)*dg2_w(i, j, 2);
+            res(i, j, 2) = dg1_w(i, j, 0)*dg2(i, j, 1) - dg1_w(i, j, 1)*dg2(i, j, 0) + dg1(i, j, 0)*dg2_w(i, j, 1) - dg1(i, j, 1)*dg2_w(i, j, 0);
+        }
+    }
+    return res;
+}
+
 template<class Array>
 void Surface<Array>::d2area_by_dcoeffdcoeff_impl(Array& data) {
     data *= 0.;
@@ -7,6 +7,7 @@ using std::string;
 
 #include <map>
 using std::map;
+#include <functional>
 #include <stdexcept>
 using std::logic_error;
 
@@ -18,6 +19,9 @@ using std::logic_error;
 template<class Array>
 Array surface_vjp_contraction(const Array& mat, const Array& v);
 
+template<class Array>
+Array surface_jvp_contraction(const Array& mat, const Array& w);
+
 template<class Array>
 class Surface {
     private:
@@ -129,6 +133,55 @@ class Surface {
             return surface_vjp_contraction<Array>(dgammadash2_by_dcoeff(), v);
         };
 
+        virtual Array dgammadash1dash1_by_dcoeff_vjp(Array& v) {
+            return surface_vjp_contraction<Array>(dgammadash1dash1_by_dcoeff(), v);
+        };
+
+        virtual Array dgammadash1dash2_by_dcoeff_vjp(Array& v) {
+            return surface_vjp_contraction<Array>(dgammadash1dash2_by_dcoeff(), v);
+        };
+
+        virtual Array dgammadash2dash2_by_dcoeff_vjp(Array& v) {
+            return surface_vjp_contraction<Array>(dgammadash2dash2_by_dcoeff(), v);
+        };
+
+        virtual Array dgamma_by_dcoeff_jvp(Array& w) {
+            return surface_jvp_contraction<Array>(dgamma_by_dcoeff(), w);
+        };
+
+        virtual Array dgammadash1_by_dcoeff_jvp(Array& w) {
+            return surface_jvp_contraction<Array>(dgammadash1_by_dcoeff(), w);
+        };
+
+        virtual Array dgammadash2_by_dcoeff_jvp(Array& w) {
+            return surface_jvp_contraction<Array>(dgammadash2_by_dcoeff(), w);
+        };
+
+        /* For surfaces whose position depends linearly on the dofs, the
+         * directional derivative of gamma (or of one of its derivatives) in
+         * direction w is the same quantity evaluated with the dofs set to w.
+         * Subclasses with such a representation use this to implement the
+         * jvp methods without forming the (nphi, ntheta, 3, ndofs) arrays. */
+        Array linear_representation_jvp(Array& w, std::function<void(Array&)> impl) {
+            int ndofs = num_dofs();
+            if((int) w.size() != ndofs)
+                throw std::runtime_error("w needs to have length num_dofs()");
+            vector<double> dofs = get_dofs();
+            vector<double> wdofs(ndofs);
+            for (int i = 0; i < ndofs; ++i)
+                wdofs[i] = w(i);
+            Array res = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta, 3});
+            set_dofs_impl(wdofs);
+            try {
+                impl(res);
+            } catch(...) {
+                set_dofs_impl(dofs);
+                throw;
+            }
+            set_dofs_impl(dofs);
+            return res;
+        }
+
         void surface_curvatures_impl(Array& data);
         void dsurface_curvatures_by_dcoeff_impl(Array& data);
         void first_fund_form_impl(Array& data);
@@ -139,6 +192,8 @@ class Surface {
         void dnormal_by_dcoeff_impl(Array& data);
         void d2normal_by_dcoeffdcoeff_impl(Array& data);
         Array dnormal_by_dcoeff_vjp(Array& v);
+        Array dnormal_by_dcoeff_jvp(Array& w);
+        Array dsurface_curvatures_by_dcoeff_vjp(Array& v);
 
         void unitnormal_impl(Array& data);
         void dunitnormal_by_dcoeff_impl(Array& data);
@@ -117,4 +117,14 @@ class SurfaceRZFourier : public Surface<Array> {
         Array dgamma_by_dcoeff_vjp(Array& v) override;
         Array dgammadash1_by_dcoeff_vjp(Array& v) override;
         Array dgammadash2_by_dcoeff_vjp(Array& v) override;
+
+        Array dgamma_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gamma_impl(A, this->quadpoints_phi, this->quadpoints_theta);});
+        }
+        Array dgammadash1_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gammadash1_impl(A);});
+        }
+        Array dgammadash2_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gammadash2_impl(A);});
+        }
 };
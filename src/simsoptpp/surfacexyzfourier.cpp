@@ -549,6 +549,112 @@ void SurfaceXYZFourier<Array>::dgammadash2dash2_by_dcoeff_impl(Array& data) {
     data *= 4*M_PI*M_PI;
 }
 
+template<class Array>
+Array SurfaceXYZFourier<Array>::dgamma_by_dcoeff_vjp(Array& v) {
+    return dgamma_by_dcoeff_vjp_impl(v, 0);
+}
+
+template<class Array>
+Array SurfaceXYZFourier<Array>::dgammadash1_by_dcoeff_vjp(Array& v) {
+    return dgamma_by_dcoeff_vjp_impl(v, 1);
+}
+
+template<class Array>
+Array SurfaceXYZFourier<Array>::dgammadash2_by_dcoeff_vjp(Array& v) {
+    return dgamma_by_dcoeff_vjp_impl(v, 2);
+}
+
+/*
+ * Computes the contraction of v with dgamma_by_dcoeff (deriv == 0),
+ * dgammadash1_by_dcoeff (deriv == 1) or dgammadash2_by_dcoeff (deriv == 2)
+ * without forming the (nphi, ntheta, 3, ndofs) array.  For a dof with basis
+ * function b(theta, phi) in \hat x, the contribution to gamma is
+ * b * (cos(phi), sin(phi), 0), in \hat y it is b * (-sin(phi), cos(phi), 0)
+ * and in z it is b * (0, 0, 1).
+ */
+template<class Array>
+Array SurfaceXYZFourier<Array>::dgamma_by_dcoeff_vjp_impl(Array& v, int deriv) {
+    int ndofs = num_dofs();
+    int nmodes = (mpol+1)*(2*ntor+1);
+    Array res = xt::zeros<double>({ndofs});
+    auto resptr = &(res(0));
+#pragma omp parallel
+    {
+        vector<double> resptr_private(ndofs, 0.);
+        vector<double> bcos(nmodes);
+        vector<double> bsin(nmodes);
+        vector<double> dbcos(nmodes);
+        vector<double> dbsin(nmodes);
+#pragma omp for
+        for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
+            double phi  = 2*M_PI*quadpoints_phi[k1];
+            double sinphi = sin(phi);
+            double cosphi = cos(phi);
+            for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
+                double theta  = 2*M_PI*quadpoints_theta[k2];
+                for (int m = 0; m <= mpol; ++m) {
+                    for (int i = 0; i < 2*ntor+1; ++i) {
+                        int n  = i - ntor;
+                        int idx = m*(2*ntor+1) + i;
+                        bcos[idx] = cos(m*theta-n*nfp*phi);
+                        bsin[idx] = sin(m*theta-n*nfp*phi);
+                        if(deriv == 1) {
+                            dbcos[idx] = (n*nfp)*bsin[idx];
+                            dbsin[idx] = (-n*nfp)*bcos[idx];
+                        } else if(deriv == 2) {
+                            dbcos[idx] = (-m)*bsin[idx];
+                            dbsin[idx] = m*bcos[idx];
+                        } else {
+                            dbcos[idx] = bcos[idx];
+                            dbsin[idx] = bsin[idx];
+                        }
+                    }
+                }
+                double v0 = v(k1, k2, 0);
+                double v1 = v(k1, k2, 1);
+                double v2 = v(k1, k2, 2);
+                // weights of the (derivative of the) basis function and, for
+                // phi derivatives, of the basis function itself which
+                // multiplies the derivative of the rotation by phi
+                double wdb[3] = {v0*cosphi + v1*sinphi, -v0*sinphi + v1*cosphi, v2};
+                double wb[3] = {0., 0., 0.};
+                if(deriv == 1) {
+                    wb[0] = -v0*sinphi + v1*cosphi;
+                    wb[1] = -v0*cosphi - v1*sinphi;
+                }
+                int counter = 0;
+                for (int d = 0; d < 3; ++d) {
+                    for (int m = 0; m <= mpol; ++m) {
+                        for (int n = -ntor; n <= ntor; ++n) {
+                            if(m==0 && n<0) continue;
+                            if(stellsym && d > 0) continue;
+                            int idx = m*(2*ntor+1) + n + ntor;
+                            resptr_private[counter++] += wdb[d]*dbcos[idx] + wb[d]*bcos[idx];
+                        }
+                    }
+                    for (int m = 0; m <= mpol; ++m) {
+                        for (int n = -ntor; n <= ntor; ++n) {
+                            if(m==0 && n<=0) continue;
+                            if(stellsym && d == 0) continue;
+                            int idx = m*(2*ntor+1) + n + ntor;
+                            resptr_private[counter++] += wdb[d]*dbsin[idx] + wb[d]*bsin[idx];
+                        }
+                    }
+                }
+            }
+        }
+#pragma omp critical
+        {
+            for(int i=0; i<ndofs; ++i) {
+                resptr[i] += resptr_private[i];
+            }
+        }
+    }
+    if(deriv > 0)
+        res *= 2*M_PI;
+    return res;
+}
+
 #include "xtensor-python/pyarray.hpp"     // Numpy bindings
 typedef xt::pyarray<double> Array;
 template class SurfaceXYZFourier<Array>;
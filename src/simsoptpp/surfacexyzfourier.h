@@ -154,4 +154,20 @@ class SurfaceXYZFourier : public Surface<Array> {
         void dgammadash1dash2_by_dcoeff_impl(Array& data) override;
         void dgammadash2dash2_by_dcoeff_impl(Array& data) override;
 
+        Array dgamma_by_dcoeff_vjp(Array& v) override;
+        Array dgammadash1_by_dcoeff_vjp(Array& v) override;
+        Array dgammadash2_by_dcoeff_vjp(Array& v) override;
+
+        Array dgamma_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gamma_impl(A, this->quadpoints_phi, this->quadpoints_theta);});
+        }
+        Array dgammadash1_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gammadash1_impl(A);});
+        }
+        Array dgammadash2_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return gammadash2_impl(A);});
+        }
+
+    private:
+        Array dgamma_by_dcoeff_vjp_impl(Array& v, int deriv);
 };
@@ -38,17 +38,6 @@ class SurfaceXYZTensorFourier : public Surface<Array> {
         Array x;
         Array y;
         Array z;
-        Array cache_basis_fun_phi;
-        Array cache_basis_fun_phi_dash;
-        Array cache_basis_fun_phi_dashdash;
-        Array cache_basis_fun_theta;
-        Array cache_basis_fun_theta_dash;
-        Array cache_basis_fun_theta_dashdash;
-        Array cache_enforcer;
-        Array cache_enforcer_dphi;
-        Array cache_enforcer_dtheta;
-        Array cache_enforcer_dphidphi;
-        Array cache_enforcer_dthetadtheta;
         int nfp;
         int mpol;
         int ntor;
@@ -117,33 +106,14 @@ class SurfaceXYZTensorFourier : public Surface<Array> {
         }
 
         void gamma_impl(Array& data, Array& quadpoints_phi, Array& quadpoints_theta) override {
-            int numquadpoints_phi = quadpoints_phi.size();
-            int numquadpoints_theta = quadpoints_theta.size();
-            data *= 0.;
-#pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhat = 0;
-                    double yhat = 0;
-                    double z = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhat += get_coeff(0, m, n) * basis_fun(0, n, k1, m, k2);
-                            yhat += get_coeff(1, m, n) * basis_fun(1, n, k1, m, k2);
-                            z += get_coeff(2, m, n) * basis_fun(2, n, k1, m, k2);
-                            //xhat += get_coeff(0, m, n) * basis_fun(0, n, phi, m, theta);
-                            //yhat += get_coeff(1, m, n) * basis_fun(1, n, phi, m, theta);
-                            //z += get_coeff(2, m, n) * basis_fun(2, n, phi, m, theta);
-                        }
-                    }
-                    data(k1, k2, 0) = xhat * cos(phi) - yhat * sin(phi);
-                    data(k1, k2, 1) = xhat * sin(phi) + yhat * cos(phi);
-                    data(k1, k2, 2) = z;
-                }
+            if(&quadpoints_phi == &(this->quadpoints_phi) && &quadpoints_theta == &(this->quadpoints_theta)) {
+                eval_gamma(basis, 0, 0, data);
+            } else {
+                BasisTables tables = build_tables(quadpoints_phi, quadpoints_theta);
+                eval_gamma(tables, 0, 0, data);
             }
         }
+
         void gamma_lin(Array& data, Array& quadpoints_phi, Array& quadpoints_theta) override {
             int numquadpoints_phi = quadpoints_phi.size();
 #pragma omp parallel for
@@ -166,428 +136,427 @@ class SurfaceXYZTensorFourier : public Surface<Array> {
             }
         }
 
-
         void gammadash1_impl(Array& data) override {
-#pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                double sinphi = sin(phi);
-                double cosphi = cos(phi);
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhat = 0;
-                    double yhat = 0;
-                    double xhatdash = 0;
-                    double yhatdash = 0;
-                    double zdash = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhat += get_coeff(0, m, n) * basis_fun(0, n, k1, m, k2);
-                            yhat += get_coeff(1, m, n) * basis_fun(1, n, k1, m, k2);
-                            xhatdash += get_coeff(0, m, n) * basis_fun_dphi(0, n, k1, m, k2);
-                            yhatdash += get_coeff(1, m, n) * basis_fun_dphi(1, n, k1, m, k2);
-                            zdash += get_coeff(2, m, n) * basis_fun_dphi(2, n, k1, m, k2);
-                            //xhat += get_coeff(0, m, n) * basis_fun(0, n, phi, m, theta);
-                            //yhat += get_coeff(1, m, n) * basis_fun(1, n, phi, m, theta);
-                            //xhatdash += get_coeff(0, m, n) * basis_fun_dphi(0, n, phi, m, theta);
-                            //yhatdash += get_coeff(1, m, n) * basis_fun_dphi(1, n, phi, m, theta);
-                            //zdash += get_coeff(2, m, n) * basis_fun_dphi(2, n, phi, m, theta);
-                        }
-                    }
-                    double xdash = xhatdash * cosphi - yhatdash * sinphi - xhat * sinphi - yhat * cosphi;
-                    double ydash = xhatdash * sinphi + yhatdash * cosphi + xhat * cosphi - yhat * sinphi;
-                    data(k1, k2, 0) = 2*M_PI*xdash;
-                    data(k1, k2, 1) = 2*M_PI*ydash;
-                    data(k1, k2, 2) = 2*M_PI*zdash;
-                }
-            }
+            eval_gamma(basis, 1, 0, data);
         }
 
         void gammadash2_impl(Array& data) override {
-#pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
+            eval_gamma(basis, 0, 1, data);
+        }
+
+        void gammadash1dash1_impl(Array& data) override {
+            eval_gamma(basis, 2, 0, data);
+        }
+
+        void gammadash1dash2_impl(Array& data) override {
+            eval_gamma(basis, 1, 1, data);
+        }
+
+        void gammadash2dash2_impl(Array& data) override {
+            eval_gamma(basis, 0, 2, data);
+        }
+
+        void dgamma_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(0, 0, data);
+        }
+
+        void dgammadash1_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(1, 0, data);
+        }
+
+        void dgammadash2_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(0, 1, data);
+        }
+
+        void dgammadash1dash1_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(2, 0, data);
+        }
+
+        void dgammadash1dash2_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(1, 1, data);
+        }
+
+        void dgammadash2dash2_by_dcoeff_impl(Array& data) override {
+            eval_dgamma_by_dcoeff(0, 2, data);
+        }
+
+        Array dgamma_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(0, 0, v);
+        }
+
+        Array dgammadash1_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(1, 0, v);
+        }
+
+        Array dgammadash2_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(0, 1, v);
+        }
+
+        Array dgammadash1dash1_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(2, 0, v);
+        }
+
+        Array dgammadash1dash2_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(1, 1, v);
+        }
+
+        Array dgammadash2dash2_by_dcoeff_vjp(Array& v) override {
+            return eval_dgamma_by_dcoeff_vjp(0, 2, v);
+        }
+
+        Array dgamma_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return eval_gamma(basis, 0, 0, A);});
+        }
+
+        Array dgammadash1_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return eval_gamma(basis, 1, 0, A);});
+        }
+
+        Array dgammadash2_by_dcoeff_jvp(Array& w) override {
+            return this->linear_representation_jvp(w, [this](Array& A) { return eval_gamma(basis, 0, 1, A);});
+        }
+
+    private:
+
+        /*
+         * One dimensional tables of the basis functions v_n(phi), w_m(theta)
+         * and their first two derivatives, evaluated on a tensor grid of
+         * quadrature points. The boundary condition enforcer is separable as
+         * well, sin(nfp*phi/2)^2 + sin(theta/2)^2 = ephi(phi) + etheta(theta),
+         * so every quantity of the surface can be evaluated by contracting the
+         * theta and the phi direction one after the other.
+         */
+        struct BasisTables {
+            int nphi;
+            int ntheta;
+            vector<double> cosphi;
+            vector<double> sinphi;
+            vector<double> v[3]; // v[i](k1, n) = d^i/dphi^i v_n(phi_k1), shape (nphi, 2*ntor+1)
+            vector<double> w[3]; // w[j](k2, m) = d^j/dtheta^j w_m(theta_k2), shape (ntheta, 2*mpol+1)
+            vector<double> ephi[3];
+            vector<double> etheta[3];
+        };
+
+        BasisTables basis;
+
+        void build_cache() {
+            basis = build_tables(quadpoints_phi, quadpoints_theta);
+        }
+
+        BasisTables build_tables(Array& quadpoints_phi, Array& quadpoints_theta) {
+            BasisTables t;
+            t.nphi = quadpoints_phi.size();
+            t.ntheta = quadpoints_theta.size();
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            t.cosphi = vector<double>(t.nphi);
+            t.sinphi = vector<double>(t.nphi);
+            for (int i = 0; i < 3; ++i) {
+                t.v[i] = vector<double>(t.nphi*N);
+                t.w[i] = vector<double>(t.ntheta*M);
+                t.ephi[i] = vector<double>(t.nphi);
+                t.etheta[i] = vector<double>(t.ntheta);
+            }
+            for (int k1 = 0; k1 < t.nphi; ++k1) {
                 double phi  = 2*M_PI*quadpoints_phi[k1];
-                double sinphi = sin(phi);
-                double cosphi = cos(phi);
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhat = 0;
-                    double yhat = 0;
-                    double xhatdash = 0;
-                    double yhatdash = 0;
-                    double zdash = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhatdash += get_coeff(0, m, n) * basis_fun_dtheta(0, n, k1, m, k2);
-                            yhatdash += get_coeff(1, m, n) * basis_fun_dtheta(1, n, k1, m, k2);
-                            zdash += get_coeff(2, m, n) * basis_fun_dtheta(2, n, k1, m, k2);
-                            //xhatdash += get_coeff(0, m, n) * basis_fun_dtheta(0, n, phi, m, theta);
-                            //yhatdash += get_coeff(1, m, n) * basis_fun_dtheta(1, n, phi, m, theta);
-                            //zdash += get_coeff(2, m, n) * basis_fun_dtheta(2, n, phi, m, theta);
-                        }
-                    }
-                    double xdash = xhatdash * cosphi - yhatdash * sinphi;
-                    double ydash = xhatdash * sinphi + yhatdash * cosphi;
-                    data(k1, k2, 0) = 2*M_PI*xdash;
-                    data(k1, k2, 1) = 2*M_PI*ydash;
-                    data(k1, k2, 2) = 2*M_PI*zdash;
+                t.cosphi[k1] = cos(phi);
+                t.sinphi[k1] = sin(phi);
+                for (int n = 0; n < N; ++n) {
+                    t.v[0][k1*N + n] = basis_fun_phi(n, phi);
+                    t.v[1][k1*N + n] = basis_fun_phi_dash(n, phi);
+                    t.v[2][k1*N + n] = basis_fun_phi_dashdash(n, phi);
                 }
+                double s = sin(nfp*phi/2);
+                double c = cos(nfp*phi/2);
+                t.ephi[0][k1] = s*s;
+                t.ephi[1][k1] = nfp*c*s;
+                t.ephi[2][k1] = 0.5*nfp*nfp*(c*c - s*s);
             }
+            for (int k2 = 0; k2 < t.ntheta; ++k2) {
+                double theta  = 2*M_PI*quadpoints_theta[k2];
+                for (int m = 0; m < M; ++m) {
+                    t.w[0][k2*M + m] = basis_fun_theta(m, theta);
+                    t.w[1][k2*M + m] = basis_fun_theta_dash(m, theta);
+                    t.w[2][k2*M + m] = basis_fun_theta_dashdash(m, theta);
+                }
+                double s = sin(theta/2);
+                double c = cos(theta/2);
+                t.etheta[0][k2] = s*s;
+                t.etheta[1][k2] = c*s;
+                t.etheta[2][k2] = 0.5*(c*c - s*s);
+            }
+            return t;
         }
 
-        void gammadash2dash2_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                double sinphi = sin(phi);
-                double cosphi = cos(phi);
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhatdd = 0;
-                    double yhatdd = 0;
-                    double zdd = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhatdd += get_coeff(0, m, n) * basis_fun_dthetadtheta(0, n, k1, m, k2);
-                            yhatdd += get_coeff(1, m, n) * basis_fun_dthetadtheta(1, n, k1, m, k2);
-                            zdd += get_coeff(2, m, n) * basis_fun_dthetadtheta(2, n, k1, m, k2);
-                        }
-                    }
-                    double xdd = xhatdd * cosphi - yhatdd * sinphi;
-                    double ydd = xhatdd * sinphi + yhatdd * cosphi;
-                    data(k1, k2, 0) = 4*M_PI*M_PI*xdd;
-                    data(k1, k2, 1) = 4*M_PI*M_PI*ydd;
-                    data(k1, k2, 2) = 4*M_PI*M_PI*zdd;
+        static inline int binom(int i, int a) {
+            return (a == 0 || a == i) ? 1 : i;
+        }
+
+        // d^a/dphi^a d^b/dtheta^b of the boundary condition enforcer
+        inline double enforcer(const BasisTables& t, int a, int b, int k1, int k2) {
+            if(a == 0 && b == 0)
+                return t.ephi[0][k1] + t.etheta[0][k2];
+            else if(b == 0)
+                return t.ephi[a][k1];
+            else if(a == 0)
+                return t.etheta[b][k2];
+            else
+                return 0.;
+        }
+
+        // d^k/dphi^k cos(phi) and d^k/dphi^k sin(phi)
+        inline double cosphi_dk(const BasisTables& t, int k, int k1) {
+            double vals[4] = {t.cosphi[k1], -t.sinphi[k1], -t.cosphi[k1], t.sinphi[k1]};
+            return vals[k % 4];
+        }
+
+        inline double sinphi_dk(const BasisTables& t, int k, int k1) {
+            double vals[4] = {t.sinphi[k1], t.cosphi[k1], -t.sinphi[k1], -t.cosphi[k1]};
+            return vals[k % 4];
+        }
+
+        /*
+         * Computes
+         *     out(k1, k2) = \sum_{m, n} coeffs(m, n) w[j]_m(theta_k2) v[i]_n(phi_k1)
+         * by first contracting over m and then over n. This costs
+         * O(ntheta*(2*mpol+1)*(2*ntor+1) + nphi*ntheta*(2*ntor+1)) instead of
+         * O(nphi*ntheta*(2*mpol+1)*(2*ntor+1)) for the direct double sum.
+         */
+        void contract(const BasisTables& t, const vector<double>& coeffs, int i, int j, vector<double>& out) {
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            int nphi = t.nphi;
+            int ntheta = t.ntheta;
+            const double* vtab = t.v[i].data();
+            const double* wtab = t.w[j].data();
+            vector<double> tmp(ntheta*N, 0.);
+#pragma omp parallel for
+            for (int k2 = 0; k2 < ntheta; ++k2) {
+                for (int m = 0; m < M; ++m) {
+                    double wm = wtab[k2*M + m];
+                    for (int n = 0; n < N; ++n)
+                        tmp[k2*N + n] += wm * coeffs[m*N + n];
+                }
+            }
+            out.assign(nphi*ntheta, 0.);
+#pragma omp parallel for
+            for (int k1 = 0; k1 < nphi; ++k1) {
+                for (int k2 = 0; k2 < ntheta; ++k2) {
+                    double val = 0.;
+                    for (int n = 0; n < N; ++n)
+                        val += vtab[k1*N + n] * tmp[k2*N + n];
+                    out[k1*ntheta + k2] = val;
                 }
             }
         }
 
-        void gammadash1dash2_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                double sinphi = sin(phi);
-                double cosphi = cos(phi);
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhatd2 = 0;
-                    double yhatd2 = 0;
-                    double xhatd1d2 = 0;
-                    double yhatd1d2 = 0;
-                    double zd1d2 = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhatd2 += get_coeff(0, m, n) * basis_fun_dtheta(0, n, k1, m, k2);
-                            yhatd2 += get_coeff(1, m, n) * basis_fun_dtheta(1, n, k1, m, k2);
-                            xhatd1d2 += get_coeff(0, m, n) * basis_fun_dthetadphi(0, n, k1, m, k2);
-                            yhatd1d2 += get_coeff(1, m, n) * basis_fun_dthetadphi(1, n, k1, m, k2);
-                            zd1d2 += get_coeff(2, m, n) * basis_fun_dthetadphi(2, n, k1, m, k2);
-                        }
-                    }
-                    double xd1d2 = xhatd1d2 * cosphi - xhatd2 * sinphi - yhatd1d2 * sinphi  \
-                                -  yhatd2 * cosphi;
-                    double yd1d2 = xhatd1d2 * sinphi + xhatd2 * cosphi
-                                +  yhatd1d2 * cosphi - yhatd2 * sinphi;
-                    data(k1, k2, 0) = 4*M_PI*M_PI*xd1d2;
-                    data(k1, k2, 1) = 4*M_PI*M_PI*yd1d2;
-                    data(k1, k2, 2) = 4*M_PI*M_PI*zd1d2;
+        /*
+         * Transpose of contract(), accumulates
+         *     res(m, n) += \sum_{k1, k2} weights(k1, k2) w[j]_m(theta_k2) v[i]_n(phi_k1)
+         * by first contracting over theta and then over phi.
+         */
+        void contract_vjp(const BasisTables& t, const vector<double>& weights, int i, int j, vector<double>& res) {
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            int nphi = t.nphi;
+            int ntheta = t.ntheta;
+            const double* vtab = t.v[i].data();
+            const double* wtab = t.w[j].data();
+            vector<double> tmp(nphi*M, 0.);
+#pragma omp parallel for
+            for (int k1 = 0; k1 < nphi; ++k1) {
+                for (int k2 = 0; k2 < ntheta; ++k2) {
+                    double wk = weights[k1*ntheta + k2];
+                    for (int m = 0; m < M; ++m)
+                        tmp[k1*M + m] += wk * wtab[k2*M + m];
+                }
+            }
+#pragma omp parallel for
+            for (int m = 0; m < M; ++m) {
+                for (int k1 = 0; k1 < nphi; ++k1) {
+                    double tk = tmp[k1*M + m];
+                    for (int n = 0; n < N; ++n)
+                        res[m*N + n] += tk * vtab[k1*N + n];
                 }
             }
         }
 
-        void gammadash1dash1_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                double sinphi = sin(phi);
-                double cosphi = cos(phi);
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    double xhat = 0;
-                    double yhat = 0;
-                    double xhatd = 0;
-                    double yhatd = 0;
-                    double xhatdd = 0;
-                    double yhatdd = 0;
-                    double zdd = 0;
-                    for (int m = 0; m <= 2*mpol; ++m) {
-                        for (int n = 0; n <= 2*ntor; ++n) {
-                            xhat += get_coeff(0, m, n) * basis_fun(0, n, k1, m, k2);
-                            yhat += get_coeff(1, m, n) * basis_fun(1, n, k1, m, k2);
-                            xhatd += get_coeff(0, m, n) * basis_fun_dphi(0, n, k1, m, k2);
-                            yhatd += get_coeff(1, m, n) * basis_fun_dphi(1, n, k1, m, k2);
-                            xhatdd += get_coeff(0, m, n) * basis_fun_dphidphi(0, n, k1, m, k2);
-                            yhatdd += get_coeff(1, m, n) * basis_fun_dphidphi(1, n, k1, m, k2);
-                            zdd += get_coeff(2, m, n) * basis_fun_dphidphi(2, n, k1, m, k2);
-                        }
-                    }
-                    double xdd = xhatdd * cosphi - 2 * xhatd * sinphi - xhat * cosphi \
-                              -  yhatdd * sinphi - 2 * yhatd * cosphi + yhat * sinphi;
-                    double ydd = xhatdd * sinphi + 2 * xhatd * cosphi - xhat * sinphi \
-                              +  yhatdd * cosphi - 2 * yhatd * sinphi - yhat * cosphi;
-                    data(k1, k2, 0) = 4*M_PI*M_PI*xdd;
-                    data(k1, k2, 1) = 4*M_PI*M_PI*ydd;
-                    data(k1, k2, 2) = 4*M_PI*M_PI*zdd;
+        /*
+         * Evaluates d^i/dphi^i d^j/dtheta^j of \hat x, \hat y or z (dim = 0, 1, 2)
+         * on the tensor grid. Modes that are multiplied by the boundary
+         * condition enforcer are contracted separately and the enforcer is
+         * applied pointwise via the product rule.
+         */
+        void eval_hat(const BasisTables& t, int dim, int i, int j, vector<double>& out) {
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            int npoints = t.nphi*t.ntheta;
+            vector<double> free_coeffs(M*N, 0.);
+            vector<double> clamped_coeffs(M*N, 0.);
+            for (int m = 0; m < M; ++m) {
+                for (int n = 0; n < N; ++n) {
+                    if(apply_bc_enforcer(dim, n, m))
+                        clamped_coeffs[m*N + n] = get_coeff(dim, m, n);
+                    else
+                        free_coeffs[m*N + n] = get_coeff(dim, m, n);
+                }
+            }
+            contract(t, free_coeffs, i, j, out);
+            if(!clamped_dims[dim])
+                return;
+            vector<double> temp;
+            for (int a = 0; a <= i; ++a) {
+                for (int b = 0; b <= j; ++b) {
+                    if(a > 0 && b > 0)
+                        continue;
+                    contract(t, clamped_coeffs, i-a, j-b, temp);
+                    double fak = binom(i, a)*binom(j, b);
+                    for (int k = 0; k < npoints; ++k)
+                        out[k] += fak * enforcer(t, a, b, k / t.ntheta, k % t.ntheta) * temp[k];
                 }
             }
         }
 
-        void dgammadash1dash1_by_dcoeff_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    int counter = 0;
-                    for (int d = 0; d < 3; ++d) {
-                        for (int m = 0; m <= 2*mpol; ++m) {
-                            for (int n = 0; n <= 2*ntor; ++n) {
-                                if(skip(d, m, n)) continue;
-                                double wivj = basis_fun(d, n, phi, m, theta);
-                                double wivjd = basis_fun_dphi(d, n, phi, m, theta);
-                                double wivjdd = basis_fun_dphidphi(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhat = wivj;
-                                    double dxhatd = wivjd;
-                                    double dxhatdd = wivjdd;
-                                    double dyhat = 0.;
-                                    double dyhatd = 0.;
-                                    double dyhatdd = 0.;
-                                    double dxdd = dxhatdd * cos(phi) - 2*dxhatd * sin(phi) - dxhat * cos(phi) \
-                                                - dyhatdd * sin(phi) - 2*dyhatd * cos(phi) + dyhat * sin(phi);
-                                    double dydd = dxhatdd * sin(phi) + 2 * dxhatd * cos(phi) - dxhat * sin(phi) \
-                                                + dyhatdd * cos(phi) - 2 * dyhatd * sin(phi) - dyhat * cos(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxdd;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dydd;
-                                } else if(d==1) {
-                                    double dxhat = 0.;
-                                    double dxhatd = 0.;
-                                    double dxhatdd = 0.;
-                                    double dyhat = wivj;
-                                    double dyhatd = wivjd;
-                                    double dyhatdd = wivjdd;
-                                    double dxdd = dxhatdd * cos(phi) - 2*dxhatd * sin(phi) - dxhat * cos(phi) \
-                                                - dyhatdd * sin(phi) - 2*dyhatd * cos(phi) + dyhat * sin(phi);
-                                    double dydd = dxhatdd * sin(phi) + 2 * dxhatd * cos(phi) - dxhat * sin(phi) \
-                                                + dyhatdd * cos(phi) - 2 * dyhatd * sin(phi) - dyhat * cos(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxdd;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dydd;
-                                }else {
-                                    double dzdd = wivjdd;
-                                    data(k1, k2, 2, counter) = 4*M_PI*M_PI*dzdd;
-                                }
-                                counter++;
-                            }
-                        }
-                    }
+        // Transpose of eval_hat(), the two contributions are accumulated separately.
+        void eval_hat_vjp(const BasisTables& t, int dim, int i, int j, const vector<double>& weights, vector<double>& res_free, vector<double>& res_clamped) {
+            int npoints = t.nphi*t.ntheta;
+            contract_vjp(t, weights, i, j, res_free);
+            if(!clamped_dims[dim])
+                return;
+            vector<double> temp(npoints);
+            for (int a = 0; a <= i; ++a) {
+                for (int b = 0; b <= j; ++b) {
+                    if(a > 0 && b > 0)
+                        continue;
+                    double fak = binom(i, a)*binom(j, b);
+                    for (int k = 0; k < npoints; ++k)
+                        temp[k] = fak * enforcer(t, a, b, k / t.ntheta, k % t.ntheta) * weights[k];
+                    contract_vjp(t, temp, i-a, j-b, res_clamped);
                 }
             }
         }
 
-        void dgammadash1dash2_by_dcoeff_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    int counter = 0;
-                    for (int d = 0; d < 3; ++d) {
-                        for (int m = 0; m <= 2*mpol; ++m) {
-                            for (int n = 0; n <= 2*ntor; ++n) {
-                                if(skip(d, m, n)) continue;
-                                double wivjd2 = basis_fun_dtheta(d, n, phi, m, theta);
-                                double wivjd1d2 = basis_fun_dthetadphi(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhatd2 = wivjd2;
-                                    double dxhatd1d2 = wivjd1d2;
-                                    double dyhatd2 = 0.;
-                                    double dyhatd1d2 = 0.;
-                                    double dxd1d2 = dxhatd1d2 * cos(phi) - dxhatd2 * sin(phi) \
-                                                  - dyhatd1d2 * sin(phi) - dyhatd2 * cos(phi);
-                                    double dyd1d2 = dxhatd1d2 * sin(phi) + dxhatd2 * cos(phi) \
-                                                + dyhatd1d2 * cos(phi) - dyhatd2 * sin(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxd1d2;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dyd1d2;
-                                }else if(d==1) {
-                                    double dxhatd2 = 0.;
-                                    double dxhatd1d2 = 0.;
-                                    double dyhatd2 = wivjd2;
-                                    double dyhatd1d2 = wivjd1d2;
-                                    double dxd1d2 = dxhatd1d2 * cos(phi) - dxhatd2 * sin(phi) \
-                                                  - dyhatd1d2 * sin(phi) - dyhatd2 * cos(phi);
-                                    double dyd1d2 = dxhatd1d2 * sin(phi) + dxhatd2 * cos(phi) \
-                                                  + dyhatd1d2 * cos(phi) - dyhatd2 * sin(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxd1d2;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dyd1d2;
-                                }else {
-                                    double dzd1d2 = wivjd1d2;
-                                    data(k1, k2, 2, counter) = 4*M_PI*M_PI*dzd1d2;
-                                }
-                                counter++;
-                            }
-                        }
+        /*
+         * Computes d^i/dphi^i d^j/dtheta^j gamma, including the factors of 2*pi
+         * that come from the quadrature points living on [0, 1). The rotation
+         * (\hat x, \hat y) -> (x, y) is differentiated using Leibniz' rule.
+         */
+        void eval_gamma(const BasisTables& t, int i, int j, Array& data) {
+            int nphi = t.nphi;
+            int ntheta = t.ntheta;
+            vector<vector<double>> xhat(i+1);
+            vector<vector<double>> yhat(i+1);
+            vector<double> zhat;
+            for (int p = 0; p <= i; ++p) {
+                eval_hat(t, 0, p, j, xhat[p]);
+                eval_hat(t, 1, p, j, yhat[p]);
+            }
+            eval_hat(t, 2, i, j, zhat);
+            double scale = pow(2*M_PI, i+j);
+#pragma omp parallel for
+            for (int k1 = 0; k1 < nphi; ++k1) {
+                for (int k2 = 0; k2 < ntheta; ++k2) {
+                    int idx = k1*ntheta + k2;
+                    double xval = 0.;
+                    double yval = 0.;
+                    for (int k = 0; k <= i; ++k) {
+                        double c = binom(i, k)*cosphi_dk(t, k, k1);
+                        double s = binom(i, k)*sinphi_dk(t, k, k1);
+                        xval += xhat[i-k][idx] * c - yhat[i-k][idx] * s;
+                        yval += xhat[i-k][idx] * s + yhat[i-k][idx] * c;
                     }
+                    data(k1, k2, 0) = scale*xval;
+                    data(k1, k2, 1) = scale*yval;
+                    data(k1, k2, 2) = scale*zhat[idx];
                 }
             }
         }
 
-        void dgammadash2dash2_by_dcoeff_impl(Array& data) override {
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    int counter = 0;
-                    for (int d = 0; d < 3; ++d) {
-                        for (int m = 0; m <= 2*mpol; ++m) {
-                            for (int n = 0; n <= 2*ntor; ++n) {
-                                if(skip(d, m, n)) continue;
-                                double wivj = basis_fun(d, n, phi, m, theta);
-                                double wivjd = basis_fun_dtheta(d, n, phi, m, theta);
-                                double wivjdd = basis_fun_dthetadtheta(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhat = wivj;
-                                    double dyhat = 0.;
-                                    double dxhatd = wivjd;
-                                    double dyhatd = 0.;
-                                    double dxhatdd = wivjdd;
-                                    double dyhatdd = 0.;
-                                    double dxdd = dxhatdd * cos(phi) - dyhatdd * sin(phi);
-                                    double dydd = dxhatdd * sin(phi) + dyhatdd * cos(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxdd;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dydd;
-                                }else if(d==1) {
-                                    double dxhat = 0.;
-                                    double dyhat = wivj;
-                                    double dxhatd = 0.;
-                                    double dyhatd = wivjd;
-                                    double dxhatdd = 0.;
-                                    double dyhatdd = wivjdd;
-                                    double dxdd = dxhatdd * cos(phi) - dyhatdd * sin(phi);
-                                    double dydd = dxhatdd * sin(phi) + dyhatdd * cos(phi);
-                                    data(k1, k2, 0, counter) = 4*M_PI*M_PI*dxdd;
-                                    data(k1, k2, 1, counter) = 4*M_PI*M_PI*dydd;
-                                }else {
-                                    double dzdd = wivjdd;
-                                    data(k1, k2, 2, counter) = 4*M_PI*M_PI*dzdd;;
-                                }
-                                counter++;
-                            }
-                        }
+        Array eval_dgamma_by_dcoeff_vjp(int i, int j, Array& v) {
+            const BasisTables& t = basis;
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            int nphi = t.nphi;
+            int ntheta = t.ntheta;
+            double scale = pow(2*M_PI, i+j);
+            vector<vector<double>> res_free(3, vector<double>(M*N, 0.));
+            vector<vector<double>> res_clamped(3, vector<double>(M*N, 0.));
+            vector<double> wx(nphi*ntheta);
+            vector<double> wy(nphi*ntheta);
+            for (int k = 0; k <= i; ++k) {
+                for (int k1 = 0; k1 < nphi; ++k1) {
+                    double c = scale*binom(i, k)*cosphi_dk(t, k, k1);
+                    double s = scale*binom(i, k)*sinphi_dk(t, k, k1);
+                    for (int k2 = 0; k2 < ntheta; ++k2) {
+                        wx[k1*ntheta + k2] = v(k1, k2, 0) * c + v(k1, k2, 1) * s;
+                        wy[k1*ntheta + k2] = -v(k1, k2, 0) * s + v(k1, k2, 1) * c;
                     }
                 }
+                eval_hat_vjp(t, 0, i-k, j, wx, res_free[0], res_clamped[0]);
+                eval_hat_vjp(t, 1, i-k, j, wy, res_free[1], res_clamped[1]);
             }
-        }
+            vector<double> wz(nphi*ntheta);
+            for (int k1 = 0; k1 < nphi; ++k1)
+                for (int k2 = 0; k2 < ntheta; ++k2)
+                    wz[k1*ntheta + k2] = scale*v(k1, k2, 2);
+            eval_hat_vjp(t, 2, i, j, wz, res_free[2], res_clamped[2]);
 
-        void dgamma_by_dcoeff_impl(Array& data) override {
-#pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    int counter = 0;
-                    for (int d = 0; d < 3; ++d) {
-                        for (int m = 0; m <= 2*mpol; ++m) {
-                            for (int n = 0; n <= 2*ntor; ++n) {
-                                if(skip(d, m, n)) continue;
-                                double wivj = basis_fun(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhat = wivj;
-                                    double dyhat = 0;
-                                    double dx = dxhat * cos(phi) - dyhat * sin(phi);
-                                    double dy = dxhat * sin(phi) + dyhat * cos(phi);
-                                    data(k1, k2, 0, counter) = dx;
-                                    data(k1, k2, 1, counter) = dy;
-                                }else if(d==1) {
-                                    double dxhat = 0;
-                                    double dyhat = wivj;
-                                    double dx = dxhat * cos(phi) - dyhat * sin(phi);
-                                    double dy = dxhat * sin(phi) + dyhat * cos(phi);
-                                    data(k1, k2, 0, counter) = dx;
-                                    data(k1, k2, 1, counter) = dy;
-                                }else {
-                                    double dz = wivj;
-                                    data(k1, k2, 2, counter) = dz;
-                                }
-                                counter++;
-                            }
-                        }
+            Array res = xt::zeros<double>({num_dofs()});
+            int counter = 0;
+            for (int d = 0; d < 3; ++d) {
+                for (int m = 0; m < M; ++m) {
+                    for (int n = 0; n < N; ++n) {
+                        if(skip(d, m, n)) continue;
+                        res(counter++) = apply_bc_enforcer(d, n, m) ? res_clamped[d][m*N + n] : res_free[d][m*N + n];
                     }
                 }
             }
+            return res;
         }
 
-        void dgammadash1_by_dcoeff_impl(Array& data) override {
-#pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    int counter = 0;
-                    for (int d = 0; d < 3; ++d) {
-                        for (int m = 0; m <= 2*mpol; ++m) {
-                            for (int n = 0; n <= 2*ntor; ++n) {
-                                if(skip(d, m, n)) continue;
-                                double wivj = basis_fun(d, n, phi, m, theta);
-                                double wivjdash = basis_fun_dphi(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhat = wivj;
-                                    double dyhat = 0.;
-                                    double dxhatdash = wivjdash;
-                                    double dyhatdash = 0.;
-                                    double dxdash = dxhatdash * cos(phi) - dyhatdash * sin(phi) - dxhat * sin(phi) - dyhat * cos(phi);
-                                    double dydash = dxhatdash * sin(phi) + dyhatdash * cos(phi) + dxhat * cos(phi) - dyhat * sin(phi);
-                                    data(k1, k2, 0, counter) = 2*M_PI*dxdash;
-                                    data(k1, k2, 1, counter) = 2*M_PI*dydash;
-                                }else if(d==1) {
-                                    double dxhat = 0.;
-                                    double dyhat = wivj;
-                                    double dxhatdash = 0.;
-                                    double dyhatdash = wivjdash;
-                                    double dxdash = dxhatdash * cos(phi) - dyhatdash * sin(phi) - dxhat * sin(phi) - dyhat * cos(phi);
-                                    double dydash = dxhatdash * sin(phi) + dyhatdash * cos(phi) + dxhat * cos(phi) - dyhat * sin(phi);
-                                    data(k1, k2, 0, counter) = 2*M_PI*dxdash;
-                                    data(k1, k2, 1, counter) = 2*M_PI*dydash;
-                                }else {
-                                    double dzdash = wivjdash;
-                                    data(k1, k2, 2, counter) = 2*M_PI*dzdash;;
-                                }
-                                counter++;
-                            }
-                        }
-                    }
+        // d^i/dphi^i d^j/dtheta^j of the basis function w_m(theta) v_n(phi), including the enforcer
+        inline double basis_fun(const BasisTables& t, int dim, int n, int m, int k1, int k2, int i, int j) {
+            int M = 2*mpol+1;
+            int N = 2*ntor+1;
+            if(!apply_bc_enforcer(dim, n, m))
+                return t.v[i][k1*N + n] * t.w[j][k2*M + m];
+            double res = 0.;
+            for (int a = 0; a <= i; ++a) {
+                for (int b = 0; b <= j; ++b) {
+                    if(a > 0 && b > 0)
+                        continue;
+                    res += binom(i, a)*binom(j, b) * enforcer(t, a, b, k1, k2) * t.v[i-a][k1*N + n] * t.w[j-b][k2*M + m];
                 }
             }
+            return res;
         }
 
-        void dgammadash2_by_dcoeff_impl(Array& data) override {
+        void eval_dgamma_by_dcoeff(int i, int j, Array& data) {
+            const BasisTables& t = basis;
+            double scale = pow(2*M_PI, i+j);
 #pragma omp parallel for
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
+            for (int k1 = 0; k1 < t.nphi; ++k1) {
+                for (int k2 = 0; k2 < t.ntheta; ++k2) {
                     int counter = 0;
                     for (int d = 0; d < 3; ++d) {
                         for (int m = 0; m <= 2*mpol; ++m) {
                             for (int n = 0; n <= 2*ntor; ++n) {
                                 if(skip(d, m, n)) continue;
-                                double wivj = basis_fun(d, n, phi, m, theta);
-                                double wivjdash = basis_fun_dtheta(d, n, phi, m, theta);
-                                if(d==0) {
-                                    double dxhat = wivj;
-                                    double dyhat = 0.;
-                                    double dxhatdash = wivjdash;
-                                    double dyhatdash = 0.;
-                                    double dxdash = dxhatdash * cos(phi) - dyhatdash * sin(phi);
-                                    double dydash = dxhatdash * sin(phi) + dyhatdash * cos(phi);
-                                    data(k1, k2, 0, counter) = 2*M_PI*dxdash;
-                                    data(k1, k2, 1, counter) = 2*M_PI*dydash;
-                                }else if(d==1) {
-                                    double dxhat = 0.;
-                                    double dyhat = wivj;
-                                    double dxhatdash = 0.;
-                                    double dyhatdash = wivjdash;
-                                    double dxdash = dxhatdash * cos(phi) - dyhatdash * sin(phi);
-                                    double dydash = dxhatdash * sin(phi) + dyhatdash * cos(phi);
-                                    data(k1, k2, 0, counter) = 2*M_PI*dxdash;
-                                    data(k1, k2, 1, counter) = 2*M_PI*dydash;
-                                }else {
-                                    double dzdash = wivjdash;
-                                    data(k1, k2, 2, counter) = 2*M_PI*dzdash;;
+                                if(d == 2) {
+                                    data(k1, k2, 2, counter) = scale*basis_fun(t, d, n, m, k1, k2, i, j);
+                                } else {
+                                    double dx = 0.;
+                                    double dy = 0.;
+                                    for (int k = 0; k <= i; ++k) {
+                                        double wivj = binom(i, k)*basis_fun(t, d, n, m, k1, k2, i-k, j);
+                                        double c = cosphi_dk(t, k, k1);
+                                        double s = sinphi_dk(t, k, k1);
+                                        // d/dcoeff of \hat x is wivj and d/dcoeff of \hat y is zero for d == 0, and vice versa for d == 1
+                                        dx += (d == 0) ? wivj * c : -wivj * s;
+                                        dy += (d == 0) ? wivj * s : wivj * c;
+                                    }
+                                    data(k1, k2, 0, counter) = scale*dx;
+                                    data(k1, k2, 1, counter) = scale*dy;
                                 }
                                 counter++;
                             }
@@ -597,50 +566,6 @@ class SurfaceXYZTensorFourier : public Surface<Array> {
             }
         }
 
-    private:
-
-        void build_cache() {
-            cache_basis_fun_phi = xt::zeros<double>({numquadpoints_phi, 2*ntor+1});
-            cache_basis_fun_phi_dash = xt::zeros<double>({numquadpoints_phi, 2*ntor+1});
-            cache_basis_fun_phi_dashdash = xt::zeros<double>({numquadpoints_phi, 2*ntor+1});
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int n = 0; n <= 2*ntor; ++n) {
-                    cache_basis_fun_phi(k1, n)= basis_fun_phi(n, phi);
-                    cache_basis_fun_phi_dash(k1, n) = basis_fun_phi_dash(n, phi);
-                    cache_basis_fun_phi_dashdash(k1, n) = basis_fun_phi_dashdash(n, phi);
-                }
-            }
-            cache_basis_fun_theta = xt::zeros<double>({numquadpoints_theta, 2*mpol+1});
-            cache_basis_fun_theta_dash = xt::zeros<double>({numquadpoints_theta, 2*mpol+1});
-            cache_basis_fun_theta_dashdash = xt::zeros<double>({numquadpoints_theta, 2*mpol+1});
-            for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                double theta  = 2*M_PI*quadpoints_theta[k2];
-                for (int m = 0; m <= 2*mpol; ++m) {
-                    cache_basis_fun_theta(k2, m) = basis_fun_theta(m, theta);
-                    cache_basis_fun_theta_dash(k2, m) = basis_fun_theta_dash(m, theta);
-                    cache_basis_fun_theta_dashdash(k2, m) = basis_fun_theta_dashdash(m, theta);
-                }
-            }
-            cache_enforcer = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta});
-            cache_enforcer_dphi = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta});
-            cache_enforcer_dtheta = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta});
-            cache_enforcer_dphidphi = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta});
-            cache_enforcer_dthetadtheta = xt::zeros<double>({numquadpoints_phi, numquadpoints_theta});
-            for (int k1 = 0; k1 < numquadpoints_phi; ++k1) {
-                double phi  = 2*M_PI*quadpoints_phi[k1];
-                for (int k2 = 0; k2 < numquadpoints_theta; ++k2) {
-                    double theta  = 2*M_PI*quadpoints_theta[k2];
-                    cache_enforcer(k1, k2) = pow(sin(nfp*phi/2), 2) + pow(sin(theta/2), 2);
-                    cache_enforcer_dphi(k1, k2) = nfp*cos(nfp*phi/2)*sin(nfp*phi/2);
-                    cache_enforcer_dphidphi(k1, k2) = nfp*(nfp/2)*(pow(cos(nfp*phi/2),2) - pow(sin(nfp*phi/2),2));
-                    cache_enforcer_dtheta(k1, k2) = cos(theta/2)*sin(theta/2);
-                    cache_enforcer_dthetadtheta(k1, k2) = (1/2)*(pow(cos(theta/2),2) - pow(sin(theta/2),2));
-                }
-            }
-
-        }
-
         inline bool apply_bc_enforcer(int dim, int n, int m) {
             return (clamped_dims[dim] && n<=ntor && m<=mpol);
         }
@@ -652,138 +577,11 @@ class SurfaceXYZTensorFourier : public Surface<Array> {
                 return 1;
         }
 
-        inline double bc_enforcer_dphi_fun(int dim, int n, double phi, int m, double theta){
-            if(apply_bc_enforcer(dim, n, m))
-                return nfp*cos(nfp*phi/2)*sin(nfp*phi/2);
-            else
-                return 0;
-        }
-
-        inline double bc_enforcer_dphidphi_fun(int dim, int n, double phi, int m, double theta){
-            if(apply_bc_enforcer(dim, n, m))
-                return (nfp*nfp/2)*(pow(cos(nfp*phi/2),2) - pow(sin(nfp*phi/2),2));
-            else
-                return 0;
-        }
-
-        inline double bc_enforcer_dtheta_fun(int dim, int n, double phi, int m, double theta){
-            if(apply_bc_enforcer(dim, n, m))
-                return cos(theta/2)*sin(theta/2);
-            else
-                return 0;
-        }
-
-        inline double bc_enforcer_dthetadtheta_fun(int dim, int n, double phi, int m, double theta){
-            if(apply_bc_enforcer(dim, n, m))
-                return (1/2)*(pow(cos(theta/2),2) - pow(sin(theta/2),2));
-            else
-                return 0;
-        }
-
-        inline double basis_fun(int dim, int n, int phiidx, int m, int thetaidx){
-            double fun = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-            if(apply_bc_enforcer(dim, n, m))
-                fun *= cache_enforcer(phiidx, thetaidx);
-            return fun;
-        }
-
-        inline double basis_fun_dphi(int dim, int n, int phiidx, int m, int thetaidx){
-            double fun_dphi = cache_basis_fun_phi_dash(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-            if(apply_bc_enforcer(dim, n, m)){
-                double fun = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-                fun_dphi = fun_dphi*cache_enforcer(phiidx, thetaidx) + fun*cache_enforcer_dphi(phiidx, thetaidx);
-            }
-            return fun_dphi;
-        }
-
-        inline double basis_fun_dphidphi(int dim, int n, int phiidx, int m, int thetaidx){
-            double fun_dphidphi = cache_basis_fun_phi_dashdash(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-            if(apply_bc_enforcer(dim, n, m)){
-                double fun_dphi = cache_basis_fun_phi_dash(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-                double fun = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-                fun_dphidphi = fun_dphidphi*cache_enforcer(phiidx, thetaidx) + 2*fun_dphi*cache_enforcer_dphi(phiidx, thetaidx) \
-                            +  fun*cache_enforcer_dphidphi(phiidx, thetaidx);
-            }
-            return fun_dphidphi;
-        }
-
-        inline double basis_fun_dtheta(int dim, int n, int phiidx, int m, int thetaidx){
-            double fun_dtheta = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta_dash(thetaidx, m);
-            if(apply_bc_enforcer(dim, n, m)){
-                double fun = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-                fun_dtheta = fun_dtheta*cache_enforcer(phiidx, thetaidx) + fun*cache_enforcer_dtheta(phiidx, thetaidx);
-            }
-            return fun_dtheta;
-        }
-
-        inline double basis_fun_dthetadphi(int dim, int n, int phiidx, int m, int thetaidx){
-            double fun_dthetadphi = cache_basis_fun_phi_dash(phiidx, n)*cache_basis_fun_theta_dash(thetaidx, m);
-            if(apply_bc_enforcer(dim, n, m)){
-                double fun_dtheta = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta_dash(thetaidx, m);
-                double fun_dphi = cache_basis_fun_phi_dash(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-                fun_dthetadphi = fun_dthetadphi*cache_enforcer(phiidx, thetaidx) \
-                                + fun_dtheta*cache_enforcer_dphi(phiidx, thetaidx) \
-                                + fun_dphi*cache_enforcer_dtheta(phiidx, thetaidx);
-            }
-            return fun_dthetadphi;
-        }
-
-        inline double basis_fun_dthetadtheta(int dim, int n, int phiidx, int m, int thetaidx){
-          double fun_dthetadtheta = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta_dashdash(thetaidx, m);
-          if(apply_bc_enforcer(dim, n, m)){
-              double fun = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta(thetaidx, m);
-              double fun_dtheta = cache_basis_fun_phi(phiidx, n)*cache_basis_fun_theta_dash(thetaidx, m);
-              fun_dthetadtheta = fun_dthetadtheta*cache_enforcer(phiidx, thetaidx) \
-                              + 2*fun_dtheta*cache_enforcer_dtheta(phiidx, thetaidx) \
-                              + fun*cache_enforcer_dthetadtheta(phiidx, thetaidx);
-          }
-          return fun_dthetadtheta;
-        }
-
         inline double basis_fun(int dim, int n, double phi, int m, double theta){
             double bc_enforcer = bc_enforcer_fun(dim, n, phi, m, theta);
             return basis_fun_phi(n, phi) * basis_fun_theta(m, theta) * bc_enforcer;
         }
 
-        inline double basis_fun_dphi(int dim, int n, double phi, int m, double theta){
-            double bc_enforcer =  bc_enforcer_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dphi = bc_enforcer_dphi_fun(dim, n, phi, m, theta);
-            return basis_fun_phi_dash(n, phi) * basis_fun_theta(m, theta) * bc_enforcer + basis_fun_phi(n, phi) * basis_fun_theta(m, theta) * bc_enforcer_dphi;
-        }
-
-        inline double basis_fun_dtheta(int dim, int n, double phi, int m, double theta){
-            double bc_enforcer =  bc_enforcer_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dtheta = bc_enforcer_dtheta_fun(dim, n, phi, m, theta);
-            return basis_fun_phi(n, phi) * basis_fun_theta_dash(m, theta) * bc_enforcer + basis_fun_phi(n, phi) * basis_fun_theta(m, theta) * bc_enforcer_dtheta;
-        }
-
-        inline double basis_fun_dthetadtheta(int dim, int n, double phi, int m, double theta){
-            double bc_enforcer =  bc_enforcer_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dtheta = bc_enforcer_dtheta_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dthetadtheta = bc_enforcer_dthetadtheta_fun(dim, n, phi, m, theta);
-            return basis_fun_phi(n, phi) * (basis_fun_theta_dashdash(m, theta) * bc_enforcer \
-                 + 2* basis_fun_theta_dash(m, theta) * bc_enforcer_dtheta \
-                 +    basis_fun_theta(m, theta) * bc_enforcer_dthetadtheta);
-        }
-
-        inline double basis_fun_dphidphi(int dim, int n, double phi, int m, double theta){
-            double bc_enforcer =  bc_enforcer_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dphi = bc_enforcer_dphi_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dphidphi = bc_enforcer_dphidphi_fun(dim, n, phi, m, theta);
-            return basis_fun_theta(m, theta) * (basis_fun_phi_dashdash(n, phi) * bc_enforcer \
-                  + 2*basis_fun_phi_dash(n, phi)*bc_enforcer_dphi \
-                  + basis_fun_phi(n,phi) * bc_enforcer_dphidphi);
-        }
-
-        inline double basis_fun_dthetadphi(int dim, int n, double phi, int m, double theta){
-            double bc_enforcer =  bc_enforcer_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dtheta = bc_enforcer_dtheta_fun(dim, n, phi, m, theta);
-            double bc_enforcer_dphi = bc_enforcer_dphi_fun(dim, n, phi, m, theta);
-            return basis_fun_phi_dash(n, phi) * basis_fun_theta_dash(m, theta) * bc_enforcer \
-                 +  basis_fun_phi(n, phi) * basis_fun_theta_dash(m, theta) * bc_enforcer_dphi \
-                 +  basis_fun_phi_dash(n, phi) * basis_fun_theta(m, theta) * bc_enforcer_dtheta;
-        }
-
         inline double basis_fun_phi(int n, double phi){
             if(n <= ntor)
                 return cos(nfp*n*phi);
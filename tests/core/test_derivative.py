@@ -337,3 +337,64 @@ class DerivativeTests(unittest.TestCase):
 
         dj1 = opt1.dfoo_vjp(np.ones(3))
         assert np.allclose(dj1(opt2), np.zeros((2, )))
+
+    def test_sum(self):
+        opt1 = Opt(n=3)
+        opt2 = Opt(n=2)
+
+        djs = [opt1.dfoo_vjp(np.ones(3)), opt2.dfoo_vjp(np.ones(2)),
+               opt1.dfoo_vjp(2 * np.ones(3))]
+        data = [{k: v.copy() for k, v in dj.data.items()} for dj in djs]
+        dj = Derivative.sum(djs)
+        dj_ref = djs[0] + djs[1] + djs[2]
+        assert np.allclose(dj(opt1), dj_ref(opt1))
+        assert np.allclose(dj(opt2), dj_ref(opt2))
+        # The summands are not modified
+        for d, dj_i in zip(data, djs):
+            for k in d:
+                assert np.array_equal(d[k], dj_i.data[k])
+        assert len(Derivative.sum([]).data) == 0
+
+    def test_batched(self):
+        # Derivatives of vector valued outputs are stored as Jacobians
+        opt1 = Opt(n=3)
+        opt2 = Opt(n=2)
+        opt1.fix(1)
+        obj = OptimizableSum([opt1, opt2])
+        jac1 = np.random.standard_normal((4, 3))
+        jac2 = np.random.standard_normal((4, 2))
+        dj = Derivative({opt1: jac1}) + 2 * Derivative({opt2: jac2})
+        jac = dj(obj)
+        self.assertEqual(jac.shape, (4, obj.dof_size))
+        np.testing.assert_allclose(jac, np.hstack([jac1[:, [0, 2]], 2 * jac2]))
+        # Rows agree with the derivatives of the individual outputs
+        for i in range(4):
+            dj_i = Derivative({opt1: jac1[i]}) + 2 * Derivative({opt2: jac2[i]})
+            np.testing.assert_allclose(jac[i], dj_i(obj))
+        np.testing.assert_allclose(Derivative({opt1: jac1})(opt2), np.zeros((4, 2)))
+        partial = dj(obj, as_derivative=True)
+        np.testing.assert_allclose(partial.data[opt2], 2 * jac2)
+
+    def test_memoization(self):
+        """
+        The Derivative objects returned by functions decorated with
+        derivative_dec are memoized when memoization is enabled.
+        """
+        opt1 = Opt(n=3)
+        opt2 = Opt(n=2)
+        obj = Obj(InterSum(opt1, opt2), InterProd(opt1, opt2))
+        obj.enable_memoization()
+        x0 = obj.x
+        dJ0 = obj.dJ()
+        self.assertEqual(obj.memoization_stats["misses"], 1)
+        np.testing.assert_allclose(obj.dJ(), dJ0)
+        self.assertIs(obj.dJ(partials=True), obj.dJ(partials=True))
+        self.assertEqual(obj.memoization_stats["misses"], 1)
+        self.assertEqual(obj.memoization_stats["hits"], 3)
+        obj.x = x0 + 0.1
+        dJ1 = obj.dJ()
+        self.assertEqual(obj.memoization_stats["misses"], 2)
+        obj.disable_memoization()
+        np.testing.assert_allclose(obj.dJ(), dJ1)
+        obj.x = x0
+        np.testing.assert_allclose(obj.dJ(), dJ0)
@@ -1,3 +1,4 @@
+import gc
 import logging
 import unittest
 
@@ -8,7 +9,9 @@ except:
     MPI = None
 
 from simsopt._core.optimizable import Optimizable, make_optimizable
-from simsopt._core.finite_difference import FiniteDifference
+from simsopt._core.finite_difference import FiniteDifference, BroydenJacobian, \
+    least_squares_broyden
+from simsopt.objectives.functions import Rosenbrock
 if MPI is not None:
     from simsopt.util.mpi import MpiPartition
     from simsopt._core.finite_difference import MPIFiniteDifference
@@ -189,6 +192,181 @@ class FiniteDifferenceTests(unittest.TestCase):
                     np.testing.assert_allclose(fd_jac, anlt_jac, rtol=1e-6,
                                                atol=1e-6)
 
+    def test_jac_workers(self):
+        """
+        Check that the finite difference Jacobian evaluated by a pool of
+        threads or processes agrees with the serial one.
+        """
+        # Forked processes inherit graphs which cannot be serialized
+        o = TestFunction2()
+        opt = make_optimizable(lambda x: [x.f0(), x.f1(), x.f2(), x.f3()], o)
+        x = np.array([1.1, 0.7])
+        with self.assertRaises(ValueError):
+            FiniteDifference(opt.J, workers=2).jac(x)
+        for diff_method in ["forward", "centered"]:
+            fd_ref = FiniteDifference(opt.J, diff_method=diff_method)
+            with FiniteDifference(opt.J, diff_method=diff_method,
+                                  workers=2, executor="fork") as fd:
+                np.testing.assert_allclose(fd.jac(x), fd_ref.jac(x),
+                                           rtol=1e-12)
+                # The pool is reused for subsequent evaluations
+                np.testing.assert_allclose(fd.jac(2 * x), fd_ref.jac(2 * x),
+                                           rtol=1e-12)
+            self.assertIsNone(fd._pool)
+
+        # Spawned processes and threads work on copies of the graph
+        # obtained from GSON
+        r = Rosenbrock()
+        x = np.array([1.0, 0.5])
+        jac_ref = FiniteDifference(r.f).jac(x)
+        for executor in ["process", "thread"]:
+            with FiniteDifference(r.f, workers=2, executor=executor) as fd:
+                np.testing.assert_allclose(fd.jac(x), jac_ref, rtol=1e-12)
+            # The DOFs of the original object are restored
+            np.testing.assert_allclose(r.x, [0, 0])
+
+        # The workers are shut down when the object is garbage collected
+        fd = FiniteDifference(r.f, workers=2, executor="thread")
+        fd.jac(x)
+        finalizer = fd._pool_finalizer
+        del fd
+        gc.collect()
+        self.assertFalse(finalizer.alive)
+
+        # Changes of the fixed DOFs are passed to the workers
+        r.fix(1)
+        with FiniteDifference(r.f, workers=2, executor="thread") as fd:
+            fd.jac([0.2])
+            r.set(1, 0.3)
+            jac_ref = FiniteDifference(r.f).jac([0.2])
+            np.testing.assert_allclose(fd.jac([0.2]), jac_ref, rtol=1e-12)
+
+        with self.assertRaises(ValueError):
+            FiniteDifference(r.f, workers=2, executor="mpi")
+
+    def test_jac_f0(self):
+        """
+        Check that the function value supplied to forward differences is
+        reused rather than recomputed.
+        """
+        o = TestFunction1()
+        x = np.array([1.0, 0.5, -0.2])
+        o.x = x
+        f0 = o.J()
+        ncalls = 0
+
+        def J():
+            nonlocal ncalls
+            ncalls += 1
+            return o.J()
+
+        fd = FiniteDifference(o.J)
+        fd.fn = J
+        jac = fd.jac(x, f0=f0)
+        self.assertEqual(ncalls, 3)
+        np.testing.assert_allclose(jac, FiniteDifference(o.J).jac(x))
+
+
+class BroydenJacobianTests(unittest.TestCase):
+    def test_update(self):
+        """
+        Broyden updates are exact for a linear function, and finite
+        differences are used again when the linearization is poor.
+        """
+        A = np.array([[1.0, 2.0], [3.0, -1.0], [0.5, 0.2]])
+        b = np.array([0.1, -0.3, 2.0])
+        o = make_optimizable(lambda x, y: A @ [x, y] + b, 0.0, 0.0,
+                             dof_indicators=["dof", "dof"])
+
+        def f(x):
+            o.x = x
+            return o.J()
+
+        fd = FiniteDifference(o.J)
+        broyden = BroydenJacobian(fd, max_updates=2)
+
+        # Take gradient descent steps
+        x = np.zeros(2)
+        for i in range(4):
+            fx = f(x)
+            broyden.record(x, fx)
+            jac = broyden.jac(x)
+            np.testing.assert_allclose(jac, A, atol=1e-6)
+            self.assertEqual(broyden.last_full, i % 3 == 0)
+            x = x - 0.05 * jac.T @ fx
+        self.assertEqual(broyden.nfull, 2)
+        self.assertEqual(broyden.nupdates, 2)
+        # Each update saves the 2 function evaluations of forward differences
+        self.assertEqual(broyden.nevals_saved, 4)
+
+        # Without a recorded function value, finite differences are used
+        x = np.array([0.3, 0.3])
+        broyden.jac(x)
+        self.assertEqual(broyden.nfull, 3)
+
+    def test_stall(self):
+        o = TestFunction1()
+
+        def f(x):
+            o.x = x
+            return o.J()
+
+        fd = FiniteDifference(o.J, diff_method="centered")
+        broyden = BroydenJacobian(fd, max_updates=5, max_rejected=2)
+        x0 = np.array([0.0, 0.2, 0.1])
+        broyden.record(x0, f(x0))
+        jac = broyden.jac(x0)
+        # Take a step decreasing the function along its Jacobian
+        x1 = x0 - 0.05 * jac[0] / np.linalg.norm(jac)
+        broyden.record(x1, f(x1))
+        broyden.jac(x1)
+        self.assertFalse(broyden.last_full)
+        self.assertEqual(broyden.nevals_saved, 6)
+        self.assertFalse(broyden.stalled)
+        # Points which do not decrease the function flag a stall
+        for x in [x1 + [0.1, 0, 0], x1 + [0.2, 0, 0]]:
+            broyden.record(x, f(x))
+        self.assertTrue(broyden.stalled)
+        np.testing.assert_allclose(broyden.x, x1)
+        broyden.reset()
+        self.assertFalse(broyden.stalled)
+        np.testing.assert_allclose(broyden.jac(x1),
+                                   FiniteDifference(o.J, diff_method="centered").jac(x1))
+        self.assertTrue(broyden.last_full)
+
+        with self.assertRaises(ValueError):
+            BroydenJacobian(fd, max_updates=-1)
+
+    def test_least_squares_broyden(self):
+        """
+        The optimization converges, and max_nfev, which must be positive,
+        bounds the function evaluations of all the restarts together.
+        """
+        for max_nfev in [None, 5, 12, 20, 25]:
+            o = make_optimizable(lambda x, y: np.array([10 * (y - x ** 2), 1 - x]),
+                                 -1.2, 1.0, dof_indicators=["dof", "dof"])
+            broyden = BroydenJacobian(FiniteDifference(o.J), max_updates=3)
+            nevals = 0
+
+            def f(x):
+                nonlocal nevals
+                nevals += 1
+                o.x = x
+                fx = o.J()
+                broyden.record(x, fx)
+                return fx
+
+            result = least_squares_broyden(f, np.array([-1.2, 1.0]), broyden,
+                                           max_nfev=max_nfev)
+            self.assertEqual(result.nfev, nevals)
+            if max_nfev is None:
+                np.testing.assert_allclose(result.x, [1, 1])
+            else:
+                self.assertLessEqual(nevals, max_nfev)
+
+        with self.assertRaises(ValueError):
+            least_squares_broyden(f, np.array([-1.2, 1.0]), broyden, max_nfev=0)
+
 
 @unittest.skipIf(MPI is None, "Requires mpi4py")
 class MPIFiniteDifferenceTests(unittest.TestCase):
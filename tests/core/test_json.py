@@ -19,6 +19,7 @@ import datetime
 import json
 import os
 import pathlib
+import tempfile
 import unittest
 from enum import Enum
 
@@ -32,7 +33,8 @@ try:
 except ImportError:
     ObjectId = None
 
-from simsopt._core.json import GSONDecoder, GSONEncoder, GSONable, _load_redirect, jsanitize, SIMSON
+from simsopt._core.json import GSONDecoder, GSONEncoder, GSONable, _load_redirect, jsanitize, SIMSON, \
+    binary_array_context
 
 test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_files")
 
@@ -448,6 +450,44 @@ class JsonTest(unittest.TestCase):
         self.assertIsInstance(obj.np_a["a"][0]["b"], np.ndarray)
         self.assertEqual(obj.np_a["a"][0]["b"][0][1], 2 + 1j)
 
+    def test_numpy_binary(self):
+        x = np.random.standard_normal((20, 3))
+        z = (np.arange(12) + 1j).astype("complex64").reshape((3, 4))
+        small = np.array([1, 2, 3], dtype="int64")
+        objs = {"x": x, "y": x[:, 1], "z": z, "small": small}
+        djson = json.dumps(objs, cls=GSONEncoder, array_threshold=10)
+        d = json.loads(djson)
+        self.assertEqual(d["x"]["encoding"], "base64")
+        self.assertEqual(d["small"]["data"], [1, 2, 3])
+        d = json.loads(djson, cls=GSONDecoder)
+        np.testing.assert_array_equal(d["x"], x)
+        np.testing.assert_array_equal(d["y"], x[:, 1])
+        np.testing.assert_array_equal(d["z"], z)
+        self.assertEqual(d["z"].dtype, "complex64")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Identical arrays are only written once to the sidecar file
+            objs["w"] = x.copy()
+            fname = os.path.join(tmpdir, "arrays.bin")
+            with open(fname, "wb") as f:
+                djson = json.dumps(objs, cls=GSONEncoder, array_threshold=0,
+                                   array_file=f)
+            self.assertLess(os.path.getsize(fname),
+                            2 * x.nbytes + z.nbytes)
+            for mmap in [True, False]:
+                with binary_array_context(tmpdir, mmap=mmap):
+                    d = json.loads(djson, cls=GSONDecoder)
+                self.assertEqual(isinstance(d["x"], np.memmap), mmap)
+                for k in objs:
+                    np.testing.assert_array_equal(d[k], objs[k])
+                # Loaded arrays can be modified without touching the file
+                d["x"][0, 0] = 1e3
+                del d
+            with binary_array_context(tmpdir):
+                d = json.loads(djson, cls=GSONDecoder)
+            np.testing.assert_array_equal(d["x"], x)
+            del d
+
     @unittest.skipIf(pd is None, "Pandas not found")
     def test_pandas(self):
 
@@ -591,6 +591,38 @@ class OptimizableTests(unittest.TestCase):
         self.assertAlmostEqual(adder3.local_x[2], 6)
         self.assertAlmostEqual(test_obj2.local_x[0], 25)
 
+    def test_recompute_flag_diamond(self):
+        # Every node of a diamond shaped graph is flagged only once when the
+        # DOFs are set, and parents are flagged before their children
+        calls = []
+
+        class Node(Adder):
+            def recompute_bell(self, parent=None):
+                calls.append(self.name)
+
+        top = Node(2)
+        left = Node(1, depends_on=[top])
+        right = Node(1, depends_on=[top])
+        bottom = Node(1, depends_on=[left, right])
+        top.fix(0)
+        calls.clear()
+        x = np.array([1.0, 2.0, 3.0, 4.0])
+        bottom.x = x
+        np.testing.assert_array_equal(bottom.x, x)
+        np.testing.assert_array_equal(top.full_x, [0.0, 1.0])
+        self.assertEqual(sorted(calls), sorted([opt.name for opt in [top, left, right, bottom]]))
+        self.assertEqual(calls[0], top.name)
+        self.assertEqual(calls[-1], bottom.name)
+        self.assertTrue(bottom.new_x)
+
+        calls.clear()
+        bottom.full_x = np.arange(5.0)
+        np.testing.assert_array_equal(bottom.x, [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(len(calls), 4)
+        calls.clear()
+        left.x = [5.0, 6.0]
+        self.assertEqual(sorted(calls), sorted([opt.name for opt in [top, left, right, bottom]]))
+
     def test_local_x(self):
         # Check with leaf type Optimizable objects
         adder = Adder(n=3, x0=[1, 2, 3], names=['x', 'y', 'z'])
@@ -1335,6 +1367,24 @@ class TestOptimizableSerialize(unittest.TestCase):
             self.assertAlmostEqual(adder1.J(), adders[0].J())
             self.assertAlmostEqual(adder2.J(), adders[1].J())
 
+        for kwargs in [dict(array_threshold=0),
+                       dict(array_threshold=0, sidecar=True)]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                fpath = Path(tmpdir) / "adders.json"
+                save([adder1, adder2], fpath, **kwargs)
+                self.assertEqual(Path(str(fpath) + ".bin").is_file(),
+                                 kwargs.get("sidecar", False))
+                adders = load(fpath)
+                self.assertAlmostEqual(adder1.J(), adders[0].J())
+                self.assertAlmostEqual(adder2.J(), adders[1].J())
+                adders[1].x = [5]
+                self.assertAlmostEqual(adders[1].J(), 15)
+                del adders
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertRaises(ValueError):
+                save(adder1, Path(tmpdir) / "adder.json", sidecar=True)
+
         with tempfile.TemporaryDirectory() as tmpdir:
             fpath = Path(tmpdir) / "adder.json"
             adder_str = adder1.save(fpath, indent=2)
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from simsopt._core.profiling import OptimizableProfiler
+from simsopt.objectives.functions import Identity, Rosenbrock
+from simsopt.objectives.least_squares import LeastSquaresProblem
+
+
+class OptimizableProfilerTests(unittest.TestCase):
+    def test_call_counts(self):
+        iden1 = Identity()
+        iden2 = Identity()
+        lsp = LeastSquaresProblem.from_sigma([3, -4], [2, 5],
+                                             depends_on=[iden1, iden2])
+        lsp.enable_memoization()
+        with OptimizableProfiler(lsp) as prof:
+            lsp.residuals([1, 2])
+            lsp.residuals([3, 4])
+            lsp.residuals([1, 2])
+            np.testing.assert_allclose(lsp.residuals(), [-1.0, 1.2])
+
+        stats = prof.stats()
+        self.assertEqual(stats[(lsp.name, "residuals")]["calls"], 4)
+        # The input functions are only evaluated on cache misses
+        self.assertEqual(stats[(iden1.name, "f")]["calls"], 2)
+        self.assertEqual(stats[(iden2.name, "f")]["calls"], 2)
+        # Setting the DOFs of the problem rings the bell of every node
+        self.assertEqual(stats[(iden1.name, "recompute_bell")]["calls"], 3)
+        self.assertEqual(prof.cache_stats()[lsp.name], {"hits": 1, "misses": 2})
+
+        class_stats = prof.stats(by="class")
+        self.assertEqual(class_stats[("Identity", "f")]["calls"], 4)
+        for s in stats.values():
+            self.assertLessEqual(s["self_time"], s["time"] + 1e-12)
+        self.assertLessEqual(stats[(iden1.name, "f")]["time"],
+                             stats[(lsp.name, "residuals")]["time"])
+
+        # The original methods are restored on exit
+        self.assertNotIn("residuals", lsp.__dict__)
+        self.assertFalse(hasattr(lsp.funcs_in[0], "__wrapped__"))
+        lsp.residuals([5, 6])
+        self.assertEqual(prof.stats()[(lsp.name, "residuals")]["calls"], 4)
+
+        with self.assertRaises(ValueError):
+            prof.stats(by="method")
+
+    def test_chrome_trace(self):
+        rosen = Rosenbrock()
+        with OptimizableProfiler(rosen) as prof:
+            rosen.x = [0.5, 0.5]
+            rosen.f()
+            rosen.f([0.2, 0.3])
+        prof.print_stats()
+        trace = prof.chrome_trace()
+        names = [e["name"] for e in trace["traceEvents"]]
+        self.assertEqual(names.count(f"{rosen.name}.f"), 2)
+        self.assertIn(f"{rosen.name}.recompute_bell", names)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "trace.json")
+            prof.save_chrome_trace(fname)
+            with open(fname) as f:
+                self.assertEqual(json.load(f), trace)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 from simsopt.field.boozermagneticfield import BoozerRadialInterpolant, InterpolatedBoozerField, BoozerAnalytic
 import numpy as np
 import unittest
+import tempfile
 from pathlib import Path
 TEST_DIR = (Path(__file__).parent / ".." / "test_files").resolve()
 filename = str((TEST_DIR / 'wout_LandremanPaul2021_QA_lowres.nc').resolve())
@@ -456,6 +457,31 @@ class TestingVmec(unittest.TestCase):
                 assert np.allclose(bri.modB_derivs()[:, 1], bri.dmodBdtheta()[:, 0])
                 assert np.allclose(bri.modB_derivs()[:, 2], bri.dmodBdzeta()[:, 0])
 
+    def test_boozerradialinterpolant_save_load(self):
+        """
+        Check that an interpolant that is stored to disk and loaded again
+        gives the same results as the original one.
+        """
+        for filename_vmec, N in [(filename_mhd_lowres, None), (filename_mhd_lasym, 0)]:
+            vmec = Vmec(filename_vmec)
+            bri = BoozerRadialInterpolant(vmec, 3, mpol=5, ntor=5, N=N)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                filename = str(Path(tmpdir) / 'bri.npz')
+                bri.save(filename)
+                bri_loaded = BoozerRadialInterpolant.load(filename)
+            assert bri_loaded.stellsym == bri.stellsym
+            assert bri_loaded.enforce_qs == bri.enforce_qs
+
+            np.random.seed(0)
+            points = np.random.uniform(size=(20, 3))
+            points[:, 0] = 0.1 + 0.8*points[:, 0]
+            points[:, 1:] *= 2*np.pi
+            bri.set_points(points)
+            bri_loaded.set_points(points)
+            for name in ['modB', 'modB_derivs', 'K', 'K_derivs', 'nu', 'nu_derivs', 'R', 'R_derivs',
+                         'Z', 'Z_derivs', 'psip', 'G', 'I', 'iota', 'dGds', 'dIds', 'diotads']:
+                assert np.allclose(getattr(bri, name)(), getattr(bri_loaded, name)(), rtol=1e-14, atol=1e-14)
+
     def test_interpolatedboozerfield_sym(self):
         """
         Here we perform 3D interpolation on a random set of points. Compare
@@ -147,6 +147,45 @@ class Testing(unittest.TestCase):
         assert np.allclose(fhxyz[:3, :], fxyz[:3, :], atol=1e-12, rtol=1e-12)
         assert np.allclose(fhxyz[3:, :], 100, atol=1e-12, rtol=1e-12)
 
+    def test_batch_matches_pointwise(self):
+        """
+        Check that evaluating a large batch of points, which are sorted by
+        cell internally, gives the same result as evaluating the points one
+        at a time, also when some of the points lie in skipped cells or
+        outside of the domain.
+        """
+        np.random.seed(0)
+        xran = (1.0, 4.0, 6)
+        yran = (1.1, 3.9, 5)
+        zran = (1.2, 3.8, 4)
+
+        def skip(xs, ys, zs):
+            return np.asarray(xs) > 3.2
+
+        for dim in [1, 3, 5]:
+            for degree in [1, 3]:
+                with self.subTest(dim=dim, degree=degree):
+                    fun = get_random_polynomial(dim, degree)
+                    rule = sopp.UniformInterpolationRule(degree)
+                    interpolant = sopp.RegularGridInterpolant3D(rule, xran, yran, zran, dim, True, skip)
+                    interpolant.interpolate_batch(fun)
+
+                    nsamples = 1001
+                    xyz = np.random.uniform(size=(nsamples, 3))
+                    xyz[:, 0] = 1.0 + 3.3*xyz[:, 0]
+                    xyz[:, 1] = 1.1 + 2.8*xyz[:, 1]
+                    xyz[:, 2] = 1.2 + 2.6*xyz[:, 2]
+                    fhxyz = 100*np.ones((nsamples, dim))
+                    interpolant.evaluate_batch(xyz, fhxyz)
+                    for i in range(nsamples):
+                        fhxyz_i = 100*np.ones((1, dim))
+                        interpolant.evaluate_batch(xyz[i:i+1, :], fhxyz_i)
+                        assert np.allclose(fhxyz[i, :], fhxyz_i[0, :], atol=1e-13, rtol=1e-13)
+                    inside = xyz[:, 0] < 3.5
+                    fxyz = fun(xyz[:, 0], xyz[:, 1], xyz[:, 2], flatten=False)
+                    assert np.allclose(fhxyz[inside, :], fxyz[inside, :], atol=1e-12, rtol=1e-12)
+                    assert np.any(fhxyz[~inside, 0] == 100)
+
     def test_convergence_order(self):
         for dim in [1, 4, 6]:
             for degree in [1, 3]:
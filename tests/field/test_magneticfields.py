@@ -20,6 +20,7 @@ from simsopt._core.json import SIMSON, GSONDecoder, GSONEncoder
 from simsopt.configs import get_ncsx_data
 from simsopt.field import (BiotSavart, CircularCoil, Coil, Current,
                            DipoleField, Dommaschk, InterpolatedField,
+                           InterpolatedFieldSuperposition,
                            MagneticFieldSum, PoloidalField, Reiman,
                            ScalarPotentialRZMagneticField, ToroidalField,
                            coils_via_symmetries, MirrorModel)
@@ -699,6 +700,54 @@ class Testing(unittest.TestCase):
         assert np.allclose(gradB, transpGradB)
         assert np.allclose(gradB, gradB_simsopt, atol=1e-4)
 
+    def test_DipoleField_sparse(self):
+        """
+        Test that the sparse DipoleField, which skips zero dipoles and
+        evaluates the symmetry images on the fly, agrees with the full
+        evaluation, and that the far-field approximation is accurate.
+        """
+        np.random.seed(0)
+        ndipoles = 200
+        phi = np.random.rand(ndipoles) * np.pi / 2
+        R = 1 + 0.3 * np.random.rand(ndipoles)
+        m_loc = np.array([R * np.cos(phi), R * np.sin(phi), 0.3 * np.random.randn(ndipoles)]).T
+        m = np.random.randn(ndipoles, 3)
+        m[np.random.rand(ndipoles) < 0.7, :] = 0.0
+        field_loc = 2 * np.random.randn(20, 3)
+        for coordinate_flag in ['cartesian', 'cylindrical', 'toroidal']:
+            for stellsym in [True, False]:
+                Bfield = DipoleField(m_loc, m, nfp=2, stellsym=stellsym, coordinate_flag=coordinate_flag)
+                Bfield_sparse = DipoleField(m_loc, m, nfp=2, stellsym=stellsym, coordinate_flag=coordinate_flag, sparse=True)
+                Bfield.set_points(field_loc)
+                Bfield_sparse.set_points(field_loc)
+                assert Bfield_sparse._sparse_grid.shape[0] == np.count_nonzero(np.any(m != 0, axis=-1))
+                # the full symmetry-expanded dipole manifold is never built
+                assert not hasattr(Bfield_sparse, 'm_vec')
+                assert not hasattr(Bfield_sparse, 'dipole_grid')
+                assert np.allclose(Bfield.B(), Bfield_sparse.B())
+                assert np.allclose(Bfield.dB_by_dX(), Bfield_sparse.dB_by_dX())
+                assert np.allclose(Bfield.A(), Bfield_sparse.A())
+                assert np.allclose(Bfield.dA_by_dX(), Bfield_sparse.dA_by_dX())
+
+        # Far-field approximation with mostly aligned dipoles
+        m = np.array([np.cos(phi), np.sin(phi), np.zeros(ndipoles)]).T
+        m[np.random.rand(ndipoles) < 0.7, :] = 0.0
+        Bfield = DipoleField(m_loc, m, nfp=2, coordinate_flag='cartesian')
+        Bfield_far = DipoleField(m_loc, m, nfp=2, coordinate_flag='cartesian',
+                                 sparse=True, theta=0.1, cluster_size=0.15)
+        Bfield.set_points(field_loc)
+        Bfield_far.set_points(field_loc)
+        assert len(Bfield_far._cluster_starts) > 2
+        B = Bfield.B()
+        dB = Bfield.dB_by_dX()
+        assert np.max(np.abs(Bfield_far.B() - B)) < 1e-2 * np.max(np.abs(B))
+        assert np.max(np.abs(Bfield_far.dB_by_dX() - dB)) < 1e-2 * np.max(np.abs(dB))
+
+        # No nonzero dipoles at all
+        Bfield_zero = DipoleField(m_loc, np.zeros_like(m), nfp=2, sparse=True, theta=0.1)
+        Bfield_zero.set_points(field_loc)
+        assert np.allclose(Bfield_zero.B(), 0.0)
+
     def test_pmopt_dipoles(self):
         """
         Test that A * m in the permanent magnet optimizer class
@@ -965,6 +1014,39 @@ class Testing(unittest.TestCase):
         assert np.allclose(Bc, Bhc, rtol=1e-3)
         assert np.allclose(dBc, dBhc, rtol=1e-3)
 
+    def test_interpolated_field_superposition(self):
+        curves, currents, ma = get_ncsx_data()
+        nfp = 3
+        # two groups of unit current coils, one per base coil subset
+        groups = [[0, 1], [2]]
+        fields = [BiotSavart(coils_via_symmetries([curves[i] for i in group], [Current(1.) for i in group], nfp, True))
+                  for group in groups]
+        n = 12
+        rmin, rmax, rsteps = 1.5, 1.7, n
+        phimin, phimax, phisteps = 0, 2*np.pi/nfp, n*32//nfp
+        zmin, zmax, zsteps = 0., 0.1, n//2
+        bsh = InterpolatedFieldSuperposition(
+            fields, [1., 1.], 4, [rmin, rmax, rsteps], [phimin, phimax, phisteps], [zmin, zmax, zsteps],
+            True, nfp=nfp, stellsym=True)
+        N = 500
+        points = np.random.uniform(size=(N, 3))
+        points[:, 0] = points[:, 0]*(rmax-rmin) + rmin
+        points[:, 1] = points[:, 1]*(nfp*phimax-phimin) + phimin
+        points[:, 2] = points[:, 2]*(2*zmax) - zmax
+        bsh.set_points_cyl(points)
+        for group_currents in [[6.5e5, 5.4e5], [1e5, -2e5]]:
+            bsh.currents = group_currents
+            assert np.allclose(bsh.currents, group_currents)
+            coils = sum([coils_via_symmetries([curves[i] for i in group], [Current(I) for i in group], nfp, True)
+                         for group, I in zip(groups, group_currents)], [])
+            bs = BiotSavart(coils)
+            bs.set_points_cyl(points)
+            assert np.allclose(bs.B(), bsh.B(), rtol=1e-3)
+            assert np.allclose(bs.GradAbsB(), bsh.GradAbsB(), rtol=1e-3)
+            assert np.allclose(bs.B_cyl(), bsh.B_cyl(), rtol=1e-3)
+        with self.assertRaises(ValueError):
+            bsh.currents = [1.]
+
     def test_interpolated_field_close_no_sym(self):
         R0test = 1.5
         B0test = 0.8
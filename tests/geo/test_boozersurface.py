@@ -572,6 +572,101 @@ class BoozerSurfaceTests(unittest.TestCase):
             with self.assertRaises(Exception):
                 mask = s.get_stellsym_mask()
 
+    def test_boozer_penalty_constraints_hessian_operator(self):
+        """
+        Verify that the matrix-free Hessian of the BoozerLS objective and the matrix-free Jacobian
+        of the optimality conditions of the exactly constrained problem agree with the dense ones.
+        """
+        np.random.seed(1)
+        for stellsym in stellsym_list:
+            for optimize_G in [True, False]:
+                for weight_inv_modB in [True, False]:
+                    with self.subTest(stellsym=stellsym, optimize_G=optimize_G, weight_inv_modB=weight_inv_modB):
+                        bs, boozer_surface = get_boozer_surface(boozer_type='ls', optimize_G=optimize_G, stellsym=stellsym,
+                                                                weight_inv_modB=weight_inv_modB, converge=False)
+                        s = boozer_surface.surface
+                        x = np.concatenate((s.get_dofs(), [-0.406]))
+                        if optimize_G:
+                            current_sum = sum(abs(c.current.get_value()) for c in bs.coils)
+                            x = np.concatenate((x, [2.*np.pi*current_sum*(4*np.pi*10**(-7)/(2 * np.pi))]))
+                        _, _, H = boozer_surface.boozer_penalty_constraints_vectorized(
+                            x, derivatives=2, constraint_weight=100., optimize_G=optimize_G, weight_inv_modB=weight_inv_modB)
+                        Hop = boozer_surface.boozer_penalty_constraints_hessian_operator(
+                            x, constraint_weight=100., optimize_G=optimize_G, weight_inv_modB=weight_inv_modB)
+                        v = np.random.uniform(size=x.shape)-0.5
+                        np.testing.assert_allclose(Hop @ v, H @ v, rtol=1e-10, atol=1e-10 * np.linalg.norm(H @ v))
+
+                        xl = np.concatenate((x, [0.1, 0.2]))
+                        res, dres = boozer_surface.boozer_exact_constraints(xl, derivatives=1, optimize_G=optimize_G)
+                        res_op, dres_op = boozer_surface.boozer_exact_constraints_jacobian_operator(xl, optimize_G=optimize_G)
+                        v = np.random.uniform(size=xl.shape)-0.5
+                        np.testing.assert_allclose(res_op, res, rtol=1e-10, atol=1e-10 * np.linalg.norm(res))
+                        np.testing.assert_allclose(dres_op @ v, dres @ v, rtol=1e-10, atol=1e-10 * np.linalg.norm(dres @ v))
+                        np.testing.assert_allclose(dres_op.rmatvec(v), dres.T @ v, rtol=1e-10, atol=1e-10 * np.linalg.norm(dres.T @ v))
+
+    def test_newton_krylov(self):
+        """
+        Verify that the matrix-free Newton-Krylov solvers converge to the same surfaces as the
+        dense Newton solvers, and that the derivatives computed with the matrix-free adjoint
+        solves agree with the ones computed with LU factorizations.
+        """
+        from simsopt.geo.surfaceobjectives import Iotas
+        for boozer_type in ['exact', 'ls']:
+            with self.subTest(boozer_type=boozer_type):
+                results = []
+                for linear_solver in ['direct', 'gmres']:
+                    bs, boozer_surface = get_boozer_surface(boozer_type=boozer_type, converge=False)
+                    boozer_surface.options['linear_solver'] = linear_solver
+                    current_sum = sum(abs(c.current.get_value()) for c in bs.coils)
+                    G0 = 2. * np.pi * current_sum * (4 * np.pi * 10**(-7) / (2 * np.pi))
+                    res = boozer_surface.run_code(-0.406, G=G0)
+                    assert res['success']
+                    assert (res['PLU'] is None) == (linear_solver == 'gmres')
+                    io = Iotas(boozer_surface)
+                    results.append((boozer_surface.surface.x.copy(), res['iota'], io.dJ()))
+                np.testing.assert_allclose(results[0][0], results[1][0], atol=1e-8)
+                np.testing.assert_allclose(results[0][1], results[1][1], atol=1e-10)
+                np.testing.assert_allclose(results[0][2], results[1][2], rtol=1e-6, atol=1e-8 * np.linalg.norm(results[0][2]))
+
+        bs, boozer_surface = get_boozer_surface(converge=False)
+        with self.assertRaises(ValueError):
+            boozer_surface.solve_residual_equation_exactly_newton(iota=-0.406, linear_solver='cg')
+
+    def test_boozer_surface_group(self):
+        """
+        Verify that the surfaces solved concurrently by BoozerSurfaceGroup after a coil update agree
+        with surfaces solved from scratch, and that the first-order prediction of the solution is
+        closer to the new solution than the old solution.
+        """
+        from simsopt.geo import BoozerSurfaceGroup
+        for boozer_type in ['exact', 'ls']:
+            with self.subTest(boozer_type=boozer_type):
+                bss, boozer_surfaces = zip(*[get_boozer_surface(boozer_type=boozer_type) for _ in range(2)])
+                with BoozerSurfaceGroup(boozer_surfaces, workers=2) as group:
+                    x_old = boozer_surfaces[0].surface.x.copy()
+                    for bs in bss:
+                        bs.coils[0].curve.x = bs.coils[0].curve.x * (1 + 1e-4)
+                    sdofs, iota, G = boozer_surfaces[0].predict_solution()
+                    np.testing.assert_allclose(boozer_surfaces[0].surface.x, x_old)
+
+                    ress = group.run_code()
+                    assert all(res['success'] for res in ress)
+
+                _, boozer_surface = get_boozer_surface(boozer_type=boozer_type, converge=False)
+                boozer_surface.biotsavart.coils[0].curve.x = bss[1].coils[0].curve.x
+                res = boozer_surface.run_code(ress[1]['iota'], G=ress[1]['G'])
+                assert res['success']
+                for booz in boozer_surfaces:
+                    np.testing.assert_allclose(booz.surface.x, boozer_surface.surface.x, atol=1e-8)
+                    np.testing.assert_allclose(booz.res['iota'], res['iota'], atol=1e-10)
+                assert np.linalg.norm(sdofs - boozer_surface.surface.x) < 0.1 * np.linalg.norm(x_old - boozer_surface.surface.x)
+
+        bs, boozer_surface = get_boozer_surface(converge=False)
+        with self.assertRaises(ValueError):
+            BoozerSurfaceGroup([boozer_surface, boozer_surface], workers=2)
+        with self.assertRaises(ValueError):
+            BoozerSurfaceGroup([boozer_surface]).run_code()
+
     def test_boozer_surface_type_assert(self):
         """
         this unit test checks that an exception is raised if a SurfaceRZFourier is passed to a BoozerSurface
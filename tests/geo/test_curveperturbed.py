@@ -48,6 +48,64 @@ class CurvePerturbationTesting(unittest.TestCase):
         print("periodic_err", np.mean(periodic_err))
         assert np.mean(periodic_err) < 1e-6
 
+    def test_spectral_covariance(self):
+        # the spectral sampler is a linear map of standard normal variables, so
+        # we can compute its covariance exactly by feeding in unit vectors
+        sigma = 1.3
+        n = 64
+        points = np.linspace(0, 1, n, endpoint=False) + 0.013
+        for length_scale in [0.5, 0.2, 0.05]:
+            sampler = GaussianSampler(points, sigma, length_scale, n_derivs=0, method="spectral")
+            nz = sampler._spectral_weights.shape[1] * 2 - 1
+            z = np.zeros((nz, nz, 3))
+            for i in range(nz):
+                z[i, i, :] = 1
+            A = sampler._spectral_samples(z)[:, 0, :, 0].T
+            X, Y = np.meshgrid(points, points, indexing='ij')
+            cov = sum((sigma**2)*np.exp(-(X-Y+i)**2/(length_scale**2)) for i in range(-5, 6))
+            np.testing.assert_allclose(A @ A.T, cov, atol=1e-12)
+
+    def test_spectral_gammadash(self):
+        sigma = 1
+        length_scale = 0.5
+        points = np.linspace(0, 1, 200, endpoint=False)
+        sampler = GaussianSampler(points, sigma, length_scale, n_derivs=3, method="spectral")
+        rg = Generator(PCG64DXSM(1))
+        sample = PerturbationSample(sampler, randomgen=rg)
+
+        dphi = points[1]
+        for idx in range(3):
+            g = sample[idx + 0]
+            gd = sample[idx + 1]
+            gdest = (-1/12) * g[4:, :] + (2/3) * g[3:-1, :] + (-2/3) * g[1:-3, :] + (1/12) * g[0:-4, :]
+            gdest *= 1/dphi
+            err = np.abs(gdest - gd[2:-2, :])
+            print("np.mean(err)", np.mean(err))
+            assert np.mean(err) < 1e-3 * np.mean(np.abs(gd))
+
+    def test_spectral_requires_uniform_points(self):
+        points = np.linspace(0, 2, 200, endpoint=False)
+        with self.assertRaises(ValueError):
+            GaussianSampler(points, 1, 0.5, n_derivs=0, method="spectral")
+        with self.assertRaises(ValueError):
+            GaussianSampler(points, 1, 0.5, n_derivs=0, method="sqrtm")
+
+    def test_draw_samples(self):
+        # drawing a batch of samples should give the same result as drawing
+        # the samples one after another
+        points = np.linspace(0, 1, 50, endpoint=False)
+        for method in ["ldl", "spectral"]:
+            sampler = GaussianSampler(points, 1, 0.1, n_derivs=2, method=method)
+            rg = Generator(PCG64DXSM(1))
+            samples = [sampler.draw_sample(rg) for _ in range(3)]
+            rg = Generator(PCG64DXSM(1))
+            batch = sampler.draw_samples(3, rg)
+            assert len(batch) == 3
+            for s, b in zip(samples, batch):
+                assert len(b) == 3
+                for i in range(3):
+                    np.testing.assert_allclose(s[i], b[i], atol=1e-14)
+
     def test_perturbed_objective_torsion(self):
         # test the torsion objective as that covers all derivatives (up to
         # third) of a curve
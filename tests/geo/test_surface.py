@@ -13,7 +13,7 @@ from simsopt.geo.surfacexyztensorfourier import SurfaceXYZTensorFourier
 from simsopt.geo.surfacehenneberg import SurfaceHenneberg
 from simsopt.geo.surfacegarabedian import SurfaceGarabedian
 from simsopt.geo.surface import signed_distance_from_surface, SurfaceScaled, \
-    best_nphi_over_ntheta
+    best_nphi_over_ntheta, select_quadrature_resolution, surface_with_quadpoints
 from simsopt.geo.curverzfourier import CurveRZFourier
 from simsopt._core.json import GSONDecoder, GSONEncoder, SIMSON
 from .surface_test_helpers import get_surface, get_boozer_surface
@@ -458,6 +458,41 @@ class BestNphiOverNthetaTests(unittest.TestCase):
                         np.testing.assert_allclose(ratio, correct, rtol=0.01)
 
 
+class QuadratureResolutionTests(unittest.TestCase):
+    def test_surface_with_quadpoints(self):
+        """
+        The surface on new quadrature points should share the dofs of the
+        original surface.
+        """
+        for surface_type in ["SurfaceRZFourier", "SurfaceXYZFourier", "SurfaceXYZTensorFourier"]:
+            with self.subTest(surface_type=surface_type):
+                s = get_surface(surface_type, True)
+                quadpoints_phi, quadpoints_theta = Surface.get_quadpoints(nphi=7, ntheta=9, range="field period", nfp=s.nfp)
+                s2 = surface_with_quadpoints(s, quadpoints_phi, quadpoints_theta)
+                self.assertEqual(s2.gamma().shape, (7, 9, 3))
+                s.x = s.x + 0.01*np.random.standard_normal(size=s.x.shape)
+                np.testing.assert_allclose(s2.x, s.x)
+                s3 = surface_with_quadpoints(s, s.quadpoints_phi, s.quadpoints_theta)
+                np.testing.assert_allclose(s3.gamma(), s.gamma(), atol=1e-14)
+
+    def test_area(self):
+        """
+        The area on the selected grid should agree with the area on a very
+        fine grid.
+        """
+        filename = TEST_DIR / 'input.LandremanPaul2021_QH_reactorScale_lowres'
+        s = SurfaceRZFourier.from_vmec_input(filename, range="half period", nphi=4, ntheta=4)
+        s_fine = SurfaceRZFourier.from_vmec_input(filename, range="half period", nphi=200, ntheta=200)
+        for tol in [1e-4, 1e-8]:
+            nphi, ntheta = select_quadrature_resolution(s, lambda surf: surf.area(), tol=tol)
+            self.assertLess(nphi*ntheta, 200*200)
+            s2 = SurfaceRZFourier.from_vmec_input(filename, range="half period", nphi=nphi, ntheta=ntheta)
+            self.assertLess(abs(s2.area()-s_fine.area()), 10*tol*s_fine.area())
+
+        nphi, ntheta = select_quadrature_resolution(s, lambda surf: surf.area(), refine_phi=False)
+        self.assertEqual(nphi, 4)
+
+
 class CurvatureTests(unittest.TestCase):
     surfacetypes = ["SurfaceRZFourier", "SurfaceXYZFourier",
                     "SurfaceXYZTensorFourier"]
@@ -2,7 +2,8 @@ import unittest
 import numpy as np
 from simsopt.field.biotsavart import BiotSavart
 from simsopt.field.coil import coils_via_symmetries
-from simsopt.geo.surfaceobjectives import ToroidalFlux, QfmResidual, parameter_derivatives, Volume, PrincipalCurvature, MajorRadius, Iotas, NonQuasiSymmetricRatio, BoozerResidual
+from simsopt.geo.surfaceobjectives import ToroidalFlux, QfmResidual, parameter_derivatives, Volume, PrincipalCurvature, MajorRadius, Iotas, NonQuasiSymmetricRatio, BoozerResidual, \
+    boozer_surface_residual, boozer_surface_residual_dB, boozer_surface_residual_hessian_contract, boozer_surface_residual_dB_vjp
 from simsopt.configs.zoo import get_ncsx_data
 from .surface_test_helpers import get_surface, get_exact_surface, get_boozer_surface
 
@@ -397,6 +398,38 @@ class BoozerResidualTests(unittest.TestCase):
                      epsilons=np.power(2., -np.asarray(range(13, 19))))
 
 
+class BoozerResidualKernelTests(unittest.TestCase):
+    def test_fused_kernels(self):
+        """
+        Compare the fused kernels for the Jacobian of the Boozer residual, the contraction of its
+        Hessians and its vector-Jacobian product with respect to B to the full derivatives.
+        """
+        np.random.seed(1)
+        for optimize_G in [True, False]:
+            for weight_inv_modB in [True, False]:
+                with self.subTest(optimize_G=optimize_G, weight_inv_modB=weight_inv_modB):
+                    bs, boozer_surface = get_boozer_surface(boozer_type='ls', optimize_G=optimize_G, converge=False)
+                    s = boozer_surface.surface
+                    G = 1.3 if optimize_G else None
+                    r, J, H = boozer_surface_residual(s, -0.406, G, bs, derivatives=2, weight_inv_modB=weight_inv_modB)
+                    r1, J1 = boozer_surface_residual(s, -0.406, G, bs, derivatives=1, weight_inv_modB=weight_inv_modB)
+                    np.testing.assert_allclose(r1, r, rtol=1e-14, atol=1e-14)
+                    np.testing.assert_allclose(J1, J, rtol=1e-12, atol=1e-12 * np.max(np.abs(J)))
+
+                    u = np.random.standard_normal(r.shape)
+                    for weights in [None, u]:
+                        _, J2, Hu = boozer_surface_residual_hessian_contract(s, -0.406, G, bs, u=weights, weight_inv_modB=weight_inv_modB)
+                        Hu_ref = np.einsum('i,ijk->jk', r if weights is None else weights, H)
+                        np.testing.assert_allclose(J2, J, rtol=1e-12, atol=1e-12 * np.max(np.abs(J)))
+                        np.testing.assert_allclose(Hu, Hu_ref, rtol=1e-10, atol=1e-12 * np.max(np.abs(Hu_ref)))
+
+                    r3, r_dB = boozer_surface_residual_dB(s, -0.406, G, bs, derivatives=0, weight_inv_modB=weight_inv_modB)
+                    r4, vjp = boozer_surface_residual_dB_vjp(s, -0.406, G, bs, u=u, weight_inv_modB=weight_inv_modB)
+                    vjp_ref = np.sum(u.reshape((-1, 3))[:, :, None] * r_dB.reshape((-1, 3, 3)), axis=1)
+                    np.testing.assert_allclose(r4, r3, rtol=1e-14, atol=1e-14)
+                    np.testing.assert_allclose(vjp, vjp_ref, rtol=1e-12, atol=1e-12 * np.max(np.abs(vjp_ref)))
+
+
 class LabelTests(unittest.TestCase):
     def test_label_surface_derivative1(self):
         for label in ["Volume", "ToroidalFlux", "Area", "AspectRatio"]:
@@ -223,6 +223,55 @@ class SurfaceTaylorTests(unittest.TestCase):
                         s.x = sign * s.x
                         self.subtest_surface_coefficient_derivative(s)
 
+    def test_surface_coefficient_vjps(self):
+        """
+        Check the vector Jacobian products against an explicit contraction
+        with the coefficient derivatives.
+        """
+        for surfacetype in self.surfacetypes:
+            for stellsym in [True, False]:
+                with self.subTest(surfacetype=surfacetype, stellsym=stellsym):
+                    s = get_surface(surfacetype, stellsym)
+                    h = np.random.standard_normal(size=s.gamma().shape)
+                    for vjp, dcoeff in [(s.dgamma_by_dcoeff_vjp, s.dgamma_by_dcoeff),
+                                        (s.dgammadash1_by_dcoeff_vjp, s.dgammadash1_by_dcoeff),
+                                        (s.dgammadash2_by_dcoeff_vjp, s.dgammadash2_by_dcoeff),
+                                        (s.dgammadash1dash1_by_dcoeff_vjp, s.dgammadash1dash1_by_dcoeff),
+                                        (s.dgammadash1dash2_by_dcoeff_vjp, s.dgammadash1dash2_by_dcoeff),
+                                        (s.dgammadash2dash2_by_dcoeff_vjp, s.dgammadash2dash2_by_dcoeff)]:
+                        via_vjp = vjp(h)
+                        via_matvec = np.sum(dcoeff()*h[..., None], axis=(0, 1, 2))
+                        assert np.linalg.norm(via_vjp-via_matvec)/np.linalg.norm(via_vjp) < 1e-13
+
+                    hk = np.random.standard_normal(size=s.surface_curvatures().shape)
+                    via_vjp = s.dsurface_curvatures_by_dcoeff_vjp(hk)
+                    via_matvec = np.sum(s.dsurface_curvatures_by_dcoeff()*hk[..., None], axis=(0, 1, 2))
+                    assert np.linalg.norm(via_vjp-via_matvec)/np.linalg.norm(via_vjp) < 1e-11
+
+    def test_surface_coefficient_jvps(self):
+        """
+        Check the Jacobian vector products against an explicit contraction
+        with the coefficient derivatives, and make sure that they leave the
+        surface untouched.
+        """
+        for surfacetype in self.surfacetypes:
+            for stellsym in [True, False]:
+                with self.subTest(surfacetype=surfacetype, stellsym=stellsym):
+                    s = get_surface(surfacetype, stellsym)
+                    x = s.x.copy()
+                    gamma = s.gamma().copy()
+                    w = np.random.standard_normal(size=(len(s.get_dofs()), ))
+                    for jvp, dcoeff in [(s.dgamma_by_dcoeff_jvp, s.dgamma_by_dcoeff),
+                                        (s.dgammadash1_by_dcoeff_jvp, s.dgammadash1_by_dcoeff),
+                                        (s.dgammadash2_by_dcoeff_jvp, s.dgammadash2_by_dcoeff),
+                                        (s.dnormal_by_dcoeff_jvp, s.dnormal_by_dcoeff)]:
+                        via_jvp = jvp(w)
+                        via_matvec = dcoeff() @ w
+                        assert np.linalg.norm(via_jvp-via_matvec)/np.linalg.norm(via_jvp) < 1e-13
+                    assert np.all(s.x == x)
+                    s.invalidate_cache()
+                    assert np.allclose(s.gamma(), gamma, rtol=0, atol=1e-15)
+
     def subtest_surface_normal_coefficient_derivative(self, s):
         coeffs = s.x
         s.invalidate_cache()
@@ -2,6 +2,7 @@ import unittest
 from pathlib import Path
 from monty.tempfile import ScratchDir
 import numpy as np
+import scipy.sparse
 from simsopt.geo import SurfaceRZFourier, ToroidalWireframe, CircularPort, \
     windowpane_wireframe
 from simsopt.field.wireframefield import WireframeField, enclosed_current
@@ -425,6 +426,12 @@ class ToroidalWireframeTests(unittest.TestCase):
         # This next test fails on GitHub Actions for some reason
         #self.assertEqual(np.linalg.matrix_rank(B0), n_phi*n_theta-2)
 
+        # Sparse output should agree with the dense matrices
+        B0_sparse, d0_sparse = wf.constraint_matrices(sparse=True)
+        self.assertTrue(scipy.sparse.issparse(B0_sparse))
+        self.assertFalse(np.any(B0_sparse.toarray() - B0))
+        self.assertFalse(np.any(d0_sparse - d0))
+
         # No constraints should be redundant
         B1, d1 = wf.constraint_matrices(remove_redundancies=False)
         self.assertEqual(B0.shape, B1.shape)
@@ -1,3 +1,4 @@
+import gc
 import unittest
 import logging
 import os
@@ -338,6 +339,55 @@ class VmecTests(unittest.TestCase):
             with ScratchDir("."):
                 Vmec(filename, verbose=verbose).run()
 
+    def test_scratch_dir(self):
+        """
+        Running vmec in a scratch directory should give the same results
+        as the standard file-based approach, and the wout files should
+        only be archived if requested.
+        """
+        filename = os.path.join(TEST_DIR, 'input.li383_low_res')
+        with ScratchDir("."):
+            vmec1 = Vmec(filename)
+            iota1 = vmec1.mean_iota()
+            for archive in ["none", "group0", "all"]:
+                for async_archive in [False, True]:
+                    with ScratchDir("."):
+                        os.mkdir("scratch")
+                        vmec2 = Vmec(filename, scratch_dir="scratch",
+                                     archive=archive,
+                                     async_archive=async_archive)
+                        for rc in [0.3, 0.31]:
+                            vmec2.boundary.set_rc(1, 0, rc)
+                            vmec2.run()
+                        vmec2.boundary.set_rc(1, 0, vmec1.boundary.get_rc(1, 0))
+                        vmec2.run()
+                        vmec2.wait_for_archive()
+                        np.testing.assert_allclose(vmec2.mean_iota(), iota1, atol=1e-10)
+                        np.testing.assert_allclose(vmec2.s_half_grid, vmec1.s_half_grid)
+
+                        wout_files = [f for f in os.listdir(".") if f.startswith("wout_")]
+                        if archive == "none":
+                            self.assertEqual(wout_files, [])
+                            self.assertIsNone(vmec2.output_file)
+                        else:
+                            # output_file points to the archived wout file
+                            self.assertIn(os.path.basename(vmec2.output_file), wout_files)
+                        if archive == "group0":
+                            # The file of the intermediate run is deleted
+                            self.assertEqual(len(wout_files), 2)
+                        elif archive == "all":
+                            self.assertEqual(len(wout_files), 3)
+                        # Only the empty run directory is left in scratch
+                        for run_dir in os.listdir("scratch"):
+                            self.assertEqual(os.listdir(os.path.join("scratch", run_dir)), [])
+                        # which is removed with the Vmec object
+                        del vmec2
+                        gc.collect()
+                        self.assertEqual(os.listdir("scratch"), [])
+
+        with self.assertRaises(ValueError):
+            Vmec(filename, archive="some")
+
     def test_vmec_failure(self):
         """
         Verify that failures of VMEC are correctly caught and represented
@@ -127,6 +127,34 @@ class ConstrainedProblemTests(unittest.TestCase):
         self.assertTrue(prob.has_lc == False)
         self.assertTrue(prob.has_nlc == False)
 
+    def test_memoization(self):
+        rosen = Rosenbrock()
+        aff = Affine(2, 2)
+        prob = ConstrainedProblem(rosen.f, tuples_nlc=[(aff.f, -np.inf, 8.0)])
+        prob.enable_memoization()
+        x0 = np.copy(prob.x)
+        x1 = x0 + 0.1
+        f0 = prob.objective(x0)
+        c0 = prob.nonlinear_constraints(x0)
+        f1 = prob.objective(x1)
+        c1 = prob.nonlinear_constraints(x1)
+        self.assertEqual(prob.memoization_stats["misses"], 4)
+        self.assertEqual(prob.memoization_stats["hits"], 0)
+        np.testing.assert_allclose(prob.all_funcs(x0), np.concatenate([[f0], c0]))
+        np.testing.assert_allclose(prob.all_funcs(x1), np.concatenate([[f1], c1]))
+        self.assertEqual(prob.memoization_stats["misses"], 4)
+        self.assertEqual(prob.memoization_stats["hits"], 4)
+
+        # Failed evaluations are not cached, so they are retried
+        failer = Failer(nparams=2, nvals=0, fail_index=2)
+        prob = ConstrainedProblem(failer.J, fail=1e12)
+        prob.enable_memoization()
+        self.assertEqual(prob.objective([0, 0]), 1.0)
+        self.assertEqual(prob.objective([1, 0]), 1e12)
+        self.assertEqual(prob.objective([0, 0]), 1.0)
+        self.assertEqual(prob.objective([1, 0]), 1.0)
+        self.assertEqual(failer.nevals, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
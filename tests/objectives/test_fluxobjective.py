@@ -9,6 +9,7 @@ from simsopt.geo.curve import create_equally_spaced_curves
 from simsopt.geo.curveobjectives import CurveLength
 from simsopt.field.biotsavart import BiotSavart
 from simsopt.objectives.fluxobjective import SquaredFlux
+from simsopt.field.spectral_bnormal import SpectralBnormal, fourier_interpolation_matrix
 from simsopt._core.json import GSONDecoder, GSONEncoder, SIMSON
 
 
@@ -112,3 +113,63 @@ class FluxObjectiveTests(unittest.TestCase):
                 ALPHA = 1e-5
                 JF_scaled_summed = Jf + ALPHA * sum(Jls)
                 self.check_taylor_test(JF_scaled_summed)
+
+    def test_spectral(self):
+        """
+        Verify that SquaredFlux with a coarse, Fourier interpolated field
+        agrees with the direct evaluation, and that its derivatives are
+        consistent.
+        """
+        s = SurfaceRZFourier.from_vmec_input(filename, range="half period", nphi=32, ntheta=32)
+        ncoils = 4
+        base_curves = create_equally_spaced_curves(ncoils, s.nfp, stellsym=s.stellsym, R0=1.0, R1=0.5, order=6)
+        base_currents = [Current(1e5) for i in range(ncoils)]
+        coils = coils_via_symmetries(base_curves, base_currents, s.nfp, s.stellsym)
+
+        bs = BiotSavart(coils)
+        bnormal = SpectralBnormal(s, bs, tol=1e-10)
+        bs_direct = BiotSavart(coils)
+        bs_direct.set_points(s.gamma().reshape((-1, 3)))
+        B = bs_direct.B().reshape(s.gamma().shape)
+        np.testing.assert_allclose(bnormal.B(), B, atol=1e-7*np.max(np.abs(B)))
+        np.testing.assert_allclose(bnormal.Bnormal(), np.sum(B*s.unitnormal(), axis=2), atol=1e-7*np.max(np.abs(B)))
+        # The points of the field are reset if they are changed elsewhere
+        bs.set_points(s.gamma().reshape((-1, 3)))
+        np.testing.assert_allclose(bnormal.B(), B, atol=1e-7*np.max(np.abs(B)))
+        # A warning is logged if the coarse grid is too coarse for the tolerance
+        bnormal.tol = 1e-30
+        with self.assertLogs('simsopt.field.spectral_bnormal', level='WARNING'):
+            bnormal.B()
+        bnormal.tol = 1e-10
+
+        for definition in ["quadratic flux", "normalized", "local"]:
+            with self.subTest(definition=definition):
+                Jf = SquaredFlux(s, BiotSavart(coils), definition=definition, spectral_tol=1e-10)
+                Jf_direct = SquaredFlux(s, BiotSavart(coils), definition=definition)
+                np.testing.assert_allclose(Jf.J(), Jf_direct.J(), rtol=1e-6)
+                np.testing.assert_allclose(Jf.dJ(), Jf_direct.dJ(), rtol=1e-6, atol=1e-6*np.max(np.abs(Jf_direct.dJ())))
+                self.check_taylor_test(Jf)
+
+    def test_fourier_interpolation_matrix(self):
+        x = np.random.uniform(size=(10, ))
+        for n in [7, 8]:
+            f = lambda t: np.cos(2*np.pi*3*t) + np.sin(2*np.pi*2*t) + 1
+            np.testing.assert_allclose(fourier_interpolation_matrix(np.arange(n)/n, n), np.eye(n), atol=1e-14)
+            np.testing.assert_allclose(fourier_interpolation_matrix(x, n) @ f(np.arange(n)/n), f(x), atol=1e-13)
+
+    def test_adapt_resolution(self):
+        """
+        After adapting the resolution, SquaredFlux should agree with the
+        value on a fine grid.
+        """
+        s = SurfaceRZFourier.from_vmec_input(filename, range="half period", nphi=64, ntheta=64)
+        base_curves = create_equally_spaced_curves(4, s.nfp, stellsym=s.stellsym, R0=1.0, R1=0.5, order=6)
+        base_currents = [Current(1e5) for i in range(4)]
+        coils = coils_via_symmetries(base_curves, base_currents, s.nfp, s.stellsym)
+        J_fine = SquaredFlux(s, BiotSavart(coils)).J()
+
+        Jf = SquaredFlux(s, BiotSavart(coils))
+        nphi, ntheta = Jf.adapt_resolution(tol=1e-6)
+        self.assertEqual(Jf.surface.gamma().shape, (nphi, ntheta, 3))
+        np.testing.assert_allclose(Jf.J(), J_fine, rtol=1e-5)
+        self.check_taylor_test(Jf)
@@ -1,6 +1,6 @@
 import unittest
 import numpy as np
-from simsopt.objectives.functions import Identity
+from simsopt.objectives.functions import Identity, Failer
 #from simsopt.core.optimizable import Target
 from simsopt.objectives.least_squares import LeastSquaresProblem
 
@@ -76,6 +76,43 @@ class LeastSquaresProblemTests(unittest.TestCase):
         self.assertAlmostEqual(np.abs(lsp.residuals()[0]), 3.5)
         self.assertAlmostEqual(np.abs(lsp.residuals()[1]), 0.8)
 
+    def test_memoization(self):
+        iden1 = Identity()
+        iden2 = Identity()
+        lsp = LeastSquaresProblem.from_sigma([3, -4], [2, 5], depends_on=[iden1, iden2])
+        self.assertIsNone(lsp.memoization_stats)
+        lsp.enable_memoization(maxsize=2)
+        r1 = lsp.residuals([10, 0])
+        r2 = lsp.residuals([5, -7])
+        # Revisiting a point does not evaluate the graph again
+        np.testing.assert_allclose(lsp.residuals([10, 0]), r1)
+        np.testing.assert_allclose(lsp.residuals([5, -7]), r2)
+        self.assertAlmostEqual(lsp.objective([10, 0]), np.dot(r1, r1))
+        self.assertEqual(lsp.memoization_stats,
+                         {"hits": 3, "misses": 2, "size": 2, "maxsize": 2})
+        # Least recently used evaluations are evicted
+        lsp.residuals([1, 1])
+        lsp.residuals([5, -7])
+        self.assertEqual(lsp.memoization_stats["misses"], 4)
+        # Changing the DOFs of a parent changes the key
+        iden1.x = [10]
+        np.testing.assert_allclose(lsp.residuals(), [3.5, -0.6])
+        lsp.clear_memoization()
+        self.assertEqual(lsp.memoization_stats["size"], 0)
+        lsp.disable_memoization()
+        self.assertIsNone(lsp.memoization_stats)
+        np.testing.assert_allclose(lsp.residuals([5, -7]), r2)
+
+        # Failed evaluations are not cached, so they are retried
+        failer = Failer(nparams=2, nvals=3, fail_index=2)
+        lsp = LeastSquaresProblem.from_tuples([(failer.J, 0, 1)], fail=1e12)
+        lsp.enable_memoization()
+        np.testing.assert_allclose(lsp.residuals([0, 0]), np.ones(3))
+        np.testing.assert_allclose(lsp.residuals([1, 0]), np.full(3, 1e12))
+        np.testing.assert_allclose(lsp.residuals([0, 0]), np.ones(3))
+        np.testing.assert_allclose(lsp.residuals([1, 0]), np.ones(3))
+        self.assertEqual(failer.nevals, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -6,7 +6,7 @@ import numpy as np
 from simsopt.geo import SurfaceXYZTensorFourier
 from simsopt.geo.curvexyzfourier import CurveXYZFourier
 from simsopt.geo.curveobjectives import CurveLength, LpCurveTorsion
-from simsopt.objectives.utilities import MPIObjective, QuadraticPenalty, MPIOptimizable
+from simsopt.objectives.utilities import MPIObjective, QuadraticPenalty, MPIOptimizable, sum_across_comm
 from simsopt.geo import parameters
 from simsopt._core.json import GSONDecoder, GSONEncoder, SIMSON
 from simsopt._core.util import parallel_loop_bounds
@@ -85,6 +85,12 @@ class UtilityObjectiveTesting(unittest.TestCase):
             assert abs(Jmpi1.J() - sum(J.J() for J in Js)/n) < 1e-14
             assert np.sum(np.abs(Jmpi1.dJ() - sum(J.dJ() for J in Js)/n)) < 1e-14
 
+        # The reduction of a Derivative sums the entries of all ranks
+        local_derivs = Js[0].dJ(partials=True) + Js[2].dJ(partials=True)
+        summed = sum_across_comm(local_derivs, comm)
+        for k in local_derivs.data.keys():
+            np.testing.assert_allclose(summed.data[k], comm.size * local_derivs.data[k], atol=1e-14)
+
     @unittest.skipIf(MPI is None, "mpi4py not found")
     def test_mpi_optimizable(self):
         """
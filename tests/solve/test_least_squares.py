@@ -65,6 +65,53 @@ class LeastSquaresProblemTests(unittest.TestCase):
                 self.assertTrue(np.allclose(iden2.x, [2]))
                 self.assertTrue(np.allclose(iden3.x, [6]))
 
+    def test_solve_workers(self):
+        """
+        Solve a problem with the finite-difference Jacobian evaluated by a
+        pool of forked processes, which gives the same iterates as the serial
+        evaluation.
+        """
+        with ScratchDir("."):
+            for diff_method in ["forward", "centered"]:
+                xs = []
+                for workers in [None, 2]:
+                    r = Rosenbrock()
+                    iden = Identity(2.0)
+                    prob = LeastSquaresProblem.from_tuples([(r.f, 0, 1),
+                                                            (iden.f, 1, 2)])
+                    least_squares_serial_solve(prob, grad=True,
+                                               workers=workers,
+                                               executor="fork",
+                                               diff_method=diff_method)
+                    self.assertAlmostEqual(prob.objective(), 0)
+                    np.testing.assert_allclose(iden.x, [1])
+                    xs.append(prob.x)
+                np.testing.assert_allclose(xs[0], xs[1], rtol=1e-12)
+
+    def test_solve_broyden(self):
+        """
+        Solve problems with Broyden updates of the finite-difference
+        Jacobian.
+        """
+        with ScratchDir("."):
+            for solver in solvers:
+                for diff_method in ["forward", "centered"]:
+                    iden1 = Identity()
+                    iden2 = Identity()
+                    iden3 = Identity()
+                    prob = LeastSquaresProblem.from_tuples(
+                        [(iden1.f, 1, 1), (iden2.f, 2, 2), (iden3.f, 3, 3)])
+                    solver(prob, grad=True, broyden_updates=3,
+                           diff_method=diff_method)
+                    self.assertAlmostEqual(prob.objective(), 0)
+                    np.testing.assert_allclose(prob.x, [1, 2, 3])
+
+                    r = Rosenbrock()
+                    prob = LeastSquaresProblem(0, 1, depends_on=r)
+                    solver(prob, grad=True, broyden_updates=3,
+                           diff_method=diff_method)
+                    self.assertAlmostEqual(prob.objective(), 0)
+
     def test_solve_rosenbrock(self):
         """
         Minimize the Rosenbrock function using two separate least-squares
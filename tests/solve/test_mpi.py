@@ -11,6 +11,7 @@ except:
 from simsopt._core.optimizable import Optimizable
 from simsopt._core import ObjectiveFailure
 from simsopt.objectives.least_squares import LeastSquaresProblem
+from simsopt.solve.mpi import _speculative_least_squares
 if MPI is not None:
     from simsopt.util.mpi import MpiPartition
     from simsopt.solve.mpi import least_squares_mpi_solve
@@ -94,6 +95,40 @@ class FailingOptimizable(Optimizable):
         return self.x - np.array([10, 9, 8, 7])
 
 
+class SpeculativeLeastSquaresTests(unittest.TestCase):
+    def test_rosenbrock(self):
+        """
+        The Levenberg-Marquardt method with candidate steps finds the
+        minimum of the Rosenbrock function for any number of candidates.
+        """
+        def fun(x):
+            return np.array([10 * (x[1] - x[0] ** 2), 1 - x[0]])
+
+        def jac(x):
+            return np.array([[-20 * x[0], 10], [-1, 0]])
+
+        def fun_batch(xs):
+            return [fun(x) for x in xs]
+
+        x0 = np.array([-1.2, 1.0])
+        nrounds = []
+        for nsteps in [1, 2, 5]:
+            result = _speculative_least_squares(fun_batch, jac, x0, fun(x0),
+                                                nsteps)
+            self.assertIn(result.status, [1, 2, 3])
+            np.testing.assert_allclose(result.x, [1, 1], atol=1e-6)
+            np.testing.assert_allclose(result.fun, fun(result.x))
+            nrounds.append((result.nfev - 1) / nsteps)
+        # Evaluating more candidates together reduces the number of
+        # sequential rounds of function evaluations
+        self.assertLess(nrounds[-1], nrounds[0])
+
+        result = _speculative_least_squares(fun_batch, jac, x0, fun(x0), 3,
+                                            max_nfev=10)
+        self.assertEqual(result.status, 0)
+        self.assertLessEqual(result.nfev, 10)
+
+
 @unittest.skipIf(MPI is None, "Requires mpi4py")
 class MPISolveTests(unittest.TestCase):
 
@@ -144,6 +179,24 @@ class MPISolveTests(unittest.TestCase):
                             self.assertAlmostEqual(prob.x[0], 1)
                             self.assertAlmostEqual(prob.x[1], 1)
 
+    def test_speculative_steps(self):
+        """
+        Test a least-squares optimization in which candidate steps are
+        evaluated concurrently by the worker groups.
+        """
+        with ScratchDir("."):
+            for ngroups in range(1, 4):
+                for speculative_steps in [ngroups, 2 * ngroups]:
+                    mpi = MpiPartition(ngroups=ngroups)
+                    o = TestFunction3(mpi.comm_groups)
+                    prob = LeastSquaresProblem.from_tuples([(o.f0, 0, 1),
+                                                            (o.f1, 0, 1)])
+                    prob.x = [-0.1, 0.2]
+                    least_squares_mpi_solve(prob, mpi, grad=True,
+                                            speculative_steps=speculative_steps)
+                    self.assertAlmostEqual(prob.x[0], 1)
+                    self.assertAlmostEqual(prob.x[1], 1)
+
     def test_objective_failure_with_mpi(self):
         """
         If the objective function fails on the first evaluation, make sure the code does not hang.
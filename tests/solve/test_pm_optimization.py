@@ -7,7 +7,8 @@ from monty.tempfile import ScratchDir
 import simsoptpp as sopp
 from simsopt.solve.permanent_magnet_optimization import prox_l0, prox_l1
 from simsopt.solve.permanent_magnet_optimization import setup_initial_condition
-from simsopt.solve import relax_and_split, GPMO
+from simsopt.solve.permanent_magnet_optimization import FISTA_algorithm
+from simsopt.solve import relax_and_split, relax_and_split_continuation, GPMO
 from simsopt.util import *
 from simsopt.geo import SurfaceRZFourier, PermanentMagnetGrid
 from simsopt.field import BiotSavart
@@ -51,6 +52,26 @@ class Testing(unittest.TestCase):
             assert dipoles.shape == (ndipoles, 3)
             assert m_hist.shape == (ndipoles, 3, 21)
 
+            # The accelerated solver should reach at least as low a loss
+            FISTA_hist, _, m_hist, dipoles_fista = FISTA_algorithm(
+                A_obj=A, b_obj=b, ATb=ATb, m_proxy=m0, m0=m0, m_maxima=m_maxima,
+                alpha=alpha / 2.0, nu=1e100, epsilon=1e-4, max_iter=max_iter,
+                reg_l0=0.0, reg_l1=0.0, reg_l2=0.0, verbose=True)
+            assert dipoles_fista.shape == (ndipoles, 3)
+            assert m_hist.shape == (ndipoles, 3, 21)
+            assert np.all(np.linalg.norm(dipoles_fista, axis=-1) <= m_maxima * (1 + 1e-12))
+            A2 = A.reshape(nquad, ndipoles * 3)
+            loss_mwpgp = 0.5 * np.sum((A2 @ np.ravel(dipoles) - b) ** 2)
+            loss_fista = 0.5 * np.sum((A2 @ np.ravel(dipoles_fista) - b) ** 2)
+            assert loss_fista <= loss_mwpgp * (1 + 1e-2)
+
+            # The loss terms are recorded at every iteration of short runs
+            FISTA_hist, _, _, _ = FISTA_algorithm(
+                A_obj=A, b_obj=b, ATb=ATb, m_proxy=m0, m0=m0, m_maxima=m_maxima,
+                alpha=alpha / 2.0, nu=1e100, epsilon=1e-4, max_iter=3,
+                reg_l0=0.0, reg_l1=0.0, reg_l2=0.0, verbose=True)
+            assert np.count_nonzero(FISTA_hist) == 3
+
     def test_algorithms(self):
         """ 
             Test the relax and split algorithm for solving
@@ -127,6 +148,28 @@ class Testing(unittest.TestCase):
             kwargs['epsilon_RS'] = 1e5
             relax_and_split(pm_opt, **kwargs)
 
+            # Accelerated convex solver, Anderson acceleration of the outer
+            # loop, and warm-started continuation in the L0 threshold
+            kwargs = initialize_default_kwargs()
+            kwargs['nu'] = nu
+            kwargs['max_iter'] = 40
+            kwargs['max_iter_RS'] = 20
+            kwargs['convex_solver'] = 'FISTA'
+            kwargs['anderson_depth'] = 3
+            kwargs['reg_l0'] = reg_l0
+            errors, m_history, m_proxy_history = relax_and_split(pm_opt, **kwargs)
+            assert len(errors) == len(m_history) == len(m_proxy_history)
+            w = pm_opt.m_proxy[~np.isclose(pm_opt.m_proxy, 0.0)]
+            assert np.all(np.abs(w) >= reg_l0 * pm_opt.m_maxima[0])
+            errors, m_history, m_proxy_history = relax_and_split_continuation(
+                pm_opt, [reg_l0 / 4.0, reg_l0 / 2.0, reg_l0], **kwargs)
+            assert len(errors) == 3
+            w = pm_opt.m_proxy[~np.isclose(pm_opt.m_proxy, 0.0)]
+            assert np.all(np.abs(w) >= reg_l0 * pm_opt.m_maxima[0])
+            kwargs['convex_solver'] = 'unknown'
+            with self.assertRaises(ValueError):
+                relax_and_split(pm_opt, **kwargs)
+
             # Test that all the GPMO variants return the same solutions
             # in various limits.
             kwargs = initialize_default_kwargs('GPMO')
@@ -192,6 +235,27 @@ class Testing(unittest.TestCase):
                 kwargs['m_init'] = m_history6[:-1, :, -1]
                 errors6, Bn_errors6, m_history6 = GPMO(pm_opt, algorithm='ArbVec_backtracking', **kwargs)
 
+            # Running in checkpointed chunks should reproduce the single run,
+            # and rerunning with an existing checkpoint should resume from it
+            kwargs.pop('m_init')
+            kwargs['checkpoint_file'] = 'gpmo_checkpoint.npz'
+            kwargs['checkpoint_every'] = 5
+            errors7, Bn_errors7, m_history7 = GPMO(pm_opt, algorithm='ArbVec_backtracking', **kwargs)
+            m7 = pm_opt.m
+            assert np.allclose(m5, m7)
+            assert np.allclose(errors5, errors7)
+            assert np.allclose(Bn_errors5, Bn_errors7)
+            assert np.allclose(m_history5[:, :, :-1], m_history7)
+            errors8, Bn_errors8, m_history8 = GPMO(pm_opt, algorithm='ArbVec_backtracking', **kwargs)
+            assert np.allclose(m7, pm_opt.m)
+            assert np.allclose(errors7, errors8)
+            assert np.allclose(m_history7, m_history8)
+            # A checkpoint of a different problem is not resumed
+            with self.assertRaises(ValueError):
+                GPMO(pm_opt, algorithm='ArbVec_backtracking', **dict(kwargs, K=kwargs['K'] + 5))
+            with self.assertRaises(ValueError):
+                GPMO(pm_opt, algorithm='baseline', **kwargs)
+
 
 if __name__ == "__main__":
     unittest.main()
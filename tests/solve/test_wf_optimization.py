@@ -180,6 +180,22 @@ class WireframeOptimizationTests(unittest.TestCase):
         res2 = optimize_wireframe(wf, 'rcls', opt_params, Amat=res['Amat'],
                                   bvec=res['bvec'], verbose=True)
         self.assertTrue(np.allclose(res2['x'], res['x']))
+        for key in ['assembly', 'factorization', 'solve']:
+            self.assertTrue(res2['timings'][key] >= 0)
+
+        # Sparse constraint handling with iterative solvers
+        for solver in ['lsqr', 'cg']:
+            opt_params_iter = {'reg_W': reg_W, 'solver': solver}
+            res_iter = optimize_wireframe(wf, 'rcls', opt_params_iter,
+                                          Amat=res['Amat'], bvec=res['bvec'],
+                                          verbose=False)
+            self.assertTrue(np.allclose(res_iter['x'], res['x'], rtol=1e-6,
+                                        atol=1e-6*np.max(np.abs(res['x']))))
+            self.assertTrue(wf.check_constraints())
+        with self.assertRaises(ValueError):
+            optimize_wireframe(wf, 'rcls', {'reg_W': reg_W, 'solver': 'foo'},
+                               Amat=res['Amat'], bvec=res['bvec'],
+                               verbose=False)
 
         # Tests with non-scalar regularization parameter
         opt_params_vectorW = {'reg_W': reg_W * np.ones((2*n_phi*n_theta))}